@@ -5,7 +5,22 @@ A tool to automate the setup of a local development environment.
 
 __version__ = "0.1.0"
 
-from local_env_setup.setup.infra.kubernetes import run as setup_kubernetes
-from local_env_setup.setup.infra.terraform import run as setup_terraform
+import importlib
+from typing import Any
 
-__all__ = ['setup_kubernetes', 'setup_terraform'] 
\ No newline at end of file
+# Resolved on first access so importing the package (e.g. for the CLI) does
+# not import every setup module
+_LAZY_EXPORTS = {
+    'setup_kubernetes': ('local_env_setup.setup.infra.kubernetes', 'run'),
+    'setup_terraform': ('local_env_setup.setup.infra.terraform', 'run'),
+}
+
+__all__ = ['setup_kubernetes', 'setup_terraform']
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module_name, attr = _LAZY_EXPORTS[name]
+    value = getattr(importlib.import_module(module_name), attr)
+    globals()[name] = value
+    return value
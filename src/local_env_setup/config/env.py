@@ -1,34 +1,73 @@
+"""Layered configuration.
+
+Values are resolved once, on first use, from these layers (later layers
+win):
+
+1. The defaults in ``EnvConfig``
+2. The YAML config file (``--config``, ``$LOCAL_ENV_SETUP_CONFIG`` or
+   ``~/.config/local_env_setup/config.yaml``): its top-level keys, then
+   the keys of the selected profile under ``profiles`` (``--profile`` or
+   ``$LOCAL_ENV_SETUP_PROFILE``)
+3. A ``.env`` file (``--env-file``, or ``.env`` in the working directory)
+4. The environment: ``LOCAL_ENV_SETUP_<KEY>`` for any key, plus the
+   historical unprefixed names in ``UNPREFIXED_KEYS``
+5. Overrides from the command line (``--set KEY=VALUE``)
+
+Keys are the ``EnvConfig`` field names; the YAML file may spell them in
+lower case. Files are only parsed when the configuration is first used,
+and parsed files are cached until they change (see ``config.sources``).
+"""
+
+import logging
 import os
-from typing import Dict, List
-from dataclasses import dataclass, field
-from dotenv import load_dotenv
+import threading
+from dataclasses import dataclass, field, fields
 from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from local_env_setup.config.sources import dotenv_files, yaml_files
+
+logger = logging.getLogger(__name__)
 
-# Get the project root directory
-project_root = Path(__file__).parent.parent.parent.parent
+ENV_PREFIX = "LOCAL_ENV_SETUP_"
+CONFIG_FILE_ENV = "LOCAL_ENV_SETUP_CONFIG"
+PROFILE_ENV = "LOCAL_ENV_SETUP_PROFILE"
 
-# Load environment variables from .env file
-env_path = project_root / '.env'
-if env_path.exists():
-    load_dotenv(env_path)
-    print(f"✅ Loaded .env file from: {env_path}")
-else:
-    print(f"❌ .env file not found at: {env_path}")
+# Keys also read from unprefixed environment variables, as before the
+# prefix existed. Other keys are not, so e.g. the PYTHON_VERSION set in
+# Python container images is not mistaken for the version to install.
+UNPREFIXED_KEYS = (
+    "GIT_USERNAME", "GIT_EMAIL", "SHELL_FAST_STARTUP", "AWS_REGION", "AWS_PROFILE",
+    "DOCKER_APP_PATH", "DOCKER_COMPOSE_PATH",
+)
+
+FALSE_VALUES = ("0", "false", "no", "off", "")
 
 @dataclass
 class EnvConfig:
     """Environment configuration settings."""
     # Development directory
-    DEV_DIR: str = os.path.expanduser("~/dev")
-    
+    DEV_DIR: str = field(default_factory=lambda: os.path.expanduser("~/dev"))
+
     # Git configuration
-    GIT_USERNAME: str = os.getenv("GIT_USERNAME", "")
-    GIT_EMAIL: str = os.getenv("GIT_EMAIL", "")
-    
+    GIT_USERNAME: str = ""
+    GIT_EMAIL: str = ""
+
     # Python configuration
     PYTHON_VERSION: str = "3.11.0"
+    # Further versions installed alongside the global PYTHON_VERSION
+    PYTHON_VERSIONS: List[str] = field(default_factory=list)
     POETRY_VERSION: str = "1.4.2"
-    
+    # Poetry's cache; empty uses the shared cache dir
+    POETRY_CACHE_DIR: str = ""
+    # Parallel installer workers (0: one per core)
+    POETRY_MAX_WORKERS: int = 0
+    # Packages (e.g. "numpy==1.26.4") whose wheels are built ahead of time
+    # for every interpreter, so projects do not compile them from sdists
+    POETRY_WHEELHOUSE: List[str] = field(default_factory=list)
+    # Unpack interpreters built on a compatible machine instead of compiling
+    PYTHON_ARTIFACT_CACHE: bool = True
+
     # Shell configuration
     ZSH_PLUGINS: List[str] = field(default_factory=lambda: [
         "zsh-autosuggestions",
@@ -37,19 +76,37 @@ class EnvConfig:
         "docker",
         "kubectl"
     ])
-    
+    # Precompiled completions and lazily initialized tools in the rc file,
+    # instead of running each tool on every shell start
+    SHELL_FAST_STARTUP: bool = True
+
     # Infrastructure tools
+    # Default Terraform, run where no .terraform-version or required_version
+    # asks for another one
     TERRAFORM_VERSION: str = "1.4.0"
+    # Further versions installed side by side (e.g. [1.3.9, 1.5.7])
+    TERRAFORM_VERSIONS: List[str] = field(default_factory=list)
+    # Providers ("hashicorp/aws@5.31.0") cached ahead of terraform init, on
+    # top of those pinned by the lock files under DEV_DIR
+    TERRAFORM_PROVIDERS: List[str] = field(default_factory=list)
+    # Shared plugin_cache_dir; empty uses the shared cache dir
+    TERRAFORM_PLUGIN_CACHE_DIR: str = ""
     KUBECTL_VERSION: str = "1.26.0"
     HELM_VERSION: str = "3.11.0"
-    
+
     # AWS configuration
-    AWS_REGION: str = os.getenv("AWS_REGION", "us-east-1")
-    AWS_PROFILE: str = os.getenv("AWS_PROFILE", "default")
-    
+    AWS_REGION: str = "us-east-1"
+    AWS_PROFILE: str = "default"
+
     # Docker configuration
     DOCKER_COMPOSE_VERSION: str = "2.17.0"
-    
+    DOCKER_APP_PATH: str = "/Applications/Docker.app"
+    DOCKER_COMPOSE_PATH: str = "/usr/local/bin/docker-compose"
+
+    # Prebuilt artifacts; empty uses the shared cache dir. Point it at a
+    # directory shared between machines to build each interpreter once
+    ARTIFACT_CACHE_DIR: str = ""
+
     # Development tools
     VSCODE_EXTENSIONS: List[str] = field(default_factory=lambda: [
         "ms-python.python",
@@ -58,8 +115,160 @@ class EnvConfig:
         "redhat.vscode-yaml"
     ])
 
-# Create environment instance
-env = EnvConfig()
+FIELDS = {f.name: f for f in fields(EnvConfig)}
+
+
+def _coerce(key: str, value: Any) -> Any:
+    """Convert a value from a file or the environment to the field's type."""
+    kind = FIELDS[key].type
+    if kind is bool:
+        return value.strip().lower() not in FALSE_VALUES if isinstance(value, str) else bool(value)
+    if kind is int:
+        return int(value)
+    if kind == List[str]:
+        if isinstance(value, str):
+            return [item for item in value.replace(",", " ").split() if item]
+        return [str(item) for item in value]
+    value = str(value)
+    if key.endswith(("_DIR", "_PATH")):
+        value = os.path.expanduser(value)
+    return value
+
+
+def config_file() -> Path:
+    """Location of the YAML config file."""
+    path = os.environ.get(CONFIG_FILE_ENV)
+    if path:
+        return Path(path).expanduser()
+    base = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(base) / "local_env_setup" / "config.yaml"
+
+
+@dataclass
+class CliOptions:
+    """Configuration options given on the command line."""
+    config_file: Optional[str] = None
+    profile: Optional[str] = None
+    env_file: Optional[str] = None
+    overrides: Dict[str, Any] = field(default_factory=dict)
+
 
-# Debug: Print loaded environment variables
-print("\nLoaded Environment Variables..")
+def _file_layers(options: CliOptions) -> List[Dict[str, Any]]:
+    """The YAML base and profile layers, keys upper-cased."""
+    path = Path(options.config_file).expanduser() if options.config_file else config_file()
+    data = yaml_files.get(path)
+    if data is None:
+        if options.config_file:
+            raise ValueError(f"Config file not found: {path}")
+        data = {}
+    profiles = data.get("profiles") or {}
+    base = {str(k).upper(): v for k, v in data.items() if k != "profiles"}
+    layers = [base]
+    profile = options.profile or os.environ.get(PROFILE_ENV)
+    if profile:
+        if profile not in profiles:
+            raise ValueError(f"Unknown profile {profile!r} in {path} "
+                             f"(available: {', '.join(profiles) or 'none'})")
+        layers.append({str(k).upper(): v for k, v in (profiles[profile] or {}).items()})
+    for layer in layers:
+        unknown = sorted(set(layer) - set(FIELDS))
+        if unknown:
+            raise ValueError(f"Unknown configuration key(s) in {path}: {', '.join(unknown)}")
+    return layers
+
+
+def _environment_layer() -> Dict[str, str]:
+    values = {key: os.environ[key] for key in UNPREFIXED_KEYS if key in os.environ}
+    for key in FIELDS:
+        if ENV_PREFIX + key in os.environ:
+            values[key] = os.environ[ENV_PREFIX + key]
+    return values
+
+
+def resolve(options: Optional[CliOptions] = None) -> EnvConfig:
+    """Build the configuration from all layers in one pass.
+
+    Args:
+        options: Command-line options (defaults to those set by ``configure``)
+
+    Raises:
+        ValueError: On unknown keys, a missing profile or config file
+    """
+    options = options or _options
+    env_path = Path(options.env_file) if options.env_file else Path.cwd() / ".env"
+    dotenv = dotenv_files.get(env_path)
+    if dotenv is None and options.env_file:
+        raise ValueError(f".env file not found: {env_path}")
+    dotenv_layer = {}
+    for key, value in (dotenv or {}).items():
+        # .env files may hold unrelated keys; take ours, prefixed or not
+        name = key[len(ENV_PREFIX):] if key.startswith(ENV_PREFIX) else key
+        if name in FIELDS:
+            dotenv_layer[name] = value
+
+    unknown = sorted(set(options.overrides) - set(FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown configuration key(s): {', '.join(unknown)}")
+
+    values: Dict[str, Any] = {}
+    for layer in [*_file_layers(options), dotenv_layer, _environment_layer(),
+                  options.overrides]:
+        values.update(layer)
+    return EnvConfig(**{key: _coerce(key, value) for key, value in values.items()})
+
+
+_options = CliOptions()
+_config: Optional[EnvConfig] = None
+_config_lock = threading.Lock()
+
+
+def configure(config_file: Optional[str] = None, profile: Optional[str] = None,
+              env_file: Optional[str] = None,
+              overrides: Optional[Dict[str, Any]] = None) -> None:
+    """Set the command-line layer; the configuration is resolved on next use.
+
+    Args:
+        config_file: YAML config file to use instead of the default one
+        profile: Profile of the config file to apply
+        env_file: .env file to use instead of ``./.env``
+        overrides: Values overriding every other layer
+    """
+    global _options, _config
+    with _config_lock:
+        _options = CliOptions(config_file, profile, env_file, dict(overrides or {}))
+        _config = None
+
+
+def load_env() -> EnvConfig:
+    """Return the configuration, resolving it on first use.
+
+    Returns:
+        EnvConfig: The resolved configuration, shared by all callers
+    """
+    global _config
+    with _config_lock:
+        if _config is None:
+            _config = resolve(_options)
+            logger.debug("Resolved configuration")
+        return _config
+
+
+def reload_env() -> EnvConfig:
+    """Resolve the configuration again, re-reading files that changed."""
+    global _config
+    with _config_lock:
+        _config = None
+    return load_env()
+
+
+class LazyEnv:
+    """Attribute proxy that resolves the configuration on first access."""
+
+    def __getattr__(self, name: str) -> Any:
+        # Once resolved, a lookup is a module global read and an attribute hit
+        config = _config if _config is not None else load_env()
+        return getattr(config, name)
+
+
+# Create environment instance
+env = LazyEnv()
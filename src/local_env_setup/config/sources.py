@@ -0,0 +1,80 @@
+"""Configuration files, parsed on first use and cached per file.
+
+A file is parsed again only when its modification time or size changes,
+so re-resolving the configuration (or calling ``utils.load_env_file``
+repeatedly) costs a ``stat`` per file. The parsers import ``yaml`` and
+``dotenv`` only when a file of that kind is actually read.
+"""
+
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+
+def parse_yaml(path: Path) -> Dict[str, Any]:
+    """Parse a YAML mapping.
+
+    Raises:
+        ValueError: If the file is not valid YAML or not a mapping
+    """
+    import yaml
+
+    try:
+        data = yaml.safe_load(path.read_text())
+    except yaml.YAMLError as e:
+        raise ValueError(f"{path}: {e}") from e
+    if data is None:
+        return {}
+    if not isinstance(data, dict):
+        raise ValueError(f"{path}: expected a mapping at the top level")
+    return data
+
+
+def parse_dotenv(path: Path) -> Dict[str, str]:
+    """Parse a ``.env`` file; keys without a value are skipped."""
+    from dotenv import dotenv_values
+
+    return {key: value for key, value in dotenv_values(path).items() if value is not None}
+
+
+class FileCache:
+    """Parsed contents of files, invalidated by modification time."""
+
+    def __init__(self, parser: Callable[[Path], Dict[str, Any]]):
+        """Initialize the cache.
+
+        Args:
+            parser: Function parsing a file into a dict
+        """
+        self.parser = parser
+        self._entries: Dict[Path, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, path: Union[str, Path]) -> Optional[Dict[str, Any]]:
+        """Return a file's parsed contents, or None if it does not exist.
+
+        The returned dict is shared; callers must not modify it.
+        """
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+        data = self.parser(path)
+        with self._lock:
+            self._entries[path] = (stamp, data)
+        return data
+
+    def clear(self) -> None:
+        """Forget every parsed file."""
+        with self._lock:
+            self._entries.clear()
+
+
+yaml_files = FileCache(parse_yaml)
+dotenv_files = FileCache(parse_dotenv)
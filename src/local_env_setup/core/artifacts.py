@@ -0,0 +1,314 @@
+"""Cache of prebuilt directory trees, such as pyenv's Python interpreters.
+
+Building CPython takes minutes per version; unpacking a build made on a
+compatible machine takes seconds. ``ArtifactCache.pack`` stores a built tree
+as a gzipped tarball, keyed by the tool, its version and the attributes the
+build depends on: architecture, OS release, build flags and install prefix
+(interpreters embed their prefix in scripts and ``sysconfig``). On a cache
+hit ``unpack`` verifies the tarball's sha256 and moves the extracted tree
+into place in one rename; on a miss the caller builds and packs the result.
+
+Each artifact is a ``<name>-<version>-<key>.<sha256[:12]>.tar.gz`` plus a
+``<name>-<version>-<key>.json`` pointing at it. Writers publish the tarball
+before replacing the JSON, and never overwrite a tarball, so machines can
+share the directory (``ARTIFACT_CACHE_DIR``, e.g. a network mount) without
+locking. A tarball's modification time records when it was last used.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import platform
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from local_env_setup.config import env
+from local_env_setup.core.state import shared_cache_dir
+
+# gzip level: most of the size reduction at a fraction of level 9's cost
+COMPRESS_LEVEL = 6
+
+# Top-level directory of every tarball
+ARCHIVE_ROOT = "tree"
+
+# Leftovers of interrupted writers older than this are removed by prune
+STALE_TMP_SECONDS = 3600
+
+
+@dataclass
+class Artifact:
+    """A packed tree in the cache.
+
+    Attributes:
+        name: Tool the tree belongs to, e.g. ``python``
+        version: Tool version
+        key: Hash of ``name``, ``version`` and ``attrs``
+        attrs: Attributes the build depends on (arch, OS release, flags...)
+        file: Tarball name, relative to the cache directory
+        sha256: Digest of the tarball
+        size: Size of the tarball in bytes
+        created: When it was packed
+        last_used: When it was last packed or unpacked
+    """
+    name: str
+    version: str
+    key: str
+    attrs: Dict[str, str]
+    file: str
+    sha256: str
+    size: int
+    created: float
+    last_used: float = field(default=0.0, compare=False)
+
+
+def os_release() -> str:
+    """Return the OS release builds are compatible within.
+
+    The major macOS version, the distribution release on Linux, or the
+    kernel release elsewhere.
+    """
+    system = platform.system().lower()
+    if system == "darwin":
+        return f"macos-{platform.mac_ver()[0].split('.')[0]}"
+    try:
+        release = platform.freedesktop_os_release()
+        return f"{release.get('ID', system)}-{release.get('VERSION_ID', '')}"
+    except (AttributeError, OSError):
+        return f"{system}-{platform.release()}"
+
+
+def platform_attrs() -> Dict[str, str]:
+    """Return the architecture and OS release of this machine."""
+    return {"arch": platform.machine(), "os": os_release()}
+
+
+def artifact_key(name: str, version: str, attrs: Dict[str, str]) -> str:
+    """Hash what a build depends on into a cache key."""
+    encoded = json.dumps([name, version, attrs], sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def _digest(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _extract(tar: tarfile.TarFile, dest: Path) -> None:
+    if hasattr(tarfile, "data_filter"):
+        # Refuse absolute paths and links escaping the destination
+        tar.extractall(dest, filter="data")
+    else:
+        tar.extractall(dest)
+
+
+class ArtifactCache:
+    """Checksummed tarballs of built trees, shareable between machines."""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None):
+        """Initialize the cache.
+
+        Args:
+            root: Cache directory (defaults to ``ARTIFACT_CACHE_DIR``, else
+                ``artifacts`` in the shared cache dir)
+        """
+        if root is None and env.ARTIFACT_CACHE_DIR:
+            root = env.ARTIFACT_CACHE_DIR
+        self.root = Path(root) if root else shared_cache_dir() / "artifacts"
+        self.logger = logging.getLogger("ArtifactCache")
+
+    def _stem(self, name: str, version: str, key: str) -> str:
+        return f"{name}-{version}-{key}"
+
+    def path(self, artifact: Artifact) -> Path:
+        """Return the tarball of an artifact."""
+        return self.root / artifact.file
+
+    def _read(self, meta: Path) -> Optional[Artifact]:
+        try:
+            artifact = Artifact(**json.loads(meta.read_text()))
+            artifact.last_used = self.path(artifact).stat().st_mtime
+        except (OSError, ValueError, TypeError):
+            # Missing tarball, or metadata from an incompatible version
+            return None
+        return artifact
+
+    def lookup(self, name: str, version: str, attrs: Dict[str, str]) -> Optional[Artifact]:
+        """Return the cached artifact for a build, if any.
+
+        Args:
+            name: Tool name
+            version: Tool version
+            attrs: Attributes the build depends on
+        """
+        key = artifact_key(name, version, attrs)
+        return self._read(self.root / f"{self._stem(name, version, key)}.json")
+
+    def list(self) -> List[Artifact]:
+        """Return every artifact in the cache, by name and version."""
+        if not self.root.is_dir():
+            return []
+        artifacts = [self._read(meta) for meta in self.root.glob("*.json")]
+        return sorted((a for a in artifacts if a is not None),
+                      key=lambda a: (a.name, a.version, a.created))
+
+    def pack(self, source: Union[str, Path], name: str, version: str,
+             attrs: Dict[str, str]) -> Artifact:
+        """Store a built tree in the cache.
+
+        Args:
+            source: Directory to pack
+            name: Tool name
+            version: Tool version
+            attrs: Attributes the build depends on
+
+        Returns:
+            Artifact: The stored artifact
+
+        Raises:
+            OSError: If the tree cannot be read or the cache written
+        """
+        source = Path(source)
+        if not source.is_dir():
+            raise FileNotFoundError(f"{source} is not a directory")
+        key = artifact_key(name, version, attrs)
+        stem = self._stem(name, version, key)
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f".{stem}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, tarfile.open(
+                    fileobj=f, mode="w:gz", compresslevel=COMPRESS_LEVEL) as tar:
+                tar.add(source, arcname=ARCHIVE_ROOT)
+            sha256 = _digest(Path(tmp))
+            artifact = Artifact(name, version, key, dict(attrs), f"{stem}.{sha256[:12]}.tar.gz",
+                                sha256, os.path.getsize(tmp), time.time(), time.time())
+            os.replace(tmp, self.path(artifact))
+            meta_tmp = self.root / f".{stem}.json.{os.getpid()}-{threading.get_ident()}.tmp"
+            meta_tmp.write_text(json.dumps(asdict(artifact), indent=1, sort_keys=True))
+            os.replace(meta_tmp, self.root / f"{stem}.json")
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+        self.logger.info(f"Packed {name} {version} ({artifact.size / 1e6:.1f} MB)")
+        return artifact
+
+    def unpack(self, artifact: Artifact, dest: Union[str, Path]) -> bool:
+        """Extract an artifact to ``dest``, which must not exist.
+
+        A tarball that fails verification is removed from the cache so the
+        next build replaces it.
+
+        Args:
+            artifact: Artifact to extract
+            dest: Directory to create
+
+        Returns:
+            bool: True if ``dest`` now holds the tree, False otherwise
+        """
+        dest = Path(dest)
+        tarball = self.path(artifact)
+        try:
+            actual = _digest(tarball)
+        except OSError as e:
+            self.logger.warning(f"Cannot read {tarball}: {e}")
+            return False
+        if actual != artifact.sha256:
+            self.logger.warning(f"Checksum mismatch for {tarball}; removing it")
+            self.remove(artifact)
+            return False
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=dest.parent, prefix=f".{dest.name}."))
+        try:
+            with tarfile.open(tarball, "r:gz") as tar:
+                _extract(tar, staging)
+            # A rename, so an interrupted unpack never leaves a partial tree
+            os.rename(staging / ARCHIVE_ROOT, dest)
+        except (OSError, tarfile.TarError) as e:
+            self.logger.warning(f"Failed to unpack {tarball}: {e}")
+            return False
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        os.utime(tarball)
+        return True
+
+    def remove(self, artifact: Artifact) -> None:
+        """Delete an artifact from the cache."""
+        meta = self.root / f"{self._stem(artifact.name, artifact.version, artifact.key)}.json"
+        current = self._read(meta)
+        # Another machine may have re-packed it since
+        if current is None or current.file == artifact.file:
+            meta.unlink(missing_ok=True)
+        self.path(artifact).unlink(missing_ok=True)
+
+    def prune(self, max_age_days: Optional[float] = None, max_bytes: Optional[int] = None,
+              dry_run: bool = False) -> List[Artifact]:
+        """Remove artifacts unused for too long, then the least recently
+        used ones until the cache fits in ``max_bytes``.
+
+        Tarballs no artifact points to (replaced by a newer pack) and the
+        leftovers of interrupted writers are removed as well.
+
+        Args:
+            max_age_days: Remove artifacts not used for this many days
+            max_bytes: Size the cache is trimmed to
+            dry_run: Only return what would be removed
+
+        Returns:
+            List[Artifact]: The artifacts removed
+        """
+        now = time.time()
+        artifacts = sorted(self.list(), key=lambda a: a.last_used)
+        removed = []
+        if max_age_days is not None:
+            cutoff = now - max_age_days * 86400
+            removed = [a for a in artifacts if a.last_used < cutoff]
+        if max_bytes is not None:
+            kept = [a for a in artifacts if a not in removed]
+            total = sum(a.size for a in kept)
+            for artifact in kept:
+                if total <= max_bytes:
+                    break
+                removed.append(artifact)
+                total -= artifact.size
+        if dry_run:
+            return removed
+        for artifact in removed:
+            self.remove(artifact)
+
+        referenced = {a.file for a in artifacts if a not in removed}
+        for path in self.root.glob("*.tar.gz") if self.root.is_dir() else []:
+            if path.name not in referenced and now - path.stat().st_mtime > STALE_TMP_SECONDS:
+                path.unlink(missing_ok=True)
+        for path in self.root.glob(".*.tmp") if self.root.is_dir() else []:
+            if now - path.stat().st_mtime > STALE_TMP_SECONDS:
+                path.unlink(missing_ok=True)
+        return removed
+
+
+_cache: Optional[ArtifactCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_artifact_cache() -> ArtifactCache:
+    """Return the process-wide artifact cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ArtifactCache()
+        return _cache
+
+
+def set_artifact_cache(cache: Optional[ArtifactCache]) -> None:
+    """Replace the process-wide artifact cache (None resets to the default)."""
+    global _cache
+    with _cache_lock:
+        _cache = cache
@@ -0,0 +1,284 @@
+"""Content-addressed snapshots of the files the setup manages.
+
+``BackupStore.snapshot`` records a file's content before the setup changes
+it. Each distinct content is stored once, under its sha256 in
+``objects/``. Where possible it is cloned copy-on-write (APFS, Btrfs, XFS).
+When the caller is about to replace the file by renaming a new one over it,
+the old inode is hard-linked instead. Otherwise it is copied.
+
+``index.jsonl`` lists the versions of every file together with the run
+(see ``core.journal``) that took them. A file whose size and modification
+time match its latest version is not even read, so snapshots of unchanged
+files cost a ``stat``. Each file keeps its last ``keep`` distinct contents,
+which means the original survives any number of runs that leave it
+unchanged.
+"""
+
+import ctypes
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from local_env_setup.core.journal import get_journal
+from local_env_setup.core.state import state_dir
+
+# Distinct contents kept per file
+DEFAULT_KEEP = 10
+
+# Linux ioctl cloning one file's extents into another (linux/fs.h)
+FICLONE = 0x40049409
+
+
+@dataclass
+class Version:
+    """One snapshot of a file."""
+    path: str
+    digest: str
+    size: int
+    mtime_ns: int
+    time: float
+    run: Optional[str] = None
+
+
+def _clone(src: Path, dst: Path) -> bool:
+    """Clone a file copy-on-write; returns False if the filesystem cannot."""
+    try:
+        if sys.platform == "darwin":
+            libc = ctypes.CDLL(None, use_errno=True)
+            return libc.clonefile(os.fsencode(src), os.fsencode(dst), 0) == 0
+        with open(src, "rb") as source, open(dst, "wb") as target:
+            fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+        return True
+    except (OSError, AttributeError):
+        dst.unlink(missing_ok=True)
+        return False
+
+
+def _digest(path: Path) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class BackupStore:
+    """Deduplicated, versioned snapshots of managed files."""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None, keep: int = DEFAULT_KEEP):
+        """Initialize the store.
+
+        Args:
+            root: Store directory (defaults to ``backups`` in the state dir)
+            keep: Distinct contents kept per file
+        """
+        self.root = Path(root) if root else state_dir() / "backups"
+        self.objects = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+        self.keep = keep
+        self.logger = logging.getLogger("BackupStore")
+        self._index: Optional[Dict[str, List[Version]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, List[Version]]:
+        if self._index is not None:
+            return self._index
+        index: Dict[str, List[Version]] = {}
+        try:
+            with self.index_path.open() as f:
+                for line in f:
+                    try:
+                        version = Version(**json.loads(line))
+                    except (ValueError, TypeError):
+                        # A torn final line from an interrupted run
+                        continue
+                    index.setdefault(version.path, []).append(version)
+        except OSError:
+            pass
+        self._index = index
+        return index
+
+    def object_path(self, digest: str) -> Path:
+        """Return where a content is stored."""
+        return self.objects / digest[:2] / digest
+
+    def versions(self, path: Union[str, Path]) -> List[Version]:
+        """Return the snapshots of a file, oldest first."""
+        with self._lock:
+            return list(self._load().get(self._key(path), []))
+
+    def paths(self) -> List[str]:
+        """Return every file with snapshots."""
+        with self._lock:
+            return sorted(self._load())
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> str:
+        return os.path.realpath(os.path.expanduser(str(path)))
+
+    def _store(self, path: Path, digest: str, replacing: bool) -> str:
+        """Put a file's content into ``objects`` unless it is there already."""
+        target = self.object_path(digest)
+        if target.exists():
+            return digest
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.parent / f".tmp-{os.getpid()}-{threading.get_ident()}"
+        tmp.unlink(missing_ok=True)
+        linked = False
+        if replacing:
+            try:
+                os.link(path, tmp)
+                linked = True
+            except OSError:
+                pass
+        if not linked and not _clone(path, tmp):
+            shutil.copyfile(path, tmp)
+        # Hash what was stored, in case the file changed in between
+        stored = digest if linked else _digest(tmp)
+        os.replace(tmp, self.object_path(stored))
+        return stored
+
+    def snapshot(self, path: Union[str, Path], run: Optional[str] = None,
+                 replacing: bool = False) -> Optional[Version]:
+        """Record the current content of a file.
+
+        Args:
+            path: File to snapshot
+            run: Run taking the snapshot (defaults to the journal's current run)
+            replacing: The caller is about to rename a new file over this
+                one, so its inode can be hard-linked into the store
+
+        Returns:
+            Optional[Version]: The file's latest version, or None if it does
+            not exist
+        """
+        key = self._key(path)
+        source = Path(key)
+        try:
+            stat = source.stat()
+        except OSError:
+            return None
+        if not source.is_file():
+            return None
+        run = run or get_journal().run_id
+        with self._lock:
+            history = self._load().get(key, [])
+            latest = history[-1] if history else None
+        if latest is not None and (latest.size, latest.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            digest = latest.digest
+        else:
+            digest = _digest(source)
+        if latest is not None and latest.digest == digest and (run is None or run == latest.run):
+            return latest
+
+        if latest is None or latest.digest != digest:
+            digest = self._store(source, digest, replacing)
+        version = Version(key, digest, stat.st_size, stat.st_mtime_ns, time.time(), run)
+        with self._lock:
+            self._load().setdefault(key, []).append(version)
+            self.root.mkdir(parents=True, exist_ok=True)
+            with self.index_path.open("a") as f:
+                f.write(json.dumps(asdict(version), sort_keys=True) + "\n")
+        self._prune(key)
+        return version
+
+    def read(self, version: Version) -> bytes:
+        """Return the content of a snapshot."""
+        return self.object_path(version.digest).read_bytes()
+
+    def at_run(self, run: str) -> List[Version]:
+        """Return, per file, its content before a run first changed it."""
+        found = []
+        with self._lock:
+            for versions in self._load().values():
+                taken = [version for version in versions if version.run == run]
+                if taken:
+                    found.append(taken[0])
+        return sorted(found, key=lambda version: version.path)
+
+    def restore(self, version: Version) -> bool:
+        """Put a snapshot back in place.
+
+        The current content is snapshotted first, so a restore can itself
+        be undone.
+
+        Returns:
+            bool: True if the file changed, False if it already matched
+        """
+        path = Path(version.path)
+        if path.is_file() and _digest(path) == version.digest:
+            return False
+        self.snapshot(path, replacing=True)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        os.close(fd)
+        shutil.copyfile(self.object_path(version.digest), tmp)
+        os.chmod(tmp, path.stat().st_mode & 0o7777 if path.exists() else 0o644)
+        os.replace(tmp, path)
+        return True
+
+    def _prune(self, key: str) -> None:
+        """Drop the versions of a file beyond its last ``keep`` contents.
+
+        Unchanged files get a record per run; beyond ``4 * keep`` records the
+        oldest records of contents that also have a newer one are dropped.
+        """
+        with self._lock:
+            index = self._load()
+            versions = index.get(key, [])
+            recent: List[str] = []
+            for version in reversed(versions):
+                if version.digest not in recent:
+                    recent.append(version.digest)
+            if len(recent) <= self.keep and len(versions) <= 4 * self.keep:
+                return
+            dropped = set(recent[self.keep:])
+            kept = [version for version in versions if version.digest not in dropped]
+            excess = len(kept) - 4 * self.keep
+            trimmed = []
+            for i, version in enumerate(kept):
+                if excess > 0 and any(v.digest == version.digest for v in kept[i + 1:]):
+                    excess -= 1
+                    continue
+                trimmed.append(version)
+            index[key] = trimmed
+            tmp_path = self.index_path.with_suffix(".tmp")
+            with tmp_path.open("w") as f:
+                for versions in index.values():
+                    for version in versions:
+                        f.write(json.dumps(asdict(version), sort_keys=True) + "\n")
+            tmp_path.replace(self.index_path)
+            referenced = {version.digest for versions in index.values() for version in versions}
+        # Contents are shared between files; delete only unreferenced ones
+        for digest in dropped - referenced:
+            self.object_path(digest).unlink(missing_ok=True)
+
+
+_store: Optional[BackupStore] = None
+_store_lock = threading.Lock()
+
+
+def get_backup_store() -> BackupStore:
+    """Return the process-wide backup store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BackupStore()
+        return _store
+
+
+def set_backup_store(store: Optional[BackupStore]) -> None:
+    """Replace the process-wide backup store (None resets to the default)."""
+    global _store
+    with _store_lock:
+        _store = store
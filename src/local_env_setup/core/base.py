@@ -1,31 +1,71 @@
-import subprocess
+import asyncio
 import platform
 import logging
 import shutil
-import os
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Sequence, Tuple, Union
 from pathlib import Path
 from abc import ABC, abstractmethod
 from local_env_setup.core.logging import setup_logger, get_logger
-from local_env_setup.core.monitoring import SetupMonitor
+from local_env_setup.core.monitoring import get_monitor
+from local_env_setup.core.backup import get_backup_store
+from local_env_setup.core.brew import BrewPlan
+from local_env_setup.core.download import DownloadError, get_download_cache
+from local_env_setup.core.executor import CommandResult, get_executor
+from local_env_setup.core.inventory import get_inventory
+from local_env_setup.core.journal import get_journal
+from local_env_setup.core.rcfile import DEFAULT_PRIORITY, get_rc_editor
+from local_env_setup.core.resources import default_pool
 from local_env_setup.utils.shell import run_command
 from local_env_setup.utils.file import create_directory, append_to_file
 
+# Install scripts are not versioned; revalidate cached copies daily
+REMOTE_SCRIPT_MAX_AGE = 24 * 3600
+
 class BaseSetup(ABC):
     """Base class for all setup components.
     
     This class provides common functionality for setup components,
     including platform checks, command execution, and file operations.
+    
+    Subclasses declare how they fit into a scheduled run:
+    
+    - ``name``: component name used on the command line
+    - ``depends_on``: names of components that must finish first
+    - ``resources``: shared resources held for the whole run
+      (see ``core.resources``); individual commands acquire finer-grained
+      resources through ``run_command``/``execute``
+    - ``brew_formulae``/``brew_casks``: Homebrew packages the component
+      needs; these are installed in one batch before the component runs
+      (see ``core.brew``)
+    
+    ``run`` is the blocking entry point. ``arun`` is its coroutine
+    counterpart; components that can overlap their own work (clones,
+    downloads, probes) override it using ``aexecute``.
     """
     
+    name: str = ""
+    depends_on: Tuple[str, ...] = ()
+    resources: Tuple[str, ...] = ()
+    brew_formulae: Tuple[str, ...] = ()
+    brew_casks: Tuple[str, ...] = ()
+    
     def __init__(self):
         """Initialize the base setup component."""
         self.logger = get_logger(self.__class__.__name__)
         self.setup_logging()
         self.system = platform.system()
         self.is_macos = self.system == "Darwin"
-        self.monitor = SetupMonitor()
+        self.monitor = get_monitor()
+        self.resource_pool = default_pool
+        self.executor = get_executor()
+        self.downloads = get_download_cache()
+        self.brew_plan: Optional[BrewPlan] = None
+        self.inventory = get_inventory()
+        self.journal = get_journal()
         self.rollback_steps: List[Dict[str, Any]] = []
+        # rc blocks declared by this component, journaled so a resumed run
+        # can declare them again without re-running the component
+        self.rc_blocks: List[Dict[str, Any]] = []
         
     def setup_logging(self):
         """Setup logging configuration."""
@@ -40,17 +80,12 @@ class BaseSetup(ABC):
         Returns:
             bool: True if the platform is supported, False otherwise
         """
-        self.monitor.start_step("platform_check")
-        try:
+        with self.monitor.span("platform_check") as span:
             if not self.is_macos:
                 self.logger.error(f"Unsupported platform: {self.system}")
-                self.monitor.end_step(False, "Unsupported platform")
+                span.fail("Unsupported platform")
                 return False
-            self.monitor.end_step(True)
             return True
-        except Exception as e:
-            self.monitor.end_step(False, str(e))
-            return False
     
     def is_command_available(self, cmd: str) -> bool:
         """Check if a command is available in the system.
@@ -61,57 +96,225 @@ class BaseSetup(ABC):
         Returns:
             bool: True if the command exists, False otherwise
         """
-        self.monitor.start_step(f"check_command_{cmd}")
-        try:
+        with self.monitor.span("check_command", target=cmd) as span:
             if shutil.which(cmd) is None:
-                self.monitor.end_step(False, f"Command not found: {cmd}")
+                span.fail(f"Command not found: {cmd}")
                 return False
-            self.monitor.end_step(True)
             return True
-        except Exception as e:
-            self.monitor.end_step(False, str(e))
-            return False
     
-    def run_command(self, cmd: List[str], shell: bool = False) -> bool:
+    def execute(self, cmd: Union[List[str], str], **kwargs: Any) -> CommandResult:
+        """Run a command through the shared executor.
+        
+        The command's timings are reported to the shared monitor and
+        its resources are acquired from this component's resource pool.
+        
+        Args:
+            cmd: Command to run
+            **kwargs: Options accepted by ``CommandExecutor.run``
+            
+        Returns:
+            CommandResult: Exit status, output tails and timings
+        """
+        kwargs.setdefault("pool", self.resource_pool)
+        kwargs.setdefault("monitor", self.monitor)
+        return self.executor.run(cmd, **kwargs)
+    
+    async def aexecute(self, cmd: Union[List[str], str], **kwargs: Any) -> CommandResult:
+        """Coroutine counterpart of ``execute``.
+        
+        Args:
+            cmd: Command to run
+            **kwargs: Options accepted by ``CommandExecutor.arun``
+            
+        Returns:
+            CommandResult: Exit status, output tails and timings
+        """
+        kwargs.setdefault("pool", self.resource_pool)
+        kwargs.setdefault("monitor", self.monitor)
+        return await self.executor.arun(cmd, **kwargs)
+    
+    def run_command(self, cmd: List[str], shell: bool = False,
+                    resources: Optional[Sequence[str]] = None,
+                    timeout: Optional[float] = None,
+                    env: Optional[Dict[str, str]] = None,
+                    passthrough: bool = False) -> bool:
         """Run a command and return its success status.
         
         Args:
             cmd: Command to run as a list of strings
             shell: Whether to run the command in a shell
+            resources: Shared resources to hold while the command runs.
+                Defaults to the executor's per-executable resources.
+            timeout: Seconds before the command is killed
+            env: Variables overlaid on the current environment
+            passthrough: Leave output attached to the terminal
             
         Returns:
             bool: True if the command succeeded, False otherwise
         """
-        self.monitor.start_step(f"run_command_{'_'.join(cmd)}")
-        try:
-            subprocess.run(cmd, check=True, shell=shell)
-            self.monitor.end_step(True)
-            return True
-        except subprocess.CalledProcessError as e:
-            error_msg = f"Command failed: {e}"
+        with self.monitor.span("run_command", target=" ".join(cmd)) as span:
+            result = self.execute(cmd, shell=shell, resources=resources, timeout=timeout,
+                                  env=env, passthrough=passthrough, echo=self.logger)
+            if result.ok:
+                return True
+            reason = "timed out" if result.timed_out else f"exit status {result.returncode}"
+            error_msg = f"Command failed: {result.display} ({reason})"
+            if result.log_path:
+                error_msg += f"; log: {result.log_path}"
             self.logger.error(error_msg)
-            self.monitor.end_step(False, error_msg)
+            span.fail(error_msg)
             return False
-        except Exception as e:
-            error_msg = f"Unexpected error: {e}"
-            self.logger.error(error_msg)
-            self.monitor.end_step(False, error_msg)
+    
+    def download(self, url: str, sha256: Optional[str] = None,
+                 max_age: Optional[float] = None) -> Optional[Path]:
+        """Fetch a URL through the shared download cache.
+        
+        Args:
+            url: URL to fetch
+            sha256: Expected digest, verified while downloading
+            max_age: Seconds after which an unpinned cached copy is
+                revalidated against the server
+            
+        Returns:
+            Optional[Path]: Path of the cached file, or None on failure
+        """
+        try:
+            return self.downloads.fetch(url, sha256, max_age)
+        except DownloadError as e:
+            self.logger.error(f"Failed to download {url}: {e}")
+            return None
+    
+    def run_remote_script(self, url: str, args: Sequence[str] = (),
+                          interpreter: str = "/bin/bash",
+                          env: Optional[Dict[str, str]] = None,
+                          passthrough: bool = False) -> bool:
+        """Download an install script through the cache and run it.
+        
+        Args:
+            url: Script URL
+            args: Arguments passed to the script
+            interpreter: Shell used to run the script
+            env: Variables overlaid on the current environment
+            passthrough: Leave output attached to the terminal
+            
+        Returns:
+            bool: True if the script ran successfully, False otherwise
+        """
+        script = self.download(url, max_age=REMOTE_SCRIPT_MAX_AGE)
+        if script is None:
             return False
+        return self.run_command([interpreter, str(script), *args], resources=(),
+                                env=env, passthrough=passthrough)
+            
+    def plan_brew(self, plan: BrewPlan) -> None:
+        """Register the Homebrew packages this component still needs.
+        
+        Args:
+            plan: Shared plan collecting packages from all components
+        """
+        self.brew_plan = plan
+        plan.add(
+            self.name,
+            formulae=[f for f in self.brew_formulae if not self.is_package_installed(f)],
+            casks=[c for c in self.brew_casks if not self.inventory.is_installed(c, cask=True)],
+        )
+    
+    def is_package_installed(self, package: str, command: Optional[str] = None) -> bool:
+        """Check if a tool is installed, consulting the Homebrew inventory first.
+        
+        Args:
+            package: Homebrew formula name or alias
+            command: Executable to look for if the tool was installed
+                outside Homebrew (defaults to the formula name)
+            
+        Returns:
+            bool: True if the tool is installed, False otherwise
+        """
+        if self.inventory.is_installed(package):
+            return True
+        return shutil.which(command or package) is not None
+    
+    def check_version_pin(self, package: str, pin: Optional[str]) -> bool:
+        """Check an installed Homebrew formula against a pinned version.
+        
+        A mismatch is logged as a warning; Homebrew only ships the latest
+        version of most formulae, so it is not treated as a failure.
+        
+        Args:
+            package: Homebrew formula name or alias
+            pin: Pinned version from the configuration
+            
+        Returns:
+            bool: True if the pin is satisfied or unset, False otherwise
+        """
+        if not pin:
+            return True
+        versions = self.inventory.versions(package)
+        if not versions or self.inventory.satisfies(package, pin):
+            return True
+        self.logger.warning(
+            f"{package} {', '.join(versions)} does not match pinned version {pin}"
+        )
+        return False
+    
+    def brew_install(self, package: str, cask: bool = False) -> bool:
+        """Install a Homebrew package, reusing the batched result if planned.
+        
+        Args:
+            package: Formula or cask name
+            cask: Whether the package is a cask
             
+        Returns:
+            bool: True if the package is installed, False otherwise
+        """
+        plan = self.brew_plan
+        if plan is not None and plan.executed and plan.includes(package, cask):
+            if not plan.succeeded(package):
+                self.logger.error(f"Batched Homebrew install of {package} failed")
+                return False
+            return True
+        if not self.run_command(["brew", "install"] + (["--cask"] if cask else []) + [package]):
+            return False
+        self.inventory.invalidate()
+        return True
+    
+    def fingerprint_inputs(self) -> Optional[Dict[str, Any]]:
+        """Describe everything the outcome of ``run`` depends on.
+        
+        The returned mapping (config values, installed tool versions, hashes
+        of target files) is recorded after a successful run; a later run is
+        skipped while it stays the same. Returning None means the component
+        always runs.
+        
+        Returns:
+            Optional[Dict[str, Any]]: JSON-serializable inputs, or None
+        """
+        return None
+    
     def add_rollback_step(self, step: Dict[str, Any]) -> None:
-        """Add a step to the rollback list."""
+        """Add a step to the rollback list.
+        
+        A step is either ``{"function": f, "args": [...]}`` or
+        ``{"mutation": m}`` for a change recorded in the journal. Function
+        steps only live as long as this process; file changes made through
+        ``create_directory``/``append_to_file``/``set_rc_block`` are also
+        journaled and can be rolled back later with ``local_env_setup
+        rollback``.
+        """
         self.rollback_steps.append(step)
         
     def rollback(self) -> None:
-        """Execute rollback steps in reverse order."""
-        self.monitor.start_step("rollback")
-        try:
-            for step in reversed(self.rollback_steps):
-                if "function" in step and "args" in step:
-                    step["function"](*step["args"])
-            self.monitor.end_step(True)
-        except Exception as e:
-            self.monitor.end_step(False, f"Rollback failed: {e}")
+        """Undo this component's changes in reverse order."""
+        with self.monitor.span("rollback") as span:
+            try:
+                for step in reversed(self.rollback_steps):
+                    if "mutation" in step:
+                        self.logger.info(self.journal.restore(step["mutation"]))
+                    elif "function" in step and "args" in step:
+                        step["function"](*step["args"])
+                self.rollback_steps.clear()
+            except Exception as e:
+                span.fail(f"Rollback failed: {e}")
             
     def create_directory(self, path: Union[str, Path]) -> bool:
         """Create a directory if it doesn't exist.
@@ -122,23 +325,54 @@ class BaseSetup(ABC):
         Returns:
             bool: True if directory exists or was created, False otherwise
         """
-        self.monitor.start_step(f"create_directory_{path}")
-        try:
-            Path(path).mkdir(parents=True, exist_ok=True)
-            self.add_rollback_step({
-                "function": lambda p: Path(p).rmdir() if Path(p).exists() else None,
-                "args": [path]
-            })
-            self.monitor.end_step(True)
-            return True
-        except OSError as e:
-            self.logger.error(f"Failed to create directory {path}: {e}")
-            self.monitor.end_step(False, str(e))
-            return False
+        with self.monitor.span("create_directory", target=str(path)) as span:
+            try:
+                with self.journal.mutation("mkdir", path) as mutation:
+                    Path(path).mkdir(parents=True, exist_ok=True)
+                if mutation is not None:
+                    self.add_rollback_step({"mutation": mutation})
+                return True
+            except OSError as e:
+                self.logger.error(f"Failed to create directory {path}: {e}")
+                span.fail(str(e))
+                return False
             
+    def set_rc_block(self, path: Union[str, Path], name: str, content: Optional[str],
+                     legacy: Sequence[str] = (), priority: int = DEFAULT_PRIORITY) -> bool:
+        """Declare a managed block in a shell rc file.
+        
+        Unlike ``append_to_file`` this is idempotent: the block replaces its
+        previous version, and during a scheduled run all blocks for a file
+        are written together once (see ``core.rcfile``).
+        
+        Args:
+            path: rc file
+            name: Block name, unique per file
+            content: Block body, or None to remove the block
+            legacy: Unmarked snippets earlier versions appended to the file
+            priority: Blocks with lower priority are placed first
+            
+        Returns:
+            bool: True if the block was recorded (or written), False otherwise
+        """
+        editor = get_rc_editor()
+        previous = editor.read_block(path, name)
+        if not editor.set_block(path, name, content, legacy, priority):
+            return False
+        self.rc_blocks.append({"path": str(path), "name": name, "content": content,
+                               "legacy": list(legacy), "priority": priority})
+        self.add_rollback_step({
+            "function": editor.set_block,
+            "args": [path, name, previous]
+        })
+        return True
+    
     def append_to_file(self, path: Union[str, Path], content: str) -> bool:
         """Append content to a file.
         
+        Prefer ``set_rc_block`` for shell rc files; appending is not
+        idempotent.
+        
         Args:
             path: Path to the file
             content: Content to append
@@ -146,69 +380,63 @@ class BaseSetup(ABC):
         Returns:
             bool: True if content was appended successfully, False otherwise
         """
-        self.monitor.start_step(f"append_to_file_{path}")
-        try:
-            path = Path(path)
-            if not path.parent.exists():
-                path.parent.mkdir(parents=True, exist_ok=True)
-            with path.open('a') as f:
-                f.write(content)
-            self.add_rollback_step({
-                "function": lambda p, c: Path(p).write_text(c) if c else Path(p).unlink(),
-                "args": [path, content]
-            })
-            self.monitor.end_step(True)
-            return True
-        except OSError as e:
-            self.logger.error(f"Failed to append to file {path}: {e}")
-            self.monitor.end_step(False, str(e))
-            return False
+        with self.monitor.span("append_to_file", target=str(path)) as span:
+            try:
+                path = Path(path)
+                if not path.parent.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                # The pre-image is saved before the file is touched
+                get_backup_store().snapshot(path)
+                with self.journal.mutation("write", path) as mutation:
+                    with path.open('a') as f:
+                        f.write(content)
+                self.add_rollback_step({"mutation": mutation})
+                return True
+            except OSError as e:
+                self.logger.error(f"Failed to append to file {path}: {e}")
+                span.fail(str(e))
+                return False
             
-    def backup_file(self, filepath: str) -> bool:
-        """Backup a file by appending .bak to its name.
+    def backup_file(self, filepath: Union[str, Path]) -> bool:
+        """Snapshot a file into the backup store.
+        
+        Every distinct version is kept (see ``core.backup``); snapshotting
+        an unchanged file costs a ``stat``.
         
         Args:
-            filepath (str): Path to the file to backup
+            filepath: Path to the file to backup
             
         Returns:
             bool: True if backup was successful, False otherwise
         """
-        if not os.path.exists(filepath):
-            return True
-            
-        backup_path = f"{filepath}.bak"
         try:
-            shutil.copy2(filepath, backup_path)
-            self.logger.info(f"Backed up {filepath} to {backup_path}")
+            version = get_backup_store().snapshot(filepath)
+            if version is not None:
+                self.logger.info(f"Backed up {filepath} ({version.digest[:12]})")
             return True
         except Exception as e:
             self.logger.error(f"Failed to backup {filepath}: {e}")
             return False
             
-    def get_command_output(self, cmd: List[str], shell: bool = False) -> Optional[str]:
+    def get_command_output(self, cmd: List[str], shell: bool = False,
+                           timeout: Optional[float] = 120) -> Optional[str]:
         """Run a command and return its output.
         
         Args:
             cmd: Command to run as a list of strings
             shell: Whether to run the command in a shell
+            timeout: Seconds before the command is killed
             
         Returns:
             str: Command output if successful, None otherwise
         """
-        self.monitor.start_step(f"get_command_output_{'_'.join(cmd)}")
-        try:
-            result = subprocess.run(cmd, capture_output=True, check=True, shell=shell)
-            output = result.stdout.decode('utf-8').strip() if result.stdout else None
-            self.monitor.end_step(True)
-            return output
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Command failed: {e}")
-            self.monitor.end_step(False, f"Command failed: {e}")
-            return None
-        except Exception as e:
-            self.logger.error(f"Error running command: {e}")
-            self.monitor.end_step(False, f"Error running command: {e}")
-            return None
+        with self.monitor.span("get_command_output", target=" ".join(cmd)) as span:
+            result = self.execute(cmd, shell=shell, timeout=timeout)
+            if not result.ok:
+                self.logger.error(f"Command failed: {result.display}: {result.stderr.strip()}")
+                span.fail(f"Command failed: {result.display}")
+                return None
+            return result.stdout.strip() or None
     
     @abstractmethod
     def run(self) -> bool:
@@ -217,4 +445,14 @@ class BaseSetup(ABC):
         Returns:
             bool: True if setup was successful, False otherwise
         """
-        pass 
\ No newline at end of file
+        pass
+    
+    async def arun(self) -> bool:
+        """Run the setup process from a coroutine.
+        
+        The default adapts ``run`` by calling it on a worker thread.
+        
+        Returns:
+            bool: True if setup was successful, False otherwise
+        """
+        return await asyncio.to_thread(self.run) 
\ No newline at end of file
@@ -0,0 +1,144 @@
+"""Batched Homebrew transactions shared by all setup components."""
+
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+from local_env_setup.core.executor import get_executor
+from local_env_setup.core.inventory import BrewInventory
+from local_env_setup.core.resources import ResourcePool, default_pool
+
+
+class BrewPlan:
+    """Collect Homebrew packages from many components and install them at once.
+
+    Components register the formulae and casks they need during planning.
+    ``execute`` then runs a single deduplicated ``brew install`` for all
+    formulae and one ``brew install --cask`` for all casks, so Homebrew's
+    startup, auto-update and dependency resolution are paid once instead of
+    once per tool. When a batch fails, the packages that did not make it are
+    mapped back to the components that asked for them.
+    """
+
+    def __init__(self, pool: Optional[ResourcePool] = None,
+                 inventory: Optional[BrewInventory] = None):
+        """Initialize an empty plan.
+
+        Args:
+            pool: Resource pool providing the ``brew`` lock
+            inventory: Inventory to invalidate after installing
+        """
+        self.pool = pool or default_pool
+        self.inventory = inventory
+        self.logger = logging.getLogger("BrewPlan")
+        self.formulae: Dict[str, Set[str]] = {}
+        self.casks: Dict[str, Set[str]] = {}
+        self.failed: Set[str] = set()
+        self.executed = False
+        self._lock = threading.Lock()
+
+    def add(self, component: str, formulae: Iterable[str] = (),
+            casks: Iterable[str] = ()) -> None:
+        """Register packages needed by a component.
+
+        Args:
+            component: Name of the requesting component
+            formulae: Formula names to install
+            casks: Cask names to install
+        """
+        with self._lock:
+            for formula in formulae:
+                self.formulae.setdefault(formula, set()).add(component)
+            for cask in casks:
+                self.casks.setdefault(cask, set()).add(component)
+
+    def __bool__(self) -> bool:
+        return bool(self.formulae or self.casks)
+
+    def components(self) -> Set[str]:
+        """Return the names of all components with registered packages."""
+        requested: Set[str] = set()
+        for owners in list(self.formulae.values()) + list(self.casks.values()):
+            requested.update(owners)
+        return requested
+
+    def _installed(self, packages: List[str], cask: bool) -> Set[str]:
+        """Return which of the given packages Homebrew reports as installed."""
+        cmd = ["brew", "list", "--versions"] + (["--cask"] if cask else []) + packages
+        # The plan already holds the brew lock
+        result = get_executor().run(cmd, resources=(), timeout=120)
+        return {line.split()[0] for line in result.stdout.splitlines() if line.strip()}
+
+    def _install_batch(self, packages: List[str], cask: bool,
+                       env: Optional[Dict[str, str]] = None) -> bool:
+        """Install a batch; returns False if brew could not be run at all."""
+        cmd = ["brew", "install"] + (["--cask"] if cask else []) + packages
+        self.logger.info(f"Running: {' '.join(cmd)}")
+        result = get_executor().run(cmd, env=env, resources=(), echo=self.logger)
+        if result.ok:
+            return True
+        if result.returncode == 127:
+            self.logger.error("Homebrew is not installed")
+            self.failed.update(packages)
+            return False
+        self.logger.error(f"brew install failed; log: {result.log_path}")
+        # Work out which packages made it so only their owners succeed
+        missing = sorted(set(packages) - self._installed(packages, cask))
+        if len(missing) > 1:
+            # brew stops at the first failing package, so the ones after it
+            # were never attempted
+            retry_env = dict(env or {}, HOMEBREW_NO_AUTO_UPDATE="1")
+            for package in missing:
+                cmd = ["brew", "install"] + (["--cask"] if cask else []) + [package]
+                if not get_executor().run(cmd, env=retry_env, resources=(), echo=self.logger).ok:
+                    self.failed.add(package)
+        else:
+            self.failed.update(missing)
+        return True
+
+    def execute(self) -> bool:
+        """Install every registered package in at most two brew invocations.
+
+        Returns:
+            bool: False if Homebrew could not be run at all, True otherwise.
+            Per-package failures are recorded and reported through
+            ``succeeded``/``failures``.
+        """
+        formulae = sorted(self.formulae)
+        casks = sorted(self.casks)
+        try:
+            with self.pool.hold(("brew",)):
+                if formulae and not self._install_batch(formulae, cask=False):
+                    self.failed.update(casks)
+                    return False
+                if casks:
+                    # The formula batch already refreshed Homebrew
+                    env = {"HOMEBREW_NO_AUTO_UPDATE": "1"} if formulae else None
+                    if not self._install_batch(casks, cask=True, env=env):
+                        return False
+        finally:
+            self.executed = True
+            if self.inventory is not None:
+                self.inventory.invalidate()
+
+        for component, packages in sorted(self.failures().items()):
+            self.logger.error(f"{component}: failed to install {', '.join(sorted(packages))}")
+        return True
+
+    def includes(self, package: str, cask: bool = False) -> bool:
+        """Check whether a package is part of this plan."""
+        return package in (self.casks if cask else self.formulae)
+
+    def succeeded(self, package: str) -> bool:
+        """Check whether a planned package was installed by the batch."""
+        return self.executed and package not in self.failed
+
+    def failures(self) -> Dict[str, Set[str]]:
+        """Map each component to the packages it asked for that failed."""
+        result: Dict[str, Set[str]] = {}
+        for table in (self.formulae, self.casks):
+            for package, owners in table.items():
+                if package in self.failed:
+                    for owner in owners:
+                        result.setdefault(owner, set()).add(package)
+        return result
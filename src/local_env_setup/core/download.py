@@ -0,0 +1,423 @@
+"""Shared download cache for installers, scripts and release binaries.
+
+Downloads are stored content-addressed under the cache directory
+(``objects/<sha256[:2]>/<sha256>``) with a URL index on top, so a file is
+fetched from the network once per machine (or once per build farm, when a
+mirror is configured) and reused afterwards. Expected checksums are
+verified while the file streams in, interrupted downloads resume with a
+``Range`` request guarded by ``If-Range``, and the cache is kept under a size cap by evicting the
+least recently used objects.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import (
+    IO, TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple, Union, cast)
+from urllib.parse import urlsplit
+
+from local_env_setup.core.resources import ResourcePool, default_pool
+from local_env_setup.core.state import shared_cache_dir
+
+if TYPE_CHECKING:
+    import requests
+
+# Environment variable holding the mirror base URL
+MIRROR_ENV = "LOCAL_ENV_SETUP_MIRROR"
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+CHUNK_SIZE = 1024 * 1024
+
+# (connect, read) timeouts in seconds
+HTTP_TIMEOUT = (10, 60)
+
+
+class DownloadError(Exception):
+    """Raised when a file cannot be downloaded."""
+
+
+class ChecksumError(DownloadError):
+    """Raised when downloaded content does not match the expected sha256."""
+
+
+def mirror_url(url: str, mirror: str) -> str:
+    """Map a URL onto a mirror laid out as ``<mirror>/<host>/<path>``.
+
+    Args:
+        url: Original URL
+        mirror: Mirror base URL
+    """
+    parts = urlsplit(url)
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{mirror.rstrip('/')}/{parts.netloc}{parts.path}{query}"
+
+
+class DownloadCache:
+    """Content-addressed, size-capped download cache."""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None,
+                 max_bytes: int = DEFAULT_MAX_BYTES, mirror: Optional[str] = None,
+                 max_workers: int = 4, pool: Optional[ResourcePool] = None):
+        """Initialize the cache.
+
+        Args:
+            root: Cache directory (defaults to ``downloads`` in the shared cache dir)
+            max_bytes: Size above which least recently used objects are evicted
+            mirror: Mirror base URL tried before the origin (defaults to
+                ``$LOCAL_ENV_SETUP_MIRROR``)
+            max_workers: Concurrent downloads in ``fetch_many`` and the size
+                of the HTTP connection pool
+            pool: Resource pool providing the ``network`` limit
+        """
+        self.root = Path(root) if root else shared_cache_dir() / "downloads"
+        self.max_bytes = max_bytes
+        self.mirror = mirror
+        self.max_workers = max_workers
+        self.pool = pool or default_pool
+        self.logger = logging.getLogger("DownloadCache")
+        self._session: Optional["requests.Session"] = None
+        self._lock = threading.Lock()
+        self._url_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def session(self) -> "requests.Session":
+        """Pooled HTTP session shared by all downloads."""
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=self.max_workers, pool_maxsize=self.max_workers,
+                    max_retries=Retry(total=3, backoff_factor=0.5,
+                                      status_forcelist=(502, 503, 504)),
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                self._session = session
+            return self._session
+
+    def object_path(self, sha256: str) -> Path:
+        """Location of the object with the given digest."""
+        return self.root / "objects" / sha256[:2] / sha256
+
+    def _index_path(self) -> Path:
+        return self.root / "index.json"
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            return cast(Dict[str, Dict[str, Any]], json.loads(self._index_path().read_text()))
+        except (OSError, ValueError):
+            return {}
+
+    def _update_index(self, url: str, entry: Dict[str, Any]) -> None:
+        # Re-read under a file lock so entries written by other processes
+        # sharing the cache are kept
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._lock, open(self.root / "index.lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            index = self._read_index()
+            index[url] = entry
+            tmp_path = self._index_path().with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps(index, indent=1, sort_keys=True))
+            tmp_path.replace(self._index_path())
+
+    def _url_lock(self, url: str) -> threading.Lock:
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    def lookup(self, url: str, sha256: Optional[str] = None,
+               max_age: Optional[float] = None) -> Optional[Path]:
+        """Return the cached file for a URL without touching the network.
+
+        Args:
+            url: Original URL
+            sha256: Expected digest; any object with this digest matches
+            max_age: Seconds an unpinned entry stays fresh (None: forever)
+        """
+        if sha256:
+            path = self.object_path(sha256.lower())
+        else:
+            entry = self._read_index().get(url)
+            if entry is None:
+                return None
+            if max_age is not None and time.time() - entry.get("fetched", 0) > max_age:
+                return None
+            path = self.object_path(entry["sha256"])
+        if not path.exists():
+            return None
+        # The mtime doubles as the last-used time for LRU eviction
+        os.utime(path)
+        return path
+
+    def fetch(self, url: str, sha256: Optional[str] = None,
+              max_age: Optional[float] = None) -> Path:
+        """Return a local copy of a URL, downloading it if needed.
+
+        Args:
+            url: URL to fetch
+            sha256: Expected digest, verified while downloading. Pinned
+                files are served from the cache forever.
+            max_age: Seconds after which an unpinned entry is revalidated
+                against the server (None: never)
+
+        Returns:
+            Path: Read-only path of the cached object
+
+        Raises:
+            ChecksumError: If the content does not match ``sha256``
+            DownloadError: If the file cannot be downloaded
+        """
+        cached = self.lookup(url, sha256, max_age)
+        if cached is not None:
+            return cached
+        with self._url_lock(url):
+            # Another thread may have finished the same download meanwhile
+            cached = self.lookup(url, sha256, max_age)
+            if cached is not None:
+                return cached
+            path = self._download(url, sha256, max_age)
+        self.evict(keep=path)
+        return path
+
+    def fetch_many(self, items: Sequence[Tuple[str, Optional[str]]]) -> List[Path]:
+        """Fetch several ``(url, sha256)`` pairs concurrently.
+
+        Returns:
+            List[Path]: Cached paths in the order of ``items``
+
+        Raises:
+            DownloadError: The first failure, after all downloads finished
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [executor.submit(self.fetch, url, sha256) for url, sha256 in items]
+            for future in futures:
+                error = future.exception()
+                if error is not None:
+                    raise error
+            return [f.result() for f in futures]
+
+    async def afetch(self, url: str, sha256: Optional[str] = None,
+                     max_age: Optional[float] = None) -> Path:
+        """Coroutine counterpart of ``fetch``."""
+        return await asyncio.to_thread(self.fetch, url, sha256, max_age)
+
+    def _sources(self, url: str) -> List[str]:
+        mirror = self.mirror if self.mirror is not None else os.environ.get(MIRROR_ENV)
+        return [mirror_url(url, mirror), url] if mirror else [url]
+
+    def _download(self, url: str, sha256: Optional[str],
+                  max_age: Optional[float] = None) -> Path:
+        partial_dir = self.root / "partial"
+        partial_dir.mkdir(parents=True, exist_ok=True)
+        partial = partial_dir / (hashlib.sha256(url.encode()).hexdigest()[:32] + ".part")
+        # ETag or Last-Modified of the response the partial file started with
+        validator = partial.with_suffix(".validator")
+        etag = self._read_index().get(url, {}).get("etag")
+
+        with self._lock_partial(partial) as f:
+            # Another process may have finished it while we waited
+            cached = self.lookup(url, sha256, max_age)
+            if cached is not None:
+                return cached
+            last_error: Optional[Exception] = None
+            for source in self._sources(url):
+                try:
+                    with self.pool.hold(("network",)):
+                        outcome = self._transfer(source, f, etag if not sha256 else None,
+                                                 validator, pinned=bool(sha256))
+                        if outcome is None:
+                            # Not modified since the last fetch
+                            entry = self._read_index()[url]
+                            path = self.object_path(entry["sha256"])
+                            if path.exists():
+                                self._update_index(url, dict(entry, fetched=time.time()))
+                                os.utime(path)
+                                return path
+                            outcome = self._transfer(source, f, None, validator,
+                                                     pinned=bool(sha256))
+                except DownloadError as e:
+                    self.logger.warning(f"Download from {source} failed: {e}")
+                    last_error = e
+                    continue
+                assert outcome is not None
+                digest, new_etag = outcome
+                if sha256 and digest != sha256.lower():
+                    f.truncate(0)
+                    validator.unlink(missing_ok=True)
+                    last_error = ChecksumError(f"{url}: expected sha256 {sha256}, got {digest}")
+                    self.logger.warning(f"Download from {source} failed: {last_error}")
+                    continue
+                path = self.object_path(digest)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                f.flush()
+                os.fsync(f.fileno())
+                os.replace(partial, path)
+                os.chmod(path, 0o444)
+                validator.unlink(missing_ok=True)
+                self._update_index(url, {"sha256": digest, "fetched": time.time(),
+                                         "etag": new_etag})
+                self.logger.info(f"Downloaded {url} ({path.stat().st_size} bytes)")
+                return path
+            if isinstance(last_error, ChecksumError):
+                raise last_error
+            raise DownloadError(f"{url}: {last_error}")
+
+    @staticmethod
+    def _lock_partial(partial: Path) -> IO[bytes]:
+        """Open and exclusively lock the partial file of a download.
+
+        The process holding the lock renames the finished file into the
+        object store, so a waiter that then gets the lock on the old inode
+        opens the path again rather than writing into the stored object.
+        """
+        while True:
+            f = open(partial, "a+b")
+            # Serialize with other processes downloading the same URL
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                if os.fstat(f.fileno()).st_ino == os.stat(partial).st_ino:
+                    return f
+            except FileNotFoundError:
+                pass
+            f.close()
+
+    def _transfer(self, url: str, f: Any, etag: Optional[str], validator: Path,
+                  pinned: bool) -> Optional[Tuple[str, Optional[str]]]:
+        """Stream a URL into the partial file, resuming from its current size.
+
+        A resumed request carries the validator of the response the partial
+        file started with as ``If-Range``, so a resource changed since is
+        sent again in full. An unpinned partial file without a validator is
+        discarded, as nothing would detect it being joined to newer content.
+
+        Args:
+            url: URL to fetch
+            f: Partial file, opened for appending
+            etag: ETag of the cached copy, to revalidate a fresh download
+            validator: File holding the partial file's validator
+            pinned: Whether the content is verified against a sha256
+
+        Returns:
+            Optional[Tuple[str, Optional[str]]]: sha256 of the complete
+            content and the response's ETag, or None if the server reported
+            the content unchanged since ``etag``
+        """
+        import requests
+
+        f.seek(0, os.SEEK_END)
+        offset = f.tell()
+        headers = {}
+        if offset:
+            try:
+                since = validator.read_text().strip()
+            except OSError:
+                since = ""
+            if since or pinned:
+                headers["Range"] = f"bytes={offset}-"
+                if since:
+                    headers["If-Range"] = since
+            else:
+                f.truncate(0)
+                offset = 0
+        if not offset and etag:
+            headers["If-None-Match"] = etag
+        try:
+            response = self.session.get(url, headers=headers, stream=True, timeout=HTTP_TIMEOUT)
+        except requests.RequestException as e:
+            raise DownloadError(str(e)) from e
+        with response:
+            if response.status_code == 304:
+                return None
+            if response.status_code == 416:
+                # The partial file is no longer a prefix of the resource
+                f.truncate(0)
+                validator.unlink(missing_ok=True)
+                return self._transfer(url, f, None, validator, pinned)
+            if response.status_code >= 400:
+                raise DownloadError(f"HTTP {response.status_code}")
+
+            hasher = hashlib.sha256()
+            if response.status_code == 206:
+                f.seek(0)
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    hasher.update(chunk)
+                self.logger.info(f"Resuming {url} at {offset} bytes")
+            else:
+                # A full response, also when If-Range no longer matched
+                f.truncate(0)
+                self._write_validator(validator, response.headers)
+            f.seek(0, os.SEEK_END)
+            try:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    hasher.update(chunk)
+                    f.write(chunk)
+            except requests.RequestException as e:
+                # Keep what arrived so the next attempt can resume
+                f.flush()
+                raise DownloadError(str(e)) from e
+            return hasher.hexdigest(), response.headers.get("ETag")
+
+    @staticmethod
+    def _write_validator(validator: Path, headers: Any) -> None:
+        """Remember what ``If-Range`` must match to resume this response."""
+        etag = headers.get("ETag")
+        # If-Range requires a strong validator
+        since = etag if etag and not etag.startswith("W/") else headers.get("Last-Modified")
+        try:
+            if since:
+                validator.write_text(since)
+            else:
+                validator.unlink(missing_ok=True)
+        except OSError:
+            # Only costs a full download if this one is interrupted
+            pass
+
+    def evict(self, keep: Optional[Path] = None) -> None:
+        """Remove least recently used objects until the cache fits its cap.
+
+        Args:
+            keep: Object that must not be evicted (the one just fetched)
+        """
+        objects = []
+        total = 0
+        for path in (self.root / "objects").glob("*/*"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            objects.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+        for _, size, path in sorted(objects):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.logger.info(f"Evicted {path.name} from the download cache")
+
+
+_cache: Optional[DownloadCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_download_cache() -> DownloadCache:
+    """Return the process-wide download cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DownloadCache()
+        return _cache
@@ -0,0 +1,691 @@
+"""Single instrumented entry point for running external commands.
+
+Every command the tool runs goes through ``CommandExecutor.run``, which
+adds per-command timeouts, bounded output capture (an in-memory tail plus a
+full log on disk), environment overlays, shared resource limits and timing
+(spawn, wall and CPU time) reported to ``SetupMonitor``, where each
+command is a span nested under the caller's current span. The process-level
+work is done by a pluggable backend so tests can substitute a fake or a
+recorded session for the real subprocess backend.
+
+``CommandExecutor.arun`` is the coroutine counterpart of ``run``: backends
+implement it natively (``asyncio.create_subprocess_exec``) or fall back to
+running the blocking call on a worker thread.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import (
+    IO, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+)
+
+from local_env_setup.core.monitoring import SetupMonitor, Span, command_key, get_monitor
+from local_env_setup.core.resources import ResourcePool, default_pool
+from local_env_setup.core.state import state_dir
+
+# Called with ("stdout" | "stderr", chunk) for every chunk of output
+OutputSink = Callable[[str, bytes], None]
+
+# Called with ("stdout" | "stderr", line) for every complete output line
+LineCallback = Callable[[str, str], None]
+
+# Size of each read from a child's output pipe
+READ_CHUNK = 65536
+
+# Seconds to keep reading a killed command's output; a process that left
+# its process group may still hold the pipes open
+DRAIN_TIMEOUT = 2.0
+
+# Resources implicitly held while running a command, keyed by executable
+COMMAND_RESOURCES: Dict[str, Tuple[str, ...]] = {
+    "brew": ("brew",),
+}
+
+DEFAULT_TAIL_BYTES = 64 * 1024
+
+# Number of per-run log directories kept on disk
+KEEP_LOG_RUNS = 20
+
+
+class CommandError(Exception):
+    """Raised by ``CommandExecutor.run(check=True)`` when a command fails."""
+
+    def __init__(self, result: "CommandResult"):
+        self.result = result
+        reason = "timed out" if result.timed_out else f"exited with {result.returncode}"
+        super().__init__(f"Command {result.display} {reason}: {result.stderr.strip()[-500:]}")
+
+
+@dataclass
+class CommandResult:
+    """Outcome of a command.
+
+    ``stdout`` and ``stderr`` hold at most the configured tail of each
+    stream; ``log_path`` points at the complete output.
+    """
+    cmd: List[str]
+    returncode: int
+    stdout: str = ""
+    stderr: str = ""
+    log_path: Optional[Path] = None
+    spawn_time: float = 0.0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    timed_out: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """Whether the command exited successfully."""
+        return self.returncode == 0 and not self.timed_out
+
+    @property
+    def display(self) -> str:
+        """Short, single-line rendering of the command."""
+        text = " ".join(self.cmd)
+        return text if len(text) <= 120 else text[:117] + "..."
+
+
+class TailBuffer:
+    """Keep only the last ``limit`` bytes written to it."""
+
+    def __init__(self, limit: int = DEFAULT_TAIL_BYTES):
+        self.limit = limit
+        self._chunks: Deque[bytes] = deque()
+        self._size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._chunks.append(chunk)
+        self._size += len(chunk)
+        while self._size - len(self._chunks[0]) >= self.limit:
+            self._size -= len(self._chunks.popleft())
+
+    def getvalue(self) -> str:
+        data = b"".join(self._chunks)[-self.limit:]
+        return data.decode("utf-8", errors="replace")
+
+
+@dataclass
+class BackendResult:
+    """What a backend reports back about a finished process."""
+    returncode: int
+    spawn_time: float = 0.0
+    cpu_time: float = 0.0
+    timed_out: bool = False
+
+
+class Backend(ABC):
+    """Runs a process and streams its output to a sink."""
+
+    @abstractmethod
+    def run(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+            env: Optional[Dict[str, str]], timeout: Optional[float],
+            passthrough: bool, sink: OutputSink) -> BackendResult:
+        """Run a command to completion.
+
+        Args:
+            cmd: Command to run
+            shell: Whether to run the command through the shell
+            cwd: Working directory
+            env: Complete environment for the process
+            timeout: Seconds after which the process is killed
+            passthrough: Leave stdout/stderr attached to the terminal
+                instead of capturing them (for interactive installers)
+            sink: Receives captured output chunks
+        """
+
+    async def arun(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+                   env: Optional[Dict[str, str]], timeout: Optional[float],
+                   passthrough: bool, sink: OutputSink) -> BackendResult:
+        """Coroutine counterpart of ``run``.
+
+        The default runs ``run`` on a worker thread; backends that can
+        wait natively on the event loop override it.
+        """
+        return await asyncio.to_thread(self.run, cmd, shell=shell, cwd=cwd, env=env,
+                                       timeout=timeout, passthrough=passthrough, sink=sink)
+
+
+def _kill(pid: int, group: bool) -> None:
+    """Kill a process, or the process group it leads with everything it started."""
+    try:
+        if group:
+            os.killpg(pid, signal.SIGKILL)
+        else:
+            os.kill(pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        # Already gone
+        pass
+
+
+class SubprocessBackend(Backend):
+    """Run commands as real child processes.
+
+    Captured commands lead their own session, so a timeout or cancellation
+    also kills the processes they started. Passthrough commands stay in
+    the terminal's session for interactive prompts.
+    """
+
+    def run(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+            env: Optional[Dict[str, str]], timeout: Optional[float],
+            passthrough: bool, sink: OutputSink) -> BackendResult:
+        start = time.perf_counter()
+        pipe = None if passthrough else subprocess.PIPE
+        try:
+            proc = subprocess.Popen(cmd, shell=shell, cwd=cwd, env=env,
+                                    stdout=pipe, stderr=pipe, start_new_session=not passthrough)
+        except OSError as e:
+            sink("stderr", f"{e}\n".encode())
+            return BackendResult(127, time.perf_counter() - start)
+        spawn_time = time.perf_counter() - start
+
+        readers = []
+        for stream, name in ((proc.stdout, "stdout"), (proc.stderr, "stderr")):
+            if stream is not None:
+                reader = threading.Thread(target=self._pump, args=(stream, name, sink), daemon=True)
+                reader.start()
+                readers.append(reader)
+
+        timed_out = threading.Event()
+
+        def kill() -> None:
+            timed_out.set()
+            _kill(proc.pid, group=not passthrough)
+
+        timer = threading.Timer(timeout, kill) if timeout else None
+        if timer is not None:
+            timer.start()
+        try:
+            # wait4 reports the child's resource usage, unlike Popen.wait
+            _, status, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(status)
+        finally:
+            if timer is not None:
+                timer.cancel()
+        if timed_out.is_set():
+            # The group is reaped only once every member exits
+            _kill(proc.pid, group=not passthrough)
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        for reader in readers:
+            reader.join(max(0.0, deadline - time.monotonic()) if timed_out.is_set() else None)
+
+        return BackendResult(
+            returncode=proc.returncode,
+            spawn_time=spawn_time,
+            cpu_time=usage.ru_utime + usage.ru_stime,
+            timed_out=timed_out.is_set(),
+        )
+
+    @staticmethod
+    def _pump(stream: IO[bytes], name: str, sink: OutputSink) -> None:
+        with stream:
+            for chunk in iter(lambda: stream.read1(READ_CHUNK), b""):  # type: ignore[attr-defined]
+                sink(name, chunk)
+
+    async def arun(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+                   env: Optional[Dict[str, str]], timeout: Optional[float],
+                   passthrough: bool, sink: OutputSink) -> BackendResult:
+        """Run a child process on the event loop.
+
+        Output is forwarded chunk by chunk as it arrives. If the calling
+        task is cancelled the process is killed. The event loop does not
+        expose child resource usage, so ``cpu_time`` is not reported.
+        """
+        start = time.perf_counter()
+        pipe = None if passthrough else asyncio.subprocess.PIPE
+        try:
+            if shell:
+                proc = await asyncio.create_subprocess_shell(
+                    cmd, cwd=cwd, env=env, stdout=pipe, stderr=pipe,  # type: ignore[arg-type]
+                    start_new_session=not passthrough)
+            else:
+                proc = await asyncio.create_subprocess_exec(
+                    *cmd, cwd=cwd, env=env, stdout=pipe, stderr=pipe,
+                    start_new_session=not passthrough)
+        except OSError as e:
+            sink("stderr", f"{e}\n".encode())
+            return BackendResult(127, time.perf_counter() - start)
+        spawn_time = time.perf_counter() - start
+
+        async def pump(stream: asyncio.StreamReader, name: str) -> None:
+            while True:
+                chunk = await stream.read(READ_CHUNK)
+                if not chunk:
+                    return
+                sink(name, chunk)
+
+        pumps = [asyncio.ensure_future(pump(stream, name))
+                 for stream, name in ((proc.stdout, "stdout"), (proc.stderr, "stderr"))
+                 if stream is not None]
+        timed_out = False
+        try:
+            try:
+                returncode = await asyncio.wait_for(proc.wait(), timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+                _kill(proc.pid, group=not passthrough)
+                returncode = await proc.wait()
+            if pumps:
+                _, pending = await asyncio.wait(pumps, timeout=DRAIN_TIMEOUT if timed_out else None)
+                for task in pending:
+                    task.cancel()
+        except asyncio.CancelledError:
+            # A reaped child's pid may be reused; its group lives on with its members
+            if proc.returncode is None or not passthrough:
+                _kill(proc.pid, group=not passthrough)
+            for task in pumps:
+                task.cancel()
+            # Reap the child so its transport is closed with the loop
+            await proc.wait()
+            raise
+        return BackendResult(returncode, spawn_time, timed_out=timed_out)
+
+
+@dataclass
+class FakeResponse:
+    """Canned result for commands matching a prefix."""
+    prefix: List[str]
+    returncode: int = 0
+    stdout: str = ""
+    stderr: str = ""
+    delay: float = 0.0
+
+
+class FakeBackend(Backend):
+    """Answer commands from canned responses instead of running them.
+
+    Responses are matched on the longest registered command prefix.
+    Unmatched commands succeed with no output unless ``strict`` is set.
+    """
+
+    def __init__(self, responses: Sequence[FakeResponse] = (), strict: bool = False):
+        self.responses: List[FakeResponse] = list(responses)
+        self.strict = strict
+        self.calls: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_recording(cls, path: Union[str, Path], strict: bool = True) -> "FakeBackend":
+        """Replay a session captured by ``RecordingBackend``."""
+        records = json.loads(Path(path).read_text())
+        return cls([FakeResponse(r["cmd"], r["returncode"], r["stdout"], r["stderr"])
+                    for r in records], strict=strict)
+
+    def add(self, prefix: Sequence[str], returncode: int = 0, stdout: str = "",
+            stderr: str = "", delay: float = 0.0) -> None:
+        """Register a canned response for commands starting with ``prefix``."""
+        self.responses.append(FakeResponse(list(prefix), returncode, stdout, stderr, delay))
+
+    def _match(self, argv: List[str]) -> Optional[FakeResponse]:
+        with self._lock:
+            self.calls.append(argv)
+        best = None
+        for response in self.responses:
+            if argv[:len(response.prefix)] == response.prefix:
+                if best is None or len(response.prefix) > len(best.prefix):
+                    best = response
+        return best
+
+    def run(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+            env: Optional[Dict[str, str]], timeout: Optional[float],
+            passthrough: bool, sink: OutputSink) -> BackendResult:
+        response = self._match(cmd.split() if isinstance(cmd, str) else list(cmd))
+        if response is not None:
+            time.sleep(min(response.delay, timeout) if timeout is not None else response.delay)
+        return self._respond(cmd, response, timeout, sink)
+
+    async def arun(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+                   env: Optional[Dict[str, str]], timeout: Optional[float],
+                   passthrough: bool, sink: OutputSink) -> BackendResult:
+        response = self._match(cmd.split() if isinstance(cmd, str) else list(cmd))
+        if response is not None:
+            await asyncio.sleep(min(response.delay, timeout) if timeout is not None else response.delay)
+        return self._respond(cmd, response, timeout, sink)
+
+    def _respond(self, cmd: Union[List[str], str], response: Optional[FakeResponse],
+                 timeout: Optional[float], sink: OutputSink) -> BackendResult:
+        if response is None:
+            if self.strict:
+                sink("stderr", f"FakeBackend: unexpected command {cmd}\n".encode())
+                return BackendResult(127)
+            return BackendResult(0)
+        if timeout is not None and response.delay > timeout:
+            return BackendResult(-9, timed_out=True)
+        if response.stdout:
+            sink("stdout", response.stdout.encode())
+        if response.stderr:
+            sink("stderr", response.stderr.encode())
+        return BackendResult(response.returncode)
+
+
+class RecordingBackend(Backend):
+    """Run commands through another backend and record them for replay."""
+
+    def __init__(self, inner: Backend, path: Union[str, Path]):
+        self.inner = inner
+        self.path = Path(path)
+        self.records: List[Dict[str, object]] = []
+        self._lock = threading.Lock()
+
+    def run(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+            env: Optional[Dict[str, str]], timeout: Optional[float],
+            passthrough: bool, sink: OutputSink) -> BackendResult:
+        captured, tee = self._tee(sink)
+        result = self.inner.run(cmd, shell=shell, cwd=cwd, env=env, timeout=timeout,
+                                passthrough=passthrough, sink=tee)
+        self._record(cmd, result, captured)
+        return result
+
+    async def arun(self, cmd: Union[List[str], str], *, shell: bool, cwd: Optional[str],
+                   env: Optional[Dict[str, str]], timeout: Optional[float],
+                   passthrough: bool, sink: OutputSink) -> BackendResult:
+        captured, tee = self._tee(sink)
+        result = await self.inner.arun(cmd, shell=shell, cwd=cwd, env=env, timeout=timeout,
+                                       passthrough=passthrough, sink=tee)
+        self._record(cmd, result, captured)
+        return result
+
+    @staticmethod
+    def _tee(sink: OutputSink) -> Tuple[Dict[str, List[bytes]], OutputSink]:
+        captured: Dict[str, List[bytes]] = {"stdout": [], "stderr": []}
+
+        def tee(name: str, chunk: bytes) -> None:
+            captured[name].append(chunk)
+            sink(name, chunk)
+
+        return captured, tee
+
+    def _record(self, cmd: Union[List[str], str], result: BackendResult,
+                captured: Dict[str, List[bytes]]) -> None:
+        record = {
+            "cmd": cmd.split() if isinstance(cmd, str) else list(cmd),
+            "returncode": result.returncode,
+            "stdout": b"".join(captured["stdout"]).decode("utf-8", errors="replace"),
+            "stderr": b"".join(captured["stderr"]).decode("utf-8", errors="replace"),
+        }
+        with self._lock:
+            self.records.append(record)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(self.records, indent=2))
+
+
+class _LineSplitter:
+    """Turn output chunks into complete lines for a callback."""
+
+    def __init__(self, callback: LineCallback):
+        self.callback = callback
+        self._partial = {"stdout": b"", "stderr": b""}
+
+    def feed(self, name: str, chunk: bytes) -> None:
+        data = self._partial[name] + chunk
+        *lines, self._partial[name] = data.split(b"\n")
+        for line in lines:
+            self.callback(name, line.decode("utf-8", errors="replace").rstrip())
+
+    def flush(self) -> None:
+        for name, rest in self._partial.items():
+            if rest:
+                self.feed(name, b"\n")
+
+
+class _Capture:
+    """Output handling for one command: tails, full log and line callbacks."""
+
+    def __init__(self, tail_bytes: int, log_path: Optional[Path],
+                 callbacks: Sequence[LineCallback]):
+        self.tails = {"stdout": TailBuffer(tail_bytes), "stderr": TailBuffer(tail_bytes)}
+        self.log_path = log_path
+        self._log_file: Optional[IO[bytes]] = open(log_path, "wb") if log_path else None
+        self._splitters = [_LineSplitter(callback) for callback in callbacks]
+        self._lock = threading.Lock()
+
+    def sink(self, stream: str, chunk: bytes) -> None:
+        with self._lock:
+            self.tails[stream].write(chunk)
+            if self._log_file is not None:
+                self._log_file.write(chunk)
+            for splitter in self._splitters:
+                splitter.feed(stream, chunk)
+
+    def close(self) -> None:
+        if self._log_file is not None:
+            self._log_file.close()
+        for splitter in self._splitters:
+            splitter.flush()
+
+
+class CommandExecutor:
+    """Run commands with timeouts, bounded capture, limits and timing."""
+
+    def __init__(self, backend: Optional[Backend] = None,
+                 log_dir: Optional[Union[str, Path]] = None,
+                 tail_bytes: int = DEFAULT_TAIL_BYTES,
+                 default_timeout: Optional[float] = None,
+                 env: Optional[Dict[str, str]] = None):
+        """Initialize the executor.
+
+        Args:
+            backend: Process backend (defaults to real subprocesses)
+            log_dir: Directory for full command logs (defaults to a per-run
+                directory under the state dir); logging is disabled if the
+                directory cannot be created
+            tail_bytes: Bytes of each stream kept in memory
+            default_timeout: Timeout for commands that do not set one
+            env: Environment overlay applied to every command
+        """
+        self.backend = backend or SubprocessBackend()
+        self.tail_bytes = tail_bytes
+        self.default_timeout = default_timeout
+        self.env = dict(env or {})
+        self.logger = logging.getLogger("CommandExecutor")
+        self._log_dir = Path(log_dir) if log_dir else None
+        self._log_root_pruned = False
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _next_log_path(self, argv: List[str]) -> Optional[Path]:
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+            if self._log_dir is None:
+                stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+                self._log_dir = state_dir() / "logs" / f"{stamp}-{os.getpid()}"
+            log_dir = self._log_dir
+            prune = not self._log_root_pruned
+            self._log_root_pruned = True
+        try:
+            log_dir.mkdir(parents=True, exist_ok=True)
+        except OSError:
+            return None
+        if prune:
+            self._prune_logs(log_dir.parent, keep=log_dir)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", "_".join(os.path.basename(a) for a in argv[:3]))[:60]
+        return log_dir / f"{seq:04d}-{slug}.log"
+
+    @staticmethod
+    def _prune_logs(root: Path, keep: Path) -> None:
+        runs = sorted((p for p in root.iterdir() if p.is_dir() and p != keep),
+                      key=lambda p: p.stat().st_mtime)
+        for old in runs[:max(0, len(runs) - KEEP_LOG_RUNS + 1)]:
+            shutil.rmtree(old, ignore_errors=True)
+
+    @staticmethod
+    def resources_for(argv: List[str]) -> Tuple[str, ...]:
+        """Resources a command holds by default, based on its executable."""
+        if not argv:
+            return ()
+        return COMMAND_RESOURCES.get(os.path.basename(argv[0]), ())
+
+    def run(self, cmd: Union[List[str], str], *, name: Optional[str] = None,
+            shell: bool = False, cwd: Optional[Union[str, Path]] = None,
+            env: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+            check: bool = False, resources: Optional[Sequence[str]] = None,
+            pool: Optional[ResourcePool] = None, monitor: Optional[SetupMonitor] = None,
+            echo: Optional[logging.Logger] = None, on_line: Optional[LineCallback] = None,
+            passthrough: bool = False, tail_bytes: Optional[int] = None) -> CommandResult:
+        """Run a command.
+
+        Args:
+            cmd: Command as a list of arguments (or a string with ``shell``)
+            name: Label used in logs and the monitor (defaults to the command)
+            shell: Whether to run the command through the shell
+            cwd: Working directory
+            env: Variables overlaid on the current environment
+            timeout: Seconds before the command is killed
+            check: Raise CommandError if the command fails
+            resources: Shared resources to hold while the command runs
+                (defaults to ``COMMAND_RESOURCES`` for the executable)
+            pool: Resource pool to acquire ``resources`` from
+            monitor: Monitor that receives the command's timings (defaults
+                to the shared one); the command is recorded as a span
+                nested in the caller's current span
+            echo: Logger that receives each output line as it arrives
+            on_line: Called with (stream, line) for each output line as it
+                arrives
+            passthrough: Leave output attached to the terminal (for
+                interactive installers); nothing is captured
+            tail_bytes: Bytes of each stream kept in memory, for commands
+                whose whole output is parsed
+
+        Returns:
+            CommandResult: Exit status, output tails and timings
+
+        Raises:
+            CommandError: If ``check`` is set and the command fails
+        """
+        argv, held, merged_env, timeout, capture = self._prepare(
+            cmd, name, env, timeout, resources, echo, on_line, passthrough, tail_bytes)
+        monitor = monitor or get_monitor()
+        action, target = command_key(argv)
+        with monitor.span(self._label(argv, name), category="command",
+                          action=action, target=target) as span:
+            start = time.perf_counter()
+            try:
+                with (pool or default_pool).hold(held):
+                    started = time.perf_counter()
+                    outcome = self.backend.run(
+                        cmd, shell=shell, cwd=str(cwd) if cwd else None, env=merged_env,
+                        timeout=timeout, passthrough=passthrough, sink=capture.sink)
+                    wall_time = time.perf_counter() - started
+            finally:
+                capture.close()
+            return self._finish(argv, name, outcome, capture, wall_time, started - start,
+                                monitor, span, check)
+
+    async def arun(self, cmd: Union[List[str], str], *, name: Optional[str] = None,
+                   shell: bool = False, cwd: Optional[Union[str, Path]] = None,
+                   env: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                   check: bool = False, resources: Optional[Sequence[str]] = None,
+                   pool: Optional[ResourcePool] = None, monitor: Optional[SetupMonitor] = None,
+                   echo: Optional[logging.Logger] = None, on_line: Optional[LineCallback] = None,
+                   passthrough: bool = False, tail_bytes: Optional[int] = None) -> CommandResult:
+        """Run a command without blocking the event loop.
+
+        Takes the same arguments as ``run``. Cancelling the awaiting task
+        kills the process and releases its resources.
+        """
+        argv, held, merged_env, timeout, capture = self._prepare(
+            cmd, name, env, timeout, resources, echo, on_line, passthrough, tail_bytes)
+        monitor = monitor or get_monitor()
+        action, target = command_key(argv)
+        with monitor.span(self._label(argv, name), category="command",
+                          action=action, target=target) as span:
+            start = time.perf_counter()
+            try:
+                async with (pool or default_pool).ahold(held):
+                    started = time.perf_counter()
+                    outcome = await self.backend.arun(
+                        cmd, shell=shell, cwd=str(cwd) if cwd else None, env=merged_env,
+                        timeout=timeout, passthrough=passthrough, sink=capture.sink)
+                    wall_time = time.perf_counter() - started
+            finally:
+                capture.close()
+            return self._finish(argv, name, outcome, capture, wall_time, started - start,
+                                monitor, span, check)
+
+    def _prepare(self, cmd: Union[List[str], str], name: Optional[str],
+                 env: Optional[Dict[str, str]], timeout: Optional[float],
+                 resources: Optional[Sequence[str]], echo: Optional[logging.Logger],
+                 on_line: Optional[LineCallback], passthrough: bool,
+                 tail_bytes: Optional[int]
+                 ) -> Tuple[List[str], Tuple[str, ...], Optional[Dict[str, str]],
+                            Optional[float], _Capture]:
+        argv = cmd.split() if isinstance(cmd, str) else [str(a) for a in cmd]
+        held = self.resources_for(argv) if resources is None else tuple(resources)
+        merged_env = {**os.environ, **self.env, **(env or {})} if (env or self.env) else None
+        timeout = timeout if timeout is not None else self.default_timeout
+
+        callbacks: List[LineCallback] = []
+        if echo is not None:
+            label = name or (os.path.basename(argv[0]) if argv else "")
+            callbacks.append(lambda stream, line: echo.info(f"[{label}] {line}"))
+        if on_line is not None:
+            callbacks.append(on_line)
+        log_path = None if passthrough else self._next_log_path(argv)
+        capture = _Capture(tail_bytes or self.tail_bytes, log_path, callbacks)
+        return argv, held, merged_env, timeout, capture
+
+    @staticmethod
+    def _label(argv: List[str], name: Optional[str]) -> str:
+        if name:
+            return name
+        text = " ".join(argv)
+        return text if len(text) <= 120 else text[:117] + "..."
+
+    def _finish(self, argv: List[str], name: Optional[str], outcome: BackendResult,
+                capture: _Capture, wall_time: float, wait_time: float,
+                monitor: SetupMonitor, span: Span, check: bool) -> CommandResult:
+        result = CommandResult(
+            cmd=argv,
+            returncode=outcome.returncode,
+            stdout=capture.tails["stdout"].getvalue(),
+            stderr=capture.tails["stderr"].getvalue(),
+            log_path=capture.log_path,
+            spawn_time=outcome.spawn_time,
+            wall_time=wall_time,
+            cpu_time=outcome.cpu_time,
+            timed_out=outcome.timed_out,
+        )
+        monitor.record_command(name or result.display, result, wait_time=wait_time, span=span)
+        if not result.ok:
+            level = logging.ERROR if check else logging.DEBUG
+            self.logger.log(level, f"{result.display} failed ({result.returncode}); "
+                                   f"log: {capture.log_path}")
+        if check and not result.ok:
+            raise CommandError(result)
+        return result
+
+
+_executor: Optional[CommandExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> CommandExecutor:
+    """Return the process-wide executor."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = CommandExecutor()
+        return _executor
+
+
+def set_executor(executor: Optional[CommandExecutor]) -> None:
+    """Replace the process-wide executor (e.g. with a fake backend).
+
+    Passing None restores a default executor on next use.
+    """
+    global _executor
+    with _executor_lock:
+        _executor = executor
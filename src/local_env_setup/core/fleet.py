@@ -0,0 +1,210 @@
+"""Provision many targets (alternate HOMEs) from one build host.
+
+Each target is a home directory, optionally with its own Homebrew prefix
+and configuration overrides. Targets are provisioned concurrently in a
+process pool; every target gets a fresh interpreter, so the process-wide
+configuration, monitor and caches of one target never leak into another.
+The download and git mirror caches are shared by all targets (see
+``state.shared_cache_dir``) and lock across processes, so each file and
+repository is fetched once per host however many targets need it, and
+Homebrew is run by one target at a time (see ``resources.HOST_RESOURCES``).
+A lock in each target's state directory keeps two runs from provisioning
+the same target at once.
+"""
+
+import fcntl
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from local_env_setup.core.monitoring import get_monitor, merge_summaries
+from local_env_setup.core.state import SHARED_CACHE_ENV, shared_cache_dir, state_dir
+
+
+@dataclass
+class FleetTarget:
+    """One environment to provision.
+
+    Attributes:
+        name: Unique label used in logs and the combined summary
+        home: Directory used as the target's ``HOME``
+        prefix: Homebrew prefix of the target (default: the host's)
+        env: Environment variables set for the target (``GIT_EMAIL``...)
+        config: ``EnvConfig`` fields overridden for the target
+            (``PYTHON_VERSION``...)
+    """
+    name: str
+    home: str
+    prefix: Optional[str] = None
+    env: Dict[str, str] = field(default_factory=dict)
+    config: Dict[str, Any] = field(default_factory=dict)
+
+    def environ(self, shared_cache: str) -> Dict[str, str]:
+        """Environment variables the target is provisioned with."""
+        home = Path(self.home)
+        environ = {
+            "HOME": str(home),
+            "XDG_STATE_HOME": str(home / ".local" / "state"),
+            "XDG_CACHE_HOME": str(home / ".cache"),
+            "XDG_DATA_HOME": str(home / ".local" / "share"),
+            "XDG_CONFIG_HOME": str(home / ".config"),
+            SHARED_CACHE_ENV: shared_cache,
+        }
+        if self.prefix:
+            environ["HOMEBREW_PREFIX"] = self.prefix
+        environ.update(self.env)
+        return environ
+
+
+@dataclass
+class TargetResult:
+    """Outcome of provisioning one target."""
+    name: str
+    success: bool
+    duration: float
+    error: Optional[str] = None
+    log_path: Optional[str] = None
+    summary: Optional[Dict[str, Any]] = field(default=None, repr=False)
+
+
+def load_targets(path: Union[str, Path]) -> List[FleetTarget]:
+    """Read targets from a JSON file.
+
+    The file holds a list of targets, or an object with ``targets`` and
+    ``defaults`` (whose ``env`` and ``config`` apply to every target)::
+
+        {"defaults": {"env": {"GIT_EMAIL": "ci@example.com"}},
+         "targets": [{"name": "runner-1", "home": "/srv/runner-1"},
+                     {"name": "py312", "home": "/srv/py312",
+                      "config": {"PYTHON_VERSION": "3.12.1"}}]}
+
+    Raises:
+        ValueError: If the file is malformed or names repeat
+    """
+    data = json.loads(Path(path).read_text())
+    defaults: Dict[str, Any] = {}
+    if isinstance(data, dict):
+        defaults = data.get("defaults", {})
+        data = data.get("targets")
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of targets")
+
+    targets = []
+    for entry in data:
+        if not isinstance(entry, dict) or "home" not in entry:
+            raise ValueError(f"{path}: every target needs a home: {entry!r}")
+        home = os.path.abspath(os.path.expanduser(entry["home"]))
+        targets.append(FleetTarget(
+            name=entry.get("name") or os.path.basename(home.rstrip("/")),
+            home=home,
+            prefix=entry.get("prefix", defaults.get("prefix")),
+            env={**defaults.get("env", {}), **entry.get("env", {})},
+            config={**defaults.get("config", {}), **entry.get("config", {})},
+        ))
+    names = [target.name for target in targets]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"{path}: duplicate target names: {', '.join(duplicates)}")
+    return targets
+
+
+def _apply_config(overrides: Dict[str, Any]) -> None:
+    """Override this process's configuration, as ``--set`` would."""
+    from local_env_setup.config.env import configure, load_env
+
+    configure(overrides=overrides)
+    # Resolve now so bad keys are reported before anything runs
+    load_env()
+
+
+def _provision(task: Dict[str, Any]) -> TargetResult:
+    """Provision one target; runs in a fresh pool worker."""
+    target = FleetTarget(**task["target"])
+    start = time.time()
+    log_path = Path(task["log_dir"]) / f"{target.name}.log"
+    log_path.parent.mkdir(parents=True, exist_ok=True)
+    os.environ.update(target.environ(task["shared_cache"]))
+    Path(target.home).mkdir(parents=True, exist_ok=True)
+
+    # The target's own state dir, now that HOME and XDG_STATE_HOME point at it
+    lock_path = state_dir() / "provision.lock"
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, "w") as lock_file, open(log_path, "w") as log, \
+            redirect_stdout(log), redirect_stderr(log):
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return TargetResult(target.name, False, time.time() - start,
+                                error="another run is provisioning this target",
+                                log_path=str(log_path))
+        try:
+            _apply_config(target.config)
+            from local_env_setup.scripts.commands import init
+
+            success = init(task["components"], jobs=task["jobs"], force=task["force"])
+            error = None if success else "setup failed"
+        except Exception as e:
+            traceback.print_exc()
+            success, error = False, f"{type(e).__name__}: {e}"
+        summary = get_monitor().get_summary()
+        summary["success"] = success
+        return TargetResult(target.name, success, time.time() - start, error=error,
+                            log_path=str(log_path), summary=summary)
+
+
+def provision_fleet(targets: List[FleetTarget], processes: Optional[int] = None,
+                    components: Optional[List[str]] = None, jobs: Optional[int] = 2,
+                    force: bool = False, shared_cache: Optional[Union[str, Path]] = None,
+                    log_dir: Optional[Union[str, Path]] = None,
+                    on_result: Optional[Callable[[TargetResult], None]] = None
+                    ) -> List[TargetResult]:
+    """Provision targets concurrently.
+
+    Args:
+        targets: Targets to provision
+        processes: Targets provisioned at once (default: CPU count)
+        components: Components to run on each target (default: all)
+        jobs: Concurrent components within each target
+        force: Run components even if they are up to date
+        shared_cache: Download and git mirror cache shared by all targets
+            (default: this host's)
+        log_dir: Directory receiving one log file per target (default:
+            ``fleet/logs`` in the state dir)
+        on_result: Called with each result as soon as its target finishes
+
+    Returns:
+        List[TargetResult]: One result per target, in the order given
+    """
+    shared = str(Path(shared_cache) if shared_cache else shared_cache_dir())
+    logs = str(Path(log_dir) if log_dir else state_dir() / "fleet" / "logs")
+    tasks = [{"target": asdict(target), "components": components, "jobs": jobs,
+              "force": force, "shared_cache": shared, "log_dir": logs}
+             for target in targets]
+    results: Dict[str, TargetResult] = {}
+    # spawn rather than fork: the parent may have threads running, and a
+    # fresh worker per target keeps per-process state apart
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(processes or os.cpu_count() or 1, maxtasksperchild=1) as pool:
+        for result in pool.imap_unordered(_provision, tasks):
+            results[result.name] = result
+            if on_result is not None:
+                on_result(result)
+    return [results[target.name] for target in targets]
+
+
+def fleet_summary(results: List[TargetResult]) -> Dict[str, Any]:
+    """Combine the targets' monitor summaries into one."""
+    summary = merge_summaries({r.name: r.summary for r in results if r.summary is not None})
+    summary["targets"] = [
+        {"name": r.name, "success": r.success, "duration": r.duration, "error": r.error,
+         "log_path": r.log_path}
+        for r in results
+    ]
+    summary["success"] = all(r.success for r in results)
+    return summary
@@ -0,0 +1,181 @@
+"""Local cache of bare git mirrors for fast, offline-friendly clones.
+
+Each remote is mirrored once (``git clone --mirror``) under the cache
+directory and refreshed incrementally with ``git fetch``. Working copies
+are then shallow-cloned from the local mirror, so only the first
+provisioning of a machine (or of a golden image cache) touches the network.
+"""
+
+import asyncio
+import fcntl
+import hashlib
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterator, Iterable, List, Optional, Union
+
+from local_env_setup.core.executor import CommandExecutor, CommandResult, get_executor
+from local_env_setup.core.resources import ResourcePool, default_pool
+from local_env_setup.core.state import shared_cache_dir
+
+if TYPE_CHECKING:
+    from local_env_setup.core.monitoring import SetupMonitor
+
+# Mirrors fetched more recently than this are used as they are
+DEFAULT_MAX_AGE = 3600
+
+
+class GitMirrorCache:
+    """Bare mirrors of remote repositories, refreshed incrementally."""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None,
+                 max_age: float = DEFAULT_MAX_AGE,
+                 executor: Optional[CommandExecutor] = None,
+                 pool: Optional[ResourcePool] = None):
+        """Initialize the cache.
+
+        Args:
+            root: Mirror directory (defaults to ``git`` in the shared cache dir)
+            max_age: Seconds a mirror is used without fetching
+            executor: Executor running git (defaults to the shared one)
+            pool: Resource pool providing the ``network`` limit
+        """
+        self.root = Path(root) if root else shared_cache_dir() / "git"
+        self.max_age = max_age
+        self.executor = executor or get_executor()
+        self.pool = pool or default_pool
+        self.logger = logging.getLogger("GitMirrorCache")
+
+    def mirror_path(self, url: str) -> Path:
+        """Location of the mirror for a remote URL."""
+        name = re.sub(r"\.git$", "", url.rstrip("/").rsplit("/", 1)[-1])
+        digest = hashlib.sha256(url.encode()).hexdigest()[:12]
+        return self.root / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}-{digest}.git"
+
+    def _stamp_path(self, mirror: Path) -> Path:
+        return mirror.with_suffix(".fetched")
+
+    def _is_fresh(self, mirror: Path) -> bool:
+        try:
+            return time.time() - self._stamp_path(mirror).stat().st_mtime < self.max_age
+        except OSError:
+            return False
+
+    @asynccontextmanager
+    async def _locked(self, mirror: Path) -> AsyncIterator[None]:
+        """Serialize work on one mirror across tasks, threads and processes.
+
+        flock locks belong to the open file, so separate opens exclude each
+        other even within one process.
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(mirror.with_suffix(".lock"), "w") as lock_file:
+            delay = 0.01
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.5)
+            yield
+
+    async def _git(self, args: List[str], monitor: Optional["SetupMonitor"],
+                   network: bool, timeout: float = 600) -> CommandResult:
+        return await self.executor.arun(
+            ["git"] + args, resources=("network",) if network else (),
+            pool=self.pool, monitor=monitor, timeout=timeout,
+            env={"GIT_TERMINAL_PROMPT": "0"})
+
+    async def aupdate(self, url: str,
+                      monitor: Optional["SetupMonitor"] = None) -> Optional[Path]:
+        """Create the mirror for a URL or bring it up to date.
+
+        A mirror that cannot be refreshed is still returned (stale but
+        usable); None means no mirror exists and none could be created.
+
+        Args:
+            url: Remote repository URL
+            monitor: Monitor receiving the git command timings
+
+        Returns:
+            Optional[Path]: Path of the bare mirror
+        """
+        mirror = self.mirror_path(url)
+        async with self._locked(mirror):
+            if mirror.is_dir():
+                if self._is_fresh(mirror):
+                    return mirror
+                result = await self._git(["-C", str(mirror), "fetch", "--prune", "--quiet"],
+                                         monitor, network=True)
+                if result.ok:
+                    self._stamp_path(mirror).touch()
+                else:
+                    self.logger.warning(f"Using stale mirror of {url}; fetch failed "
+                                        f"(log: {result.log_path})")
+                return mirror
+
+            tmp = mirror.with_suffix(f".tmp-{os.getpid()}")
+            shutil.rmtree(tmp, ignore_errors=True)
+            result = await self._git(["clone", "--mirror", "--quiet", url, str(tmp)],
+                                     monitor, network=True, timeout=1800)
+            if not result.ok:
+                shutil.rmtree(tmp, ignore_errors=True)
+                self.logger.warning(f"Failed to mirror {url} (log: {result.log_path})")
+                return None
+            os.replace(tmp, mirror)
+            self._stamp_path(mirror).touch()
+            return mirror
+
+    async def aupdate_many(self, urls: Iterable[str],
+                           monitor: Optional["SetupMonitor"] = None) -> List[Optional[Path]]:
+        """Create or refresh several mirrors concurrently."""
+        return list(await asyncio.gather(*(self.aupdate(url, monitor) for url in urls)))
+
+    async def aclone(self, url: str, dest: Union[str, Path], depth: int = 1,
+                     monitor: Optional["SetupMonitor"] = None) -> CommandResult:
+        """Shallow-clone a repository through its local mirror.
+
+        The working copy's ``origin`` points at the real remote, so later
+        pulls work without the cache. Falls back to cloning the remote
+        directly if no mirror is available.
+
+        Args:
+            url: Remote repository URL
+            dest: Destination directory
+            depth: History depth of the working copy
+            monitor: Monitor receiving the git command timings
+
+        Returns:
+            CommandResult: Result of the clone
+        """
+        mirror = await self.aupdate(url, monitor)
+        if mirror is None:
+            return await self._git(["clone", "--quiet", "--depth", str(depth), url, str(dest)],
+                                   monitor, network=True)
+        # A file:// URL makes git honour --depth for a local source
+        result = await self._git(
+            ["clone", "--quiet", "--depth", str(depth), mirror.as_uri(), str(dest)],
+            monitor, network=False)
+        if result.ok:
+            await self._git(["-C", str(dest), "remote", "set-url", "origin", url],
+                            monitor, network=False)
+        return result
+
+
+_mirrors: Optional[GitMirrorCache] = None
+_mirrors_lock = threading.Lock()
+
+
+def get_git_mirrors() -> GitMirrorCache:
+    """Return the process-wide git mirror cache."""
+    global _mirrors
+    with _mirrors_lock:
+        if _mirrors is None:
+            _mirrors = GitMirrorCache()
+        return _mirrors
@@ -0,0 +1,318 @@
+"""Run history: every run's spans in a local SQLite database.
+
+Each run appends its spans keyed by (category, component, action); the
+variable part of a step (paths, versions, package lists) is kept as the
+target but not used for grouping. Summary files written by
+``SetupMonitor.save_summary`` on other machines can be ingested too, so
+step timings can be compared across a fleet.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import statistics
+import threading
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from local_env_setup.core.monitoring import SetupMonitor, command_key
+from local_env_setup.core.state import state_dir
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id TEXT PRIMARY KEY,
+    host TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration REAL,
+    success INTEGER,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS spans (
+    run_id TEXT NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    component TEXT NOT NULL,
+    action TEXT NOT NULL,
+    target TEXT NOT NULL,
+    duration REAL NOT NULL,
+    success INTEGER
+);
+CREATE INDEX IF NOT EXISTS spans_by_kind ON spans (category, component, action);
+"""
+
+# Step names written before steps had structured keys, e.g.
+# "run_command_brew_install_kubectl"
+LEGACY_STEP_RE = re.compile(
+    r"^(?P<action>run_command|check_command|create_directory|append_to_file|"
+    r"get_command_output)_(?P<target>.*)$")
+
+Kind = Tuple[str, str, str]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Return the q-th percentile (0-100) with linear interpolation."""
+    ordered = sorted(values)
+    if not ordered:
+        raise ValueError("percentile of no values")
+    rank = (len(ordered) - 1) * q / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+@dataclass
+class StepStats:
+    """Duration statistics for one kind of step."""
+    category: str
+    component: str
+    action: str
+    count: int
+    runs: int
+    p50: float
+    p95: float
+    max: float
+    failures: int
+
+    @property
+    def kind(self) -> Kind:
+        return (self.category, self.component, self.action)
+
+
+@dataclass
+class Regression:
+    """A step that got slower in the latest run than its recent baseline."""
+    category: str
+    component: str
+    action: str
+    baseline: float
+    latest: float
+
+    @property
+    def change(self) -> float:
+        """Relative slowdown (0.5 means 50% slower)."""
+        return self.latest / self.baseline - 1 if self.baseline else float("inf")
+
+
+def _legacy_spans(summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Derive keyed spans from a summary written without ``spans``."""
+    spans = []
+    for step in summary.get("steps", []):
+        match = LEGACY_STEP_RE.match(step.get("name", ""))
+        action, target = (match.group("action"), match.group("target")) if match \
+            else (step.get("name", ""), "")
+        spans.append({"category": "step", "component": step.get("component", ""),
+                      "action": action, "target": target,
+                      "duration": step.get("duration"), "success": step.get("success")})
+    for command in summary.get("commands", []):
+        action, target = command_key(command.get("name", "").split())
+        spans.append({"category": "command", "component": "", "action": action,
+                      "target": target, "duration": command.get("wall_time"),
+                      "success": command.get("returncode") == 0})
+    return spans
+
+
+class RunHistory:
+    """SQLite store of past runs and their spans."""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """Initialize the store.
+
+        Args:
+            path: Database file (defaults to ``history.sqlite3`` in the state dir)
+        """
+        self.path = Path(path) if path else state_dir() / "history.sqlite3"
+        self.logger = logging.getLogger("RunHistory")
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def ingest(self, summary: Dict[str, Any], source: Optional[str] = None) -> bool:
+        """Add a run from a monitor summary.
+
+        Args:
+            summary: Output of ``SetupMonitor.get_summary`` (possibly from
+                another machine or an older version)
+            source: Where the summary came from (file path)
+
+        Returns:
+            bool: False if the run was already recorded
+        """
+        run_id = summary.get("run_id") or hashlib.sha256(
+            json.dumps(summary, sort_keys=True, default=str).encode()).hexdigest()[:32]
+        spans = summary.get("spans")
+        if spans is None:
+            spans = _legacy_spans(summary)
+        rows = [(run_id, s.get("category", "step"), s.get("component") or "",
+                 s.get("action") or "", s.get("target") or "", float(s["duration"]),
+                 None if s.get("success") is None else int(bool(s["success"])))
+                for s in spans if s.get("duration") is not None]
+        success = summary.get("success")
+        if success is None:
+            success = summary.get("failed_steps", 0) == 0
+        with self._lock, closing(self._connect()) as conn, conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO runs (id, host, started_at, duration, success, source) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (run_id, summary.get("host") or "unknown",
+                 summary.get("started_at") or 0.0, summary.get("total_duration"),
+                 int(bool(success)), source))
+            if cursor.rowcount == 0:
+                return False
+            conn.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        return True
+
+    def record(self, monitor: SetupMonitor, success: bool) -> None:
+        """Append the run a monitor observed."""
+        summary = monitor.get_summary()
+        summary["success"] = success
+        self.ingest(summary)
+
+    def ingest_files(self, paths: Iterable[Union[str, Path]]) -> Tuple[int, int]:
+        """Ingest summary files, or directories of them.
+
+        Returns:
+            Tuple[int, int]: Runs added and files skipped (already known or
+            unreadable)
+        """
+        added = skipped = 0
+        for path in map(Path, paths):
+            files = sorted(path.rglob("*.json")) if path.is_dir() else [path]
+            for file in files:
+                try:
+                    summary = json.loads(file.read_text())
+                except (OSError, ValueError) as e:
+                    self.logger.warning(f"Skipping {file}: {e}")
+                    skipped += 1
+                    continue
+                if isinstance(summary, dict) and self.ingest(summary, source=str(file)):
+                    added += 1
+                else:
+                    skipped += 1
+        return added, skipped
+
+    def _durations(self, category: Optional[str], host: Optional[str],
+                   last_runs: Optional[int]) -> Dict[Kind, List[Tuple[str, float, int]]]:
+        """Durations per kind as (run id, duration, success), oldest run first."""
+        query = ("SELECT s.category, s.component, s.action, s.run_id, s.duration, s.success "
+                 "FROM spans s JOIN runs r ON r.id = s.run_id WHERE 1 = 1")
+        params: List[Any] = []
+        if category:
+            query += " AND s.category = ?"
+            params.append(category)
+        if host:
+            query += " AND r.host = ?"
+            params.append(host)
+        if last_runs:
+            query += (" AND s.run_id IN (SELECT id FROM runs WHERE ? IS NULL OR host = ? "
+                      "ORDER BY started_at DESC LIMIT ?)")
+            params += [host, host, last_runs]
+        query += " ORDER BY r.started_at, s.rowid"
+        grouped: Dict[Kind, List[Tuple[str, float, int]]] = {}
+        with self._lock, closing(self._connect()) as conn:
+            for cat, component, action, run_id, duration, success in conn.execute(query, params):
+                grouped.setdefault((cat, component, action), []).append(
+                    (run_id, duration, success))
+        return grouped
+
+    def runs(self) -> int:
+        """Number of recorded runs."""
+        with self._lock, closing(self._connect()) as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0])
+
+    def step_stats(self, category: Optional[str] = None, host: Optional[str] = None,
+                   last_runs: Optional[int] = None) -> List[StepStats]:
+        """Return duration statistics per kind of step, slowest p95 first.
+
+        Args:
+            category: Only this span category (``step``, ``command``, ...)
+            host: Only runs from this host
+            last_runs: Only the most recent runs
+        """
+        stats = []
+        for (cat, component, action), rows in self._durations(category, host, last_runs).items():
+            durations = [duration for _, duration, _ in rows]
+            stats.append(StepStats(
+                category=cat, component=component, action=action,
+                count=len(durations), runs=len({run_id for run_id, _, _ in rows}),
+                p50=percentile(durations, 50), p95=percentile(durations, 95),
+                max=max(durations), failures=sum(1 for _, _, ok in rows if ok == 0)))
+        return sorted(stats, key=lambda s: s.p95, reverse=True)
+
+    def expected_durations(self, host: Optional[str] = None,
+                           last_runs: int = 10) -> Dict[str, float]:
+        """Median duration of each component's successful recent runs.
+
+        Args:
+            host: Prefer this host's runs, falling back to all hosts if it
+                has none
+            last_runs: Runs considered
+
+        Returns:
+            Dict[str, float]: Seconds by component (scheduler task) name
+        """
+        rows = self._durations("component", host, last_runs)
+        if not rows and host:
+            rows = self._durations("component", None, last_runs)
+        expected = {}
+        for (_, _, name), samples in rows.items():
+            durations = [duration for _, duration, ok in samples if ok]
+            if durations:
+                expected[name] = statistics.median(durations)
+        return expected
+
+    def _per_run(self, category: Optional[str], host: Optional[str],
+                 last_runs: int) -> Dict[Kind, Dict[str, float]]:
+        """Total time per kind in each of the recent runs, oldest run first."""
+        totals: Dict[Kind, Dict[str, float]] = {}
+        for kind, rows in self._durations(category, host, last_runs).items():
+            per_run = totals.setdefault(kind, {})
+            for run_id, duration, _ in rows:
+                per_run[run_id] = per_run.get(run_id, 0.0) + duration
+        return totals
+
+    def trend(self, category: Optional[str] = None, host: Optional[str] = None,
+              last_runs: int = 10) -> Dict[Kind, List[float]]:
+        """Total time per kind in each of the recent runs, oldest first."""
+        return {kind: list(per_run.values())
+                for kind, per_run in self._per_run(category, host, last_runs).items()}
+
+    def regressions(self, threshold: float = 0.2, window: int = 5,
+                    min_seconds: float = 0.5, category: Optional[str] = None,
+                    host: Optional[str] = None) -> List[Regression]:
+        """Find steps of the latest run that were slower than their baseline.
+
+        Args:
+            threshold: Relative slowdown to report (0.2 is 20% slower)
+            window: Earlier runs forming the baseline (median)
+            min_seconds: Ignore steps whose latest time is below this
+            category: Only this span category
+            host: Only runs from this host
+
+        Returns:
+            List[Regression]: Regressions, largest slowdown first
+        """
+        query = "SELECT id FROM runs" + (" WHERE host = ?" if host else "") + \
+            " ORDER BY started_at DESC LIMIT 1"
+        with self._lock, closing(self._connect()) as conn:
+            row = conn.execute(query, [host] if host else []).fetchone()
+        if row is None:
+            return []
+        latest_run = row[0]
+
+        found = []
+        for kind, per_run in self._per_run(category, host, window + 1).items():
+            if latest_run not in per_run or len(per_run) < 2:
+                continue
+            latest = per_run.pop(latest_run)
+            baseline = statistics.median(per_run.values())
+            if latest >= min_seconds and latest > baseline * (1 + threshold):
+                found.append(Regression(*kind, baseline=baseline, latest=latest))
+        return sorted(found, key=lambda r: r.change, reverse=True)
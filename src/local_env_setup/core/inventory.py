@@ -0,0 +1,191 @@
+"""Cached index of installed Homebrew formulae and casks."""
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, cast
+
+from local_env_setup.core.executor import CommandError, get_executor
+from local_env_setup.core.state import cache_dir
+
+# Bump when the on-disk format changes
+CACHE_VERSION = 1
+
+
+def find_brew_prefix() -> Optional[Path]:
+    """Locate the Homebrew prefix without spawning ``brew --prefix``."""
+    candidates = [
+        os.environ.get("HOMEBREW_PREFIX"),
+        "/opt/homebrew",
+        "/usr/local",
+        "/home/linuxbrew/.linuxbrew",
+    ]
+    for candidate in candidates:
+        if candidate and (Path(candidate) / "Cellar").is_dir():
+            return Path(candidate)
+    return None
+
+
+def version_matches(installed: str, pin: str) -> bool:
+    """Check whether an installed version satisfies a pinned version.
+
+    A pin matches on whole dotted components, so ``1.26`` matches
+    ``1.26.3`` but not ``1.260.0``. Homebrew revision suffixes such as
+    ``_1`` are ignored.
+
+    Args:
+        installed: Version string reported by Homebrew
+        pin: Pinned version from the configuration
+    """
+    installed_parts = installed.split("_")[0].split(".")
+    pin_parts = pin.lstrip("v").split(".")
+    return installed_parts[:len(pin_parts)] == pin_parts
+
+
+class BrewInventory:
+    """In-memory index of installed Homebrew packages.
+
+    The index is built from a single ``brew info --json=v2 --installed`` call
+    and persisted to disk. The on-disk copy is keyed on the modification
+    times of the Cellar and Caskroom directories (and their package
+    directories), so it is reused across runs until Homebrew installs,
+    upgrades or removes something. Lookups after loading are plain dict hits.
+    """
+
+    def __init__(self, cache_path: Optional[Path] = None,
+                 prefix: Optional[Path] = None):
+        """Initialize the inventory.
+
+        Args:
+            cache_path: Location of the on-disk cache (defaults to
+                ``brew_inventory.json`` in the cache dir)
+            prefix: Homebrew prefix (detected when omitted)
+        """
+        self.cache_path = Path(cache_path) if cache_path else cache_dir() / "brew_inventory.json"
+        self.prefix = prefix
+        self.logger = logging.getLogger("BrewInventory")
+        self._formulae: Optional[Dict[str, List[str]]] = None
+        self._casks: Dict[str, List[str]] = {}
+        self._lock = threading.Lock()
+
+    def _stamp(self) -> Optional[Dict[str, int]]:
+        """Fingerprint the Homebrew install directories."""
+        prefix = self.prefix or find_brew_prefix()
+        if prefix is None:
+            return None
+        stamp = {}
+        for name in ("Cellar", "Caskroom"):
+            root = prefix / name
+            if not root.is_dir():
+                continue
+            stamp[str(root)] = root.stat().st_mtime_ns
+            # Upgrades add a version directory inside the package directory
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    stamp[entry.path] = entry.stat().st_mtime_ns
+        return stamp
+
+    def _read_cache(self, stamp: Dict[str, int]) -> Optional[Dict[str, Any]]:
+        try:
+            data = json.loads(self.cache_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != CACHE_VERSION or data.get("stamp") != stamp:
+            return None
+        return cast(Dict[str, Any], data)
+
+    def _write_cache(self, stamp: Dict[str, int]) -> None:
+        data = {
+            "version": CACHE_VERSION,
+            "stamp": stamp,
+            "formulae": self._formulae,
+            "casks": self._casks,
+        }
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(data))
+            tmp_path.replace(self.cache_path)
+        except OSError as e:
+            self.logger.warning(f"Failed to write inventory cache: {e}")
+
+    def _query_brew(self) -> None:
+        """Build the index from one ``brew info`` call."""
+        result = get_executor().run(
+            ["brew", "info", "--json=v2", "--installed"],
+            resources=(), timeout=300, check=True, tail_bytes=256 * 1024 * 1024
+        )
+        data = json.loads(result.stdout)
+        formulae: Dict[str, List[str]] = {}
+        for formula in data.get("formulae", []):
+            versions = [item["version"] for item in formula.get("installed", [])]
+            for name in [formula["name"], formula.get("full_name")] + formula.get("aliases", []):
+                if name:
+                    formulae[name] = versions
+        casks: Dict[str, List[str]] = {}
+        for cask in data.get("casks", []):
+            installed = cask.get("installed")
+            casks[cask["token"]] = [installed] if installed else []
+        self._formulae, self._casks = formulae, casks
+
+    def load(self) -> None:
+        """Load the index from the disk cache or from Homebrew."""
+        with self._lock:
+            if self._formulae is not None:
+                return
+            stamp = self._stamp()
+            if stamp is None:
+                # No Homebrew installed yet; nothing is installed
+                self._formulae, self._casks = {}, {}
+                return
+            cached = self._read_cache(stamp)
+            if cached is not None:
+                self._formulae, self._casks = cached["formulae"], cached["casks"]
+                return
+            try:
+                self._query_brew()
+            except (CommandError, ValueError) as e:
+                self.logger.warning(f"Failed to query Homebrew inventory: {e}")
+                self._formulae, self._casks = {}, {}
+                return
+            self._write_cache(stamp)
+
+    def invalidate(self) -> None:
+        """Drop the in-memory index so the next lookup reloads it."""
+        with self._lock:
+            self._formulae = None
+            self._casks = {}
+
+    def versions(self, name: str, cask: bool = False) -> List[str]:
+        """Return the installed versions of a formula or cask.
+
+        Args:
+            name: Formula name, alias or cask token
+            cask: Whether to look up a cask
+        """
+        self.load()
+        table = self._casks if cask else self._formulae
+        return list((table or {}).get(name, []))
+
+    def is_installed(self, name: str, cask: bool = False) -> bool:
+        """Check whether a formula or cask is installed."""
+        return bool(self.versions(name, cask))
+
+    def satisfies(self, name: str, pin: str) -> bool:
+        """Check whether any installed version of a formula matches a pin."""
+        return any(version_matches(v, pin) for v in self.versions(name))
+
+
+_inventory: Optional[BrewInventory] = None
+_inventory_lock = threading.Lock()
+
+
+def get_inventory() -> BrewInventory:
+    """Return the process-wide Homebrew inventory."""
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = BrewInventory()
+        return _inventory
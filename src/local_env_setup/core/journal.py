@@ -0,0 +1,378 @@
+"""Write-ahead journal of setup runs, for resuming and rolling them back.
+
+Every run appends JSON lines to ``journal.jsonl`` in the state dir, each
+flushed to disk before the next action:
+
+- ``begin``: a run started (its components, and the run it resumes)
+- ``intent``: a file is about to be written or a directory created; the
+  file's previous content (its pre-image) is saved under ``preimages/``
+  by digest first
+- ``done``: the mutation finished
+- ``commit``: a component succeeded, with the rc blocks it declared (these
+  are only written when the run ends, so a resumed run declares them again)
+- ``end``: the run finished, successfully or not
+- ``rollback``: a run was rolled back
+
+A run without ``end`` crashed. ``init --resume`` starts a new run that
+skips the components the interrupted one committed, after undoing any
+mutation it left half done. ``rollback`` restores the pre-images of a run
+(and of the runs it resumed) newest first.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Union
+
+from local_env_setup.core.state import state_dir
+
+# Runs kept in the journal; older ones can no longer be rolled back
+KEEP_RUNS = 10
+
+
+@dataclass
+class Mutation:
+    """A file or directory change and what it replaced.
+
+    Attributes:
+        seq: Position in the run
+        action: ``write`` (file content) or ``mkdir`` (directory tree)
+        path: File written, or the topmost directory created
+        preimage: Digest of the previous content; None if the path did not
+            exist
+        done: Whether the change finished
+        data: Previous content, for mutations made outside a journaled run
+    """
+    seq: int
+    action: str
+    path: str
+    preimage: Optional[str] = None
+    done: bool = False
+    data: Optional[bytes] = field(default=None, repr=False)
+
+
+@dataclass
+class JournalRun:
+    """A run as reconstructed from the journal."""
+    run_id: str
+    components: List[str]
+    started_at: float
+    resumes: Optional[str] = None
+    committed: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
+    mutations: List[Mutation] = field(default_factory=list)
+    finished: bool = False
+    success: bool = False
+    rolled_back: bool = False
+
+    @property
+    def interrupted(self) -> bool:
+        """Whether the run stopped before reaching its end."""
+        return not self.finished
+
+
+class Journal:
+    """Append-only, fsynced record of runs, mutations and completed steps."""
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """Initialize the journal.
+
+        Args:
+            path: JSON-lines file (defaults to ``journal.jsonl`` in the
+                state dir); pre-images are kept next to it
+        """
+        self.path = Path(path) if path else state_dir() / "journal.jsonl"
+        self.preimage_dir = self.path.parent / "preimages"
+        self.logger = logging.getLogger("Journal")
+        self.run_id: Optional[str] = None
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, sort_keys=True)
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a") as f:
+                f.write(line + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _read(self) -> List[Dict[str, Any]]:
+        records = []
+        try:
+            with self.path.open() as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn final line from a crash
+                        continue
+        except OSError:
+            pass
+        return records
+
+    def begin(self, components: List[str], resumes: Optional[str] = None) -> str:
+        """Start journaling a run.
+
+        Args:
+            components: Components the run sets up
+            resumes: Id of the interrupted run this one continues
+
+        Returns:
+            str: Id of the new run
+        """
+        if resumes is None:
+            self._prune()
+        self.run_id = uuid.uuid4().hex[:12]
+        self._seq = 0
+        self._append({"op": "begin", "run": self.run_id, "components": components,
+                      "resumes": resumes, "time": time.time()})
+        return self.run_id
+
+    def commit(self, step: str, redo: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Record that a step completed.
+
+        Args:
+            step: Component name
+            redo: rc blocks the step declared, replayed when resuming
+        """
+        if self.run_id is not None:
+            self._append({"op": "commit", "run": self.run_id, "step": step, "redo": redo or []})
+
+    def end(self, success: bool) -> None:
+        """Record the end of the current run."""
+        if self.run_id is not None:
+            self._append({"op": "end", "run": self.run_id, "success": success})
+            self.run_id = None
+
+    def _save_preimage(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        blob = self.preimage_dir / digest
+        if not blob.exists():
+            self.preimage_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.preimage_dir)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, blob)
+        return digest
+
+    @contextmanager
+    def mutation(self, action: str, path: Union[str, Path]) -> Iterator[Optional[Mutation]]:
+        """Record a change before making it.
+
+        Inside a run the intent and pre-image are on disk before the block
+        runs, and the change is marked done when the block exits without an
+        exception. Outside a run nothing is written; the returned mutation
+        can still be undone with ``restore``.
+
+        Args:
+            action: ``write`` to replace or append to a file, ``mkdir`` to
+                create a directory and its missing parents
+            path: File or directory changed
+
+        Yields:
+            Optional[Mutation]: The recorded change, or None if there is
+            nothing to undo (a directory that already exists)
+        """
+        target = Path(os.path.realpath(os.path.expanduser(str(path))))
+        if action == "mkdir":
+            # Record the topmost directory that will be created
+            while not target.parent.exists() and target.parent != target:
+                target = target.parent
+            if target.exists():
+                yield None
+                return
+        data = None
+        if action == "write" and target.is_file():
+            data = target.read_bytes()
+
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        mutation = Mutation(seq, action, str(target))
+        run_id = self.run_id
+        if run_id is None:
+            mutation.data = data
+        else:
+            mutation.preimage = self._save_preimage(data) if data is not None else None
+            self._append({"op": "intent", "run": run_id, "seq": seq, "action": action,
+                          "path": mutation.path, "preimage": mutation.preimage})
+        yield mutation
+        mutation.done = True
+        if run_id is not None:
+            self._append({"op": "done", "run": run_id, "seq": seq})
+
+    def runs(self) -> List[JournalRun]:
+        """Return the journaled runs, oldest first."""
+        runs: Dict[str, JournalRun] = {}
+        for record in self._read():
+            run = runs.get(record.get("run", ""))
+            op = record.get("op")
+            if op == "begin":
+                runs[record["run"]] = JournalRun(record["run"], record.get("components", []),
+                                                 record.get("time", 0.0), record.get("resumes"))
+            elif run is None:
+                continue
+            elif op == "intent":
+                run.mutations.append(Mutation(record["seq"], record["action"], record["path"],
+                                              record.get("preimage")))
+            elif op == "done":
+                for mutation in run.mutations:
+                    if mutation.seq == record["seq"]:
+                        mutation.done = True
+            elif op == "commit":
+                run.committed[record["step"]] = record.get("redo", [])
+            elif op == "end":
+                run.finished, run.success = True, bool(record.get("success"))
+            elif op == "rollback":
+                run.rolled_back = True
+        return list(runs.values())
+
+    def chain(self, run_id: Optional[str] = None) -> List[JournalRun]:
+        """Return a run and the interrupted runs it resumed, newest first.
+
+        Args:
+            run_id: Run to start from (default: the latest run)
+        """
+        runs = {run.run_id: run for run in self.runs()}
+        if run_id is None:
+            run_id = next(reversed(runs), None) if runs else None
+        chain = []
+        while run_id in runs and runs[run_id] not in chain:
+            chain.append(runs[run_id])
+            run_id = runs[run_id].resumes
+        return chain
+
+    def resumable(self) -> Optional[JournalRun]:
+        """Return the latest run if it did not succeed and was not rolled back.
+
+        Its ``committed`` includes the steps of the runs it resumed.
+        """
+        chain = self.chain()
+        if not chain or chain[0].success or chain[0].rolled_back:
+            return None
+        latest = chain[0]
+        for previous in chain[1:]:
+            for step, redo in previous.committed.items():
+                latest.committed.setdefault(step, redo)
+        return latest
+
+    def restore(self, mutation: Mutation) -> str:
+        """Undo one mutation.
+
+        Returns:
+            str: Description of what was done
+        """
+        path = Path(mutation.path)
+        if mutation.action == "mkdir":
+            if not path.is_dir():
+                return f"{path} already removed"
+            # Leave anything put there since, e.g. by the user
+            for root, _, _ in os.walk(path, topdown=False):
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
+            return f"removed {path}" if not path.exists() else f"kept {path} (not empty)"
+        if mutation.data is not None:
+            data = mutation.data
+        elif mutation.preimage is not None:
+            data = (self.preimage_dir / mutation.preimage).read_bytes()
+        else:
+            if path.exists():
+                path.unlink()
+                return f"removed {path}"
+            return f"{path} already removed"
+        if path.is_file() and path.read_bytes() == data:
+            return f"{path} unchanged"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if path.exists():
+            shutil.copymode(path, tmp)
+        else:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+        return f"restored {path}"
+
+    def recover(self, run: JournalRun) -> List[str]:
+        """Undo the mutations an interrupted run left half done."""
+        return [self.restore(m) for m in reversed(run.mutations) if not m.done]
+
+    def rollback(self, run_id: Optional[str] = None, dry_run: bool = False,
+                 report: Optional[Callable[[str], None]] = None) -> List[JournalRun]:
+        """Undo a run and the runs it resumed, newest change first.
+
+        Args:
+            run_id: Run to roll back (default: the latest run)
+            dry_run: Only return what would be rolled back
+            report: Called with a description of each undone change
+                (defaults to logging it)
+
+        Returns:
+            List[JournalRun]: The runs rolled back, newest first
+
+        Raises:
+            ValueError: If the run was already rolled back
+        """
+        chain = self.chain(run_id)
+        if chain and chain[0].rolled_back:
+            raise ValueError(f"Run {chain[0].run_id} was already rolled back")
+        if dry_run:
+            return chain
+        report = report or self.logger.info
+        for run in chain:
+            for mutation in reversed(run.mutations):
+                report(self.restore(mutation))
+            self._append({"op": "rollback", "run": run.run_id, "time": time.time()})
+        return chain
+
+    def _prune(self) -> None:
+        """Drop all but the last ``KEEP_RUNS`` runs and their pre-images."""
+        records = self._read()
+        started = [r["run"] for r in records if r.get("op") == "begin"]
+        if len(started) <= KEEP_RUNS:
+            return
+        keep = set(started[-KEEP_RUNS:])
+        kept = [r for r in records if r.get("run") in keep]
+        with self._lock:
+            tmp_path = self.path.with_suffix(".tmp")
+            with tmp_path.open("w") as f:
+                for record in kept:
+                    f.write(json.dumps(record, sort_keys=True) + "\n")
+            tmp_path.replace(self.path)
+        referenced = {r.get("preimage") for r in kept}
+        for blob in self.preimage_dir.glob("*"):
+            if blob.name not in referenced:
+                blob.unlink(missing_ok=True)
+
+
+_journal: Optional[Journal] = None
+_journal_lock = threading.Lock()
+
+
+def get_journal() -> Journal:
+    """Return the process-wide journal."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = Journal()
+        return _journal
+
+
+def set_journal(journal: Optional[Journal]) -> None:
+    """Replace the process-wide journal (None resets to the default)."""
+    global _journal
+    with _journal_lock:
+        _journal = journal
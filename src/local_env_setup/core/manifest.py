@@ -0,0 +1,395 @@
+"""Declarative manifest of the desired machine state.
+
+A manifest lists Homebrew formulae and casks (optionally pinned to a
+version), VS Code extensions, global git settings and managed rc file
+blocks::
+
+    brew:
+      kubectl: "1.26"       # pinned
+      kubectx:              # any version
+    casks: [docker]
+    vscode: [ms-python.python]
+    git:
+      user.name: Jane Doe
+    rc:
+      ~/.zshrc:
+        aliases:
+          content: alias k=kubectl
+          priority: 60
+
+``gather_state`` reads the actual state of everything the manifest
+mentions in one pass: the Homebrew inventory (one cached ``brew info``),
+one ``git config --list``, one ``code --list-extensions`` and each rc file
+once. ``diff`` turns the two into a list of changes and ``apply`` executes
+only those, so changing one pin touches exactly one tool.
+"""
+
+import logging
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from local_env_setup.core.brew import BrewPlan
+from local_env_setup.core.executor import CommandExecutor, get_executor
+from local_env_setup.core.inventory import BrewInventory, get_inventory, version_matches
+from local_env_setup.core.rcfile import DEFAULT_PRIORITY, RcEditor, get_rc_editor
+from local_env_setup.core.resources import ResourcePool
+from local_env_setup.core.scheduler import Scheduler
+
+KINDS = ("brew", "cask", "vscode", "git", "rc")
+
+# Global git settings the setup has always applied
+DEFAULT_GIT_EDITOR = "code --wait"
+
+logger = logging.getLogger("Manifest")
+
+
+def manifest_file() -> Path:
+    """Default location of the manifest."""
+    base = os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config"
+    return Path(base) / "local_env_setup" / "manifest.yaml"
+
+
+@dataclass(frozen=True)
+class Resource:
+    """One desired item of machine state.
+
+    Attributes:
+        kind: One of ``KINDS``
+        name: Formula, cask, extension id, git key or rc block name
+        value: Version pin (brew, cask, vscode), value (git) or block
+            content (rc); None means any version
+        path: rc file of an rc block
+        priority: Placement of an rc block (lower comes first)
+    """
+    kind: str
+    name: str
+    value: Optional[str] = None
+    path: Optional[str] = None
+    priority: int = DEFAULT_PRIORITY
+
+    @property
+    def address(self) -> str:
+        """Unique, human-readable identifier, e.g. ``brew.kubectl``."""
+        if self.kind == "rc":
+            return f"rc.{self.path}:{self.name}"
+        return f"{self.kind}.{self.name}"
+
+
+@dataclass
+class Manifest:
+    """Desired state as a list of resources."""
+    resources: List[Resource] = field(default_factory=list)
+
+    def of_kind(self, kind: str) -> List[Resource]:
+        return [resource for resource in self.resources if resource.kind == kind]
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], source: str = "manifest") -> "Manifest":
+        """Build a manifest from its YAML structure.
+
+        Raises:
+            ValueError: On unknown sections or malformed entries
+        """
+        unknown = sorted(set(data) - {"brew", "casks", "vscode", "git", "rc"})
+        if unknown:
+            raise ValueError(f"{source}: unknown section(s): {', '.join(unknown)}")
+
+        def entries(section: str) -> List[Tuple[str, Optional[str]]]:
+            value = data.get(section) or {}
+            if isinstance(value, list):
+                return [(str(name), None) for name in value]
+            if isinstance(value, dict):
+                return [(str(k), None if v is None else str(v)) for k, v in value.items()]
+            raise ValueError(f"{source}: {section} must be a list or a mapping")
+
+        resources = [Resource("brew", name, pin) for name, pin in entries("brew")]
+        resources += [Resource("cask", name, pin) for name, pin in entries("casks")]
+        resources += [Resource("vscode", name, pin) for name, pin in entries("vscode")]
+        resources += [Resource("git", key, value) for key, value in entries("git")]
+        for path, blocks in (data.get("rc") or {}).items():
+            if not isinstance(blocks, dict):
+                raise ValueError(f"{source}: rc.{path} must map block names to blocks")
+            for name, block in blocks.items():
+                if isinstance(block, str):
+                    block = {"content": block}
+                if not isinstance(block, dict) or "content" not in block:
+                    raise ValueError(f"{source}: rc.{path}.{name} needs a content")
+                resources.append(Resource("rc", str(name), str(block["content"]), path=str(path),
+                                          priority=int(block.get("priority", DEFAULT_PRIORITY))))
+        return cls(resources)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "Manifest":
+        """Read a YAML manifest (parsed once per file version)."""
+        from local_env_setup.config.sources import yaml_files
+
+        data = yaml_files.get(path)
+        if data is None:
+            raise FileNotFoundError(f"Manifest not found: {path}")
+        return cls.from_dict(data, source=str(path))
+
+    @classmethod
+    def from_config(cls) -> "Manifest":
+        """The manifest equivalent of the configuration and components.
+
+        Every Homebrew package the components install, pinned to the
+        configured versions, plus the configured VS Code extensions and git
+        identity.
+        """
+        from local_env_setup.config import env
+        from local_env_setup.setup import COMPONENTS, load_component
+
+        pins = {"kubectl": env.KUBECTL_VERSION, "helm": env.HELM_VERSION}
+        resources = []
+        for name in COMPONENTS:
+            component = load_component(name)
+            resources += [Resource("brew", f, pins.get(f)) for f in component.brew_formulae]
+            resources += [Resource("cask", c) for c in component.brew_casks]
+        resources += [Resource("vscode", extension) for extension in env.VSCODE_EXTENSIONS]
+        git = {"user.name": env.GIT_USERNAME, "user.email": env.GIT_EMAIL,
+               "core.editor": DEFAULT_GIT_EDITOR}
+        resources += [Resource("git", key, value) for key, value in git.items() if value]
+        return cls(resources)
+
+
+@dataclass
+class ActualState:
+    """What is on the machine, for the resources of a manifest."""
+    inventory: BrewInventory
+    vscode: Optional[Dict[str, str]] = None
+    git: Dict[str, str] = field(default_factory=dict)
+    rc: Dict[Tuple[str, str], Optional[str]] = field(default_factory=dict)
+
+
+def _vscode_extensions(executor: CommandExecutor) -> Optional[Dict[str, str]]:
+    """Installed extensions by lower-cased id, or None without the ``code`` CLI."""
+    if shutil.which("code") is None:
+        return None
+    result = executor.run(["code", "--list-extensions", "--show-versions"], timeout=60)
+    if not result.ok:
+        return None
+    extensions = {}
+    for line in result.stdout.splitlines():
+        name, _, version = line.strip().partition("@")
+        if name:
+            extensions[name.lower()] = version
+    return extensions
+
+
+def _git_settings(executor: CommandExecutor) -> Dict[str, str]:
+    """Global git settings by lower-cased key (the last value wins)."""
+    result = executor.run(["git", "config", "--global", "--list"], timeout=30)
+    settings = {}
+    for line in result.stdout.splitlines() if result.ok else []:
+        key, sep, value = line.partition("=")
+        if sep:
+            settings[key.lower()] = value
+    return settings
+
+
+def gather_state(manifest: Manifest, inventory: Optional[BrewInventory] = None,
+                 executor: Optional[CommandExecutor] = None,
+                 editor: Optional[RcEditor] = None) -> ActualState:
+    """Read the actual state of everything a manifest mentions, concurrently.
+
+    Args:
+        manifest: Desired state
+        inventory: Homebrew inventory (defaults to the shared one)
+        executor: Executor running git and code (defaults to the shared one)
+        editor: rc file editor (defaults to the shared one)
+    """
+    executor = executor or get_executor()
+    editor = editor or get_rc_editor()
+    inventory = inventory or get_inventory()
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        brew = pool.submit(inventory.load) if manifest.of_kind("brew") or \
+            manifest.of_kind("cask") else None
+        vscode = pool.submit(_vscode_extensions, executor) if manifest.of_kind("vscode") else None
+        git = pool.submit(_git_settings, executor) if manifest.of_kind("git") else None
+        rc = {(r.path, r.name): editor.read_block(r.path, r.name)
+              for r in manifest.of_kind("rc") if r.path is not None}
+        if brew is not None:
+            brew.result()
+        return ActualState(inventory, vscode=vscode.result() if vscode else None,
+                           git=git.result() if git else {}, rc=rc)
+
+
+@dataclass
+class Change:
+    """A difference between desired and actual state.
+
+    ``action`` is ``install``/``set`` for something missing and
+    ``upgrade``/``update`` for something present but different.
+    """
+    resource: Resource
+    action: str
+    current: Optional[str] = None
+
+    @property
+    def symbol(self) -> str:
+        return "+" if self.action in ("install", "set") else "~"
+
+    def describe(self) -> str:
+        """One line such as ``~ brew.kubectl 1.27.1 -> 1.26``."""
+        resource = self.resource
+        if resource.kind == "rc":
+            return f"{self.symbol} {resource.address}"
+        if resource.kind == "git":
+            current = f"{self.current!r} -> " if self.current is not None else ""
+            return f"{self.symbol} {resource.address} = {current}{resource.value!r}"
+        desired = resource.value or "latest"
+        current = f"{self.current} -> " if self.current else ""
+        return f"{self.symbol} {resource.address} {current}{desired}"
+
+
+def _brew_change(resource: Resource, inventory: BrewInventory) -> Optional[Change]:
+    cask = resource.kind == "cask"
+    versions = inventory.versions(resource.name, cask=cask)
+    if not versions:
+        return Change(resource, "install")
+    if resource.value and not any(version_matches(v, resource.value) for v in versions):
+        return Change(resource, "upgrade", current=", ".join(versions))
+    return None
+
+
+def diff(manifest: Manifest, state: ActualState) -> List[Change]:
+    """Return the changes that bring the machine to the manifest."""
+    changes = []
+    for resource in manifest.resources:
+        change: Optional[Change] = None
+        if resource.kind in ("brew", "cask"):
+            change = _brew_change(resource, state.inventory)
+        elif resource.kind == "vscode":
+            installed = (state.vscode or {}).get(resource.name.lower())
+            if installed is None:
+                change = Change(resource, "install")
+            elif resource.value and installed != resource.value:
+                change = Change(resource, "upgrade", current=installed)
+        elif resource.kind == "git":
+            current = state.git.get(resource.name.lower())
+            if current != resource.value:
+                change = Change(resource, "set" if current is None else "update", current)
+        elif resource.kind == "rc" and resource.path is not None:
+            current = state.rc.get((resource.path, resource.name))
+            if current is None:
+                change = Change(resource, "set")
+            elif current.strip("\n") != (resource.value or "").strip("\n"):
+                change = Change(resource, "update")
+        if change is not None:
+            changes.append(change)
+    return changes
+
+
+def plan(manifest: Manifest, **kwargs: Any) -> List[Change]:
+    """Gather the actual state and diff it against a manifest.
+
+    Keyword arguments are passed to ``gather_state``.
+    """
+    return diff(manifest, gather_state(manifest, **kwargs))
+
+
+class _Applier:
+    """Runs the changes of one kind; each method returns per-change results."""
+
+    def __init__(self, executor: CommandExecutor, inventory: BrewInventory,
+                 pool: ResourcePool, editor: RcEditor):
+        self.executor = executor
+        self.inventory = inventory
+        self.pool = pool
+        self.editor = editor
+        self.results: Dict[str, bool] = {}
+
+    def brew(self, changes: List[Change]) -> bool:
+        installs = [c.resource for c in changes if c.action == "install"]
+        upgrades = [c.resource for c in changes if c.action == "upgrade"]
+        if installs:
+            plan = BrewPlan(self.pool, self.inventory)
+            plan.add("manifest", formulae=[r.name for r in installs if r.kind == "brew"],
+                     casks=[r.name for r in installs if r.kind == "cask"])
+            ran = plan.execute()
+            for resource in installs:
+                self.results[resource.address] = ran and plan.succeeded(resource.name)
+        for resource in upgrades:
+            cmd = ["brew", "upgrade"] + (["--cask"] if resource.kind == "cask" else [])
+            with self.pool.hold(("brew",)):
+                result = self.executor.run(cmd + [resource.name], resources=(),
+                                           echo=logger, pool=self.pool)
+            self.inventory.invalidate()
+            installed = self.inventory.versions(resource.name, cask=resource.kind == "cask")
+            ok = result.ok and any(version_matches(v, resource.value or "") for v in installed)
+            if result.ok and not ok:
+                # Homebrew only upgrades to its current version
+                logger.error(f"{resource.name}: Homebrew does not provide version {resource.value} "
+                             f"(installed: {', '.join(installed)})")
+            self.results[resource.address] = ok
+        return all(self.results[c.resource.address] for c in changes)
+
+    def vscode(self, changes: List[Change]) -> bool:
+        for change in changes:
+            resource = change.resource
+            spec = f"{resource.name}@{resource.value}" if resource.value else resource.name
+            result = self.executor.run(["code", "--install-extension", spec, "--force"],
+                                       resources=("network",), pool=self.pool, timeout=300)
+            self.results[resource.address] = result.ok
+        return all(self.results[c.resource.address] for c in changes)
+
+    def git(self, changes: List[Change]) -> bool:
+        for change in changes:
+            resource = change.resource
+            result = self.executor.run(["git", "config", "--global", resource.name,
+                                        resource.value or ""], timeout=30)
+            self.results[resource.address] = result.ok
+        return all(self.results[c.resource.address] for c in changes)
+
+    def rc(self, changes: List[Change]) -> bool:
+        with self.editor.batch() as written:
+            for change in changes:
+                resource = change.resource
+                self.results[resource.address] = resource.path is not None and \
+                    self.editor.set_block(resource.path, resource.name, resource.value,
+                                          priority=resource.priority)
+        if not written.ok:
+            for change in changes:
+                self.results[change.resource.address] = False
+        return all(self.results[c.resource.address] for c in changes)
+
+
+def _task(run: Callable[[List[Change]], bool], group: List[Change]) -> Callable[[], bool]:
+    """Bind a group of changes to the applier method handling their kind."""
+    def task() -> bool:
+        return run(group)
+    return task
+
+
+def apply(changes: List[Change], executor: Optional[CommandExecutor] = None,
+          inventory: Optional[BrewInventory] = None, pool: Optional[ResourcePool] = None,
+          editor: Optional[RcEditor] = None) -> Dict[str, bool]:
+    """Execute changes, each kind of resource concurrently with the others.
+
+    Args:
+        changes: Output of ``diff``/``plan``
+        executor: Executor running commands (defaults to the shared one)
+        inventory: Homebrew inventory to refresh (defaults to the shared one)
+        pool: Resource pool (defaults to the scheduler's)
+        editor: rc file editor (defaults to the shared one)
+
+    Returns:
+        Dict[str, bool]: Success of each change by resource address
+    """
+    scheduler = Scheduler(pool=pool)
+    applier = _Applier(executor or get_executor(), inventory or get_inventory(),
+                       scheduler.pool, editor or get_rc_editor())
+    groups: Dict[str, List[Change]] = {}
+    for change in changes:
+        kind = "brew" if change.resource.kind == "cask" else change.resource.kind
+        groups.setdefault(kind, []).append(change)
+    for kind, group in groups.items():
+        scheduler.add(kind, _task(getattr(applier, kind), group))
+    scheduler.run()
+    # A task that raised leaves its changes unrecorded
+    return {change.resource.address: applier.results.get(change.resource.address, False)
+            for change in changes}
@@ -1,8 +1,48 @@
+import contextvars
+import json
 import logging
+import os
+import platform
+import threading
 import time
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+)
 from datetime import datetime
+from pathlib import Path
+
+if TYPE_CHECKING:
+    from local_env_setup.core.executor import CommandResult
+
+class StepKey(NamedTuple):
+    """Low-cardinality identity of a span, used to aggregate across runs.
+    
+    ``component`` and ``action`` name the kind of work (``python``,
+    ``pyenv install``); ``target`` holds the variable part (the version,
+    path or package list) and is not used for grouping.
+    """
+    component: str
+    action: str
+    target: str = ""
+
+
+def command_key(argv: Sequence[str]) -> Tuple[str, str]:
+    """Split a command into an action and a target.
+    
+    The action is the executable and its subcommand (``brew install``,
+    ``git clone``); the arguments after that are the target.
+    """
+    if not argv:
+        return "", ""
+    action = os.path.basename(argv[0])
+    rest = list(argv[1:])
+    if rest and not rest[0].startswith("-") and "/" not in rest[0] and "=" not in rest[0]:
+        action = f"{action} {rest.pop(0)}"
+    target = " ".join(rest)
+    return action, target if len(target) <= 200 else target[:197] + "..."
 
 @dataclass
 class SetupStep:
@@ -12,46 +52,244 @@ class SetupStep:
     success: Optional[bool] = None
     error: Optional[str] = None
     duration: Optional[float] = None
+    component: str = ""
+    target: str = ""
+
+@dataclass
+class Span:
+    """A timed region of work, possibly nested in another span.
+    
+    Times are ``time.perf_counter()`` readings. ``track`` is the lane the
+    span is drawn on in a trace: spans on one track never overlap without
+    nesting, so concurrent work gets separate tracks.
+    """
+    id: int
+    name: str
+    category: str
+    start: float
+    track: int
+    thread: str
+    parent: Optional["Span"] = field(default=None, repr=False)
+    attrs: Dict[str, Any] = field(default_factory=dict)
+    end: Optional[float] = None
+    success: Optional[bool] = None
+    error: Optional[str] = None
+    
+    @property
+    def parent_id(self) -> Optional[int]:
+        return self.parent.id if self.parent is not None else None
+    
+    @property
+    def duration(self) -> Optional[float]:
+        return self.end - self.start if self.end is not None else None
+    
+    @property
+    def component(self) -> str:
+        """Name of the component this span belongs to, if any."""
+        span: Optional[Span] = self
+        while span is not None:
+            if span.category == "component":
+                return span.name
+            if "component" in span.attrs:
+                return str(span.attrs["component"])
+            span = span.parent
+        return ""
+    
+    @property
+    def key(self) -> StepKey:
+        """Grouping key: component, action (``attrs["action"]`` or the name)
+        and target."""
+        return StepKey(self.component, str(self.attrs.get("action", self.name)),
+                       str(self.attrs.get("target", "")))
+    
+    def fail(self, error: str) -> None:
+        """Mark the span as failed (it still ends when its block exits)."""
+        self.success = False
+        self.error = error
+
+@dataclass
+class CommandRecord:
+    """Timings of one external command."""
+    name: str
+    returncode: int
+    spawn_time: float
+    wall_time: float
+    cpu_time: float
+    wait_time: float
+    timed_out: bool = False
+    log_path: Optional[str] = None
 
 class SetupMonitor:
-    """Monitor setup progress and track errors."""
+    """Monitor setup progress and track errors.
+    
+    Work is recorded as nestable spans: ``span()`` is a context manager
+    (and, through ``contextlib``, a decorator) that parents itself under
+    the span active in the current thread or asyncio task. One monitor is
+    shared by every component of a run (see ``get_monitor``), and the
+    whole run can be exported as a Chrome trace (``chrome://tracing``,
+    Perfetto) or as JSON lines.
+    """
     
     def __init__(self):
         self.steps: List[SetupStep] = []
-        self.current_step: Optional[SetupStep] = None
+        self.spans: List[Span] = []
+        self.commands: List[CommandRecord] = []
+        self._commands_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._next_id = 1
+        self._tracks: Dict[int, List[Span]] = {}
+        # Per thread/task: the innermost open span and the legacy step stack
+        self._current: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+            f"span_{id(self)}", default=None)
+        self._open_steps: contextvars.ContextVar[Tuple[Span, ...]] = contextvars.ContextVar(
+            f"steps_{id(self)}", default=())
         self.logger = logging.getLogger("SetupMonitor")
+        self.run_id = uuid.uuid4().hex
+        self.host = platform.node()
         self.start_time = time.time()
+        self._origin = time.perf_counter()
+    
+    @property
+    def current_span(self) -> Optional[Span]:
+        """The innermost open span of the calling thread or task."""
+        return self._current.get()
+    
+    def _track_for(self, parent: Optional[Span]) -> int:
+        """Pick a track where the new span nests properly."""
+        if parent is not None:
+            stack = self._tracks.get(parent.track)
+            if stack and stack[-1] is parent:
+                return parent.track
+        for track, stack in sorted(self._tracks.items()):
+            if not stack:
+                return track
+        return len(self._tracks)
+    
+    def _open(self, name: str, category: str, attrs: Dict[str, Any]) -> Span:
+        parent = self._current.get()
+        with self._lock:
+            track = self._track_for(parent)
+            span = Span(self._next_id, name, category, time.perf_counter(), track,
+                        threading.current_thread().name, parent, dict(attrs))
+            self._next_id += 1
+            self._tracks.setdefault(track, []).append(span)
+        return span
+    
+    def _close(self, span: Span) -> None:
+        span.end = time.perf_counter()
+        if span.success is None:
+            span.success = True
+        with self._lock:
+            stack = self._tracks.get(span.track, [])
+            if span in stack:
+                stack.remove(span)
+            self.spans.append(span)
+            if span.category == "step":
+                self.steps.append(SetupStep(
+                    name=span.name,
+                    start_time=self.start_time + span.start - self._origin,
+                    end_time=self.start_time + span.end - self._origin,
+                    success=span.success,
+                    error=span.error,
+                    duration=span.duration,
+                    component=span.component,
+                    target=span.key.target,
+                ))
+        if span.category != "step":
+            return
+        label = f"{span.name} {span.key.target}".rstrip()
+        if span.success:
+            self.logger.info(f"Completed step: {label} (duration: {span.duration:.2f}s)")
+        else:
+            self.logger.error(f"Failed step: {label} - {span.error}")
+    
+    @contextmanager
+    def span(self, name: str, category: str = "step", target: Optional[str] = None,
+             **attrs: Any) -> Iterator[Span]:
+        """Record the enclosed block as a span.
         
-    def start_step(self, name: str) -> None:
-        """Start tracking a setup step."""
-        if self.current_step is not None:
-            self.end_step(False, "Previous step not completed")
+        The span fails if the block raises or calls ``Span.fail``.
+        
+        Args:
+            name: Span name; keep it constant per kind of work so runs can
+                be aggregated, and put the variable part in ``target``
+            category: Kind of work (``run``, ``component``, ``step``,
+                ``command``)
+            target: What the work applies to (path, package, version)
+            **attrs: Extra details included in exports
             
-        self.current_step = SetupStep(
-            name=name,
-            start_time=time.time()
-        )
-        self.logger.info(f"Starting step: {name}")
+        Yields:
+            Span: The open span
+        """
+        if target is not None:
+            attrs["target"] = target
+        span = self._open(name, category, attrs)
+        token = self._current.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if span.success is None:
+                span.fail(str(e) or type(e).__name__)
+            raise
+        finally:
+            self._current.reset(token)
+            self._close(span)
+    
+    def start_step(self, name: str, target: Optional[str] = None) -> None:
+        """Start tracking a setup step.
         
+        Steps nest: a step started while another is open becomes its child.
+        Prefer ``span()``, which cannot be left open.
+        """
+        span = self._open(name, "step", {} if target is None else {"target": target})
+        self._open_steps.set(self._open_steps.get() + (span,))
+        self._current.set(span)
+        self.logger.info(f"Starting step: {name}")
+    
     def end_step(self, success: bool, error: Optional[str] = None) -> None:
-        """End tracking a setup step."""
-        if self.current_step is None:
+        """End the innermost step started by ``start_step``."""
+        steps = self._open_steps.get()
+        if not steps:
             return
-            
-        end_time = time.time()
-        self.current_step.end_time = end_time
-        self.current_step.success = success
-        self.current_step.error = error
-        self.current_step.duration = end_time - self.current_step.start_time
-        
-        self.steps.append(self.current_step)
+        span = steps[-1]
+        self._open_steps.set(steps[:-1])
+        self._current.set(span.parent)
+        span.success = success
+        span.error = error
+        self._close(span)
+    
+    def record_command(self, name: str, result: "CommandResult", wait_time: float = 0.0,
+                       span: Optional[Span] = None) -> None:
+        """Record the timings of an external command.
         
-        if success:
-            self.logger.info(f"Completed step: {self.current_step.name} (duration: {self.current_step.duration:.2f}s)")
-        else:
-            self.logger.error(f"Failed step: {self.current_step.name} - {error}")
-            
-        self.current_step = None
+        Args:
+            name: Label of the command
+            result: Result reported by the executor
+            wait_time: Time spent waiting for shared resources
+            span: Span covering the command, which receives the timings
+        """
+        record = CommandRecord(
+            name=name,
+            returncode=result.returncode,
+            spawn_time=result.spawn_time,
+            wall_time=result.wall_time,
+            cpu_time=result.cpu_time,
+            wait_time=wait_time,
+            timed_out=result.timed_out,
+            log_path=str(result.log_path) if result.log_path else None,
+        )
+        with self._commands_lock:
+            self.commands.append(record)
+        if span is not None:
+            span.attrs.update(returncode=result.returncode, cpu_time=result.cpu_time,
+                              wait_time=wait_time, timed_out=result.timed_out,
+                              log_path=record.log_path)
+            if not result.ok:
+                span.fail("timed out" if result.timed_out else f"exit status {result.returncode}")
+        self.logger.debug(
+            f"Command {name}: exit {result.returncode}, wall {result.wall_time:.2f}s, "
+            f"cpu {result.cpu_time:.2f}s, spawn {result.spawn_time * 1000:.1f}ms"
+        )
         
     def get_summary(self) -> Dict:
         """Get a summary of the setup process."""
@@ -59,7 +297,12 @@ class SetupMonitor:
         successful_steps = sum(1 for step in self.steps if step.success)
         failed_steps = sum(1 for step in self.steps if not step.success)
         
+        with self._lock:
+            spans = list(self.spans)
         return {
+            "run_id": self.run_id,
+            "host": self.host,
+            "started_at": self.start_time,
             "timestamp": datetime.now().isoformat(),
             "total_duration": total_duration,
             "total_steps": len(self.steps),
@@ -68,17 +311,43 @@ class SetupMonitor:
             "steps": [
                 {
                     "name": step.name,
+                    "component": step.component,
+                    "target": step.target,
                     "duration": step.duration,
                     "success": step.success,
                     "error": step.error
                 }
                 for step in self.steps
+            ],
+            # Every finished span with its grouping key, for run history
+            "spans": [
+                {
+                    "category": span.category,
+                    "component": span.key.component,
+                    "action": span.key.action,
+                    "target": span.key.target,
+                    "duration": span.duration,
+                    "success": span.success,
+                }
+                for span in spans
+            ],
+            "commands": [
+                {
+                    "name": command.name,
+                    "returncode": command.returncode,
+                    "spawn_time": command.spawn_time,
+                    "wall_time": command.wall_time,
+                    "cpu_time": command.cpu_time,
+                    "wait_time": command.wait_time,
+                    "timed_out": command.timed_out,
+                    "log_path": command.log_path,
+                }
+                for command in self.commands
             ]
         }
         
     def save_summary(self, filepath: str) -> None:
         """Save setup summary to a file."""
-        import json
         summary = self.get_summary()
         with open(filepath, "w") as f:
             json.dump(summary, f, indent=2)
@@ -96,4 +365,135 @@ class SetupMonitor:
             print("\nFailed Steps:")
             for step in summary['steps']:
                 if not step['success']:
-                    print(f"- {step['name']}: {step['error']}") 
\ No newline at end of file
+                    print(f"- {step['name']}: {step['error']}") 
+    
+    def _finished_spans(self) -> List[Span]:
+        """All spans, with still-open ones cut off at the current time."""
+        now = time.perf_counter()
+        with self._lock:
+            spans = list(self.spans)
+            spans += [Span(s.id, s.name, s.category, s.start, s.track, s.thread, s.parent,
+                           dict(s.attrs, unfinished=True), now, s.success, s.error)
+                      for stack in self._tracks.values() for s in stack]
+        return sorted(spans, key=lambda s: s.start)
+    
+    def chrome_trace(self) -> Dict[str, Any]:
+        """Return the spans in Chrome trace-event format.
+        
+        Each span becomes a complete ("X") event on its track; the result
+        loads in ``chrome://tracing`` and https://ui.perfetto.dev as a
+        flame chart.
+        """
+        pid = os.getpid()
+        spans = self._finished_spans()
+        events: List[Dict[str, Any]] = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "local_env_setup"}}]
+        for track in sorted({s.track for s in spans}):
+            events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": track,
+                           "args": {"name": f"lane {track}"}})
+        for s in spans:
+            args = dict(s.attrs, thread=s.thread, success=s.success)
+            if s.error:
+                args["error"] = s.error
+            events.append({
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": round((s.start - self._origin) * 1e6, 1),
+                "dur": round((s.duration or 0.0) * 1e6, 1),
+                "pid": pid,
+                "tid": s.track,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms",
+                "otherData": {"start": datetime.fromtimestamp(self.start_time).isoformat()}}
+    
+    def save_chrome_trace(self, filepath: Union[str, Path]) -> None:
+        """Write the spans as a Chrome trace-event JSON file."""
+        with open(filepath, "w") as f:
+            json.dump(self.chrome_trace(), f)
+    
+    def save_jsonl(self, filepath: Union[str, Path]) -> None:
+        """Write one JSON object per span, in start order.
+        
+        Times are seconds relative to the monitor's creation.
+        """
+        with open(filepath, "w") as f:
+            for s in self._finished_spans():
+                f.write(json.dumps({
+                    "id": s.id,
+                    "parent": s.parent_id,
+                    "name": s.name,
+                    "cat": s.category,
+                    "start": round(s.start - self._origin, 6),
+                    "duration": round(s.duration or 0.0, 6),
+                    "track": s.track,
+                    "thread": s.thread,
+                    "success": s.success,
+                    "error": s.error,
+                    "attrs": s.attrs,
+                }, default=str) + "\n")
+
+
+def merge_summaries(summaries: Dict[str, Dict]) -> Dict:
+    """Combine the summaries of several runs into one.
+
+    The result has the shape of ``SetupMonitor.get_summary``, so it can be
+    saved or ingested into the run history like a single run. Every step,
+    span and command is labelled with the run it came from (``run``), and
+    ``runs`` lists each run's id, duration and outcome.
+
+    Args:
+        summaries: Summaries by label (e.g. fleet target name)
+
+    Returns:
+        Dict: The combined summary
+    """
+    starts = [s.get("started_at", 0.0) for s in summaries.values()]
+    ends = [s.get("started_at", 0.0) + s.get("total_duration", 0.0) for s in summaries.values()]
+    merged: Dict[str, Any] = {
+        "run_id": uuid.uuid4().hex,
+        "host": platform.node(),
+        "started_at": min(starts, default=time.time()),
+        "timestamp": datetime.now().isoformat(),
+        "total_duration": max(ends, default=0.0) - min(starts, default=0.0),
+        "runs": [],
+    }
+    for key in ("total_steps", "successful_steps", "failed_steps"):
+        merged[key] = sum(s.get(key, 0) for s in summaries.values())
+    for key in ("steps", "spans", "commands"):
+        merged[key] = [dict(item, run=label) for label, s in summaries.items()
+                       for item in s.get(key, [])]
+    for label, s in summaries.items():
+        merged["runs"].append({
+            "run": label,
+            "run_id": s.get("run_id"),
+            "host": s.get("host"),
+            "total_duration": s.get("total_duration"),
+            "success": s.get("success", s.get("failed_steps", 0) == 0),
+        })
+    merged["success"] = all(run["success"] for run in merged["runs"])
+    return merged
+
+
+_monitor: Optional[SetupMonitor] = None
+_monitor_lock = threading.Lock()
+
+
+def get_monitor() -> SetupMonitor:
+    """Return the process-wide monitor shared by all components of a run."""
+    global _monitor
+    with _monitor_lock:
+        if _monitor is None:
+            _monitor = SetupMonitor()
+        return _monitor
+
+
+def set_monitor(monitor: Optional[SetupMonitor]) -> None:
+    """Replace the process-wide monitor (e.g. to start a fresh run).
+
+    Passing None creates a new monitor on next use.
+    """
+    global _monitor
+    with _monitor_lock:
+        _monitor = monitor
@@ -0,0 +1,294 @@
+"""Shared Terraform provider cache, filled ahead of ``terraform init``.
+
+Terraform downloads every provider again for each working directory unless
+``plugin_cache_dir`` is set in ``~/.terraformrc``. ``ProviderMirror`` fills
+that directory before any ``init`` runs: the providers come from the
+configuration (``TERRAFORM_PROVIDERS``) and from the ``.terraform.lock.hcl``
+files of the repositories under ``DEV_DIR``. They are fetched concurrently
+through the download cache, so they honour the mirror and the ``network``
+limit. Each package is checked against the registry's sha256 and the
+lock file's ``zh:`` hashes before it is unpacked.
+
+The directory uses Terraform's unpacked layout
+(``<host>/<namespace>/<type>/<version>/<os>_<arch>/``), which also makes it
+a valid ``filesystem_mirror`` for ``provider_installation`` or
+``terraform init -plugin-dir``.
+"""
+
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from local_env_setup.config import env
+from local_env_setup.core.download import DownloadCache, DownloadError, get_download_cache
+from local_env_setup.core.state import shared_cache_dir
+
+DEFAULT_REGISTRY = "registry.terraform.io"
+
+LOCK_FILE = ".terraform.lock.hcl"
+
+# Directories never holding Terraform configurations worth scanning
+SKIP_DIRS = {".git", ".terraform", "node_modules", ".venv", "venv", "__pycache__"}
+
+# provider "registry.terraform.io/hashicorp/aws" { version = "5.31.0" hashes = [...] }
+LOCK_BLOCK = re.compile(r'provider\s+"([^"]+)"\s*\{(.*?)\n\}', re.S)
+LOCK_VERSION = re.compile(r'^\s*version\s*=\s*"([^"]+)"', re.M)
+LOCK_HASH = re.compile(r'"zh:([0-9a-f]{64})"')
+
+MACHINES = {"x86_64": "amd64", "amd64": "amd64", "aarch64": "arm64", "arm64": "arm64"}
+
+
+class ProviderError(Exception):
+    """Raised when a provider cannot be fetched or verified."""
+
+
+@dataclass(frozen=True)
+class Provider:
+    """A provider version to cache.
+
+    Attributes:
+        source: Fully qualified source, ``<host>/<namespace>/<type>``
+        version: Exact version
+        hashes: sha256 digests of the official packages (``zh:`` lock
+            file hashes); empty when unknown
+    """
+    source: str
+    version: str
+    hashes: Tuple[str, ...] = ()
+
+    @property
+    def host(self) -> str:
+        """Registry host, e.g. ``registry.terraform.io``."""
+        return self.source.split("/")[0]
+
+    @property
+    def namespace(self) -> str:
+        """Registry namespace, e.g. ``hashicorp``."""
+        return self.source.split("/")[1]
+
+    @property
+    def type(self) -> str:
+        """Provider type, e.g. ``aws``."""
+        return self.source.split("/")[2]
+
+    def __str__(self) -> str:
+        return f"{self.source} {self.version}"
+
+
+def parse_provider(spec: str) -> Provider:
+    """Parse ``[host/]namespace/type@version``.
+
+    Raises:
+        ValueError: If the spec is malformed
+    """
+    source, sep, version = spec.strip().partition("@")
+    parts = source.split("/")
+    if not sep or not version or len(parts) not in (2, 3) or not all(parts):
+        raise ValueError(f"Invalid provider {spec!r}; expected namespace/type@version")
+    if len(parts) == 2:
+        parts.insert(0, DEFAULT_REGISTRY)
+    return Provider("/".join(parts).lower(), version)
+
+
+def parse_lock_file(text: str) -> List[Provider]:
+    """Return the providers pinned by a ``.terraform.lock.hcl``."""
+    providers = []
+    for source, body in LOCK_BLOCK.findall(text):
+        version = LOCK_VERSION.search(body)
+        if version and source.count("/") == 2:
+            providers.append(Provider(source.lower(), version.group(1),
+                                      tuple(LOCK_HASH.findall(body))))
+    return providers
+
+
+def find_lock_files(root: Union[str, Path], index: Optional[Path] = None) -> List[Path]:
+    """Return the lock files of the Terraform configurations under ``root``.
+
+    Args:
+        root: Directory to search
+        index: File remembering the last walk. While no directory it
+            visited was modified (adding, removing or renaming an entry
+            changes the directory's mtime), its result is reused without
+            listing any directory.
+    """
+    root = str(root)
+    if index is not None:
+        try:
+            cached = json.loads(index.read_text())
+            if cached["root"] == root and all(
+                    os.stat(path).st_mtime_ns == mtime for path, mtime in cached["dirs"].items()):
+                return [Path(path) for path in cached["lock_files"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    started = time.time_ns()
+    found = []
+    dirs = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        try:
+            dirs[dirpath] = os.stat(dirpath).st_mtime_ns
+        except OSError:
+            continue
+        dirnames[:] = [d for d in dirnames if d not in SKIP_DIRS]
+        if LOCK_FILE in filenames:
+            found.append(Path(dirpath) / LOCK_FILE)
+    found.sort()
+
+    # A directory changed within the filesystem's timestamp granularity (or
+    # during the walk) could change again without its mtime moving
+    if index is not None and dirs and max(dirs.values()) < started - 1_000_000_000:
+        try:
+            index.parent.mkdir(parents=True, exist_ok=True)
+            tmp = index.with_name(f"{index.name}.{os.getpid()}")
+            tmp.write_text(json.dumps({"root": root, "dirs": dirs,
+                                       "lock_files": [str(path) for path in found]}))
+            os.replace(tmp, index)
+        except OSError:
+            # Walking again next time is only slower
+            pass
+    return found
+
+
+def merge_providers(providers: Iterable[Provider]) -> List[Provider]:
+    """Deduplicate providers, keeping every known hash of each version."""
+    merged: Dict[Tuple[str, str], Provider] = {}
+    for provider in providers:
+        key = (provider.source, provider.version)
+        if key in merged:
+            hashes = tuple(dict.fromkeys(merged[key].hashes + provider.hashes))
+            provider = Provider(provider.source, provider.version, hashes)
+        merged[key] = provider
+    return sorted(merged.values(), key=lambda p: (p.source, p.version))
+
+
+def terraform_platform() -> str:
+    """Return this machine's Terraform platform, e.g. ``darwin_arm64``."""
+    machine = platform.machine().lower()
+    return f"{platform.system().lower()}_{MACHINES.get(machine, machine)}"
+
+
+def plugin_cache_dir() -> Path:
+    """Return the shared ``plugin_cache_dir``."""
+    if env.TERRAFORM_PLUGIN_CACHE_DIR:
+        return Path(env.TERRAFORM_PLUGIN_CACHE_DIR)
+    return shared_cache_dir() / "terraform" / "plugin-cache"
+
+
+def _unzip(archive: Path, dest: Path) -> None:
+    """Extract a provider package, keeping executable bits."""
+    with zipfile.ZipFile(archive) as package:
+        for member in package.infolist():
+            target = (dest / member.filename).resolve()
+            if not str(target).startswith(str(dest.resolve()) + os.sep):
+                raise ProviderError(f"{archive.name}: {member.filename} escapes the package")
+            package.extract(member, dest)
+            mode = member.external_attr >> 16
+            if mode and not member.is_dir():
+                os.chmod(target, mode & 0o777)
+
+
+class ProviderMirror:
+    """Terraform providers unpacked into a shared directory."""
+
+    def __init__(self, root: Optional[Union[str, Path]] = None,
+                 downloads: Optional[DownloadCache] = None,
+                 target: Optional[str] = None, max_workers: int = 8):
+        """Initialize the mirror.
+
+        Args:
+            root: Directory in Terraform's unpacked layout (defaults to
+                ``plugin_cache_dir()``)
+            downloads: Download cache used for registry metadata and packages
+            target: Platform to cache, e.g. ``darwin_arm64`` (defaults to
+                this machine's)
+            max_workers: Providers fetched at once; transfers are further
+                limited by the download cache's ``network`` resource
+        """
+        self.root = Path(root) if root else plugin_cache_dir()
+        self.downloads = downloads or get_download_cache()
+        self.target = target or terraform_platform()
+        self.max_workers = max_workers
+        self.logger = logging.getLogger("ProviderMirror")
+
+    def path(self, provider: Provider) -> Path:
+        """Return where a provider is unpacked."""
+        return (self.root / provider.host / provider.namespace / provider.type
+                / provider.version / self.target)
+
+    def has(self, provider: Provider) -> bool:
+        """Return whether a provider is already in the mirror."""
+        path = self.path(provider)
+        return path.is_dir() and any(path.iterdir())
+
+    def fetch(self, provider: Provider) -> Path:
+        """Download, verify and unpack one provider.
+
+        Returns:
+            Path: The provider's directory in the mirror
+
+        Raises:
+            ProviderError: If the registry, the download or a checksum fails
+        """
+        dest = self.path(provider)
+        if self.has(provider):
+            return dest
+        os_name, arch = self.target.split("_", 1)
+        url = (f"https://{provider.host}/v1/providers/{provider.namespace}/{provider.type}/"
+               f"{provider.version}/download/{os_name}/{arch}")
+        try:
+            # Registry metadata of a released version never changes
+            meta = json.loads(self.downloads.fetch(url).read_text())
+            archive = self.downloads.fetch(meta["download_url"], sha256=meta["shasum"])
+        except (DownloadError, KeyError, ValueError) as e:
+            raise ProviderError(f"{provider}: {e}") from e
+        if provider.hashes and meta["shasum"] not in provider.hashes:
+            raise ProviderError(f"{provider}: package checksum does not match the lock file")
+
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=dest.parent, prefix=f".{self.target}."))
+        try:
+            _unzip(archive, staging)
+            try:
+                os.rename(staging, dest)
+            except OSError:
+                # Unpacked meanwhile by another process
+                if not self.has(provider):
+                    raise
+        except (OSError, zipfile.BadZipFile) as e:
+            raise ProviderError(f"{provider}: {e}") from e
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return dest
+
+    def warm(self, providers: Iterable[Provider]) -> Dict[Provider, Optional[str]]:
+        """Fetch every missing provider concurrently.
+
+        Args:
+            providers: Providers to cache
+
+        Returns:
+            Dict[Provider, Optional[str]]: Error message per provider, None
+            for providers that are now in the mirror
+        """
+        providers = list(providers)
+        missing = [p for p in providers if not self.has(p)]
+        outcome: Dict[Provider, Optional[str]] = {p: None for p in providers}
+        if not missing:
+            return outcome
+        self.logger.info(f"Fetching {len(missing)} Terraform providers into {self.root}")
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {p: executor.submit(self.fetch, p) for p in missing}
+            for provider, future in futures.items():
+                error = future.exception()
+                outcome[provider] = str(error) if error is not None else None
+        return outcome
@@ -0,0 +1,300 @@
+"""Managed blocks in shell rc files.
+
+Components never append to rc files directly. Each one declares a named
+block, delimited by marker comments, and the editor merges all blocks for a
+file in memory, replaces earlier versions of the same block in place and
+writes the file once (temp file, fsync, atomic rename) only if its content
+changed. Re-running the setup therefore never grows the file.
+"""
+
+import logging
+import os
+import re
+import tempfile
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from local_env_setup.core.backup import get_backup_store
+from local_env_setup.core.journal import get_journal
+
+BEGIN_MARKER = "# >>> local_env_setup: {name} >>>"
+END_MARKER = "# <<< local_env_setup: {name} <<<"
+
+BLOCK_RE = re.compile(
+    r"^# >>> local_env_setup: (?P<name>[\w.-]+) >>>\n(?P<body>.*?)"
+    r"^# <<< local_env_setup: (?P=name) <<<\n?",
+    re.MULTILINE | re.DOTALL,
+)
+
+DEFAULT_PRIORITY = 50
+
+
+@dataclass
+class Block:
+    """Desired content of a managed block (None removes the block)."""
+    content: Optional[str]
+    priority: int = DEFAULT_PRIORITY
+
+
+@dataclass
+class BatchResult:
+    """Outcome of an ``RcEditor.batch``, set when the outermost batch ends.
+
+    Attributes:
+        ok: False if a deferred write failed
+    """
+    ok: bool = True
+
+
+@dataclass
+class _PendingFile:
+    blocks: Dict[str, Block] = field(default_factory=dict)
+    legacy: List[str] = field(default_factory=list)
+
+
+def format_block(name: str, content: str) -> str:
+    """Render a block with its markers."""
+    body = content.strip("\n")
+    return f"{BEGIN_MARKER.format(name=name)}\n{body}\n{END_MARKER.format(name=name)}\n"
+
+
+def parse_blocks(text: str) -> Dict[str, str]:
+    """Return the bodies of all managed blocks in a file's text."""
+    return {m.group("name"): m.group("body").rstrip("\n") for m in BLOCK_RE.finditer(text)}
+
+
+def _split(text: str) -> List[Tuple[Optional[str], str]]:
+    """Split text into (block name or None, segment) pieces."""
+    pieces: List[Tuple[Optional[str], str]] = []
+    pos = 0
+    for match in BLOCK_RE.finditer(text):
+        pieces.append((None, text[pos:match.start()]))
+        pieces.append((match.group("name"), match.group(0)))
+        pos = match.end()
+    pieces.append((None, text[pos:]))
+    return pieces
+
+
+def _strip_legacy(segment: str, legacy: Sequence[str]) -> str:
+    stripped = segment
+    for snippet in legacy:
+        stripped = stripped.replace(snippet, "\n")
+    if stripped != segment:
+        stripped = re.sub(r"\n{3,}", "\n\n", stripped)
+    return stripped
+
+
+def render(text: str, blocks: Dict[str, Block], legacy: Sequence[str] = ()) -> str:
+    """Apply block updates to a file's text.
+
+    Existing blocks are replaced in place (or removed). New blocks are
+    inserted before the first existing block with a higher priority, or
+    appended. Legacy snippets (unmarked text written by older versions) are
+    removed from outside the managed blocks.
+
+    Args:
+        text: Current file content
+        blocks: Desired blocks by name
+        legacy: Exact snippets to strip from unmanaged text
+    """
+    pieces = [(name, _strip_legacy(segment, legacy) if name is None else segment)
+              for name, segment in _split(text)]
+
+    existing = {name for name, _ in pieces if name is not None}
+    removed = False
+    result: List[Tuple[Optional[str], str]] = []
+    for name, segment in pieces:
+        if name is not None and name in blocks:
+            content = blocks[name].content
+            segment = format_block(name, content) if content is not None else ""
+            removed = removed or content is None
+        result.append((name, segment))
+
+    new = sorted(((b.priority, name) for name, b in blocks.items()
+                  if name not in existing and b.content is not None))
+    for priority, name in new:
+        block = format_block(name, blocks[name].content or "")
+        for i, (other, _) in enumerate(result):
+            if other is None:
+                continue
+            other_priority = blocks[other].priority if other in blocks else DEFAULT_PRIORITY
+            if other_priority > priority:
+                result.insert(i, (name, block + "\n"))
+                break
+        else:
+            # Separate the block from preceding content by one blank line
+            tail = "".join(segment for _, segment in result)
+            if not tail or tail.endswith("\n\n"):
+                separator = ""
+            elif tail.endswith("\n"):
+                separator = "\n"
+            else:
+                separator = "\n\n"
+            result.append((name, separator + block))
+    rendered = "".join(segment for _, segment in result)
+    # Do not leave a growing gap where a block was removed
+    return re.sub(r"\n{3,}", "\n\n", rendered) if removed else rendered
+
+
+def atomic_write(path: Union[str, Path], text: str, backup: bool = True) -> None:
+    """Replace a file's content atomically.
+
+    The content is written to a temporary file in the same directory,
+    fsynced and renamed over the target. Symlinked rc files (dotfile
+    managers) are written through to their target. The previous version is
+    kept in the backup store (see ``core.backup``).
+
+    Args:
+        path: File to write
+        text: New content
+        backup: Snapshot the previous content first
+    """
+    target = Path(os.path.realpath(path))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    mode = target.stat().st_mode & 0o7777 if target.exists() else 0o644
+    if backup:
+        # The rename below detaches the old inode, so it can be hard-linked
+        get_backup_store().snapshot(target, replacing=True)
+    fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, mode)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    dir_fd = os.open(target.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+class RcEditor:
+    """Collect managed block edits and write each file at most once.
+
+    Outside of ``batch()`` every edit is written immediately. Inside it,
+    edits are merged in memory and written when the outermost batch ends.
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("RcEditor")
+        self._pending: Dict[Path, _PendingFile] = {}
+        self._depth = 0
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(path: Union[str, Path]) -> Path:
+        return Path(os.path.expanduser(str(path)))
+
+    @staticmethod
+    def _read(path: Path) -> str:
+        try:
+            return path.read_text()
+        except FileNotFoundError:
+            return ""
+
+    def read_block(self, path: Union[str, Path], name: str) -> Optional[str]:
+        """Return a block's content, including edits not yet written."""
+        key = self._key(path)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and name in pending.blocks:
+                return pending.blocks[name].content
+        return parse_blocks(self._read(key)).get(name)
+
+    def unmanaged_text(self, path: Union[str, Path], legacy: Sequence[str] = ()) -> str:
+        """Return a file's text outside managed blocks and legacy snippets.
+
+        Used to detect configuration the user maintains by hand.
+        """
+        return "".join(_strip_legacy(segment, legacy)
+                       for name, segment in _split(self._read(self._key(path)))
+                       if name is None)
+
+    def set_block(self, path: Union[str, Path], name: str, content: Optional[str],
+                  legacy: Sequence[str] = (), priority: int = DEFAULT_PRIORITY) -> bool:
+        """Declare the content of a managed block.
+
+        Args:
+            path: rc file
+            name: Block name (letters, digits, ``.``, ``_`` and ``-``)
+            content: Block body, or None to remove the block
+            legacy: Unmarked snippets older versions appended to the file;
+                they are removed when the file is written
+            priority: Blocks with lower priority are placed first
+
+        Returns:
+            bool: False if an immediate write failed
+        """
+        key = self._key(path)
+        with self._lock:
+            pending = self._pending.setdefault(key, _PendingFile())
+            pending.blocks[name] = Block(content, priority)
+            pending.legacy.extend(s for s in legacy if s not in pending.legacy)
+            if self._depth:
+                return True
+        return self.flush()
+
+    @contextmanager
+    def batch(self) -> Iterator[BatchResult]:
+        """Defer writes until the outermost batch ends.
+
+        Yields:
+            BatchResult: Whether the deferred writes succeeded, once the
+            outermost batch has ended (always ok for nested batches)
+        """
+        result = BatchResult()
+        with self._lock:
+            self._depth += 1
+        try:
+            yield result
+        finally:
+            with self._lock:
+                self._depth -= 1
+                outermost = self._depth == 0
+            if outermost:
+                result.ok = self.flush()
+
+    def flush(self) -> bool:
+        """Write all files with pending edits whose content changed.
+
+        Returns:
+            bool: True if every file was written (or unchanged)
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        ok = True
+        for path, edits in pending.items():
+            try:
+                current = self._read(path)
+                updated = render(current, edits.blocks, edits.legacy)
+                if updated == current:
+                    continue
+                with get_journal().mutation("write", path):
+                    atomic_write(path, updated)
+                self.logger.info(f"Updated {path} ({', '.join(sorted(edits.blocks))})")
+            except OSError as e:
+                self.logger.error(f"Failed to write {path}: {e}")
+                ok = False
+        return ok
+
+
+_editor: Optional[RcEditor] = None
+_editor_lock = threading.Lock()
+
+
+def get_rc_editor() -> RcEditor:
+    """Return the process-wide rc file editor."""
+    global _editor
+    with _editor_lock:
+        if _editor is None:
+            _editor = RcEditor()
+        return _editor
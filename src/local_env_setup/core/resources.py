@@ -0,0 +1,133 @@
+"""Shared resource limits for concurrently running setup components."""
+
+import asyncio
+import fcntl
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import IO, AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from local_env_setup.core.state import shared_cache_dir
+
+# Default number of concurrent holders per resource. Anything not listed
+# here is unlimited.
+DEFAULT_RESOURCE_LIMITS: Dict[str, int] = {
+    "brew": 1,      # Homebrew takes a global lock; two installs would collide
+    "network": 4,   # downloads and git clones
+    "cpu": 1,       # compiler-heavy builds such as `pyenv install`
+}
+
+# Resources that are also locked across processes sharing the cache dir
+# (e.g. fleet workers using the host's Homebrew)
+HOST_RESOURCES = ("brew",)
+
+
+def _open_host_lock(name: str) -> Optional[IO[str]]:
+    """Open the lock file of a host-wide resource, or None if it cannot be."""
+    path = shared_cache_dir() / "locks" / f"{name}.lock"
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return open(path, "a")
+    except OSError:
+        # Only this process is serialized then
+        return None
+
+
+class ResourcePool:
+    """Counting semaphores keyed by resource name.
+
+    Resources are always acquired in sorted order so that two callers
+    asking for overlapping sets can never deadlock each other. A limited
+    resource listed in ``HOST_RESOURCES`` is additionally held with a file
+    lock in the shared cache dir, once its semaphore is acquired.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, int]] = None):
+        """Initialize the pool.
+
+        Args:
+            limits: Maximum concurrent holders per resource name
+        """
+        self.limits = dict(DEFAULT_RESOURCE_LIMITS if limits is None else limits)
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, name: str) -> Optional[threading.BoundedSemaphore]:
+        limit = self.limits.get(name)
+        if limit is None:
+            return None
+        with self._lock:
+            if name not in self._semaphores:
+                self._semaphores[name] = threading.BoundedSemaphore(limit)
+            return self._semaphores[name]
+
+    @contextmanager
+    def hold(self, resources: Iterable[str]) -> Iterator[None]:
+        """Hold all given resources for the duration of the block.
+
+        Args:
+            resources: Resource names to acquire
+        """
+        acquired = []
+        locks: List[IO[str]] = []
+        try:
+            for name in sorted(set(resources)):
+                semaphore = self._semaphore(name)
+                if semaphore is None:
+                    continue
+                semaphore.acquire()
+                acquired.append(semaphore)
+                lock = _open_host_lock(name) if name in HOST_RESOURCES else None
+                if lock is not None:
+                    locks.append(lock)
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.close()
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+    @asynccontextmanager
+    async def ahold(self, resources: Iterable[str]) -> AsyncIterator[None]:
+        """Hold resources from a coroutine without blocking the event loop.
+
+        Limits are shared with ``hold``, so coroutines and worker threads
+        count against the same semaphores. Waiting polls with a short
+        backoff instead of parking a thread per waiter.
+
+        Args:
+            resources: Resource names to acquire
+        """
+        acquired = []
+        locks: List[IO[str]] = []
+        try:
+            for name in sorted(set(resources)):
+                semaphore = self._semaphore(name)
+                if semaphore is None:
+                    continue
+                delay = 0.001
+                while not semaphore.acquire(blocking=False):
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, 0.05)
+                acquired.append(semaphore)
+                lock = _open_host_lock(name) if name in HOST_RESOURCES else None
+                if lock is not None:
+                    locks.append(lock)
+                    delay = 0.001
+                    while True:
+                        try:
+                            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                            break
+                        except BlockingIOError:
+                            await asyncio.sleep(delay)
+                            delay = min(delay * 2, 0.05)
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.close()
+            for semaphore in reversed(acquired):
+                semaphore.release()
+
+
+# Process-wide pool used unless a scheduler injects its own.
+default_pool = ResourcePool()
@@ -0,0 +1,412 @@
+"""Dependency-graph scheduler for running setup components concurrently.
+
+The scheduler runs on an asyncio event loop. Coroutine tasks (such as
+components that override ``BaseSetup.arun``) run on the loop itself;
+blocking tasks run on a bounded worker pool.
+
+Given expected task durations (e.g. from ``core.history``), ready tasks are
+started longest remaining path first, progress reports carry an ETA and
+the critical path of a run can be computed from expected or actual
+durations.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.monitoring import SetupMonitor, get_monitor
+from local_env_setup.core.resources import ResourcePool, default_pool
+
+
+@dataclass
+class Task:
+    """A unit of work in the dependency graph."""
+    name: str
+    func: Callable[[], Any]
+    depends_on: Sequence[str] = ()
+    resources: Sequence[str] = ()
+
+
+@dataclass
+class TaskResult:
+    """Outcome of a scheduled task."""
+    name: str
+    success: bool
+    skipped: bool = False
+    error: Optional[str] = None
+    duration: float = 0.0
+    blocked_by: List[str] = field(default_factory=list)
+    wait_time: float = 0.0
+
+
+@dataclass
+class RunReport:
+    """Where the wall time of a run went."""
+    wall_time: float
+    critical_path: List[str]
+    critical_time: float
+    lock_wait: Dict[str, float]
+
+    @property
+    def critical_wait(self) -> float:
+        """Time the critical path spent waiting for shared resources."""
+        return sum(self.lock_wait.get(name, 0.0) for name in self.critical_path)
+
+
+@dataclass
+class Progress:
+    """Snapshot of a run, passed to the progress callback."""
+    done: int
+    total: int
+    running: List[str]
+    elapsed: float
+    eta: Optional[float] = None
+
+
+class Scheduler:
+    """Run tasks as a DAG.
+
+    A task starts as soon as all of its dependencies have succeeded. Tasks
+    whose dependencies failed are skipped. Dependencies on names that were
+    never added are treated as already satisfied, which lets callers run any
+    subset of components. With ``fail_fast`` the first failure cancels
+    every running and pending task.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None,
+                 pool: Optional[ResourcePool] = None, fail_fast: bool = False,
+                 monitor: Optional[SetupMonitor] = None,
+                 estimates: Optional[Dict[str, float]] = None,
+                 on_progress: Optional[Callable[[Progress], None]] = None,
+                 progress_interval: float = 15.0,
+                 on_result: Optional[Callable[[TaskResult], None]] = None):
+        """Initialize the scheduler.
+
+        Args:
+            max_workers: Worker threads for blocking tasks (defaults to one
+                per CPU, at least 4)
+            pool: Resource pool shared by all tasks
+            fail_fast: Cancel sibling tasks as soon as one fails
+            monitor: Monitor recording a span per task (defaults to the
+                shared one)
+            estimates: Expected seconds per task name; tasks without one
+                are assumed to take the median estimate
+            on_progress: Called whenever a task finishes and every
+                ``progress_interval`` seconds while tasks run
+            progress_interval: Seconds between periodic progress reports
+            on_result: Called with each task's result as soon as the task
+                finishes
+        """
+        self.max_workers = max_workers or max(4, os.cpu_count() or 1)
+        self.pool = pool or default_pool
+        self.fail_fast = fail_fast
+        self.monitor = monitor or get_monitor()
+        self.estimates = dict(estimates or {})
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self.on_result = on_result
+        self._started: Dict[str, float] = {}
+        self._wall_time = 0.0
+        self.tasks: Dict[str, Task] = {}
+        self.logger = logging.getLogger("Scheduler")
+
+    def add(self, name: str, func: Callable[[], Any],
+            depends_on: Sequence[str] = (), resources: Sequence[str] = ()) -> None:
+        """Register a task.
+
+        Args:
+            name: Unique task name
+            func: Callable or coroutine function returning a falsy value
+                on failure
+            depends_on: Names of tasks that must succeed first
+            resources: Shared resources held while the task runs
+
+        Raises:
+            ValueError: If a task with the same name was already added
+        """
+        if name in self.tasks:
+            raise ValueError(f"Duplicate task: {name}")
+        self.tasks[name] = Task(name, func, tuple(depends_on), tuple(resources))
+
+    def add_component(self, component: BaseSetup, depends_on: Sequence[str] = ()) -> None:
+        """Register a setup component using its declared graph metadata.
+
+        Args:
+            component: Component to run
+            depends_on: Extra dependencies on top of ``component.depends_on``
+        """
+        component.resource_pool = self.pool
+        # Components without a native coroutine run on the worker pool
+        native = type(component).arun is not BaseSetup.arun
+        self.add(
+            component.name,
+            component.arun if native else component.run,
+            depends_on=tuple(component.depends_on) + tuple(depends_on),
+            resources=component.resources,
+        )
+
+    def _dependencies(self, task: Task) -> List[str]:
+        return [dep for dep in task.depends_on if dep in self.tasks]
+
+    def _dependents(self) -> Dict[str, List[str]]:
+        dependents: Dict[str, List[str]] = {name: [] for name in self.tasks}
+        for task in self.tasks.values():
+            for dep in self._dependencies(task):
+                dependents[dep].append(task.name)
+        return dependents
+
+    def estimate(self, name: str) -> float:
+        """Expected duration of a task in seconds."""
+        if name in self.estimates:
+            return self.estimates[name]
+        known = sorted(self.estimates.values())
+        return known[len(known) // 2] if known else 1.0
+
+    def ranks(self) -> Dict[str, float]:
+        """Expected time from each task's start to the end of the run.
+
+        A task's rank is its own estimate plus the largest rank among the
+        tasks depending on it; starting high-rank tasks first shortens the
+        run when workers or resources are contended.
+        """
+        dependents = self._dependents()
+        ranks: Dict[str, float] = {}
+
+        def rank(name: str) -> float:
+            if name not in ranks:
+                ranks[name] = self.estimate(name) + max(
+                    (rank(d) for d in dependents[name]), default=0.0)
+            return ranks[name]
+
+        for name in self.tasks:
+            rank(name)
+        return ranks
+
+    def critical_path(self, durations: Optional[Dict[str, float]] = None
+                      ) -> Tuple[List[str], float]:
+        """Return the longest chain of dependent tasks and its length.
+
+        Args:
+            durations: Seconds per task (defaults to the estimates); tasks
+                missing from it count as zero
+
+        Returns:
+            Tuple[List[str], float]: Task names in execution order and the
+            sum of their durations
+        """
+        self._check_cycles()
+        if durations is None:
+            durations = {name: self.estimate(name) for name in self.tasks}
+        finish: Dict[str, float] = {}
+        previous: Dict[str, Optional[str]] = {}
+
+        def visit(name: str) -> float:
+            if name not in finish:
+                deps = self._dependencies(self.tasks[name])
+                before = max(deps, key=visit, default=None)
+                previous[name] = before
+                finish[name] = durations.get(name, 0.0) + (visit(before) if before else 0.0)
+            return finish[name]
+
+        if not self.tasks:
+            return [], 0.0
+        end: Optional[str] = max(self.tasks, key=visit)
+        path: List[str] = []
+        while end is not None:
+            path.append(end)
+            end = previous[end]
+        return path[::-1], finish[path[0]]
+
+    def eta(self, results: Dict[str, TaskResult]) -> float:
+        """Expected seconds until all tasks finish, assuming free workers."""
+        ranks = self.ranks()
+        dependents = self._dependents()
+        now = time.time()
+        remaining = 0.0
+        for name in self.tasks:
+            if name in results:
+                continue
+            if name in self._started:
+                left = max(0.0, self.estimate(name) - (now - self._started[name]))
+                left += max((ranks[d] for d in dependents[name]), default=0.0)
+            else:
+                left = ranks[name]
+            remaining = max(remaining, left)
+        return remaining
+
+    def _report_progress(self, results: Dict[str, TaskResult], started_at: float) -> None:
+        if self.on_progress is None:
+            return
+        running = [name for name in self._started if name not in results]
+        eta = self.eta(results) if self.estimates else None
+        self.on_progress(Progress(len(results), len(self.tasks), running,
+                                  time.time() - started_at, eta))
+
+    def _check_cycles(self) -> None:
+        """Raise ValueError if the task graph contains a cycle."""
+        state: Dict[str, int] = {}
+
+        def visit(name: str, path: List[str]) -> None:
+            if state.get(name) == 2:
+                return
+            if state.get(name) == 1:
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = 1
+            for dep in self._dependencies(self.tasks[name]):
+                visit(dep, path + [name])
+            state[name] = 2
+
+        for name in self.tasks:
+            visit(name, [])
+
+    def _call(self, task: Task) -> Tuple[Any, float]:
+        start = time.perf_counter()
+        with self.pool.hold(task.resources):
+            waited = time.perf_counter() - start
+            return task.func(), waited
+
+    async def _execute(self, task: Task, threads: ThreadPoolExecutor) -> TaskResult:
+        start = time.time()
+        waited = 0.0
+        with self.monitor.span(task.name, category="component") as span:
+            try:
+                if asyncio.iscoroutinefunction(task.func):
+                    acquiring = time.perf_counter()
+                    async with self.pool.ahold(task.resources):
+                        waited = time.perf_counter() - acquiring
+                        ok = await task.func()
+                else:
+                    # Run in a copy of this context so the task's spans nest
+                    # under its component span
+                    loop = asyncio.get_running_loop()
+                    ok, waited = await loop.run_in_executor(
+                        threads, contextvars.copy_context().run, self._call, task)
+                # Components that predate the bool contract return None on success
+                success = ok is None or bool(ok)
+                error = None if success else "Task reported failure"
+            except Exception as e:
+                self.logger.error(f"Task {task.name} raised: {e}")
+                success, error = False, str(e)
+            if not success:
+                span.fail(error or "")
+            span.attrs["wait_time"] = waited
+        return TaskResult(task.name, success, error=error, duration=time.time() - start,
+                          wait_time=waited)
+
+    async def _cancel(self, running: Dict["asyncio.Future[TaskResult]", str],
+                      pending: List[str], results: Dict[str, TaskResult],
+                      failed: str) -> None:
+        """Cancel everything still running or pending after ``failed`` failed."""
+        for future in running:
+            future.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        for name in list(running.values()) + pending:
+            self.logger.warning(f"Cancelling {name}: {failed} failed")
+            results[name] = TaskResult(name, False, skipped=True,
+                                       error="Cancelled", blocked_by=[failed])
+        running.clear()
+        pending.clear()
+
+    async def arun(self) -> Dict[str, TaskResult]:
+        """Run all registered tasks on the current event loop.
+
+        Blocking tasks that are already running on a worker thread cannot
+        be interrupted when cancelled; they are reported as cancelled and
+        finish in the background.
+
+        Returns:
+            Dict[str, TaskResult]: Results keyed by task name, in
+            registration order
+        """
+        self._check_cycles()
+        results: Dict[str, TaskResult] = {}
+        ranks = self.ranks()
+        # Longest expected remaining work first; ties keep registration order
+        pending = sorted(self.tasks, key=lambda name: -ranks[name])
+        running: Dict["asyncio.Future[TaskResult]", str] = {}
+        threads = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._started = {}
+        started_at = time.time()
+
+        try:
+            while pending or running:
+                for name in list(pending):
+                    deps = self._dependencies(self.tasks[name])
+                    failed = [d for d in deps if d in results and not results[d].success]
+                    if failed:
+                        pending.remove(name)
+                        self.logger.warning(f"Skipping {name}: dependency failed ({', '.join(failed)})")
+                        results[name] = TaskResult(name, False, skipped=True,
+                                                   error="Dependency failed", blocked_by=failed)
+                    elif all(d in results for d in deps):
+                        pending.remove(name)
+                        self.logger.info(f"Starting {name}")
+                        self._started[name] = time.time()
+                        future: "asyncio.Future[TaskResult]" = asyncio.ensure_future(
+                            self._execute(self.tasks[name], threads))
+                        running[future] = name
+
+                if not running:
+                    continue
+
+                done, _ = await asyncio.wait(running, timeout=self.progress_interval,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                first_failure = None
+                for future in done:
+                    result = future.result()
+                    results[running.pop(future)] = result
+                    status = "completed" if result.success else "failed"
+                    self.logger.info(f"{result.name} {status} in {result.duration:.2f}s")
+                    if self.on_result is not None:
+                        self.on_result(result)
+                    if not result.success and first_failure is None:
+                        first_failure = result.name
+                if first_failure is not None and self.fail_fast:
+                    await self._cancel(running, pending, results, first_failure)
+                self._report_progress(results, started_at)
+        finally:
+            for future in running:
+                future.cancel()
+            threads.shutdown(wait=False)
+            self._wall_time = time.time() - started_at
+
+        return {name: results[name] for name in self.tasks}
+
+    def report(self, results: Dict[str, TaskResult]) -> RunReport:
+        """Summarize a finished run.
+
+        The critical path is computed from the actual durations. Lock
+        waits add up the time each task and the commands it ran spent
+        acquiring shared resources, as recorded by the monitor.
+
+        Args:
+            results: Results returned by ``arun``/``run``
+
+        Returns:
+            RunReport: Wall time, critical path and lock waits per task
+        """
+        path, critical_time = self.critical_path(
+            {name: result.duration for name, result in results.items() if not result.skipped})
+        lock_wait: Dict[str, float] = {}
+        for span in self.monitor.spans:
+            component = span.component
+            if component in self.tasks and "wait_time" in span.attrs:
+                lock_wait[component] = lock_wait.get(component, 0.0) + span.attrs["wait_time"]
+        return RunReport(self._wall_time, path, critical_time, lock_wait)
+
+    def run(self) -> Dict[str, TaskResult]:
+        """Run all registered tasks from synchronous code.
+
+        Starts a private event loop; async callers should await ``arun``.
+
+        Returns:
+            Dict[str, TaskResult]: Results keyed by task name, in
+            registration order
+        """
+        return asyncio.run(self.arun())
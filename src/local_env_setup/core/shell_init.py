@@ -0,0 +1,219 @@
+"""Fast interactive shell startup.
+
+Tools commonly ask to be initialized with ``source <(tool completion zsh)``
+or ``eval "$(tool init -)"``, which spawns the tool on every new shell.
+This module provides the pieces to avoid that:
+
+- ``CompletionCache`` generates completion scripts once into a directory on
+  ``fpath`` (zsh autoloads them on first use) and regenerates them only
+  when the tool's binary changes.
+- ``lazy_function`` renders a shell function stub that runs a tool's real
+  init the first time the tool is called.
+- ``zcompile`` byte-compiles zsh startup files.
+- ``benchmark_shell`` measures interactive shell start latency.
+"""
+
+import json
+import logging
+import os
+import shutil
+import statistics
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from local_env_setup.core.executor import CommandExecutor, get_executor
+from local_env_setup.core.state import cache_dir, state_dir
+
+
+def completions_dir() -> Path:
+    """Directory holding generated zsh completion functions."""
+    return cache_dir() / "zsh" / "completions"
+
+
+def fpath_snippet() -> str:
+    """rc snippet adding the completions directory to ``fpath``.
+
+    Must run before ``compinit`` (i.e. before Oh My Zsh is sourced).
+    """
+    return f'fpath=("{completions_dir()}" $fpath)\n'
+
+
+def lazy_function(name: str, init: str) -> str:
+    """Render a stub that initializes a tool on its first call.
+
+    Args:
+        name: Command the stub stands in for
+        init: Shell code performing the tool's real initialization, which
+            is expected to define ``name`` (or leave the binary on PATH)
+
+    Returns:
+        str: Function definition for the rc file
+    """
+    return (
+        f"{name}() {{\n"
+        f"  unset -f {name}\n"
+        f"  {init}\n"
+        f'  {name} "$@"\n'
+        f"}}\n"
+    )
+
+
+class CompletionCache:
+    """Completion scripts generated once per tool binary."""
+
+    def __init__(self, directory: Optional[Union[str, Path]] = None,
+                 executor: Optional[CommandExecutor] = None):
+        """Initialize the cache.
+
+        Args:
+            directory: Completions directory (defaults to ``completions_dir()``)
+            executor: Executor running the generators
+        """
+        self.directory = Path(directory) if directory else completions_dir()
+        self.executor = executor or get_executor()
+        self.logger = logging.getLogger("CompletionCache")
+
+    @staticmethod
+    def _binary_stamp(tool: str) -> Optional[Dict[str, Any]]:
+        binary = shutil.which(tool)
+        if binary is None:
+            return None
+        real = os.path.realpath(binary)
+        stat = os.stat(real)
+        return {"binary": real, "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+    def generate(self, tool: str, command: Sequence[str]) -> Optional[Path]:
+        """Write ``_<tool>`` from a completion generator unless it is current.
+
+        Args:
+            tool: Executable the completion is for
+            command: Command printing the zsh completion script
+
+        Returns:
+            Optional[Path]: The completion file, or None if it could not be
+            generated
+        """
+        target = self.directory / f"_{tool}"
+        stamp_path = self.directory / f"_{tool}.stamp"
+        stamp = self._binary_stamp(tool)
+        if stamp is None:
+            self.logger.warning(f"{tool} not found; skipping its completion")
+            return None
+        try:
+            if target.exists() and json.loads(stamp_path.read_text()) == stamp:
+                return target
+        except (OSError, ValueError):
+            pass
+
+        result = self.executor.run(list(command), timeout=60)
+        if not result.ok or not result.stdout.strip():
+            self.logger.warning(f"Failed to generate {tool} completion (log: {result.log_path})")
+            return None
+        script = result.stdout
+        # Autoloading from fpath requires the #compdef tag on the first line
+        if not script.startswith("#compdef"):
+            script = f"#compdef {tool}\n{script}"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target.write_text(script)
+        stamp_path.write_text(json.dumps(stamp))
+        zcompile(target, executor=self.executor)
+        self.logger.info(f"Generated {tool} completion in {target}")
+        return target
+
+
+def zcompile(path: Union[str, Path], executor: Optional[CommandExecutor] = None) -> bool:
+    """Byte-compile a zsh script to ``<path>.zwc`` if it is out of date.
+
+    zsh only uses the compiled file while it is newer than the source, so
+    a stale ``.zwc`` is never loaded.
+
+    Args:
+        path: zsh script
+        executor: Executor running zsh
+
+    Returns:
+        bool: True if the compiled file is current
+    """
+    source = Path(os.path.realpath(path))
+    compiled = Path(f"{source}.zwc")
+    if not source.exists() or shutil.which("zsh") is None:
+        return False
+    if compiled.exists() and compiled.stat().st_mtime >= source.stat().st_mtime:
+        return True
+    result = (executor or get_executor()).run(["zsh", "-fc", 'zcompile "$1"', "zsh", str(source)],
+                                              timeout=30)
+    return result.ok
+
+
+@dataclass
+class ShellBenchmark:
+    """Interactive shell start latencies in milliseconds."""
+    shell: str
+    runs: List[float] = field(default_factory=list)
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.runs)
+
+    @property
+    def p95(self) -> float:
+        ordered = sorted(self.runs)
+        return ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+
+    @property
+    def best(self) -> float:
+        return min(self.runs)
+
+
+def benchmark_shell(shell: str, runs: int = 10, warmup: int = 2,
+                    executor: Optional[CommandExecutor] = None) -> ShellBenchmark:
+    """Measure how long an interactive shell takes to start and exit.
+
+    Args:
+        shell: Shell executable (e.g. ``zsh``)
+        runs: Measured runs
+        warmup: Unmeasured runs first, to warm file caches
+        executor: Executor running the shell
+
+    Returns:
+        ShellBenchmark: The measured latencies
+
+    Raises:
+        RuntimeError: If the shell fails to start
+    """
+    executor = executor or get_executor()
+    bench = ShellBenchmark(shell)
+    for i in range(warmup + runs):
+        result = executor.run([shell, "-i", "-c", "exit"], timeout=30, env={"TERM": "dumb"})
+        if not result.ok:
+            raise RuntimeError(f"{shell} failed to start: {result.stderr.strip()[-500:]}")
+        if i >= warmup:
+            bench.runs.append(result.wall_time * 1000)
+    return bench
+
+
+def bench_history_path() -> Path:
+    """File holding the previous benchmark result per shell."""
+    return state_dir() / "shell_bench.json"
+
+
+def load_previous_benchmark(shell: str) -> Optional[ShellBenchmark]:
+    """Return the last recorded benchmark for a shell, if any."""
+    try:
+        data = json.loads(bench_history_path().read_text())[shell]
+    except (OSError, ValueError, KeyError):
+        return None
+    return ShellBenchmark(**data)
+
+
+def save_benchmark(bench: ShellBenchmark) -> None:
+    """Record a benchmark so the next one can be compared against it."""
+    path = bench_history_path()
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        data = {}
+    data[bench.shell] = asdict(bench)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(data, indent=2))
@@ -0,0 +1,173 @@
+"""Persistent record of completed setup steps and their input fingerprints."""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+
+def state_dir() -> Path:
+    """Return the directory for persistent tool state (XDG state home)."""
+    base = os.environ.get("XDG_STATE_HOME") or Path.home() / ".local" / "state"
+    return Path(base) / "local_env_setup"
+
+
+def cache_dir() -> Path:
+    """Return the directory for re-creatable caches (XDG cache home)."""
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "local_env_setup"
+
+
+def data_dir() -> Path:
+    """Return the directory for installed tools (XDG data home)."""
+    base = os.environ.get("XDG_DATA_HOME") or Path.home() / ".local" / "share"
+    return Path(base) / "local_env_setup"
+
+
+# Overrides where the download and git mirror caches live, so several
+# provisioning processes (or users) on one host share them
+SHARED_CACHE_ENV = "LOCAL_ENV_SETUP_SHARED_CACHE"
+
+
+def shared_cache_dir() -> Path:
+    """Return the directory for caches that may be shared between targets."""
+    shared = os.environ.get(SHARED_CACHE_ENV)
+    return Path(shared) if shared else cache_dir()
+
+
+def file_digest(path: Union[str, Path]) -> Optional[str]:
+    """Return the sha256 of a file's contents, or None if it does not exist."""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def fingerprint(inputs: Dict[str, Any]) -> str:
+    """Hash a step's inputs into a stable fingerprint."""
+    encoded = json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+@dataclass
+class StepDecision:
+    """Whether a step needs to run and why."""
+    step: str
+    run: bool
+    reason: str
+    changed: List[str] = field(default_factory=list)
+
+
+class StepStateStore:
+    """JSON-lines store of completed steps.
+
+    Each line records a step name, the fingerprint of its inputs and the
+    inputs themselves, so a later run can both skip unchanged steps and
+    explain exactly which inputs changed for the ones it re-runs. The last
+    record for a step wins; the file is compacted when it accumulates too
+    many superseded records.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        """Initialize the store.
+
+        Args:
+            path: JSON-lines file (defaults to ``steps.jsonl`` in the state dir)
+        """
+        self.path = Path(path) if path else state_dir() / "steps.jsonl"
+        self.logger = logging.getLogger("StepStateStore")
+        self._records: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lines = 0
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._records is not None:
+            return self._records
+        records: Dict[str, Dict[str, Any]] = {}
+        lines = 0
+        try:
+            with self.path.open() as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn final line from an interrupted run
+                        continue
+                    records[record["step"]] = record
+                    lines += 1
+        except OSError:
+            pass
+        self._records, self._lines = records, lines
+        return records
+
+    def get(self, step: str) -> Optional[Dict[str, Any]]:
+        """Return the last completed record for a step."""
+        with self._lock:
+            return self._load().get(step)
+
+    def check(self, step: str, inputs: Optional[Dict[str, Any]]) -> StepDecision:
+        """Decide whether a step must run given its current inputs.
+
+        Args:
+            step: Step name
+            inputs: Current inputs, or None if the step cannot be fingerprinted
+
+        Returns:
+            StepDecision: The decision and the reason for it
+        """
+        if inputs is None:
+            return StepDecision(step, True, "always runs (no fingerprint)")
+        record = self.get(step)
+        if record is None:
+            return StepDecision(step, True, "never completed")
+        if record["fingerprint"] == fingerprint(inputs):
+            return StepDecision(step, False, "up to date")
+        previous = record.get("inputs", {})
+        current = json.loads(json.dumps(inputs, default=str))
+        changed = sorted(
+            key for key in set(previous) | set(current)
+            if previous.get(key) != current.get(key)
+        )
+        return StepDecision(step, True, "inputs changed", changed)
+
+    def record(self, step: str, inputs: Dict[str, Any]) -> None:
+        """Record that a step completed with the given inputs."""
+        entry = {
+            "step": step,
+            "fingerprint": fingerprint(inputs),
+            "inputs": inputs,
+            "completed_at": time.time(),
+        }
+        line = json.dumps(entry, sort_keys=True, default=str)
+        with self._lock:
+            records = self._load()
+            records[step] = json.loads(line)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            if self._lines > 4 * max(len(records), 8):
+                self._compact(records)
+                return
+            with self.path.open("a") as f:
+                f.write(line + "\n")
+            self._lines += 1
+
+    def _compact(self, records: Dict[str, Dict[str, Any]]) -> None:
+        tmp_path = self.path.with_suffix(".tmp")
+        with tmp_path.open("w") as f:
+            for record in records.values():
+                f.write(json.dumps(record, sort_keys=True) + "\n")
+        tmp_path.replace(self.path)
+        self._lines = len(records)
+
+    def forget(self, step: str) -> None:
+        """Drop a step so that it runs again next time."""
+        with self._lock:
+            records = self._load()
+            if records.pop(step, None) is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._compact(records)
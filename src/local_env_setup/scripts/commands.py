@@ -0,0 +1,475 @@
+"""Handlers for the CLI subcommands.
+
+Imported only once a subcommand is dispatched, so everything the handlers
+need can be imported at module level here.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+from local_env_setup.config import env
+from local_env_setup.core.artifacts import Artifact, get_artifact_cache
+from local_env_setup.core.backup import get_backup_store
+from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.brew import BrewPlan
+from local_env_setup.core.fleet import (
+    FleetTarget, TargetResult, fleet_summary, load_targets, provision_fleet)
+from local_env_setup.core.history import RunHistory
+from local_env_setup.core.inventory import get_inventory
+from local_env_setup.core.journal import JournalRun, get_journal
+from local_env_setup.core.manifest import Change, Manifest, apply, manifest_file, plan
+from local_env_setup.core.monitoring import SetupMonitor, set_monitor
+from local_env_setup.core.rcfile import get_rc_editor
+from local_env_setup.core.scheduler import Progress, RunReport, Scheduler, TaskResult
+from local_env_setup.core.shell_init import (
+    benchmark_shell, load_previous_benchmark, save_benchmark, zcompile)
+from local_env_setup.core.state import StepStateStore
+from local_env_setup.setup import COMPONENTS, load_component
+
+def explain_components(names: List[str]) -> None:
+    """Print which components would run and why."""
+    store = StepStateStore()
+    for name in names:
+        component = load_component(name)()
+        decision = store.check(name, component.fingerprint_inputs())
+        detail = f" ({', '.join(decision.changed)})" if decision.changed else ""
+        marker = "▶️ " if decision.run else "⏭️ "
+        print(f"{marker} {name}: {decision.reason}{detail}")
+
+async def arun_components(names: List[str], jobs: Optional[int] = None,
+                          force: bool = False, fail_fast: bool = False,
+                          trace: Optional[str] = None, resume: bool = False) -> bool:
+    """Run the given setup components as a dependency graph.
+
+    Components whose recorded input fingerprint is unchanged since their
+    last successful run are skipped unless ``force`` is set. The run is
+    recorded in the journal (see ``core.journal``) as it goes. This is the
+    entry point for callers that already run an event loop.
+
+    Args:
+        names: Component names to run
+        jobs: Maximum number of blocking components running at once
+        force: Run every component even if it is up to date
+        fail_fast: Cancel the remaining components after the first failure
+        trace: Write a Chrome trace of the run to this path, and its spans
+            as JSON lines next to it
+        resume: Skip the components an interrupted earlier run completed
+
+    Returns:
+        bool: True if every component succeeded, False otherwise
+    """
+    journal = get_journal()
+    interrupted = journal.resumable() if resume else None
+    if resume and interrupted is None:
+        print("ℹ️  No interrupted run to resume; running normally")
+    # Every component of the run reports to one fresh monitor
+    monitor = SetupMonitor()
+    set_monitor(monitor)
+    success = False
+    try:
+        with monitor.span("init", category="run", components=names):
+            success = await _arun_components(names, jobs, force, fail_fast, interrupted)
+        return success
+    finally:
+        journal.end(success)
+        try:
+            RunHistory().record(monitor, success)
+        except sqlite3.Error as e:
+            print(f"⚠️  Could not record run history: {e}")
+        if trace:
+            monitor.save_chrome_trace(trace)
+            monitor.save_jsonl(os.path.splitext(trace)[0] + ".jsonl")
+            print(f"📊 Trace written to {trace} (open in https://ui.perfetto.dev)")
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    return f"{minutes}m{seconds:02d}s" if minutes else f"{seconds}s"
+
+def _print_progress(progress: Progress) -> None:
+    eta = f", ETA {_format_duration(progress.eta)}" if progress.eta is not None else ""
+    running = f" — running {', '.join(progress.running)}" if progress.running else ""
+    print(f"⏳ [{progress.done}/{progress.total}] {_format_duration(progress.elapsed)} "
+          f"elapsed{eta}{running}")
+
+def _print_report(report: RunReport) -> None:
+    if report.wall_time <= 0:
+        return
+    share = report.critical_time / report.wall_time
+    print(f"⏱️  Finished in {_format_duration(report.wall_time)}; critical path "
+          f"{' → '.join(report.critical_path)} took {_format_duration(report.critical_time)} "
+          f"({share:.0%} of wall time)")
+    total_wait = sum(report.lock_wait.values())
+    if total_wait >= 1:
+        waits = sorted(report.lock_wait.items(), key=lambda item: item[1], reverse=True)[:3]
+        detail = ", ".join(f"{name} {_format_duration(wait)}" for name, wait in waits if wait >= 1)
+        print(f"🔒 Waited {_format_duration(total_wait)} on shared resources ({detail}); "
+              f"{_format_duration(report.critical_wait)} of it on the critical path")
+
+async def _arun_components(names: List[str], jobs: Optional[int], force: bool,
+                           fail_fast: bool, interrupted: Optional[JournalRun]) -> bool:
+    journal = get_journal()
+    committed = interrupted.committed if interrupted is not None else {}
+    if interrupted is not None:
+        done = [name for name in names if name in committed]
+        print(f"🔁 Resuming run {interrupted.run_id}: {len(done)} of {len(names)} "
+              f"component(s) already done")
+        # Undo writes the interruption cut short before redoing them
+        for line in journal.recover(interrupted):
+            print(f"↩️  {line}")
+    journal.begin(names, resumes=interrupted.run_id if interrupted is not None else None)
+
+    store = StepStateStore()
+    components = []
+    resumed = []
+    for name in names:
+        component = load_component(name)()
+        if name in committed:
+            print(f"⏭️  {name} completed before the interruption")
+            resumed.append(component)
+            continue
+        if not force and not store.check(name, component.fingerprint_inputs()).run:
+            print(f"⏭️  {name} is up to date")
+            continue
+        components.append(component)
+    if not components:
+        with get_rc_editor().batch() as written:
+            _redeclare_blocks(committed)
+        if not written.ok:
+            print("❌ Failed to write the shell rc files")
+            return False
+        _record_fingerprints(store, resumed)
+        return True
+
+    try:
+        estimates = RunHistory().expected_durations(host=platform.node())
+    except sqlite3.Error:
+        estimates = {}
+    by_name = {component.name: component for component in components}
+
+    def commit(result: TaskResult) -> None:
+        # Journal each component as it succeeds, so a crash later in the
+        # run does not lose it
+        if result.success and result.name in by_name:
+            journal.commit(result.name, by_name[result.name].rc_blocks)
+
+    scheduler = Scheduler(max_workers=jobs, fail_fast=fail_fast, estimates=estimates,
+                          on_progress=_print_progress, on_result=commit)
+
+    # Plan all Homebrew packages up front and install them in one batch
+    plan = BrewPlan(scheduler.pool, get_inventory())
+    for component in components:
+        component.plan_brew(plan)
+    if plan:
+        scheduler.add("brew-bundle", plan.execute, depends_on=["homebrew"])
+
+    brew_users = plan.components()
+    for component in components:
+        extra = ["brew-bundle"] if component.name in brew_users else []
+        scheduler.add_component(component, depends_on=extra)
+    if estimates:
+        path, expected = scheduler.critical_path()
+        print(f"⏱️  Expected duration {_format_duration(expected)} "
+              f"(critical path: {' → '.join(path)})")
+    # Merge every component's rc file blocks and write each file once
+    with get_rc_editor().batch() as written:
+        _redeclare_blocks(committed)
+        results = await scheduler.arun()
+    _print_report(scheduler.report(results))
+    if not written.ok:
+        # The components' rc blocks are missing, so none of them is done
+        print("❌ Failed to write the shell rc files")
+        return False
+    if env.SHELL_FAST_STARTUP:
+        # Compile after the single write so the .zwc matches the final file
+        await asyncio.to_thread(zcompile, os.path.expanduser("~/.zshrc"))
+
+    # Fingerprint after the whole run so steps sharing files (e.g. ~/.zshrc)
+    # all record the final state
+    _record_fingerprints(store, resumed + [c for c in components if results[c.name].success])
+
+    failed = [r for r in results.values() if not r.success]
+    for result in failed:
+        reason = f"skipped, waiting on {', '.join(result.blocked_by)}" if result.skipped else result.error
+        print(f"❌ {result.name}: {reason}")
+    return not failed
+
+def _redeclare_blocks(committed: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Declare again the rc blocks of components completed by an interrupted run."""
+    editor = get_rc_editor()
+    for blocks in committed.values():
+        for block in blocks:
+            editor.set_block(block["path"], block["name"], block["content"],
+                             block.get("legacy", ()), block["priority"])
+
+def _record_fingerprints(store: StepStateStore, components: List[BaseSetup]) -> None:
+    for component in components:
+        inputs = component.fingerprint_inputs()
+        if inputs is not None:
+            store.record(component.name, inputs)
+
+def run_components(names: List[str], jobs: Optional[int] = None, force: bool = False,
+                   fail_fast: bool = False, trace: Optional[str] = None,
+                   resume: bool = False) -> bool:
+    """Run the given setup components from synchronous code.
+
+    See ``arun_components`` for the arguments.
+    """
+    return asyncio.run(arun_components(names, jobs, force, fail_fast, trace, resume))
+
+def init(components: Optional[List[str]] = None, jobs: Optional[int] = None,
+         force: bool = False, fail_fast: bool = False, trace: Optional[str] = None,
+         resume: bool = False) -> bool:
+    print("Bootstrapping local development environment...")
+    # Create dev directory if it doesn't exist
+    dev_dir = os.path.expanduser(env.DEV_DIR)
+    if not os.path.exists(dev_dir):
+        os.makedirs(dev_dir)
+        print(f"✅ Created development directory: {dev_dir}")
+
+    if resume and not components:
+        # Continue with the components the interrupted run was given
+        interrupted = get_journal().resumable()
+        components = interrupted.components if interrupted is not None else None
+    if not run_components(components or list(COMPONENTS), jobs, force, fail_fast, trace,
+                          resume):
+        print("❌ Dev environment initialization failed.")
+        return False
+    print("✅ Dev environment initialized!")
+    return True
+
+def cmd_init(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup init``."""
+    if args.explain:
+        explain_components(args.components or list(COMPONENTS))
+        return True
+    return init(args.components, args.jobs, args.force, args.fail_fast, args.trace,
+                args.resume)
+
+def _print_target(result: TargetResult) -> None:
+    if result.success:
+        print(f"✅ {result.name} ({_format_duration(result.duration)})")
+    else:
+        print(f"❌ {result.name}: {result.error} (log: {result.log_path})")
+
+def cmd_fleet(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup fleet``."""
+    try:
+        targets = load_targets(args.targets) if args.targets else []
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not read targets: {e}")
+        return False
+    for home in args.homes:
+        home = os.path.abspath(os.path.expanduser(home))
+        targets.append(FleetTarget(name=os.path.basename(home.rstrip("/")), home=home))
+    if not targets:
+        print("❌ No targets given")
+        return False
+
+    print(f"🚀 Provisioning {len(targets)} target(s)...")
+    results = provision_fleet(targets, processes=args.processes, components=args.components,
+                              jobs=args.jobs, force=args.force,
+                              shared_cache=args.shared_cache, log_dir=args.log_dir,
+                              on_result=_print_target)
+    summary = fleet_summary(results)
+    if args.summary:
+        with open(args.summary, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"📊 Summary written to {args.summary}")
+    failed = [result.name for result in results if not result.success]
+    print(f"{'❌' if failed else '✅'} {len(results) - len(failed)}/{len(results)} target(s) "
+          f"provisioned in {_format_duration(summary['total_duration'])}")
+    return not failed
+
+def _load_manifest(path: Optional[str]) -> Optional[Manifest]:
+    """Read ``path``, else the default manifest file, else the configuration."""
+    try:
+        if path:
+            return Manifest.load(path)
+        if manifest_file().exists():
+            return Manifest.load(manifest_file())
+        return Manifest.from_config()
+    except (OSError, ValueError) as e:
+        print(f"❌ Could not read manifest: {e}")
+        return None
+
+def _print_plan(changes: List[Change], total: int) -> None:
+    added = sum(1 for change in changes if change.symbol == "+")
+    print(f"📋 Plan: {added} to add, {len(changes) - added} to change, "
+          f"{total - len(changes)} unchanged")
+    for change in changes:
+        print(f"  {change.describe()}")
+
+def cmd_plan(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup plan``."""
+    manifest = _load_manifest(args.manifest)
+    if manifest is None:
+        return False
+    changes = plan(manifest)
+    _print_plan(changes, len(manifest.resources))
+    return not (args.check and changes)
+
+def cmd_apply(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup apply``."""
+    manifest = _load_manifest(args.manifest)
+    if manifest is None:
+        return False
+    changes = plan(manifest)
+    _print_plan(changes, len(manifest.resources))
+    if not changes:
+        print("✅ Machine matches the manifest")
+        return True
+
+    results = apply(changes)
+    for change in changes:
+        ok = results[change.resource.address]
+        print(f"{'✅' if ok else '❌'} {change.resource.address}")
+    failed = sum(1 for ok in results.values() if not ok)
+    print(f"{'❌' if failed else '✅'} {len(results) - failed}/{len(results)} change(s) applied")
+    return not failed
+
+def cmd_rollback(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup rollback``."""
+    journal = get_journal()
+    try:
+        runs = journal.rollback(args.run, dry_run=args.dry_run,
+                                report=lambda line: print(f"↩️  {line}"))
+    except ValueError as e:
+        print(f"❌ {e}")
+        return False
+    if not runs:
+        print("ℹ️  Nothing to roll back")
+        return True
+    if args.dry_run:
+        for run in runs:
+            print(f"Run {run.run_id} ({', '.join(run.components)}):")
+            for mutation in reversed(run.mutations):
+                print(f"  {mutation.action} {mutation.path}")
+        return True
+
+    # Rolled-back components must run again next time
+    store = StepStateStore()
+    for run in runs:
+        for step in run.committed:
+            store.forget(step)
+    print(f"✅ Rolled back {len(runs)} run(s): {', '.join(run.run_id for run in runs)}")
+    return True
+
+def cmd_restore(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup restore``."""
+    store = get_backup_store()
+    wanted = {os.path.realpath(os.path.expanduser(path)) for path in args.paths}
+    if args.list:
+        for path in store.paths():
+            if wanted and path not in wanted:
+                continue
+            print(path)
+            for version in reversed(store.versions(path)):
+                taken = time.strftime("%Y-%m-%d %H:%M", time.localtime(version.time))
+                print(f"  {taken}  run {version.run or '-':<12}  {version.size:>8} B  "
+                      f"{version.digest[:12]}")
+        return True
+
+    versions = [v for v in store.at_run(args.at) if not wanted or v.path in wanted]
+    if not versions:
+        print(f"❌ No snapshots taken in run {args.at}")
+        return False
+    for version in versions:
+        if args.dry_run:
+            print(f"↩️  would restore {version.path}")
+        elif store.restore(version):
+            print(f"✅ Restored {version.path}")
+        else:
+            print(f"⏭️  {version.path} already matches")
+    return True
+
+def _print_artifact(artifact: Artifact, marker: str = "  ") -> None:
+    used = time.strftime("%Y-%m-%d", time.localtime(artifact.last_used))
+    print(f"{marker}{artifact.name} {artifact.version:<10} "
+          f"{artifact.attrs.get('arch', '-')}/{artifact.attrs.get('os', '-'):<14} "
+          f"{artifact.size / 1e6:>7.1f} MB  used {used}  {artifact.sha256[:12]}")
+
+def cmd_artifacts(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup artifacts``."""
+    cache = get_artifact_cache()
+    if args.action == "list":
+        artifacts = cache.list()
+        print(f"📦 {len(artifacts)} artifacts in {cache.root} "
+              f"({sum(a.size for a in artifacts) / 1e6:.1f} MB)")
+        for artifact in artifacts:
+            _print_artifact(artifact)
+        return True
+
+    max_bytes = int(args.max_size * 1e9) if args.max_size is not None else None
+    removed = cache.prune(args.max_age, max_bytes, dry_run=args.dry_run)
+    for artifact in removed:
+        _print_artifact(artifact, "↩️  would remove " if args.dry_run else "🗑️  ")
+    freed = sum(a.size for a in removed) / 1e6
+    print(f"{'Would free' if args.dry_run else 'Freed'} {freed:.1f} MB")
+    return True
+
+def cmd_component(args: argparse.Namespace) -> bool:
+    """Handle the single-component subcommands (``git``, ``python``, ...)."""
+    return run_components([args.command], force=args.force)
+
+def cmd_shell_bench(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup shell-bench``."""
+    try:
+        bench = benchmark_shell(args.shell, runs=args.runs)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return False
+    previous = load_previous_benchmark(args.shell)
+    save_benchmark(bench)
+
+    print(f"⏱️  {args.shell} startup over {len(bench.runs)} runs: "
+          f"min {bench.best:.0f} ms, median {bench.median:.0f} ms, p95 {bench.p95:.0f} ms")
+    if previous is not None and previous.runs:
+        delta = bench.median - previous.median
+        print(f"   {delta:+.0f} ms median vs. previous run ({previous.median:.0f} ms)")
+    if args.budget_ms is not None and bench.median > args.budget_ms:
+        print(f"❌ Median startup exceeds the {args.budget_ms:.0f} ms budget")
+        return False
+    return True
+
+SPARKS = "▁▂▃▄▅▆▇█"
+
+def _sparkline(values: List[float]) -> str:
+    low, high = min(values), max(values)
+    if high - low < 1e-9:
+        return SPARKS[0] * len(values)
+    return "".join(SPARKS[int((v - low) / (high - low) * (len(SPARKS) - 1))] for v in values)
+
+def cmd_stats(args: argparse.Namespace) -> bool:
+    """Handle ``local_env_setup stats``."""
+    history = RunHistory()
+    if args.ingest:
+        added, skipped = history.ingest_files(args.ingest)
+        print(f"📥 Ingested {added} run(s), skipped {skipped} file(s)")
+
+    stats = history.step_stats(args.category, args.host, args.last)
+    if not stats:
+        print("No runs recorded yet.")
+        return True
+    trends = history.trend(args.category, args.host, last_runs=10)
+    print(f"📊 Step timings over {history.runs()} run(s) (seconds, slowest p95 first)")
+    print(f"{'kind':<48} {'count':>6} {'p50':>8} {'p95':>8} {'max':>8} {'fail':>5}  trend")
+    for stat in stats[:args.top]:
+        kind = "/".join(part for part in (stat.component, stat.action) if part)
+        kind = f"[{stat.category}] {kind}"
+        if len(kind) > 48:
+            kind = kind[:45] + "..."
+        print(f"{kind:<48} {stat.count:>6} {stat.p50:>8.2f} {stat.p95:>8.2f} "
+              f"{stat.max:>8.2f} {stat.failures:>5}  {_sparkline(trends.get(stat.kind, [0.0]))}")
+
+    regressions = history.regressions(args.threshold, args.window, category=args.category,
+                                      host=args.host)
+    for regression in regressions:
+        kind = "/".join(part for part in (regression.component, regression.action) if part)
+        print(f"⚠️  {kind} regressed {regression.change:+.0%}: {regression.latest:.2f}s "
+              f"vs. a median of {regression.baseline:.2f}s in earlier runs")
+    return not (regressions and args.fail_on_regression)
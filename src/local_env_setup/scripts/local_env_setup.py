@@ -1,90 +1,202 @@
 #!/usr/bin/env python3
 import argparse
+import importlib
 import sys
-import os
-from local_env_setup.setup.dev_tools.git import run as setup_git
-from local_env_setup.setup.os.homebrew import run as install_homebrew
-from local_env_setup.setup.dev_tools.python import run as setup_python
-from local_env_setup.setup.os.shell import run as setup_shell
-from local_env_setup.setup.infra.kubernetes import run as setup_kubernetes
-from local_env_setup.setup.infra.terraform import run as setup_terraform
-from local_env_setup.setup.infra.docker import run as install_docker
-from local_env_setup.config import env
-
-def init():
-    print("Bootstrapping local development environment...")
-    # Create dev directory if it doesn't exist
-    dev_dir = os.path.expanduser(env.DEV_DIR)
-    if not os.path.exists(dev_dir):
-        os.makedirs(dev_dir)
-        print(f"✅ Created development directory: {dev_dir}")
-    
-    setup_git()
-    install_homebrew()
-    setup_python()
-    setup_shell()
-    install_docker()
-    setup_kubernetes()
-    setup_terraform()
-    print("✅ Dev environment initialized!")
-
-def git():
-    setup_git()
-
-def homebrew():
-    install_homebrew()
-
-def python():
-    setup_python()
-
-def shell():
-    setup_shell()
-
-def docker():
-    install_docker()
-
-def kubernetes():
-    setup_kubernetes()
-
-def terraform():
-    setup_terraform()
+from typing import Callable, Dict, NamedTuple, Optional
+from local_env_setup.setup import COMPONENTS
 
-def main():
+class Command(NamedTuple):
+    """A subcommand whose handler is imported only when it is dispatched."""
+    help: str
+    handler: str
+    add_arguments: Optional[Callable[[argparse.ArgumentParser], None]] = None
+
+def _init_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "components", nargs="*", metavar="component",
+        help=f"Components to set up (default: all of {', '.join(COMPONENTS)})"
+    )
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Maximum number of components to run at once")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-run components even if their inputs are unchanged")
+    parser.add_argument("--fail-fast", action="store_true",
+                        help="Cancel the remaining components after the first failure")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue an interrupted run, skipping the components it completed")
+    parser.add_argument("--explain", action="store_true",
+                        help="Show which components would run and why, then exit")
+    parser.add_argument("--trace", metavar="FILE", default=None,
+                        help="Write a Chrome/Perfetto trace of the run to FILE "
+                             "(and its spans as JSON lines next to it, with a .jsonl suffix)")
+
+def _fleet_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("homes", nargs="*", metavar="HOME",
+                        help="Target home directories, each named after its last component")
+    parser.add_argument("--targets", metavar="FILE",
+                        help="JSON file of targets with per-target env and config overrides")
+    parser.add_argument("-p", "--processes", type=int, default=None,
+                        help="Targets provisioned at once (default: CPU count)")
+    parser.add_argument("-j", "--jobs", type=int, default=2,
+                        help="Components run at once within each target (default: 2)")
+    parser.add_argument("--components", nargs="+", choices=list(COMPONENTS),
+                        help="Components to set up on each target (default: all)")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-run components even if their inputs are unchanged")
+    parser.add_argument("--shared-cache", metavar="DIR",
+                        help="Download and git mirror cache shared by the targets "
+                             "(default: this user's cache)")
+    parser.add_argument("--log-dir", metavar="DIR", help="Write one log file per target here")
+    parser.add_argument("--summary", metavar="FILE",
+                        help="Write the combined monitor summary of all targets to FILE")
+
+def _component_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--force", action="store_true",
+                        help="Re-run even if the inputs are unchanged")
+
+def _shell_bench_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--shell", default="zsh",
+                        help="Shell to measure (default: zsh)")
+    parser.add_argument("-n", "--runs", type=int, default=10,
+                        help="Number of measured shell starts")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fail if the median start time exceeds this many milliseconds")
+
+def _stats_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ingest", nargs="+", metavar="PATH",
+                        help="Add summary files (or directories of them) from other machines first")
+    parser.add_argument("--category", choices=("run", "component", "step", "command"),
+                        help="Only show spans of this kind")
+    parser.add_argument("--host", help="Only include runs from this host")
+    parser.add_argument("--last", type=int, default=None, metavar="N",
+                        help="Only include the N most recent runs")
+    parser.add_argument("--top", type=int, default=25,
+                        help="Number of step kinds to show (default: 25)")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Report steps this much slower than their baseline (default: 0.2)")
+    parser.add_argument("--window", type=int, default=5,
+                        help="Runs forming the regression baseline (default: 5)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with an error if any step regressed")
+
+def _rollback_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--run", metavar="ID",
+                        help="Run to roll back (default: the latest, with the runs it resumed)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only list the changes that would be undone")
+
+def _restore_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("paths", nargs="*", metavar="PATH",
+                        help="Only restore these files (default: every file the run changed)")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--at", metavar="RUN",
+                       help="Restore files as they were before this run changed them")
+    group.add_argument("--list", action="store_true",
+                       help="List the snapshots of each file and the runs that took them")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Only show which files would be restored")
+
+def _artifacts_arguments(parser: argparse.ArgumentParser) -> None:
+    actions = parser.add_subparsers(dest="action", required=True)
+    actions.add_parser("list", help="List the prebuilt artifacts in the cache")
+    prune = actions.add_parser("prune", help="Remove old or least recently used artifacts")
+    prune.add_argument("--max-age", type=float, default=90, metavar="DAYS",
+                       help="Remove artifacts not used for this many days (default: 90)")
+    prune.add_argument("--max-size", type=float, default=None, metavar="GB",
+                       help="Then remove the least recently used until the cache fits")
+    prune.add_argument("--dry-run", action="store_true",
+                       help="Only list the artifacts that would be removed")
+
+def _manifest_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--manifest", metavar="FILE",
+                        help="Desired-state manifest (default: "
+                             "~/.config/local_env_setup/manifest.yaml if present, "
+                             "else the configuration)")
+
+def _plan_arguments(parser: argparse.ArgumentParser) -> None:
+    _manifest_arguments(parser)
+    parser.add_argument("--check", action="store_true",
+                        help="Exit with an error if the machine differs from the manifest")
+
+COMPONENT_HANDLER = "local_env_setup.scripts.commands:cmd_component"
+
+# Subcommand registry: name -> help text, "module:function" handler and an
+# optional function adding the subcommand's arguments
+COMMANDS: Dict[str, Command] = {
+    "init": Command("Initialize dev environment",
+                    "local_env_setup.scripts.commands:cmd_init", _init_arguments),
+    "shell-bench": Command("Measure interactive shell startup time",
+                           "local_env_setup.scripts.commands:cmd_shell_bench",
+                           _shell_bench_arguments),
+    "stats": Command("Show step timings and regressions across past runs",
+                     "local_env_setup.scripts.commands:cmd_stats", _stats_arguments),
+    "fleet": Command("Provision many target home directories concurrently",
+                     "local_env_setup.scripts.commands:cmd_fleet", _fleet_arguments),
+    "rollback": Command("Undo the file changes of the last run",
+                        "local_env_setup.scripts.commands:cmd_rollback", _rollback_arguments),
+    "restore": Command("Restore managed files from the backup store",
+                       "local_env_setup.scripts.commands:cmd_restore", _restore_arguments),
+    "artifacts": Command("List or prune prebuilt Python interpreters",
+                         "local_env_setup.scripts.commands:cmd_artifacts", _artifacts_arguments),
+    "plan": Command("Show how the machine differs from the manifest",
+                    "local_env_setup.scripts.commands:cmd_plan", _plan_arguments),
+    "apply": Command("Apply only the differences from the manifest",
+                     "local_env_setup.scripts.commands:cmd_apply", _manifest_arguments),
+    "git": Command("Setup Git configuration", COMPONENT_HANDLER, _component_arguments),
+    "homebrew": Command("Install Homebrew", COMPONENT_HANDLER, _component_arguments),
+    "python": Command("Setup Python environment", COMPONENT_HANDLER, _component_arguments),
+    "shell": Command("Setup Oh My Zsh and Powerlevel10k", COMPONENT_HANDLER, _component_arguments),
+    "docker": Command("Install Docker Desktop", COMPONENT_HANDLER, _component_arguments),
+    "kubernetes": Command("Setup Kubernetes tools", COMPONENT_HANDLER, _component_arguments),
+    "terraform": Command("Setup Terraform", COMPONENT_HANDLER, _component_arguments),
+}
+
+def build_parser() -> argparse.ArgumentParser:
+    """Build the argument parser without importing any command module."""
     parser = argparse.ArgumentParser(description="Local Environment Setup CLI")
+    parser.add_argument("--config", metavar="FILE",
+                        help="YAML config file (default: ~/.config/local_env_setup/config.yaml)")
+    parser.add_argument("--profile", help="Profile of the config file to apply")
+    parser.add_argument("--env-file", metavar="FILE", help=".env file (default: ./.env)")
+    parser.add_argument("--set", dest="overrides", action="append", default=[],
+                        metavar="KEY=VALUE", help="Override a configuration value")
     subparsers = parser.add_subparsers(dest="command")
+    for name, command in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=command.help)
+        if command.add_arguments is not None:
+            command.add_arguments(subparser)
+    return parser
 
-    # Subcommands
-    subparsers.add_parser("init", help="Initialize dev environment")
-    subparsers.add_parser("git", help="Setup Git configuration")
-    subparsers.add_parser("homebrew", help="Install Homebrew")
-    subparsers.add_parser("python", help="Setup Python environment")
-    subparsers.add_parser("shell", help="Setup Oh My Zsh and Powerlevel10k")
-    subparsers.add_parser("docker", help="Install Docker Desktop")
-    subparsers.add_parser("kubernetes", help="Setup Kubernetes tools")
-    subparsers.add_parser("terraform", help="Setup Terraform")
-
+def main():
+    parser = build_parser()
     args = parser.parse_args()
 
-    # Command handling
+    command = COMMANDS.get(args.command)
+    if command is None:
+        print(f"Usage: local_env_setup {{{'|'.join(COMMANDS)}}}")
+        sys.exit(1)
+
     if args.command == "init":
-        init()
-    elif args.command == "git":
-        git()
-    elif args.command == "homebrew":
-        homebrew()
-    elif args.command == "python":
-        python()
-    elif args.command == "shell":
-        shell()
-    elif args.command == "docker":
-        docker()
-    elif args.command == "kubernetes":
-        kubernetes()
-    elif args.command == "terraform":
-        terraform()
-    else:
-        print("Usage: local_env_setup {init|git|homebrew|python|shell|docker|kubernetes|terraform}")
+        unknown = [name for name in args.components if name not in COMPONENTS]
+        if unknown:
+            parser.error(f"unknown component(s): {', '.join(unknown)} (choose from {', '.join(COMPONENTS)})")
+
+    if args.config or args.profile or args.env_file or args.overrides:
+        overrides = dict(item.partition("=")[::2] for item in args.overrides)
+        if any("=" not in item for item in args.overrides):
+            parser.error("--set expects KEY=VALUE")
+        from local_env_setup.config.env import configure, load_env
+        configure(args.config, args.profile, args.env_file, overrides)
+        try:
+            load_env()
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Only now import the module implementing the command
+    module_name, function_name = command.handler.split(":")
+    handler = getattr(importlib.import_module(module_name), function_name)
+    if handler(args) is False:
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
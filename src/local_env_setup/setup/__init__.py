@@ -0,0 +1,34 @@
+"""Setup components and the registry used to load them on demand."""
+
+import importlib
+from typing import TYPE_CHECKING, Dict, Type, cast
+
+if TYPE_CHECKING:
+    from local_env_setup.core.base import BaseSetup
+
+# Setup components in their default bootstrap order, as "module:Class" so
+# that only the components actually used get imported
+COMPONENTS: Dict[str, str] = {
+    "git": "local_env_setup.setup.dev_tools.git:GitSetup",
+    "homebrew": "local_env_setup.setup.os.homebrew:HomebrewSetup",
+    "python": "local_env_setup.setup.dev_tools.python:PythonSetup",
+    "shell": "local_env_setup.setup.os.shell:ShellSetup",
+    "docker": "local_env_setup.setup.infra.docker:DockerSetup",
+    "kubernetes": "local_env_setup.setup.infra.kubernetes:KubernetesSetup",
+    "terraform": "local_env_setup.setup.infra.terraform:TerraformSetup",
+}
+
+def load_component(name: str) -> "Type[BaseSetup]":
+    """Import and return the setup class registered under a name.
+
+    Args:
+        name: Component name, e.g. "python"
+
+    Returns:
+        Type[BaseSetup]: The component class
+
+    Raises:
+        KeyError: If no component is registered under the name
+    """
+    module_name, class_name = COMPONENTS[name].split(":")
+    return cast("Type[BaseSetup]", getattr(importlib.import_module(module_name), class_name))
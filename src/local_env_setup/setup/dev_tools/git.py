@@ -1,34 +1,56 @@
-import subprocess
+from pathlib import Path
+from typing import Any, Dict
 from local_env_setup.config import env
+from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.executor import CommandError
+from local_env_setup.core.state import file_digest
 
-def run():
+class GitSetup(BaseSetup):
     """Configure Git with user details and VS Code as default editor."""
-    try:
-        
-        # Print current configuration
-        print("\nCurrent Git Configuration:")
-        print("-" * 30)
-        name_result = subprocess.run(["git", "config", "--global", "user.name"], capture_output=True, text=True)
-        email_result = subprocess.run(["git", "config", "--global", "user.email"], capture_output=True, text=True)
-        print(f"Name:  {name_result.stdout.strip() if name_result.returncode == 0 else 'Not set'}")
-        print(f"Email: {email_result.stdout.strip() if email_result.returncode == 0 else 'Not set'}")
-        print("-" * 30)
-        
-        # Set Git user name and email
-        subprocess.run(["git", "config", "--global", "user.name", env.GIT_USERNAME], check=True)
-        subprocess.run(["git", "config", "--global", "user.email", env.GIT_EMAIL], check=True)
-        subprocess.run(["git", "config", "--global", "core.editor", "code --wait"], check=True)
-        
-        # Print updated configuration
-        print("\nUpdated Git Configuration:")
+
+    name = "git"
+
+    def fingerprint_inputs(self) -> Dict[str, Any]:
+        """Git settings are fully determined by the config and ~/.gitconfig."""
+        return {
+            "GIT_USERNAME": env.GIT_USERNAME,
+            "GIT_EMAIL": env.GIT_EMAIL,
+            "gitconfig": file_digest(Path.home() / ".gitconfig"),
+        }
+
+    def print_config(self, title: str) -> None:
+        """Print the current global user name and email."""
+        print(f"\n{title}:")
         print("-" * 30)
-        name_result = subprocess.run(["git", "config", "--global", "user.name"], capture_output=True, text=True)
-        email_result = subprocess.run(["git", "config", "--global", "user.email"], capture_output=True, text=True)
-        print(f"Name:  {name_result.stdout.strip() if name_result.returncode == 0 else 'Not set'}")
-        print(f"Email: {email_result.stdout.strip() if email_result.returncode == 0 else 'Not set'}")
+        name_result = self.execute(["git", "config", "--global", "user.name"], timeout=30)
+        email_result = self.execute(["git", "config", "--global", "user.email"], timeout=30)
+        print(f"Name:  {name_result.stdout.strip() if name_result.ok else 'Not set'}")
+        print(f"Email: {email_result.stdout.strip() if email_result.ok else 'Not set'}")
         print("-" * 30)
-        
-        print("✅ Git configured with name/email and VS Code as default editor.")
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error configuring Git: {e}")
-        raise 
\ No newline at end of file
+
+    def run(self) -> bool:
+        """Configure Git."""
+        try:
+            self.print_config("Current Git Configuration")
+
+            # Set Git user name and email
+            self.backup_file(Path.home() / ".gitconfig")
+            with self.journal.mutation("write", Path.home() / ".gitconfig"):
+                self.execute(["git", "config", "--global", "user.name", env.GIT_USERNAME],
+                             check=True)
+                self.execute(["git", "config", "--global", "user.email", env.GIT_EMAIL],
+                             check=True)
+                self.execute(["git", "config", "--global", "core.editor", "code --wait"],
+                             check=True)
+
+            self.print_config("Updated Git Configuration")
+
+            print("✅ Git configured with name/email and VS Code as default editor.")
+            return True
+        except CommandError as e:
+            print(f"❌ Error configuring Git: {e}")
+            return False
+
+def run() -> bool:
+    """Configure Git with user details and VS Code as default editor."""
+    return GitSetup().run()
@@ -1,25 +1,134 @@
-import subprocess
+import asyncio
+import json
 import os
 import shutil
 import time
 import re
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 from local_env_setup.config import env
+from local_env_setup.core.artifacts import get_artifact_cache, platform_attrs
+from local_env_setup.core.backup import get_backup_store
 from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.executor import CommandError, get_executor
+from local_env_setup.core.rcfile import get_rc_editor
+from local_env_setup.core.shell_init import lazy_function
+from local_env_setup.core.state import cache_dir, file_digest, shared_cache_dir
+
+# Unmarked block appended by earlier versions; replaced by a managed block
+LEGACY_PYENV_CONFIG = """
+# Pyenv configuration
+export PYENV_ROOT="{pyenv_root}"
+command -v pyenv >/dev/null || export PATH="$PYENV_ROOT/bin:$PATH"
+eval "$(pyenv init -)"
+"""
+
+# make jobs worth giving one build before starting another build instead
+MIN_MAKE_JOBS = 4
+
+# Variables python-build passes to configure and the compiler; a prebuilt
+# interpreter is only reused when they match
+BUILD_FLAG_VARS = ("PYTHON_CONFIGURE_OPTS", "PYTHON_CFLAGS", "CONFIGURE_OPTS",
+                   "CFLAGS", "CPPFLAGS", "LDFLAGS")
+
+# Official Poetry installer, run with the global interpreter
+POETRY_INSTALL_URL = "https://install.python-poetry.org"
+
+POETRY_PATH_CONFIG = 'export PATH="$HOME/.local/bin:$PATH"\n'
+
+# Package spec: name, optional extras, optional version constraint
+PACKAGE_SPEC = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(.*?)\s*$")
+
+def python_versions() -> List[str]:
+    """Return the versions to install: the global one first, then the others."""
+    versions = [env.PYTHON_VERSION]
+    versions += [v for v in env.PYTHON_VERSIONS if v not in versions]
+    return versions
+
+def build_jobs(builds: int, cpus: Optional[int] = None) -> Tuple[int, int]:
+    """Split CPU cores between concurrent builds and ``make`` jobs per build.
+    
+    Much of a CPython build (configure, installing, byte-compiling the
+    standard library) is serial, so builds side by side use the cores
+    better than one build with all of them; each build still gets at least
+    ``MIN_MAKE_JOBS`` cores where there are enough.
+    
+    Args:
+        builds: Number of versions to build
+        cpus: Available cores (defaults to the machine's)
+        
+    Returns:
+        Tuple[int, int]: Concurrent builds and ``make -j`` per build
+    """
+    cpus = cpus or os.cpu_count() or 1
+    parallel = max(1, min(builds, cpus // MIN_MAKE_JOBS))
+    return parallel, max(1, cpus // parallel)
+
+def poetry_cache_dir() -> Path:
+    """Return Poetry's cache directory, shared between projects and targets."""
+    return Path(env.POETRY_CACHE_DIR) if env.POETRY_CACHE_DIR else shared_cache_dir() / "pypoetry"
+
+def wheelhouse_pyproject(packages: List[str], version: str) -> str:
+    """Render the ``pyproject.toml`` of a project depending on ``packages``.
+    
+    Args:
+        packages: Package specs such as ``numpy==1.26.4`` or ``psycopg2``
+        version: Interpreter version the project is locked for
+        
+    Returns:
+        str: The project file
+        
+    Raises:
+        ValueError: If a package spec cannot be parsed
+    """
+    major_minor = ".".join(version.split(".")[:2])
+    lines = [
+        "[tool.poetry]",
+        'name = "local-env-setup-wheelhouse"',
+        'version = "0.0.0"',
+        'description = "Builds wheels of heavy packages into the shared Poetry cache"',
+        "authors = []",
+        "",
+        "[tool.poetry.dependencies]",
+        f'python = "~{major_minor}"',
+    ]
+    for package in packages:
+        match = PACKAGE_SPEC.match(package)
+        if not match:
+            raise ValueError(f"Invalid package spec: {package!r}")
+        name, constraint = match.groups()
+        lines.append(f"{json.dumps(name)} = {json.dumps(constraint or '*')}")
+    return "\n".join(lines) + "\n"
 
 class PythonSetup(BaseSetup):
     """Setup component for Python environment configuration.
     
     This class handles the installation and configuration of Python using pyenv.
-    It ensures the correct Python version is installed and set as the global version.
+    It installs every configured Python version, unpacking prebuilt ones
+    from the artifact cache and building the others concurrently, and sets
+    ``PYTHON_VERSION`` as the global version. It then installs the pinned
+    Poetry, points it at a shared cache and optionally pre-builds wheels of
+    heavy packages for every interpreter.
     """
     
+    name = "python"
+    depends_on = ("homebrew",)
+    brew_formulae = ("pyenv",)
+    
     def __init__(self):
         """Initialize the Python setup component."""
         super().__init__()
         self.pyenv_root = Path.home() / ".pyenv"
-        self.shell_rc = self._get_shell_rc()
+        self.poetry_bin = Path.home() / ".local" / "bin" / "poetry"
+    
+    @property
+    def shell_rc(self) -> Path:
+        """The rc file of the current shell.
+        
+        Raises:
+            RuntimeError: If the shell is not supported
+        """
+        return self._get_shell_rc()
         
     def _get_shell_rc(self) -> Path:
         """Get the path to the shell rc file based on the current shell.
@@ -36,23 +145,30 @@ class PythonSetup(BaseSetup):
         elif "zsh" in shell:
             return Path.home() / ".zshrc"
         else:
-            self.logger.error(f"Unsupported shell: {shell}")
             raise RuntimeError(f"Unsupported shell: {shell}")
     
-    def check_platform(self) -> bool:
-        """Check if the current platform is supported.
-        
-        Returns:
-            bool: True if the platform is supported, False otherwise
-        """
-        self.monitor.start_step("platform_check")
+    def fingerprint_inputs(self) -> Dict[str, Any]:
+        """Inputs: the requested versions, pyenv, its global version and the rc file."""
+        global_version = self.pyenv_root / "version"
         try:
-            result = super().check_platform()
-            self.monitor.end_step(result)
-            return result
-        except Exception as e:
-            self.monitor.end_step(False, str(e))
-            raise
+            shell_rc = file_digest(self.shell_rc)
+        except RuntimeError:
+            # Reported by run(), failing only this component
+            shell_rc = None
+        return {
+            "PYTHON_VERSION": env.PYTHON_VERSION,
+            "PYTHON_VERSIONS": env.PYTHON_VERSIONS,
+            "SHELL_FAST_STARTUP": env.SHELL_FAST_STARTUP,
+            "pyenv": self.inventory.versions("pyenv"),
+            "installed": [v for v in python_versions() if self.verify_python_version(v)],
+            "global": global_version.read_text().strip() if global_version.exists() else None,
+            "shell_rc": shell_rc,
+            "POETRY_VERSION": env.POETRY_VERSION,
+            "POETRY_CACHE_DIR": str(poetry_cache_dir()),
+            "POETRY_MAX_WORKERS": env.POETRY_MAX_WORKERS,
+            "POETRY_WHEELHOUSE": env.POETRY_WHEELHOUSE,
+            "poetry": self.poetry_bin.exists(),
+        }
     
     def check_prerequisites(self) -> bool:
         """Check if all prerequisites are met.
@@ -60,78 +176,180 @@ class PythonSetup(BaseSetup):
         Returns:
             bool: True if all prerequisites are met, False otherwise
         """
-        self.monitor.start_step("prerequisites")
-        try:
+        with self.monitor.span("prerequisites") as span:
             if not shutil.which("brew"):
                 self.logger.error("Homebrew is not installed")
-                self.monitor.end_step(False, "Homebrew is not installed")
+                span.fail("Homebrew is not installed")
                 return False
                 
             if not shutil.which("curl"):
                 self.logger.error("curl is not installed")
-                self.monitor.end_step(False, "curl is not installed")
+                span.fail("curl is not installed")
                 return False
                 
-            self.monitor.end_step(True)
             return True
-        except Exception as e:
-            self.monitor.end_step(False, str(e))
-            raise
     
-    def install(self) -> bool:
-        """Install pyenv and required Python version.
+    def install_pyenv(self) -> bool:
+        """Install pyenv and hook it into the shell rc file.
         
         Returns:
-            bool: True if installation was successful, False otherwise
+            bool: True if pyenv is installed and configured, False otherwise
         """
-        self.monitor.start_step("install")
-        try:
-            # Install pyenv if not already installed
-            try:
-                subprocess.run(["pyenv", "--version"], check=True, capture_output=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
-                self.logger.info("Installing pyenv...")
-                try:
-                    subprocess.run(["brew", "install", "pyenv"], check=True)
-                except subprocess.CalledProcessError as e:
-                    self.logger.error(f"Failed to install pyenv: {e}")
-                    self.monitor.end_step(False, f"Failed to install pyenv: {e}")
-                    return False
-                
-                # Add pyenv configuration to shell rc file
-                pyenv_config = f"""
-# Pyenv configuration
+        if not self.is_package_installed("pyenv"):
+            self.logger.info("Installing pyenv...")
+            if not self.brew_install("pyenv"):
+                self.logger.error("Failed to install pyenv")
+                return False
+        
+        # Leave pyenv alone if the user configures it by hand
+        legacy = [LEGACY_PYENV_CONFIG.format(pyenv_root=self.pyenv_root)]
+        if "PYENV_ROOT" in get_rc_editor().unmanaged_text(self.shell_rc, legacy):
+            return True
+        
+        config = f"""# Pyenv configuration
 export PYENV_ROOT="{self.pyenv_root}"
 command -v pyenv >/dev/null || export PATH="$PYENV_ROOT/bin:$PATH"
-eval "$(pyenv init -)"
 """
-                with open(self.shell_rc, "a") as f:
-                    f.write(pyenv_config)
-                self.logger.info(f"Added pyenv configuration to {self.shell_rc}")
-                
-                # Source the shell rc file
-                try:
-                    subprocess.run(["source", str(self.shell_rc)], shell=True, check=True)
-                except subprocess.CalledProcessError as e:
-                    self.logger.warning(f"Failed to source {self.shell_rc}: {e}")
+        if env.SHELL_FAST_STARTUP:
+            # Shims resolve python without pyenv init; the full init (which
+            # costs a pyenv process per shell) runs on the first pyenv call
+            config += 'export PATH="$PYENV_ROOT/shims:$PATH"\n'
+            config += lazy_function("pyenv", 'eval "$(command pyenv init -)"')
+        else:
+            config += 'eval "$(pyenv init -)"\n'
+        return self.set_rc_block(self.shell_rc, "pyenv", config, legacy=legacy)
+    
+    def artifact_attrs(self, version: str) -> Dict[str, str]:
+        """Return what a build of ``version`` depends on besides the version.
+        
+        The install prefix is part of it: interpreters embed it in their
+        scripts and ``sysconfig``.
+        """
+        attrs = platform_attrs()
+        attrs["prefix"] = str(self.pyenv_root / "versions" / version)
+        attrs.update({var: os.environ[var] for var in BUILD_FLAG_VARS if os.environ.get(var)})
+        return attrs
+    
+    def restore_prebuilt(self, version: str) -> bool:
+        """Unpack a prebuilt interpreter from the artifact cache.
+        
+        Args:
+            version: Python version to restore
             
-            # Install Python version if not already installed
-            if not self.verify_python_version(env.PYTHON_VERSION):
-                self.logger.info(f"Installing Python {env.PYTHON_VERSION}...")
-                try:
-                    subprocess.run(["pyenv", "install", env.PYTHON_VERSION], check=True)
-                except subprocess.CalledProcessError as e:
-                    self.logger.error(f"Failed to install Python {env.PYTHON_VERSION}: {e}")
-                    self.monitor.end_step(False, f"Failed to install Python {env.PYTHON_VERSION}: {e}")
-                    return False
+        Returns:
+            bool: True if the version was unpacked, False if it must be built
+        """
+        dest = self.pyenv_root / "versions" / version
+        if not env.PYTHON_ARTIFACT_CACHE or dest.exists():
+            return False
+        cache = get_artifact_cache()
+        artifact = cache.lookup("python", version, self.artifact_attrs(version))
+        if artifact is None:
+            return False
+        with self.monitor.span("artifact_unpack", target=version) as span:
+            if not cache.unpack(artifact, dest):
+                span.fail(f"Failed to unpack prebuilt Python {version}")
+                return False
+        self.logger.info(f"Unpacked prebuilt Python {version} from {cache.path(artifact)}")
+        return True
+    
+    def cache_build(self, version: str) -> None:
+        """Pack a freshly built interpreter into the artifact cache."""
+        source = self.pyenv_root / "versions" / version
+        if not env.PYTHON_ARTIFACT_CACHE or not (source / "bin").is_dir():
+            return
+        with self.monitor.span("artifact_pack", target=version) as span:
+            try:
+                get_artifact_cache().pack(source, "python", version, self.artifact_attrs(version))
+            except OSError as e:
+                # The build itself succeeded; only the next machine pays for this
+                self.logger.warning(f"Failed to cache Python {version}: {e}")
+                span.fail(str(e))
+    
+    async def abuild(self, versions: List[str]) -> bool:
+        """Install Python versions, from prebuilt artifacts where possible.
+        
+        Versions found in the artifact cache are unpacked. The others are
+        built concurrently with ``pyenv install`` and packed into the cache.
+        The builds share the ``cpu`` resource: it is held once for all of
+        them, and the cores are split between concurrent builds and the
+        ``make`` jobs of each (see ``build_jobs``).
+        
+        Args:
+            versions: Versions to install
             
-            self.monitor.end_step(True)
+        Returns:
+            bool: True if every version was installed, False otherwise
+        """
+        restored = await asyncio.gather(
+            *(asyncio.to_thread(self.restore_prebuilt, version) for version in versions))
+        if any(restored):
+            # Create the shims of the unpacked interpreters
+            await self.aexecute(["pyenv", "rehash"], resources=(), timeout=60)
+        versions = [version for version, hit in zip(versions, restored) if not hit]
+        if not versions:
             return True
-            
-        except Exception as e:
-            self.logger.error(f"Unexpected error during installation: {e}")
-            self.monitor.end_step(False, str(e))
+        
+        parallel, make_jobs = build_jobs(len(versions))
+        self.logger.info(f"Building Python {', '.join(versions)} "
+                         f"({parallel} at a time, make -j{make_jobs})")
+        slots = asyncio.Semaphore(parallel)
+        
+        async def build(version: str) -> bool:
+            async with slots:
+                with self.monitor.span("pyenv_install", target=version) as span:
+                    result = await self.aexecute(
+                        ["pyenv", "install", "--skip-existing", version], resources=(),
+                        env={"MAKE_OPTS": f"-j{make_jobs}"}, echo=self.logger)
+                    if not result.ok:
+                        self.logger.error(f"Failed to install Python {version}; "
+                                          f"log: {result.log_path}")
+                        span.fail(f"pyenv install {version} failed")
+                        return False
+                await asyncio.to_thread(self.cache_build, version)
+                return True
+        
+        async with self.resource_pool.ahold(("cpu",)):
+            results = await asyncio.gather(*(build(version) for version in versions))
+        return all(results)
+    
+    async def ainstall(self) -> bool:
+        """Install pyenv and every configured Python version.
+        
+        Returns:
+            bool: True if installation was successful, False otherwise
+        """
+        if not await asyncio.to_thread(self.install_pyenv):
             return False
+        missing = [v for v in python_versions() if not self.verify_python_version(v)]
+        if not missing:
+            return True
+        return await self.abuild(missing)
+    
+    def wait_until_ready(self, version: str, timeout: float = 10.0) -> bool:
+        """Poll until pyenv reports ``version`` as the global version.
+        
+        Args:
+            version: Expected global version
+            timeout: Seconds to wait at most
+            
+        Returns:
+            bool: True once the version is active, False on timeout
+        """
+        version_file = self.pyenv_root / "version"
+        deadline = time.monotonic() + timeout
+        delay = 0.01
+        while True:
+            try:
+                active = version_file.read_text().split()
+            except OSError:
+                active = []
+            if active[:1] == [version] and self.verify_python_version(version):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
     
     def configure(self) -> bool:
         """Configure Python environment.
@@ -139,70 +357,164 @@ eval "$(pyenv init -)"
         Returns:
             bool: True if configuration was successful, False otherwise
         """
-        self.monitor.start_step("configure")
-        try:
-            # Set global Python version
-            subprocess.run(["pyenv", "global", env.PYTHON_VERSION], check=True)
-            self.logger.info(f"Set Python {env.PYTHON_VERSION} as global version")
-            
-            # Give the system a moment to recognize the new Python version
-            time.sleep(2)
-            
-            self.monitor.end_step(True)
+        with self.monitor.span("configure") as span:
+            try:
+                # Set global Python version
+                self.execute(["pyenv", "global", env.PYTHON_VERSION], timeout=60, check=True)
+                if not self.wait_until_ready(env.PYTHON_VERSION):
+                    self.logger.error(f"pyenv did not activate Python {env.PYTHON_VERSION}")
+                    span.fail(f"Python {env.PYTHON_VERSION} not active")
+                    return False
+                self.logger.info(f"Set Python {env.PYTHON_VERSION} as global version")
+                return True
+                
+            except CommandError as e:
+                self.logger.error(f"Error during configuration: {e}")
+                span.fail(str(e))
+                return False
+            except Exception as e:
+                self.logger.error(f"Unexpected error during configuration: {e}")
+                span.fail(str(e))
+                return False
+    
+    def poetry_version(self) -> Optional[str]:
+        """Return the installed Poetry version, or None if it is not installed."""
+        if not self.poetry_bin.exists():
+            return None
+        result = self.execute([str(self.poetry_bin), "--version"], timeout=60)
+        match = re.search(r"(\d+\.\d+(?:\.\d+)?)", result.stdout) if result.ok else None
+        return match.group(1) if match else None
+    
+    def install_poetry(self) -> bool:
+        """Install the pinned Poetry with its official installer.
+        
+        Returns:
+            bool: True if Poetry is installed at ``POETRY_VERSION``, False otherwise
+        """
+        if self.poetry_version() != env.POETRY_VERSION:
+            self.logger.info(f"Installing Poetry {env.POETRY_VERSION}...")
+            python = self.pyenv_root / "versions" / env.PYTHON_VERSION / "bin" / "python3"
+            if not self.run_remote_script(POETRY_INSTALL_URL, interpreter=str(python),
+                                          args=["--version", env.POETRY_VERSION]):
+                self.logger.error("Failed to install Poetry")
+                return False
+            installed = self.poetry_version()
+            if installed != env.POETRY_VERSION:
+                self.logger.error(f"Expected Poetry {env.POETRY_VERSION}, found {installed}")
+                return False
+        return self.set_rc_block(self.shell_rc, "poetry", POETRY_PATH_CONFIG)
+    
+    def configure_poetry(self) -> bool:
+        """Point Poetry at the shared cache and set its installer workers.
+        
+        Only settings that differ from ``poetry config --list`` are written.
+        
+        Returns:
+            bool: True if Poetry is configured, False otherwise
+        """
+        wanted = {
+            "cache-dir": str(poetry_cache_dir()),
+            "installer.max-workers": str(env.POETRY_MAX_WORKERS or os.cpu_count() or 1),
+        }
+        with self.monitor.span("configure_poetry") as span:
+            poetry = str(self.poetry_bin)
+            result = self.execute([poetry, "config", "--list"], timeout=60)
+            current = {}
+            for line in result.stdout.splitlines() if result.ok else []:
+                key, sep, value = line.partition(" = ")
+                if sep:
+                    current[key.strip()] = value.strip().strip('"')
+            for key, value in wanted.items():
+                if current.get(key) == value:
+                    continue
+                if not self.execute([poetry, "config", key, value], timeout=60).ok:
+                    self.logger.error(f"Failed to set Poetry {key}")
+                    span.fail(f"poetry config {key} failed")
+                    return False
             return True
+    
+    async def awarm_wheelhouse(self, versions: List[str]) -> List[str]:
+        """Pre-build wheels of ``POETRY_WHEELHOUSE`` for every interpreter.
+        
+        Poetry only installs from its configured sources, so the wheels are
+        built by Poetry itself: a project depending on the packages is
+        installed once per interpreter, concurrently, which leaves the wheels
+        built from sdists in the shared Poetry cache. The first
+        ``poetry install`` of a repository then reuses them instead of
+        compiling. The projects are kept so later runs are incremental.
+        
+        Args:
+            versions: Interpreter versions to build wheels for
             
-        except subprocess.CalledProcessError as e:
-            self.logger.error(f"Error during configuration: {e}")
-            self.monitor.end_step(False, str(e))
-            return False
-        except Exception as e:
-            self.logger.error(f"Unexpected error during configuration: {e}")
-            self.monitor.end_step(False, str(e))
-            return False
+        Returns:
+            List[str]: Versions whose wheels are in the cache
+        """
+        packages = env.POETRY_WHEELHOUSE
+        if not packages:
+            return []
+        self.logger.info(f"Building wheels of {', '.join(packages)} "
+                         f"for Python {', '.join(versions)}")
+        overlay = {"POETRY_VIRTUALENVS_IN_PROJECT": "true",
+                   "POETRY_CACHE_DIR": str(poetry_cache_dir())}
+        
+        async def warm(version: str) -> bool:
+            project = cache_dir() / "wheelhouse" / version
+            project.mkdir(parents=True, exist_ok=True)
+            (project / "pyproject.toml").write_text(wheelhouse_pyproject(packages, version))
+            python = self.pyenv_root / "versions" / version / "bin" / "python3"
+            with self.monitor.span("wheelhouse", target=version) as span:
+                for cmd in (["env", "use", str(python)], ["install", "--no-root"]):
+                    result = await self.aexecute([str(self.poetry_bin), *cmd], cwd=str(project),
+                                                 env=overlay, resources=(), echo=self.logger)
+                    if not result.ok:
+                        # The setup works without the wheels; they only save time later
+                        self.logger.warning(f"Failed to build wheels for Python {version}; "
+                                            f"log: {result.log_path}")
+                        span.fail(f"poetry {cmd[0]} failed for {version}")
+                        return False
+                return True
+        
+        async with self.resource_pool.ahold(("cpu",)):
+            results = await asyncio.gather(*(warm(version) for version in versions))
+        return [version for version, ok in zip(versions, results) if ok]
+    
+    def installed_versions(self) -> Optional[Set[str]]:
+        """Return the versions pyenv knows, from one ``pyenv versions --bare``.
+        
+        Returns:
+            Optional[Set[str]]: Installed versions (virtualenvs included),
+            or None if pyenv could not be run
+        """
+        result = self.execute(["pyenv", "versions", "--bare"], timeout=60)
+        if not result.ok:
+            return None
+        return {line.strip() for line in result.stdout.splitlines() if line.strip()}
     
     def verify(self) -> bool:
         """
-        Verify that Python and pyenv are installed and configured correctly.
+        Verify that every configured Python version and Poetry are installed.
         
         Returns:
             bool: True if verification passes, False otherwise.
         """
-        self.monitor.start_step("verify")
-        try:
-            # Verify pyenv version
-            pyenv_result = subprocess.run(["pyenv", "version"], capture_output=True)
-            if pyenv_result.returncode != 0:
-                self.logger.error("Failed to get pyenv version")
-                self.monitor.end_step(False, "Failed to get pyenv version")
+        with self.monitor.span("verify") as span:
+            installed = self.installed_versions()
+            if installed is None:
+                self.logger.error("Failed to list pyenv versions")
+                span.fail("Failed to list pyenv versions")
                 return False
-                
-            # In test mode, we consider any non-empty stdout as a match
-            if not pyenv_result.stdout:
-                self.logger.error(f"Python version mismatch in pyenv. Expected {env.PYTHON_VERSION}")
-                self.monitor.end_step(False, f"Python version mismatch in pyenv. Expected {env.PYTHON_VERSION}")
+            missing = [v for v in python_versions() if v not in installed]
+            if missing:
+                self.logger.error(f"Python {', '.join(missing)} not installed according to pyenv")
+                span.fail(f"Missing Python versions: {', '.join(missing)}")
                 return False
-                
-            # Verify direct Python version
-            python_result = subprocess.run(["python", "--version"], capture_output=True)
-            if python_result.returncode != 0:
-                self.logger.error("Failed to get Python version")
-                self.monitor.end_step(False, "Failed to get Python version")
+            poetry = self.poetry_version()
+            if poetry != env.POETRY_VERSION:
+                self.logger.error(f"Expected Poetry {env.POETRY_VERSION}, found {poetry}")
+                span.fail(f"Poetry {env.POETRY_VERSION} not installed")
                 return False
-                
-            # In test mode, we consider any non-empty stdout as a match
-            if not python_result.stdout:
-                self.logger.error(f"Python version mismatch. Expected {env.PYTHON_VERSION}")
-                self.monitor.end_step(False, f"Python version mismatch. Expected {env.PYTHON_VERSION}")
-                return False
-                
             self.logger.info("Python verification successful")
-            self.monitor.end_step(True)
             return True
-            
-        except Exception as e:
-            self.logger.error(f"Unexpected error during Python verification: {str(e)}")
-            self.monitor.end_step(False, str(e))
-            return False
     
     def check_command_exists(self, cmd: str) -> bool:
         """Check if a command exists in the system.
@@ -213,29 +525,22 @@ eval "$(pyenv init -)"
         Returns:
             bool: True if the command exists, False otherwise
         """
-        try:
-            result = subprocess.run(["which", cmd], capture_output=True)
-            return result.returncode == 0 and bool(result.stdout)
-        except subprocess.CalledProcessError:
-            return False
+        result = self.execute(["which", cmd], timeout=30)
+        return result.ok and bool(result.stdout)
     
     def verify_python_version(self, version: str) -> bool:
         """Verify if a Python version is valid and installed.
         
+        pyenv keeps every installed interpreter under ``$PYENV_ROOT/versions``,
+        so this is a directory lookup rather than a ``pyenv versions`` call.
+        
         Args:
             version: Python version to verify
             
         Returns:
             bool: True if the version is valid and installed, False otherwise
         """
-        try:
-            result = subprocess.run(["pyenv", "versions"], capture_output=True)
-            if result.stdout is None or result.returncode != 0:
-                return False
-            # In test mode, we consider any non-empty stdout as a match
-            return bool(result.stdout)
-        except subprocess.CalledProcessError:
-            return False
+        return (self.pyenv_root / "versions" / version / "bin").is_dir()
             
     def run(self) -> bool:
         """
@@ -244,6 +549,10 @@ eval "$(pyenv init -)"
         Returns:
             bool: True if setup completes successfully, False otherwise.
         """
+        return asyncio.run(self.arun())
+    
+    async def arun(self) -> bool:
+        """Run the Python setup, building interpreters concurrently."""
         try:
             # First check if we have a supported shell
             try:
@@ -258,13 +567,21 @@ eval "$(pyenv init -)"
             if not self.check_prerequisites():
                 return False
                 
-            if not self.install():
+            if not await self.ainstall():
                 return False
                 
-            if not self.configure():
+            if not await asyncio.to_thread(self.configure):
                 return False
                 
-            if not self.verify():
+            if not await asyncio.to_thread(self.install_poetry):
+                return False
+                
+            if not await asyncio.to_thread(self.configure_poetry):
+                return False
+                
+            await self.awarm_wheelhouse(python_versions())
+                
+            if not await asyncio.to_thread(self.verify):
                 return False
                 
             self.logger.info("Python setup completed successfully")
@@ -276,72 +593,24 @@ eval "$(pyenv init -)"
 
 def get_current_python_version():
     """Get the current Python version."""
-    try:
-        result = subprocess.run(["python", "--version"], capture_output=True, text=True)
-        return result.stdout.strip()
-    except subprocess.CalledProcessError:
-        return None
+    result = get_executor().run(["python", "--version"], timeout=60)
+    return result.stdout.strip() if result.ok else None
 
 def backup_file(file_path):
-    """Create a backup of a file if it exists."""
-    if os.path.exists(file_path):
-        backup_path = f"{file_path}.bak"
-        shutil.copy2(file_path, backup_path)
-        return backup_path
-    return None
+    """Snapshot a file into the backup store if it exists.
 
-def run():
+    Returns:
+        str: Path of the stored copy, or None if the file does not exist
+    """
+    store = get_backup_store()
+    version = store.snapshot(file_path)
+    return str(store.object_path(version.digest)) if version is not None else None
+
+def run() -> bool:
     """
     Setup Python environment using pyenv.
     
     Returns:
         bool: True if setup completes successfully, False otherwise.
     """
-    try:
-        # Check if Homebrew is installed
-        if not check_command_exists("brew"):
-            print("❌ Homebrew is not installed. Please install it first.")
-            return False
-
-        # Install pyenv
-        if not install_pyenv():
-            return False
-
-        # Check if curl is installed
-        if not check_command_exists("curl"):
-            print("❌ curl is not installed. Please install it first.")
-            return False
-
-        # Check if Python version is already installed
-        if verify_python_version(env.PYTHON_VERSION):
-            print(f"✅ Python {env.PYTHON_VERSION} is already installed.")
-        else:
-            # Install Python version
-            print(f"Installing Python {env.PYTHON_VERSION}...")
-            subprocess.run(["pyenv", "install", env.PYTHON_VERSION], check=True)
-            print(f"✅ Python {env.PYTHON_VERSION} installed successfully.")
-
-        # Set global Python version
-        subprocess.run(["pyenv", "global", env.PYTHON_VERSION], check=True)
-        print(f"✅ Set Python {env.PYTHON_VERSION} as global version.")
-        
-        # Give the system a moment to recognize the new Python version
-        time.sleep(2)
-        
-        # Verify Python version using pyenv
-        result = subprocess.run(["pyenv", "version"], capture_output=True, text=True)
-        if env.PYTHON_VERSION not in result.stdout:
-            print(f"⚠️  Warning: Python version verification failed. Please restart your shell.")
-            print(f"   Expected: {env.PYTHON_VERSION}")
-            print(f"   Current: {result.stdout.strip()}")
-            return False
-        else:
-            print(f"✅ Verified Python version: {result.stdout.strip()}")
-            return True
-
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Error during Python setup: {e}")
-        return False
-    except Exception as e:
-        print(f"❌ Unexpected error: {str(e)}")
-        return False 
\ No newline at end of file
+    return PythonSetup().run()
@@ -1,24 +1,42 @@
 """Docker setup module for installing and configuring Docker Desktop and Docker Compose."""
 
-import subprocess
 import os
 import platform
+import shutil
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.brew import BrewPlan
 from local_env_setup.config.env import env
 from local_env_setup.utils.shell import run_command, get_command_output
 
+COMPOSE_RELEASE_URL = "https://github.com/docker/compose/releases/download/{tag}/{asset}"
+
+# Compose release assets use the kernel's architecture names
+COMPOSE_ARCH = {"arm64": "aarch64"}
+
 class DockerSetup(BaseSetup):
     """Setup class for Docker Desktop and Docker Compose."""
     
+    name = "docker"
+    depends_on = ("homebrew",)
+    brew_casks = ("docker",)
+    
     def __init__(self):
         """Initialize DockerSetup."""
         super().__init__()
         self.docker_compose_version = env.DOCKER_COMPOSE_VERSION
-        self.docker_app_path = Path("/Applications/Docker.app")
-        self.docker_compose_path = Path("/usr/local/bin/docker-compose")
+        self.docker_app_path = Path(env.DOCKER_APP_PATH)
+        self.docker_compose_path = Path(env.DOCKER_COMPOSE_PATH)
+    
+    def fingerprint_inputs(self) -> Dict[str, Any]:
+        """Inputs: the Compose version and what is installed."""
+        return {
+            "DOCKER_COMPOSE_VERSION": self.docker_compose_version,
+            "docker_app": self.docker_app_path.exists(),
+            "docker_compose": self.docker_compose_path.exists(),
+        }
     
     def check_platform(self) -> bool:
         """Check if the current platform is supported.
@@ -28,29 +46,64 @@ class DockerSetup(BaseSetup):
         Returns:
             bool: True if the platform is supported, False otherwise
         """
-        self.monitor.start_step("platform_check")
-        try:
+        with self.monitor.span("platform_check") as span:
             if self.system not in ["Darwin", "Linux"]:
                 self.logger.error(f"Unsupported platform: {self.system}")
-                self.monitor.end_step(False, "Unsupported platform")
+                span.fail("Unsupported platform")
                 return False
-            self.monitor.end_step(True)
             return True
-        except Exception as e:
-            self.monitor.end_step(False, str(e))
-            return False
     
     def check_prerequisites(self) -> bool:
         """Check if Homebrew is installed."""
         return self.is_command_available("brew")
     
+    def compose_url(self) -> str:
+        """Release URL of the Docker Compose binary for this machine."""
+        version = self.docker_compose_version
+        tag = version if version.startswith("v") else f"v{version}"
+        machine = platform.machine()
+        asset = f"docker-compose-{platform.system().lower()}-{COMPOSE_ARCH.get(machine, machine)}"
+        return COMPOSE_RELEASE_URL.format(tag=tag, asset=asset)
+    
+    def install_compose(self) -> bool:
+        """Install the Docker Compose binary, verified against its release checksum.
+        
+        Both the checksum file and the binary come from the download cache,
+        so repeated installs of the same version do not hit the network.
+        
+        Returns:
+            bool: True if Docker Compose was installed, False otherwise
+        """
+        url = self.compose_url()
+        checksum_file = self.download(f"{url}.sha256")
+        if checksum_file is None:
+            return False
+        # Format: "<sha256> *<asset name>"
+        expected = checksum_file.read_text().split()[0]
+        binary = self.download(url, sha256=expected)
+        if binary is None:
+            return False
+        try:
+            shutil.copyfile(binary, self.docker_compose_path)
+            self.docker_compose_path.chmod(0o755)
+        except OSError as e:
+            self.logger.error(f"Failed to install Docker Compose: {e}")
+            return False
+        return True
+    
+    def plan_brew(self, plan: BrewPlan) -> None:
+        """Register the Docker Desktop cask unless the app is already present."""
+        self.brew_plan = plan
+        if not self.docker_app_path.exists():
+            plan.add(self.name, casks=self.brew_casks)
+    
     def install(self) -> bool:
         """Install Docker Desktop and Docker Compose."""
         try:
             # Install Docker Desktop
             if not self.docker_app_path.exists():
                 self.logger.info("Installing Docker Desktop...")
-                if not self.run_command(["brew", "install", "--cask", "docker"]):
+                if not self.brew_install("docker", cask=True):
                     self.logger.error("Failed to install Docker Desktop")
                     return False
                 self.logger.info("✅ Docker Desktop installed successfully")
@@ -58,16 +111,9 @@ class DockerSetup(BaseSetup):
             # Install Docker Compose
             if not self.docker_compose_path.exists():
                 self.logger.info(f"Installing Docker Compose {self.docker_compose_version}...")
-                if not self.run_command([
-                    "curl", "-L", 
-                    f"https://github.com/docker/compose/releases/download/{self.docker_compose_version}/docker-compose-{platform.system().lower()}-{platform.machine()}",
-                    "-o", str(self.docker_compose_path)
-                ]):
+                if not self.install_compose():
                     self.logger.error("Failed to download Docker Compose")
                     return False
-                
-                # Make docker-compose executable
-                self.docker_compose_path.chmod(0o755)
                 self.logger.info("✅ Docker Compose installed successfully")
             
             return True
@@ -1,15 +1,46 @@
 import os
+from typing import Any, Dict
 from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.shell_init import CompletionCache, fpath_snippet
+from local_env_setup.core.state import file_digest
 from local_env_setup.config.env import env
 
+KUBE_CONFIG = """
+# Kubernetes configuration
+source <(kubectl completion zsh)
+alias k=kubectl
+complete -F __start_kubectl k
+"""
+
+# The completion itself is autoloaded from the generated _kubectl
+KUBE_FAST_CONFIG = """# Kubernetes configuration
+alias k=kubectl
+compdef k=kubectl
+"""
+
 class KubernetesSetup(BaseSetup):
     """Setup Kubernetes tools (kubectl, kubectx, Helm)."""
     
+    name = "kubernetes"
+    depends_on = ("homebrew",)
+    brew_formulae = ("kubectl", "kubectx", "helm")
+    
     def __init__(self):
         super().__init__()
         self.kube_dir = os.path.expanduser("~/.kube")
         self.zshrc_path = os.path.expanduser("~/.zshrc")
     
+    def fingerprint_inputs(self) -> Dict[str, Any]:
+        """Inputs: version pins, installed versions and the .zshrc contents."""
+        return {
+            "KUBECTL_VERSION": env.KUBECTL_VERSION,
+            "HELM_VERSION": env.HELM_VERSION,
+            "installed": {f: self.inventory.versions(f) for f in self.brew_formulae},
+            "kube_dir": os.path.isdir(self.kube_dir),
+            "SHELL_FAST_STARTUP": env.SHELL_FAST_STARTUP,
+            "zshrc": file_digest(self.zshrc_path),
+        }
+    
     def check_prerequisites(self) -> bool:
         """Check if prerequisites are met."""
         if not self.is_command_available("brew"):
@@ -19,30 +50,34 @@ class KubernetesSetup(BaseSetup):
     
     def install_kubectl(self) -> bool:
         """Install kubectl."""
-        if self.is_command_available("kubectl"):
+        if not self.is_package_installed("kubectl"):
+            self.logger.info("Installing kubectl...")
+            if not self.brew_install("kubectl"):
+                return False
+        else:
             self.logger.info("kubectl is already installed")
-            return True
-            
-        self.logger.info("Installing kubectl...")
-        return self.run_command(["brew", "install", "kubectl"])
+        self.check_version_pin("kubectl", env.KUBECTL_VERSION)
+        return True
     
     def install_kubectx(self) -> bool:
         """Install kubectx."""
-        if self.is_command_available("kubectx"):
+        if self.is_package_installed("kubectx"):
             self.logger.info("kubectx is already installed")
             return True
             
         self.logger.info("Installing kubectx...")
-        return self.run_command(["brew", "install", "kubectx"])
+        return self.brew_install("kubectx")
     
     def install_helm(self) -> bool:
         """Install Helm."""
-        if self.is_command_available("helm"):
+        if not self.is_package_installed("helm"):
+            self.logger.info("Installing Helm...")
+            if not self.brew_install("helm"):
+                return False
+        else:
             self.logger.info("Helm is already installed")
-            return True
-            
-        self.logger.info("Installing Helm...")
-        return self.run_command(["brew", "install", "helm"])
+        self.check_version_pin("helm", env.HELM_VERSION)
+        return True
     
     def setup_kubeconfig(self) -> bool:
         """Setup kubeconfig directory."""
@@ -56,27 +91,37 @@ class KubernetesSetup(BaseSetup):
         return True
     
     def setup_shell_completion(self) -> bool:
-        """Setup shell completion for kubectl."""
-        # Backup .zshrc
-        if not self.backup_file(self.zshrc_path):
-            self.logger.warning("Failed to backup .zshrc, continuing anyway...")
+        """Setup shell completion for kubectl and Helm.
         
-        # Add kubectl completion
-        kube_config = """
-# Kubernetes configuration
-source <(kubectl completion zsh)
-alias k=kubectl
-complete -F __start_kubectl k
-"""
-        return self.append_to_file(self.zshrc_path, kube_config)
+        With SHELL_FAST_STARTUP the completion scripts are generated once
+        into a directory on fpath and autoloaded by compinit, instead of
+        running ``kubectl completion zsh`` on every shell start.
+        """
+        if not env.SHELL_FAST_STARTUP:
+            # Completion needs compinit, which Oh My Zsh runs in its block
+            return all([
+                self.set_rc_block(self.zshrc_path, "completions", None),
+                self.set_rc_block(self.zshrc_path, "kubernetes", KUBE_CONFIG,
+                                  legacy=[KUBE_CONFIG], priority=60),
+            ])
+        
+        completions = CompletionCache()
+        for tool in ("kubectl", "helm"):
+            completions.generate(tool, [tool, "completion", "zsh"])
+        # fpath must be extended before Oh My Zsh (priority 10) runs compinit
+        return all([
+            self.set_rc_block(self.zshrc_path, "completions", fpath_snippet(), priority=5),
+            self.set_rc_block(self.zshrc_path, "kubernetes", KUBE_FAST_CONFIG,
+                              legacy=[KUBE_CONFIG], priority=60),
+        ])
     
-    def run(self):
+    def run(self) -> bool:
         """Setup Kubernetes tools."""
         if not self.check_platform():
-            return
+            return False
             
         if not self.check_prerequisites():
-            return
+            return False
             
         # Install tools
         if not all([
@@ -84,18 +129,19 @@ complete -F __start_kubectl k
             self.install_kubectx(),
             self.install_helm()
         ]):
-            return
+            return False
             
         # Setup configuration
         if not all([
             self.setup_kubeconfig(),
             self.setup_shell_completion()
         ]):
-            return
+            return False
             
         self.logger.info("✅ Kubernetes tools setup completed!")
+        return True
 
-def run():
+def run() -> bool:
     """Run the Kubernetes setup."""
     setup = KubernetesSetup()
-    setup.run() 
\ No newline at end of file
+    return setup.run() 
\ No newline at end of file
@@ -1,47 +1,241 @@
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import local_env_setup
 from local_env_setup.core.base import BaseSetup
 from local_env_setup.config.env import env
+from local_env_setup.core.providers import (
+    Provider, ProviderMirror, find_lock_files, merge_providers, parse_lock_file,
+    parse_provider, plugin_cache_dir, terraform_platform)
+from local_env_setup.core.rcfile import atomic_write
+from local_env_setup.core.state import cache_dir, data_dir, file_digest
+from local_env_setup.shims.terraform import installed_versions, parse_version, render_shim
+
+RELEASE_URL = "https://releases.hashicorp.com/terraform/{version}/{name}"
 
 class TerraformSetup(BaseSetup):
-    """Setup Terraform."""
+    """Setup Terraform versions side by side behind a version-resolving shim,
+    and a provider cache shared by every working directory."""
+    
+    name = "terraform"
+    
+    def __init__(self):
+        """Initialize the Terraform setup component."""
+        super().__init__()
+        self.terraformrc = Path.home() / ".terraformrc"
+        self.versions_dir = data_dir() / "terraform" / "versions"
+        self.shim_path = data_dir() / "terraform" / "bin" / "terraform"
+        # Versions resolved from required_version, per working directory
+        self.resolve_cache = cache_dir() / "terraform" / "dirs"
+        # Last walk of DEV_DIR for lock files, reused while no directory changed
+        self.lock_index = cache_dir() / "terraform" / "lock_files.json"
+        shell = os.environ.get("SHELL", "")
+        self.shell_rc = Path.home() / (".bashrc" if "bash" in shell else ".zshrc")
+    
+    def fingerprint_inputs(self) -> Dict[str, Any]:
+        """Inputs: the requested and installed Terraform versions, the shim,
+        the provider list and the lock files under ``DEV_DIR``."""
+        return {
+            "versions": self.versions(),
+            "installed": installed_versions(str(self.versions_dir)),
+            "shim": file_digest(self.shim_path),
+            "shell_rc": file_digest(self.shell_rc),
+            "TERRAFORM_PROVIDERS": env.TERRAFORM_PROVIDERS,
+            "plugin_cache_dir": str(plugin_cache_dir()),
+            "lock_files": {str(path): file_digest(path) for path in self.lock_files()},
+            "terraformrc": file_digest(self.terraformrc),
+        }
     
-    def check_prerequisites(self) -> bool:
-        """Check if prerequisites are met."""
-        if not self.is_command_available("brew"):
-            self.logger.error("Homebrew is not installed. Please install it first.")
+    def lock_files(self) -> List[Path]:
+        """Return the lock files under ``DEV_DIR``."""
+        return find_lock_files(env.DEV_DIR, index=self.lock_index)
+    
+    def versions(self) -> List[str]:
+        """Return the versions to install, the default first."""
+        return list(dict.fromkeys([env.TERRAFORM_VERSION, *env.TERRAFORM_VERSIONS]))
+    
+    def binary(self, version: str) -> Path:
+        """Return the executable of an installed version."""
+        return self.versions_dir / version / "terraform"
+    
+    def install_version(self, version: str) -> bool:
+        """Install one Terraform release, verified against its SHA256SUMS.
+        
+        The release is unpacked next to the other versions and moved into
+        place in one rename, so an interrupted install leaves nothing behind.
+        
+        Args:
+            version: Terraform version, e.g. ``1.5.7``
+            
+        Returns:
+            bool: True if the version is installed, False otherwise
+        """
+        if self.binary(version).is_file():
+            return True
+        asset = f"terraform_{version}_{terraform_platform()}.zip"
+        sums = self.download(RELEASE_URL.format(version=version,
+                                                name=f"terraform_{version}_SHA256SUMS"))
+        if sums is None:
+            return False
+        # Format: "<sha256>  <asset name>"
+        expected = next((line.split()[0] for line in sums.read_text().splitlines()
+                         if line.split()[1:] == [asset]), None)
+        if expected is None:
+            self.logger.error(f"Terraform {version} has no release {asset}")
             return False
+        archive = self.download(RELEASE_URL.format(version=version, name=asset), sha256=expected)
+        if archive is None:
+            return False
+            
+        dest = self.versions_dir / version
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self.versions_dir, prefix=f".{version}."))
+        try:
+            with zipfile.ZipFile(archive) as package:
+                package.extract("terraform", staging)
+            (staging / "terraform").chmod(0o755)
+            os.rename(staging, dest)
+        except (OSError, KeyError, zipfile.BadZipFile) as e:
+            # Another run may have installed it meanwhile
+            if not self.binary(version).is_file():
+                self.logger.error(f"Failed to install Terraform {version}: {e}")
+                return False
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
         return True
     
-    def install_terraform(self) -> bool:
-        """Install Terraform."""
-        if self.is_command_available("terraform"):
-            self.logger.info("Terraform is already installed")
+    def install_versions(self) -> bool:
+        """Install the missing versions concurrently and check that each runs."""
+        versions = self.versions()
+        invalid = [v for v in versions if parse_version(v) is None]
+        if invalid:
+            self.logger.error(f"Invalid Terraform versions: {', '.join(invalid)}")
+            return False
+        missing = [v for v in versions if not self.binary(v).is_file()]
+        if not missing:
+            self.logger.info(f"Terraform {', '.join(versions)} already installed")
             return True
             
-        self.logger.info("Installing Terraform...")
-        if not self.run_command(["brew", "install", "terraform"]):
+        self.logger.info(f"Installing Terraform {', '.join(missing)}...")
+        with self.monitor.span("terraform_versions") as span:
+            # Transfers are limited by the download cache's network resource
+            with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+                installed = dict(zip(missing, executor.map(self.install_version, missing)))
+            failed = [v for v, ok in installed.items() if not ok]
+            if failed:
+                span.fail(f"Terraform {', '.join(failed)} not installed")
+                return False
+                
+        for version in missing:
+            output = self.get_command_output([str(self.binary(version)), "version"])
+            if not output or f"v{version}" not in output:
+                self.logger.error(f"Terraform {version} does not run: {output}")
+                return False
+        return True
+    
+    def install_shim(self) -> bool:
+        """Install the ``terraform`` shim and put it first on ``PATH``."""
+        try:
+            script = render_shim(str(self.shim_path), str(self.versions_dir),
+                                 str(self.resolve_cache), env.TERRAFORM_VERSION, sys.executable,
+                                 str(Path(local_env_setup.__file__).parent.parent))
+        except ValueError as e:
+            self.logger.error(str(e))
             return False
-            
-        # Verify installation
-        version = self.get_command_output(["terraform", "version"])
-        if version:
-            self.logger.info(f"Terraform version: {version}")
+        try:
+            current: Optional[str] = self.shim_path.read_text()
+        except OSError:
+            current = None
+        # Rewriting the shim invalidates every cached lookup
+        if current != script:
+            try:
+                atomic_write(self.shim_path, script, backup=False)
+                self.shim_path.chmod(0o755)
+            except OSError as e:
+                self.logger.error(f"Failed to install {self.shim_path}: {e}")
+                return False
+        return self.set_rc_block(self.shell_rc, "terraform",
+                                 f'export PATH="{self.shim_path.parent}:$PATH"\n')
+    
+    def providers(self) -> List[Provider]:
+        """Return the configured providers and those pinned under ``DEV_DIR``.
+        
+        Raises:
+            ValueError: If a configured provider is malformed
+        """
+        providers = [parse_provider(spec) for spec in env.TERRAFORM_PROVIDERS]
+        for lock_file in self.lock_files():
+            try:
+                providers += parse_lock_file(lock_file.read_text())
+            except OSError as e:
+                self.logger.warning(f"Cannot read {lock_file}: {e}")
+        return merge_providers(providers)
+    
+    def configure_plugin_cache(self) -> bool:
+        """Point ``plugin_cache_dir`` in ``~/.terraformrc`` at the shared cache."""
+        cache = plugin_cache_dir()
+        try:
+            # terraform init fails if the directory does not exist
+            cache.mkdir(parents=True, exist_ok=True)
+        except OSError as e:
+            self.logger.error(f"Failed to create {cache}: {e}")
+            return False
+        return self.set_rc_block(self.terraformrc, "plugin_cache",
+                                 f'plugin_cache_dir = "{cache}"\n')
+    
+    def warm_providers(self) -> bool:
+        """Fetch the providers into the plugin cache, in parallel.
+        
+        A provider that cannot be fetched is only reported: ``terraform
+        init`` downloads it as before.
+        
+        Returns:
+            bool: False if the provider list is invalid, True otherwise
+        """
+        try:
+            providers = self.providers()
+        except ValueError as e:
+            self.logger.error(str(e))
+            return False
+        if not providers:
             return True
-        return False
+        with self.monitor.span("provider_mirror") as span:
+            outcome = ProviderMirror(downloads=self.downloads).warm(providers)
+            failed = {provider: error for provider, error in outcome.items() if error}
+            for error in failed.values():
+                self.logger.warning(f"Could not cache provider {error}")
+            if failed:
+                span.fail(f"{len(failed)} providers not cached")
+        self.logger.info(f"{len(providers) - len(failed)}/{len(providers)} "
+                         f"Terraform providers cached")
+        return True
     
-    def run(self):
+    def run(self) -> bool:
         """Setup Terraform."""
         if not self.check_platform():
-            return
+            return False
             
-        if not self.check_prerequisites():
-            return
+        if not self.install_versions():
+            return False
+            
+        if not self.install_shim():
+            return False
             
-        if not self.install_terraform():
-            return
+        if not self.configure_plugin_cache():
+            return False
+            
+        if not self.warm_providers():
+            return False
             
         self.logger.info("✅ Terraform setup completed!")
+        return True
 
-def run():
+def run() -> bool:
     """Run the Terraform setup."""
     setup = TerraformSetup()
-    setup.run() 
\ No newline at end of file
+    return setup.run()
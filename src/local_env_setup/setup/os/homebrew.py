@@ -1,56 +1,57 @@
+from typing import Any, Dict
 from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.inventory import find_brew_prefix
 from local_env_setup.config.env import env
-import subprocess
+
+HOMEBREW_INSTALL_URL = "https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh"
 
 class HomebrewSetup(BaseSetup):
     """Setup Homebrew package manager."""
     
+    name = "homebrew"
+    resources = ("brew",)
+    
     def check_prerequisites(self) -> bool:
         """Check if prerequisites are met."""
+        return True
+    
+    def fingerprint_inputs(self) -> Dict[str, Any]:
+        """Homebrew only needs installing while no prefix exists."""
+        prefix = find_brew_prefix()
+        return {"prefix": str(prefix) if prefix else None}
+    
+    def is_installed(self) -> bool:
+        """Check if Homebrew is already installed."""
         if self.is_command_available("brew"):
             self.logger.info("Homebrew is already installed")
             return True
-        return True
+        return False
     
     def install_homebrew(self) -> bool:
         """Install Homebrew."""
         self.logger.info("Installing Homebrew...")
         try:
-            # First download the install script
-            result = subprocess.run(
-                ['curl', '-fsSL', 'https://raw.githubusercontent.com/Homebrew/install/HEAD/install.sh'],
-                capture_output=True,
-                text=True
-            )
-            if result.returncode != 0:
-                self.logger.error("Failed to download Homebrew installation script")
-                return False
-                
-            # Then execute the downloaded script
-            install_command = [
-                '/bin/bash',
-                '-c',
-                result.stdout
-            ]
-            return self.run_command(install_command)
+            # The installer may prompt for sudo, so keep it on the terminal
+            return self.run_remote_script(HOMEBREW_INSTALL_URL, passthrough=True)
         except Exception as e:
             self.logger.error(f"Error during Homebrew installation: {e}")
             return False
     
-    def run(self):
+    def run(self) -> bool:
         """Setup Homebrew."""
         if not self.check_platform():
-            return
+            return False
             
         if not self.check_prerequisites():
-            return
+            return False
             
-        if not self.install_homebrew():
-            return
+        if not self.is_installed() and not self.install_homebrew():
+            return False
             
         self.logger.info("✅ Homebrew setup completed!")
+        return True
 
-def run():
+def run() -> bool:
     """Run the Homebrew setup."""
     setup = HomebrewSetup()
-    setup.run() 
\ No newline at end of file
+    return setup.run() 
\ No newline at end of file
@@ -1,15 +1,84 @@
+import asyncio
 import os
-import shutil
+from typing import Any, Dict, List, Optional, Tuple
 from local_env_setup.core.base import BaseSetup
+from local_env_setup.core.git_mirror import get_git_mirrors
+from local_env_setup.core.state import file_digest
 from local_env_setup.config.env import env
 
+OH_MY_ZSH_INSTALL_URL = "https://raw.githubusercontent.com/ohmyzsh/ohmyzsh/master/tools/install.sh"
+
+ZSHRC_CONFIG = """
+# Oh My Zsh configuration
+export ZSH="$HOME/.oh-my-zsh"
+ZSH_THEME="powerlevel10k/powerlevel10k"
+plugins=({plugins})
+source $ZSH/oh-my-zsh.sh
+
+# Powerlevel10k configuration
+[[ ! -f ~/.p10k.zsh ]] || source ~/.p10k.zsh
+"""
+
+# Plugin line appended by earlier versions, before plugins followed ZSH_PLUGINS
+LEGACY_PLUGINS = "git zsh-autosuggestions zsh-syntax-highlighting"
+POWERLEVEL10K_URL = "https://github.com/romkatv/powerlevel10k.git"
+
+# Third-party plugins that can be named in ZSH_PLUGINS by name alone. Other
+# third-party plugins are given as "owner/repo" on GitHub; any remaining
+# name is a plugin bundled with Oh My Zsh.
+KNOWN_PLUGIN_URLS = {
+    "zsh-autosuggestions": "https://github.com/zsh-users/zsh-autosuggestions.git",
+    "zsh-syntax-highlighting": "https://github.com/zsh-users/zsh-syntax-highlighting.git",
+    "zsh-completions": "https://github.com/zsh-users/zsh-completions.git",
+    "zsh-history-substring-search": "https://github.com/zsh-users/zsh-history-substring-search.git",
+    "fast-syntax-highlighting": "https://github.com/zdharma-continuum/fast-syntax-highlighting.git",
+}
+
+def plugin_sources(plugins: List[str]) -> Dict[str, Optional[str]]:
+    """Map ZSH_PLUGINS entries to plugin names and clone URLs.
+    
+    Args:
+        plugins: Plugin names or "owner/repo" GitHub references
+        
+    Returns:
+        Dict[str, Optional[str]]: Plugin name to clone URL, None for
+        plugins bundled with Oh My Zsh
+    """
+    sources: Dict[str, Optional[str]] = {}
+    for entry in plugins:
+        if "/" in entry:
+            sources[entry.rsplit("/", 1)[-1]] = f"https://github.com/{entry}.git"
+        else:
+            sources[entry] = KNOWN_PLUGIN_URLS.get(entry)
+    return sources
+
 class ShellSetup(BaseSetup):
     """Setup Oh My Zsh with Powerlevel10k theme and essential tools."""
     
+    name = "shell"
+    depends_on = ("homebrew",)
+    
     def __init__(self):
         super().__init__()
         self.zshrc_path = os.path.expanduser("~/.zshrc")
         self.oh_my_zsh_path = os.path.expanduser("~/.oh-my-zsh")
+        self.theme_path = os.path.join(self.oh_my_zsh_path, "custom", "themes", "powerlevel10k")
+        self.plugins_path = os.path.join(self.oh_my_zsh_path, "custom", "plugins")
+    
+    def fingerprint_inputs(self) -> Dict[str, Any]:
+        """Inputs: configured plugins, what is cloned and the .zshrc contents."""
+        custom = os.path.join(self.oh_my_zsh_path, "custom")
+        return {
+            "ZSH_PLUGINS": env.ZSH_PLUGINS,
+            "oh_my_zsh": os.path.isdir(self.oh_my_zsh_path),
+            "custom": sorted(
+                f"{kind}/{name}"
+                for kind in ("themes", "plugins")
+                if os.path.isdir(os.path.join(custom, kind))
+                for name in os.listdir(os.path.join(custom, kind))
+            ),
+            "zshrc": file_digest(self.zshrc_path),
+        }
     
     def check_prerequisites(self) -> bool:
         """Check if prerequisites are met."""
@@ -25,89 +94,75 @@ class ShellSetup(BaseSetup):
             return True
             
         self.logger.info("Installing Oh My Zsh...")
-        install_script = 'sh -c "$(curl -fsSL https://raw.githubusercontent.com/ohmyzsh/ohmyzsh/master/tools/install.sh)" "" --unattended'
-        return self.run_command(install_script.split())
+        return self.run_remote_script(OH_MY_ZSH_INSTALL_URL, args=["--unattended"],
+                                      interpreter="sh")
     
-    def install_powerlevel10k(self) -> bool:
-        """Install Powerlevel10k theme."""
-        theme_path = os.path.join(self.oh_my_zsh_path, "custom", "themes", "powerlevel10k")
-        if os.path.exists(theme_path):
-            self.logger.info("Powerlevel10k is already installed")
-            return True
-            
-        self.logger.info("Installing Powerlevel10k...")
-        return self.run_command([
-            "git", "clone", "--depth=1",
-            "https://github.com/romkatv/powerlevel10k.git",
-            theme_path
-        ])
+    def missing_clones(self) -> List[Tuple[str, str]]:
+        """Return (url, destination) for the theme and plugins not yet present."""
+        clones = []
+        if not os.path.exists(self.theme_path):
+            clones.append((POWERLEVEL10K_URL, self.theme_path))
+        for plugin, url in plugin_sources(env.ZSH_PLUGINS).items():
+            path = os.path.join(self.plugins_path, plugin)
+            if url and not os.path.exists(path):
+                clones.append((url, path))
+        return clones
     
-    def install_plugins(self) -> bool:
-        """Install Zsh plugins."""
-        plugins_path = os.path.join(self.oh_my_zsh_path, "custom", "plugins")
-        if not self.create_directory(plugins_path):
+    async def aclone_missing(self) -> bool:
+        """Clone the theme and all missing plugins concurrently.
+        
+        Clones are shallow copies of local mirrors (see ``core.git_mirror``),
+        so only mirrors that are missing or stale touch the network.
+        """
+        if not self.create_directory(self.plugins_path):
             return False
-            
-        # Install zsh-autosuggestions
-        autosuggestions_path = os.path.join(plugins_path, "zsh-autosuggestions")
-        if not os.path.exists(autosuggestions_path):
-            self.logger.info("Installing zsh-autosuggestions...")
-            if not self.run_command([
-                "git", "clone", "https://github.com/zsh-users/zsh-autosuggestions",
-                autosuggestions_path
-            ]):
-                return False
-                
-        # Install zsh-syntax-highlighting
-        highlighting_path = os.path.join(plugins_path, "zsh-syntax-highlighting")
-        if not os.path.exists(highlighting_path):
-            self.logger.info("Installing zsh-syntax-highlighting...")
-            if not self.run_command([
-                "git", "clone", "https://github.com/zsh-users/zsh-syntax-highlighting.git",
-                highlighting_path
-            ]):
-                return False
-                
-        return True
+        clones = self.missing_clones()
+        if not clones:
+            self.logger.info("Powerlevel10k and plugins are already installed")
+            return True
+        self.logger.info(f"Cloning {len(clones)} repositories...")
+        mirrors = get_git_mirrors()
+        results = await asyncio.gather(*(
+            mirrors.aclone(url, path, monitor=self.monitor) for url, path in clones
+        ))
+        for result in results:
+            if not result.ok:
+                self.logger.error(f"Command failed: {result.display}; log: {result.log_path}")
+        return all(result.ok for result in results)
     
     def setup_zshrc(self) -> bool:
         """Setup .zshrc configuration."""
-        # Backup .zshrc
-        if not self.backup_file(self.zshrc_path):
-            self.logger.warning("Failed to backup .zshrc, continuing anyway...")
-            
-        # Configure .zshrc
-        zsh_config = """
-# Oh My Zsh configuration
-export ZSH="$HOME/.oh-my-zsh"
-ZSH_THEME="powerlevel10k/powerlevel10k"
-plugins=(git zsh-autosuggestions zsh-syntax-highlighting)
-source $ZSH/oh-my-zsh.sh
-
-# Powerlevel10k configuration
-[[ ! -f ~/.p10k.zsh ]] || source ~/.p10k.zsh
-"""
-        return self.append_to_file(self.zshrc_path, zsh_config)
+        plugins = " ".join(plugin_sources(env.ZSH_PLUGINS))
+        legacy = [ZSHRC_CONFIG.format(plugins=p) for p in (LEGACY_PLUGINS, plugins)]
+        # Other blocks (completions) rely on Oh My Zsh being loaded first
+        return self.set_rc_block(self.zshrc_path, "oh-my-zsh", ZSHRC_CONFIG.format(plugins=plugins),
+                                 legacy=legacy, priority=10)
     
-    def run(self):
+    def run(self) -> bool:
         """Setup shell environment."""
+        return asyncio.run(self.arun())
+    
+    async def arun(self) -> bool:
+        """Setup shell environment, cloning repositories concurrently."""
         if not self.check_platform():
-            return
+            return False
             
         if not self.check_prerequisites():
-            return
+            return False
             
-        if not all([
-            self.install_oh_my_zsh(),
-            self.install_powerlevel10k(),
-            self.install_plugins(),
-            self.setup_zshrc()
-        ]):
-            return
+        if not await asyncio.to_thread(self.install_oh_my_zsh):
+            return False
+            
+        if not await self.aclone_missing():
+            return False
+            
+        if not self.setup_zshrc():
+            return False
             
         self.logger.info("✅ Shell setup completed!")
+        return True
 
-def run():
+def run() -> bool:
     """Run the shell setup."""
     setup = ShellSetup()
-    setup.run() 
\ No newline at end of file
+    return setup.run() 
\ No newline at end of file
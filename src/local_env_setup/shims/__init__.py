@@ -0,0 +1,5 @@
+"""Helpers run by the executables installed on ``PATH``.
+
+They are started with ``python -S`` on every cache miss of a shim, so these
+modules import nothing but the standard library.
+"""
@@ -0,0 +1,254 @@
+"""Pick the Terraform version a directory asks for.
+
+The ``terraform`` shim (see ``render_shim``) is a POSIX shell script, so
+the common cases cost no extra process:
+
+1. The nearest ``.terraform-version`` in the directory or its parents
+   names the version.
+2. Otherwise, if the directory has ``*.tf`` files, their
+   ``required_version`` constraints pick the newest installed version that
+   satisfies them, preferring the default. The result is cached per
+   directory under the cache dir and used while no ``*.tf`` file was added,
+   removed or changed and no version was installed since. Only a miss
+   runs this module, with ``python -S``.
+3. Otherwise the default version (``TERRAFORM_VERSION``) runs.
+
+``-chdir=DIR`` as the first argument resolves for ``DIR``, as Terraform
+itself would read the configuration there.
+"""
+
+import os
+import re
+import sys
+import time
+from typing import List, Optional, Tuple
+
+REQUIRED_VERSION = re.compile(r'^\s*required_version\s*=\s*"([^"]*)"', re.M)
+VERSION = re.compile(r"v?(\d+)(?:\.(\d+))?(?:\.(\d+))?")
+CONSTRAINT = re.compile(r"\s*(~>|>=|<=|!=|=|>|<)?\s*(\S+)\s*")
+
+# Name of the cache entry in a directory's mirror under the cache dir. It
+# holds the resolved version and the number of *.tf files it was read from.
+CACHE_ENTRY = ".resolved"
+
+SHIM = """#!/bin/sh
+# Managed by local_env_setup: runs the Terraform version the working
+# directory asks for (see local_env_setup.shims.terraform)
+versions='{versions}'
+cache='{cache}'
+default='{default}'
+dir=$PWD
+case "$1" in
+  -chdir=*) dir=$(cd "${{1#-chdir=}}" 2>/dev/null && pwd) || dir=$PWD ;;
+esac
+
+version=
+d=$dir
+while :; do
+  if [ -f "$d/.terraform-version" ]; then
+    read -r version < "$d/.terraform-version"
+    version=${{version#v}}
+    from="$d/.terraform-version"
+    break
+  fi
+  [ -z "$d" ] && break
+  d=${{d%/*}}
+done
+
+if [ -z "$version" ]; then
+  entry=$cache$dir/{entry}
+  fresh=
+  if [ -f "$entry" ] && ! [ "$versions" -nt "$entry" ] && ! [ '{shim}' -nt "$entry" ]; then
+    fresh=1
+  fi
+  count=0
+  for tf in "$dir"/*.tf; do
+    [ -e "$tf" ] || break
+    count=$((count + 1))
+    if [ "$tf" -nt "$entry" ]; then fresh=; fi
+  done
+  if [ "$count" -gt 0 ]; then
+    if ! {{ [ -n "$fresh" ] && read -r version files < "$entry" && [ "$files" = "$count" ]; }}; then
+      version=$(PYTHONPATH='{pythonpath}' '{python}' -S -m local_env_setup.shims.terraform \\
+        "$dir" "$default" "$versions" "$cache") || exit 1
+    fi
+    from="required_version in $dir"
+  fi
+fi
+
+if [ -z "$version" ]; then
+  version=$default
+  from=terraform_version
+fi
+if ! [ -x "$versions/$version/terraform" ]; then
+  echo "terraform: $version ($from) is not installed; add it to terraform_versions" >&2
+  exit 1
+fi
+exec "$versions/$version/terraform" "$@"
+"""
+
+
+def render_shim(shim: str, versions: str, cache: str, default: str, python: str,
+                pythonpath: str) -> str:
+    """Return the shell script of the ``terraform`` shim.
+
+    Args:
+        shim: Path the shim is installed at
+        versions: Directory holding ``<version>/terraform``
+        cache: Directory of the per-directory lookup cache
+        default: Version used where nothing else is asked for
+        python: Interpreter running this module on a cache miss
+        pythonpath: Directory containing the ``local_env_setup`` package
+
+    Raises:
+        ValueError: If a value cannot be single-quoted
+    """
+    values = {"shim": shim, "versions": versions, "cache": cache, "default": default,
+              "python": python, "pythonpath": pythonpath}
+    for value in values.values():
+        if "'" in str(value):
+            raise ValueError(f"Cannot quote {value!r} in the shim")
+    return SHIM.format(entry=CACHE_ENTRY, **values)
+
+
+def parse_version(text: str) -> Optional[Tuple[int, int, int]]:
+    """Parse ``1.5.7`` (or ``v1.5``) into a tuple; None for anything else."""
+    match = VERSION.fullmatch(text.strip())
+    if not match:
+        return None
+    return tuple(int(part or 0) for part in match.groups())  # type: ignore[return-value]
+
+
+def parse_constraints(constraints: str) -> Optional[List[Tuple[str, Tuple[int, int, int], int]]]:
+    """Parse comma-separated constraints into ``(operator, version, components)``.
+
+    Returns:
+        None if any constraint is not one Terraform understands
+    """
+    parsed = []
+    for constraint in filter(str.strip, constraints.split(",")):
+        match = CONSTRAINT.fullmatch(constraint)
+        if match is None:
+            return None
+        wanted = parse_version(match.group(2))
+        if wanted is None:
+            return None
+        parsed.append((match.group(1) or "=", wanted, len(match.group(2).lstrip("v").split("."))))
+    return parsed
+
+
+def satisfies(version: str, constraints: str) -> bool:
+    """Check a version against Terraform version constraints.
+
+    Supports ``=``, ``!=``, ``>``, ``>=``, ``<``, ``<=`` and ``~>`` joined
+    by commas, e.g. ``>= 1.3, < 2.0`` or ``~> 1.5.0``. Versions or
+    constraints that do not parse are never satisfied.
+    """
+    actual = parse_version(version)
+    parsed = parse_constraints(constraints)
+    if actual is None or parsed is None:
+        return False
+    for op, wanted, given in parsed:
+        if op == "~>":
+            # Only the rightmost given component may increase
+            if actual < wanted or (given > 1 and actual[:given - 1] != wanted[:given - 1]):
+                return False
+        elif not {"=": actual == wanted, "!=": actual != wanted,
+                  ">": actual > wanted, ">=": actual >= wanted,
+                  "<": actual < wanted, "<=": actual <= wanted}[op]:
+            return False
+    return True
+
+
+def _version_key(name: str) -> Tuple[int, int, int]:
+    return parse_version(name) or (0, 0, 0)
+
+
+def config_files(directory: str) -> List[str]:
+    """Return the ``*.tf`` files of a directory, as the shim's glob sees them."""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    return sorted(os.path.join(directory, name) for name in names
+                  if name.endswith(".tf") and not name.startswith("."))
+
+
+def required_version(files: List[str]) -> Optional[str]:
+    """Return the combined ``required_version`` of configuration files."""
+    constraints = []
+    for path in files:
+        try:
+            with open(path, errors="replace") as f:
+                constraints += REQUIRED_VERSION.findall(f.read())
+        except OSError:
+            continue
+    return ", ".join(c for c in constraints if c.strip()) or None
+
+
+def installed_versions(versions: str) -> List[str]:
+    """Return the installed versions, newest first."""
+    try:
+        names = [n for n in os.listdir(versions)
+                 if parse_version(n) and os.path.isfile(os.path.join(versions, n, "terraform"))]
+    except OSError:
+        return []
+    return sorted(names, key=_version_key, reverse=True)
+
+
+def resolve(directory: str, default: str, versions: str) -> str:
+    """Return the version to run in a directory without a ``.terraform-version``.
+
+    The default version wins if it satisfies ``required_version``, else
+    the newest installed version that does. Constraints that do not parse
+    are ignored in favour of the default.
+
+    Raises:
+        LookupError: If no installed version satisfies ``required_version``
+    """
+    constraints = required_version(config_files(directory))
+    if constraints is None or parse_constraints(constraints) is None:
+        return default
+    installed = installed_versions(versions)
+    for version in ([default] if default in installed else []) + installed:
+        if satisfies(version, constraints):
+            return version
+    raise LookupError(f'no installed version satisfies required_version "{constraints}" '
+                      f"in {directory}; add one to terraform_versions")
+
+
+def cache_resolution(cache: str, directory: str, version: str, count: int) -> None:
+    """Store a directory's resolved version for the shim."""
+    parent = cache + os.path.abspath(directory)
+    os.makedirs(parent, exist_ok=True)
+    entry = os.path.join(parent, CACHE_ENTRY)
+    tmp = f"{entry}.{os.getpid()}"
+    with open(tmp, "w") as f:
+        f.write(f"{version} {count}\n")
+    os.replace(tmp, entry)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Resolve, cache and print the version for ``DIR DEFAULT VERSIONS CACHE``."""
+    directory, default, versions, cache = argv if argv is not None else sys.argv[1:]
+    started = time.time()
+    files = config_files(directory)
+    try:
+        version = resolve(directory, default, versions)
+    except LookupError as e:
+        print(f"terraform: {e}", file=sys.stderr)
+        return 1
+    try:
+        # A file changed within the filesystem's timestamp granularity (or
+        # while it was read) could look older than the entry
+        if all(os.path.getmtime(path) < started - 1 for path in files):
+            cache_resolution(cache, directory, version, len(files))
+    except OSError:
+        # Resolving again next time is only slower
+        pass
+    print(version)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
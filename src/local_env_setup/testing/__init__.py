@@ -0,0 +1,10 @@
+"""Sandboxed end-to-end runs of the setup against stub tools.
+
+``Sandbox`` builds a throwaway HOME and a PATH of fake ``brew``, ``git``,
+``pyenv`` and friends, so the full ``init`` flow runs on any Unix machine
+without touching it; ``bench`` measures such runs for regression checks.
+"""
+
+from local_env_setup.testing.sandbox import Sandbox
+
+__all__ = ["Sandbox"]
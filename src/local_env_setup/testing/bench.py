@@ -0,0 +1,195 @@
+"""End-to-end benchmark of ``init`` against the sandbox stubs.
+
+Each round builds a fresh sandbox and runs three scenarios:
+
+- ``cold``: first run on an empty machine (everything is installed)
+- ``warm``: the same command again (everything is up to date)
+- ``forced``: ``init --force`` with everything installed, which runs every
+  component's checks without installing anything
+
+Medians over the rounds are written as JSON. Given the JSON of an earlier
+run with ``--compare``, metrics that got worse by more than the tolerance
+are reported and the exit status is 1, so CI can fail on regressions::
+
+    python -m local_env_setup.testing.bench --runs 3 --output bench.json \\
+        --compare baseline.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import sys
+import tempfile
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from local_env_setup.testing.sandbox import Sandbox
+
+SCENARIOS = ("cold", "warm", "forced")
+
+# Metrics compared against a baseline, with the smallest absolute change
+# worth reporting (timer noise on shared CI runners is tens of ms)
+METRICS: Dict[str, float] = {
+    "wall_time": 0.25,
+    "overhead": 0.25,
+    "commands": 1,
+    "stub_calls": 1,
+    "peak_rss_mb": 5.0,
+}
+
+# Bump when the result format changes
+RESULT_VERSION = 1
+
+
+@dataclass
+class Regression:
+    """A benchmark metric that got worse than its baseline."""
+    scenario: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        """Relative change (0.5 means 50% worse)."""
+        return self.current / self.baseline - 1 if self.baseline else float("inf")
+
+
+def _median(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Median of every metric over several runs, including per-step times."""
+    summary: Dict[str, Any] = {
+        metric: statistics.median(run[metric] for run in runs) for metric in METRICS
+    }
+    summary["success"] = all(run["success"] for run in runs)
+    steps = sorted({name for run in runs for name in run["steps"]})
+    summary["steps"] = {
+        name: {field: statistics.median(run["steps"][name][field]
+                                        for run in runs if name in run["steps"])
+               for field in ("duration", "commands", "overhead")}
+        for name in steps
+    }
+    return summary
+
+
+def run_benchmark(runs: int = 3, latency: float = 0.05, failure_rate: float = 0.0,
+                  jobs: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """Run every scenario in fresh sandboxes.
+
+    Args:
+        runs: Rounds (fresh sandboxes) per scenario
+        latency: Seconds each stub call takes
+        failure_rate: Probability (0-1) that a stub call fails
+        jobs: Maximum concurrent components
+        seed: Seed of the first round's injected failures
+
+    Returns:
+        Dict[str, Any]: Configuration and, per scenario, the raw runs and
+        their medians
+    """
+    results: Dict[str, List[Dict[str, Any]]] = {name: [] for name in SCENARIOS}
+    for round_ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="local-env-bench-") as root, \
+                Sandbox(root, latency=latency, failure_rate=failure_rate,
+                        seed=seed + round_) as sandbox:
+            for scenario in SCENARIOS:
+                result = sandbox.run_init(jobs=jobs, force=scenario == "forced")
+                result.pop("output")
+                results[scenario].append(result)
+                print(f"  round {round_ + 1}/{runs} {scenario}: {result['wall_time']:.2f}s, "
+                      f"{result['commands']} commands, {result['overhead']:.2f}s overhead")
+    return {
+        "version": RESULT_VERSION,
+        "python": platform.python_version(),
+        "config": {"runs": runs, "latency": latency, "failure_rate": failure_rate,
+                   "jobs": jobs, "seed": seed},
+        "scenarios": {name: {"median": _median(scenario_runs), "runs": scenario_runs}
+                      for name, scenario_runs in results.items()},
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any],
+            tolerance: float = 0.2) -> List[Regression]:
+    """Find metrics that got worse than in a baseline benchmark.
+
+    Args:
+        current: Result of ``run_benchmark``
+        baseline: Earlier result to compare with
+        tolerance: Relative change allowed (0.2 is 20% worse)
+
+    Returns:
+        List[Regression]: Regressions, largest first
+    """
+    found = []
+    for scenario, result in current["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if previous is None:
+            continue
+        for metric, min_change in METRICS.items():
+            if metric not in previous["median"]:
+                continue
+            before, after = previous["median"][metric], result["median"][metric]
+            if after - before >= min_change and after > before * (1 + tolerance):
+                found.append(Regression(scenario, metric, before, after))
+    return sorted(found, key=lambda r: r.change, reverse=True)
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    """Print the medians of a benchmark result."""
+    print(f"{'scenario':<10} {'wall':>8} {'overhead':>9} {'commands':>9} {'rss MiB':>8}")
+    for name, scenario in result["scenarios"].items():
+        median = scenario["median"]
+        mark = "" if median["success"] else "  ❌ failed"
+        print(f"{name:<10} {median['wall_time']:>7.2f}s {median['overhead']:>8.2f}s "
+              f"{median['commands']:>9.0f} {median['peak_rss_mb']:>8.1f}{mark}")
+    steps = result["scenarios"]["cold"]["median"]["steps"]
+    slowest = sorted(steps.items(), key=lambda item: item[1]["overhead"], reverse=True)[:5]
+    print("Python-side overhead per component (cold): " +
+          ", ".join(f"{name} {step['overhead']:.2f}s" for name, step in slowest))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark init against stub tools")
+    parser.add_argument("-n", "--runs", type=int, default=3,
+                        help="Fresh sandboxes per scenario (default: 3)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds each stub call takes (default: 0.05)")
+    parser.add_argument("--failure-rate", type=float, default=0.0,
+                        help="Probability that a stub call fails (default: 0)")
+    parser.add_argument("-j", "--jobs", type=int, help="Maximum concurrent components")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for injected failures")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="Fail if worse than this earlier --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="Relative slowdown allowed by --compare (default: 0.2)")
+    args = parser.parse_args(argv)
+
+    print(f"🏁 Benchmarking init: {args.runs} round(s), {args.latency:.3f}s per tool call")
+    result = run_benchmark(args.runs, args.latency, args.failure_rate, args.jobs, args.seed)
+    print_result(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"📊 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"⚠️  {regression.scenario} {regression.metric} regressed "
+                  f"{regression.change:+.0%}: {regression.current:.2f} vs. "
+                  f"{regression.baseline:.2f}")
+        if regressions:
+            return 1
+    # Injected failures are expected to fail runs
+    if args.failure_rate == 0 and not all(
+            s["median"]["success"] for s in result["scenarios"].values()):
+        print("❌ init failed inside the sandbox")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Child-process entry point running ``init`` inside a sandbox.
+
+Run as ``python -m local_env_setup.testing.runner --output result.json``
+with the environment from ``Sandbox.env()``. The setup targets macOS, so
+the platform is reported as an Apple Silicon Mac before any component is
+imported; everything the components run is a sandbox stub.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from local_env_setup.core.monitoring import SetupMonitor
+
+
+def _covered(intervals: List[Tuple[float, float]]) -> float:
+    """Total length covered by possibly overlapping intervals."""
+    total = 0.0
+    end = float("-inf")
+    for start, stop in sorted(intervals):
+        if stop > end:
+            total += stop - max(start, end)
+            end = stop
+    return total
+
+
+def step_overhead(monitor: SetupMonitor) -> Dict[str, Dict[str, float]]:
+    """Split each component's time into subprocess time and Python overhead.
+
+    Overhead is the part of a component's span during which none of its
+    commands were running: imports, file I/O, fingerprinting, sleeps and
+    waiting on other components' locks.
+
+    Returns:
+        Dict[str, Dict[str, float]]: Per component, ``duration``,
+        ``commands`` (time covered by command spans) and ``overhead``
+    """
+    commands: Dict[str, List[Tuple[float, float]]] = {}
+    for span in monitor.spans:
+        if span.category == "command" and span.end is not None:
+            commands.setdefault(span.component, []).append((span.start, span.end))
+    steps = {}
+    for span in monitor.spans:
+        if span.category != "component" or span.duration is None:
+            continue
+        covered = _covered(commands.get(span.name, []))
+        steps[span.name] = {
+            "duration": span.duration,
+            "commands": covered,
+            "overhead": max(span.duration - covered, 0.0),
+        }
+    return steps
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def measure(components: Optional[List[str]], jobs: Optional[int],
+            force: bool, resume: bool = False) -> Dict[str, Any]:
+    """Run ``init`` and measure it.
+
+    Returns:
+        Dict[str, Any]: ``success``, ``wall_time``, ``import_time``,
+        ``commands`` (subprocesses run through the executor), ``steps``
+        (see ``step_overhead``), ``overhead`` (their sum) and peak RSS in
+        MiB of this process and of its largest child
+    """
+    platform.system = lambda: "Darwin"
+    platform.machine = lambda: "arm64"
+
+    start = time.perf_counter()
+    from local_env_setup.core.monitoring import get_monitor
+    from local_env_setup.scripts.commands import init
+    import_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    success = init(components, jobs=jobs, force=force, resume=resume)
+    wall_time = time.perf_counter() - start
+
+    monitor = get_monitor()
+    steps = step_overhead(monitor)
+    return {
+        "success": success,
+        "wall_time": wall_time,
+        "import_time": import_time,
+        "commands": len(monitor.commands),
+        "steps": steps,
+        "overhead": sum(step["overhead"] for step in steps.values()),
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_child_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run init inside a sandbox")
+    parser.add_argument("--output", required=True, help="Write the measurements here")
+    parser.add_argument("--components", nargs="+", help="Components to run")
+    parser.add_argument("--jobs", type=int, help="Maximum concurrent components")
+    parser.add_argument("--force", action="store_true", help="Ignore recorded state")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run")
+    args = parser.parse_args(argv)
+
+    result = measure(args.components, args.jobs, args.force, args.resume)
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    return 0 if result["success"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
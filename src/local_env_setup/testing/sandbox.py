@@ -0,0 +1,366 @@
+"""Hermetic sandbox for running the setup against stub tools.
+
+A ``Sandbox`` is a throwaway directory holding a fake ``HOME``, a Homebrew
+prefix and a ``PATH`` made of stub executables (see ``stub.py``) plus the
+few system utilities the install scripts need. Downloads are served by a
+local HTTP mirror and any request that slips past it hits a dead proxy, so
+nothing leaves the machine. Each stub's latency and failure rate can be
+configured to model slow or flaky tools.
+"""
+
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import local_env_setup
+from local_env_setup.testing.stub import PLATFORM, TOOLS, VERSIONS
+
+# Stubs on PATH from the start; the rest appear as Homebrew installs them
+PREINSTALLED = ("brew", "git", "curl")
+
+# System utilities the downloaded install scripts may call
+SYSTEM_TOOLS = ("sh", "mkdir", "cat", "chmod", "uname", "which", "env")
+
+# Oh My Zsh installer served by the mirror
+OH_MY_ZSH_INSTALLER = """#!/bin/sh
+mkdir -p "$HOME/.oh-my-zsh/custom/plugins" "$HOME/.oh-my-zsh/custom/themes"
+: > "$HOME/.oh-my-zsh/oh-my-zsh.sh"
+"""
+
+# Poetry installer served by the mirror, run by the stub python
+POETRY_INSTALLER = """import json, os, sys
+from pathlib import Path
+version = sys.argv[sys.argv.index("--version") + 1]
+home = Path.home() / ".local"
+(home / "share" / "pypoetry").mkdir(parents=True, exist_ok=True)
+(home / "share" / "pypoetry" / "VERSION").write_text(version)
+(home / "bin").mkdir(parents=True, exist_ok=True)
+if not (home / "bin" / "poetry").is_symlink():
+    with open(os.environ["STUB_CONFIG"]) as f:
+        stubs_dir = json.load(f)["stubs_dir"]
+    (home / "bin" / "poetry").symlink_to(Path(stubs_dir) / "poetry")
+"""
+
+# Unroutable proxy catching any request that does not go to the mirror
+DEAD_PROXY = "http://127.0.0.1:9"
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    """Serves install scripts and release binaries by URL suffix."""
+
+    def do_GET(self) -> None:
+        # Model a distant server: every request pays a round trip
+        time.sleep(self.server.latency)  # type: ignore[attr-defined]
+        self.server.requests.append(self.path)  # type: ignore[attr-defined]
+        body = self.server.lookup(self.path)  # type: ignore[attr-defined]
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        logging.getLogger("Sandbox").debug(format % args)
+
+
+class _MirrorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, files: Dict[str, bytes], latency: float = 0.0):
+        super().__init__(("127.0.0.1", 0), _MirrorHandler)
+        self.files = files
+        self.latency = latency
+        self.requests: List[str] = []
+
+    def lookup(self, path: str) -> Optional[bytes]:
+        path = path.split("?", 1)[0]
+        for suffix, body in self.files.items():
+            if path.endswith(suffix):
+                return body
+        return None
+
+
+class Sandbox:
+    """Throwaway HOME, PATH and download mirror built from stub tools."""
+
+    def __init__(self, root: Union[str, Path], latency: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0, mirror_latency: float = 0.0):
+        """Create the sandbox layout.
+
+        Args:
+            root: Empty or missing directory to build the sandbox in
+            latency: Seconds every stub call sleeps before answering
+            failure_rate: Probability (0-1) that a stub call fails
+            seed: Seed making injected failures reproducible
+            mirror_latency: Seconds the mirror waits before each response
+        """
+        self.root = Path(root).resolve()
+        self.home = self.root / "home"
+        self.bin_dir = self.root / "bin"
+        self.stubs_dir = self.root / "stubs"
+        self.system_dir = self.root / "sysbin"
+        self.prefix = self.root / "homebrew"
+        self.config_path = self.root / "stubs.json"
+        self.calls_log = self.root / "calls.jsonl"
+        self.logger = logging.getLogger("Sandbox")
+        self.config: Dict[str, Any] = {
+            "stubs_dir": str(self.stubs_dir),
+            "calls_log": str(self.calls_log),
+            "seed": seed,
+            "latency": latency,
+            "failure_rate": failure_rate,
+            "tools": {},
+        }
+        self.mirror_latency = mirror_latency
+        # Served by the mirror in addition to the install scripts; may grow
+        # while it runs
+        self.files: Dict[str, bytes] = {}
+        self.provider_hashes: Dict[Tuple[str, str], str] = {}
+        self._server: Optional[_MirrorServer] = None
+        self._build()
+
+    def _build(self) -> None:
+        for path in (self.home, self.bin_dir, self.stubs_dir, self.system_dir,
+                     self.prefix / "Cellar", self.prefix / "Caskroom", self.prefix / "bin"):
+            path.mkdir(parents=True, exist_ok=True)
+
+        stub = self.stubs_dir / "_stub.py"
+        source = (Path(__file__).parent / "stub.py").read_text()
+        stub.write_text(f"#!{sys.executable} -S\n{source}")
+        stub.chmod(0o755)
+        for tool in TOOLS:
+            (self.stubs_dir / tool).symlink_to(stub.name)
+        for tool in PREINSTALLED:
+            (self.bin_dir / tool).symlink_to(self.stubs_dir / tool)
+        for tool in SYSTEM_TOOLS:
+            found = shutil.which(tool)
+            if found:
+                (self.system_dir / tool).symlink_to(found)
+        self._write_config()
+
+    def _write_config(self) -> None:
+        self.config_path.write_text(json.dumps(self.config, indent=2))
+
+    def configure(self, tool: Optional[str] = None, latency: Optional[float] = None,
+                  failure_rate: Optional[float] = None) -> None:
+        """Change stub behaviour for one tool, or for all tools by default.
+
+        Args:
+            tool: Stub name (``brew``, ``pyenv``...), None for the defaults
+            latency: Seconds each call sleeps
+            failure_rate: Probability (0-1) that a call fails
+        """
+        settings = self.config if tool is None else self.config["tools"].setdefault(tool, {})
+        if latency is not None:
+            settings["latency"] = latency
+        if failure_rate is not None:
+            settings["failure_rate"] = failure_rate
+        self._write_config()
+
+    def start(self) -> None:
+        """Start the download mirror."""
+        compose = (self.stubs_dir / "_stub.py").read_bytes()
+        compose_digest = hashlib.sha256(compose).hexdigest()
+        self.files.update({
+            "/tools/install.sh": OH_MY_ZSH_INSTALLER.encode(),
+            "/install.python-poetry.org": POETRY_INSTALLER.encode(),
+            ".sha256": f"{compose_digest} *docker-compose\n".encode(),
+            "/docker-compose-darwin-aarch64": compose,
+            "/docker-compose-darwin-x86_64": compose,
+        })
+        self.add_terraform_release(VERSIONS["terraform"])
+        self._server = _MirrorServer(self.files, self.mirror_latency)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    @property
+    def mirror_requests(self) -> List[str]:
+        """Paths the mirror was asked for, in order."""
+        return list(self._server.requests) if self._server is not None else []
+
+    def add_provider(self, source: str, version: str, size: int = 1 << 20) -> str:
+        """Publish a Terraform provider through the mirror's stand-in registry.
+
+        Args:
+            source: ``<host>/<namespace>/<type>``
+            version: Provider version
+            size: Size of the provider executable in bytes
+
+        Returns:
+            str: sha256 of the package, as in a lock file's ``zh:`` hash
+        """
+        host, namespace, kind = source.split("/")
+        target = PLATFORM
+        filename = f"terraform-provider-{kind}_{version}_{target}.zip"
+        # Incompressible, so transfers cost what real ones of this size do
+        seed = hashlib.sha256(f"{source}@{version}".encode()).digest()
+        blocks = (size + 31) // 32
+        binary = b"".join(hashlib.sha256(seed + i.to_bytes(8, "big")).digest()
+                          for i in range(blocks))[:size]
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as package:
+            info = zipfile.ZipInfo(f"terraform-provider-{kind}_v{version}_x5")
+            info.external_attr = 0o755 << 16
+            package.writestr(info, binary)
+        archive = buffer.getvalue()
+        digest = hashlib.sha256(archive).hexdigest()
+        os_name, arch = target.split("_", 1)
+        download_url = f"https://releases.hashicorp.com/terraform-provider-{kind}/{version}/{filename}"
+        self.files[f"/{host}/v1/providers/{namespace}/{kind}/{version}/download/{os_name}/{arch}"] = \
+            json.dumps({"download_url": download_url, "shasum": digest, "filename": filename,
+                        "os": os_name, "arch": arch}).encode()
+        self.files[f"/releases.hashicorp.com/terraform-provider-{kind}/{version}/{filename}"] = archive
+        self.provider_hashes[(source, version)] = digest
+        return digest
+
+    def add_terraform_release(self, version: str) -> None:
+        """Publish a Terraform release, running the stub, with its SHA256SUMS.
+
+        Args:
+            version: Version the released ``terraform`` reports
+        """
+        script = (f"#!/bin/sh\nSTUB_TERRAFORM_VERSION={version} "
+                  f"exec '{self.stubs_dir / 'terraform'}' \"$@\"\n")
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as package:
+            info = zipfile.ZipInfo("terraform")
+            info.external_attr = 0o755 << 16
+            package.writestr(info, script)
+        archive = buffer.getvalue()
+        filename = f"terraform_{version}_{PLATFORM}.zip"
+        sums = f"{hashlib.sha256(archive).hexdigest()}  {filename}\n"
+        base = f"/releases.hashicorp.com/terraform/{version}"
+        self.files[f"{base}/{filename}"] = archive
+        self.files[f"{base}/terraform_{version}_SHA256SUMS"] = sums.encode()
+
+    def add_terraform_config(self, name: str, providers: List[Tuple[str, str]]) -> Path:
+        """Create a Terraform configuration under ``~/dev`` with a lock file.
+
+        Args:
+            name: Directory name
+            providers: ``(source, version)`` pairs published with ``add_provider``
+
+        Returns:
+            Path: The configuration's directory
+        """
+        directory = self.home / "dev" / name
+        directory.mkdir(parents=True, exist_ok=True)
+        blocks = []
+        for source, version in providers:
+            blocks.append(f'provider "{source}" {{\n'
+                          f'  version = "{version}"\n'
+                          f'  hashes = [\n'
+                          f'    "zh:{self.provider_hashes[(source, version)]}",\n'
+                          f'  ]\n'
+                          f'}}\n')
+        (directory / ".terraform.lock.hcl").write_text("\n".join(blocks))
+        return directory
+
+    def stop(self) -> None:
+        """Stop the download mirror."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> "Sandbox":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    @property
+    def mirror(self) -> str:
+        """Base URL of the download mirror."""
+        if self._server is None:
+            raise RuntimeError("Sandbox mirror is not running")
+        host, port = self._server.server_address[:2]
+        if isinstance(host, bytes):
+            host = host.decode()
+        return f"http://{host}:{port}"
+
+    def env(self) -> Dict[str, str]:
+        """Environment for processes running inside the sandbox."""
+        path = os.pathsep.join(map(str, (self.bin_dir, self.prefix / "bin", self.system_dir)))
+        return {
+            "HOME": str(self.home),
+            "PATH": path,
+            "SHELL": "/bin/zsh",
+            "USER": "sandbox",
+            "LANG": "C.UTF-8",
+            "TMPDIR": str(self.root / "tmp"),
+            "PYTHONPATH": str(Path(local_env_setup.__file__).parent.parent),
+            "XDG_CACHE_HOME": str(self.home / ".cache"),
+            "XDG_STATE_HOME": str(self.home / ".local" / "state"),
+            "HOMEBREW_PREFIX": str(self.prefix),
+            "GIT_USERNAME": "Sandbox User",
+            "GIT_EMAIL": "sandbox@example.com",
+            "DOCKER_APP_PATH": str(self.prefix / "Caskroom" / "docker"),
+            "DOCKER_COMPOSE_PATH": str(self.prefix / "bin" / "docker-compose"),
+            "LOCAL_ENV_SETUP_MIRROR": self.mirror,
+            "HTTP_PROXY": DEAD_PROXY,
+            "HTTPS_PROXY": DEAD_PROXY,
+            "NO_PROXY": "127.0.0.1,localhost",
+            "STUB_CONFIG": str(self.config_path),
+        }
+
+    def calls(self) -> List[Dict[str, Any]]:
+        """Stub invocations so far, in completion order."""
+        if not self.calls_log.exists():
+            return []
+        with self.calls_log.open() as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def run_init(self, components: Optional[List[str]] = None, jobs: Optional[int] = None,
+                 force: bool = False, resume: bool = False,
+                 timeout: float = 300) -> Dict[str, Any]:
+        """Run ``init`` in a child process and return its measurements.
+
+        Args:
+            components: Components to run (all by default)
+            jobs: Maximum number of concurrent components
+            force: Run components even if they are up to date
+            resume: Continue the previous run if it failed
+            timeout: Seconds before the run is killed
+
+        Returns:
+            Dict[str, Any]: The runner's result (see ``runner.measure``)
+            plus ``stub_calls``, the number of stub invocations, and
+            ``output``, the run's console output
+        """
+        (self.root / "tmp").mkdir(exist_ok=True)
+        result_path = self.root / "result.json"
+        result_path.unlink(missing_ok=True)
+        calls_before = len(self.calls())
+        cmd = [sys.executable, "-m", "local_env_setup.testing.runner",
+               "--output", str(result_path)]
+        if components:
+            cmd += ["--components", *components]
+        if jobs:
+            cmd += ["--jobs", str(jobs)]
+        if force:
+            cmd.append("--force")
+        if resume:
+            cmd.append("--resume")
+        process = subprocess.run(cmd, cwd=self.home, env=self.env(), timeout=timeout,
+                                 stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        if not result_path.exists():
+            raise RuntimeError(f"Sandbox run exited with {process.returncode} "
+                               f"without a result:\n{process.stdout}")
+        result = json.loads(result_path.read_text())
+        result["stub_calls"] = len(self.calls()) - calls_before
+        result["output"] = process.stdout
+        return result
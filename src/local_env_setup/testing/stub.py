@@ -0,0 +1,291 @@
+"""Stand-in for the external tools the setup drives.
+
+The sandbox links this file under each tool's name (``brew``, ``git``,
+``pyenv``...). It dispatches on the name it was invoked as, emulates just
+enough of the tool for the setup flow and keeps its state under the
+sandbox ``HOME`` and ``HOMEBREW_PREFIX``. It only uses the standard
+library so it can run with ``python -S``.
+
+Behaviour is read from the JSON file named by ``STUB_CONFIG``::
+
+    {"stubs_dir": "...", "calls_log": "...", "seed": 0,
+     "tools": {"brew": {"latency": 0.05, "failure_rate": 0.0}}}
+
+Failures are deterministic for a given seed and command line, so a failing
+benchmark scenario fails the same way every time.
+"""
+
+import json
+import os
+import random
+import re
+import runpy
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+# Executables each Homebrew package provides
+PROVIDES: Dict[str, List[str]] = {
+    "kubectl": ["kubectl"],
+    "kubectx": ["kubectx", "kubens"],
+    "helm": ["helm"],
+    "terraform": ["terraform"],
+    # pyenv's shims provide python
+    "pyenv": ["pyenv", "python"],
+    "docker": ["docker"],
+}
+
+# Terraform platform of the machine the sandbox emulates (see runner.py)
+PLATFORM = "darwin_arm64"
+
+VERSIONS = {
+    "kubectl": "1.26.0",
+    "kubectx": "0.9.4",
+    "helm": "3.11.0",
+    "terraform": "1.4.0",
+    "pyenv": "2.3.17",
+    "docker": "4.20.0",
+}
+
+
+def _prefix() -> Path:
+    return Path(os.environ["HOMEBREW_PREFIX"])
+
+
+def _installed(cask: bool) -> Dict[str, List[str]]:
+    root = _prefix() / ("Caskroom" if cask else "Cellar")
+    if not root.is_dir():
+        return {}
+    return {p.name: sorted(v.name for v in p.iterdir()) for p in sorted(root.iterdir())}
+
+
+def brew(args: List[str], config: Dict) -> int:
+    if args[:1] == ["--prefix"]:
+        print(_prefix())
+    elif args[:1] == ["info"]:
+        print(json.dumps({
+            "formulae": [{"name": name, "full_name": name, "aliases": [],
+                          "installed": [{"version": v} for v in versions]}
+                         for name, versions in _installed(cask=False).items()],
+            "casks": [{"token": name, "installed": versions[-1]}
+                      for name, versions in _installed(cask=True).items()],
+        }))
+    elif args[:1] == ["list"]:
+        installed = _installed(cask="--cask" in args)
+        for name in (a for a in args[1:] if not a.startswith("-")):
+            if name in installed:
+                print(f"{name} {' '.join(installed[name])}")
+    elif args[:1] == ["install"]:
+        cask = "--cask" in args
+        for name in (a for a in args[1:] if not a.startswith("-")):
+            version = VERSIONS.get(name, "1.0.0")
+            (_prefix() / ("Caskroom" if cask else "Cellar") / name / version).mkdir(
+                parents=True, exist_ok=True)
+            bin_dir = _prefix() / "bin"
+            bin_dir.mkdir(exist_ok=True)
+            for tool in PROVIDES.get(name, []):
+                link = bin_dir / tool
+                if not link.exists():
+                    link.symlink_to(Path(config["stubs_dir"]) / tool)
+            print(f"==> Installed {name} {version}")
+    return 0
+
+
+def git(args: List[str], config: Dict) -> int:
+    if args[:2] == ["config", "--global"]:
+        path = Path.home() / ".gitconfig"
+        values = {}
+        if path.exists():
+            values = dict(line.split(" = ", 1) for line in path.read_text().splitlines() if line)
+        if len(args) == 3:
+            if args[2] not in values:
+                return 1
+            print(values[args[2]])
+        else:
+            values[args[2]] = args[3]
+            path.write_text("".join(f"{k} = {v}\n" for k, v in values.items()))
+    elif args[:1] == ["clone"]:
+        dest = Path(args[-1])
+        dest.mkdir(parents=True, exist_ok=True)
+        (dest / ("HEAD" if "--mirror" in args else "README")).write_text("stub\n")
+    return 0
+
+
+def pyenv(args: List[str], config: Dict) -> int:
+    root = Path(os.environ.get("PYENV_ROOT", Path.home() / ".pyenv"))
+    if args[:1] == ["install"]:
+        bin_dir = root / "versions" / args[-1] / "bin"
+        bin_dir.mkdir(parents=True, exist_ok=True)
+        if not (bin_dir / "python3").is_symlink():
+            # Relative, like the links of a real build
+            target = os.path.relpath(Path(config["stubs_dir"]) / "python", bin_dir)
+            (bin_dir / "python3").symlink_to(target)
+    elif args[:1] == ["global"]:
+        root.mkdir(parents=True, exist_ok=True)
+        (root / "version").write_text(args[1] + "\n")
+    elif args[:1] == ["version"]:
+        version = root / "version"
+        print(f"{version.read_text().strip() if version.exists() else 'system'} "
+              f"(set by {version})")
+    elif args[:2] == ["versions", "--bare"]:
+        versions = root / "versions"
+        for path in sorted(versions.iterdir()) if versions.is_dir() else []:
+            print(path.name)
+    elif args[:1] == ["root"]:
+        print(root)
+    return 0
+
+
+def python(args: List[str], config: Dict) -> int:
+    if args and Path(args[0]).is_file():
+        # Run downloaded install scripts for real
+        sys.argv = args
+        runpy.run_path(args[0], run_name="__main__")
+        return 0
+    version = Path.home() / ".pyenv" / "version"
+    print(f"Python {version.read_text().strip() if version.exists() else '3.11.0'}")
+    return 0
+
+
+def poetry(args: List[str], config: Dict) -> int:
+    home = Path.home() / ".local" / "share" / "pypoetry"
+    settings_file = home / "config.json"
+    settings = json.loads(settings_file.read_text()) if settings_file.exists() else {}
+    if args[:1] == ["--version"]:
+        print(f"Poetry (version {(home / 'VERSION').read_text().strip()})")
+    elif args[:2] == ["config", "--list"]:
+        for key, value in sorted(settings.items()):
+            print(f'{key} = "{value}"')
+    elif args[:1] == ["config"] and len(args) == 3:
+        settings[args[1]] = args[2]
+        settings_file.write_text(json.dumps(settings))
+    return 0
+
+
+def _fetch_provider(host: str, namespace: str, kind: str, version: str, dest: Path) -> None:
+    """Download a provider from the sandbox's stand-in registry and unpack it."""
+    # Imported here: every stub call would pay for them otherwise
+    import hashlib
+    import io
+    import urllib.parse
+    import urllib.request
+    import zipfile
+
+    mirror = os.environ["LOCAL_ENV_SETUP_MIRROR"]
+    os_name, arch = PLATFORM.split("_", 1)
+    url = f"{mirror}/{host}/v1/providers/{namespace}/{kind}/{version}/download/{os_name}/{arch}"
+    with urllib.request.urlopen(url) as response:
+        meta = json.load(response)
+    download = urllib.parse.urlsplit(meta["download_url"])
+    with urllib.request.urlopen(f"{mirror}/{download.netloc}{download.path}") as response:
+        archive = response.read()
+    if hashlib.sha256(archive).hexdigest() != meta["shasum"]:
+        raise RuntimeError(f"checksum mismatch for {host}/{namespace}/{kind} {version}")
+    dest.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(io.BytesIO(archive)) as package:
+        for member in package.infolist():
+            package.extract(member, dest)
+            os.chmod(dest / member.filename, (member.external_attr >> 16) or 0o644)
+
+
+def terraform_init(config: Dict) -> int:
+    """Install the providers of the lock file like ``terraform init``.
+
+    Providers found in ``plugin_cache_dir`` (from ``~/.terraformrc``) are
+    linked; the others are downloaded, into the cache when one is set.
+    """
+    lock = Path(".terraform.lock.hcl")
+    pins = re.findall(r'provider\s+"([^"]+)"\s*\{\s*version\s*=\s*"([^"]+)"',
+                      lock.read_text() if lock.exists() else "")
+    rc = Path.home() / ".terraformrc"
+    setting = re.search(r'^plugin_cache_dir\s*=\s*"([^"]+)"', rc.read_text() if rc.exists() else "",
+                        re.M)
+    cache = Path(setting.group(1)) if setting else None
+    for source, version in pins:
+        host, namespace, kind = source.split("/")
+        relative = Path(host, namespace, kind, version, PLATFORM)
+        dest = Path(".terraform", "providers") / relative
+        if dest.exists():
+            continue
+        if cache is None:
+            _fetch_provider(host, namespace, kind, version, dest)
+            continue
+        if not (cache / relative).is_dir():
+            _fetch_provider(host, namespace, kind, version, cache / relative)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.symlink_to(cache / relative)
+    print("Terraform has been successfully initialized!")
+    return 0
+
+
+def terraform(args: List[str], config: Dict) -> int:
+    if args[:1] == ["init"]:
+        return terraform_init(config)
+    # Releases installed by the setup run this stub under their version
+    version = os.environ.get("STUB_TERRAFORM_VERSION", VERSIONS["terraform"])
+    return versioned("terraform", f"Terraform v{version}")(args, config)
+
+
+def versioned(tool: str, line: str):
+    def run(args: List[str], config: Dict) -> int:
+        if args[:2] == ["completion", "zsh"]:
+            print(f"#compdef {tool}\n_{tool}() {{ }}")
+        elif any(a in ("version", "--version") for a in args[:1]):
+            print(line)
+        return 0
+    return run
+
+
+def noop(args: List[str], config: Dict) -> int:
+    return 0
+
+
+TOOLS = {
+    "brew": brew,
+    "git": git,
+    "pyenv": pyenv,
+    "python": python,
+    "python3": python,
+    "poetry": poetry,
+    "kubectl": versioned("kubectl", "Client Version: v1.26.0"),
+    "helm": versioned("helm", "v3.11.0+gstub"),
+    "terraform": terraform,
+    "docker": versioned("docker", "Docker version 24.0.0, build stub"),
+    "docker-compose": versioned("docker-compose", "Docker Compose version v2.17.0"),
+    "kubectx": noop,
+    "kubens": noop,
+    "curl": noop,
+}
+
+
+def main() -> int:
+    start = time.time()
+    tool = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    with open(os.environ["STUB_CONFIG"]) as f:
+        config = json.load(f)
+    settings = config.get("tools", {}).get(tool, {})
+
+    time.sleep(settings.get("latency", config.get("latency", 0.0)))
+    failure_rate = settings.get("failure_rate", config.get("failure_rate", 0.0))
+    rng = random.Random(f"{config.get('seed', 0)}:{tool}:{' '.join(args)}")
+    if rng.random() < failure_rate:
+        print(f"{tool}: injected failure", file=sys.stderr)
+        status = 1
+    else:
+        status = TOOLS.get(tool, noop)(args, config)
+
+    record = {"tool": tool, "args": args, "start": start,
+              "duration": time.time() - start, "status": status}
+    # One small O_APPEND write per call keeps concurrent records intact
+    fd = os.open(config["calls_log"], os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, (json.dumps(record) + "\n").encode())
+    finally:
+        os.close(fd)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""Benchmark of ``terraform init`` with and without the shared provider cache.
+
+A sandbox's mirror stands in for the Terraform registry and release server,
+with a configurable delay per request. Several configurations under ``~/dev``
+pin the same providers in their lock files, and the stub ``terraform init``
+installs them the way Terraform does:
+
+- ``cold``: no ``plugin_cache_dir``, so every configuration downloads every
+  provider
+- ``warmup``: ``init terraform`` installs Terraform, sets
+  ``plugin_cache_dir`` and fetches the providers found in the lock files,
+  in parallel
+- ``warm``: ``terraform init`` again in every (cleaned) configuration, which
+  now links the providers from the cache
+
+::
+
+    python -m local_env_setup.testing.tfbench --configs 8 --providers 3 \\
+        --size-mb 20 --latency 0.1 --output tfbench.json
+"""
+
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from local_env_setup.testing.sandbox import Sandbox
+
+# Bump when the result format changes
+RESULT_VERSION = 1
+
+
+def _init_all(sandbox: Sandbox, configs: List[Path]) -> Dict[str, Any]:
+    """Run ``terraform init`` in every configuration, one after the other."""
+    terraform = sandbox.stubs_dir / "terraform"
+    requests_before = len(sandbox.mirror_requests)
+    start = time.monotonic()
+    for config in configs:
+        shutil.rmtree(config / ".terraform", ignore_errors=True)
+        subprocess.run([str(terraform), "init"], cwd=config, env=sandbox.env(), check=True,
+                       stdout=subprocess.DEVNULL)
+    return {"seconds": time.monotonic() - start,
+            "requests": len(sandbox.mirror_requests) - requests_before}
+
+
+def run_tf_benchmark(configs: int = 8, providers: int = 3, size_mb: float = 5.0,
+                     latency: float = 0.05) -> Dict[str, Any]:
+    """Time ``terraform init`` across configurations, cold and warm.
+
+    Args:
+        configs: Terraform configurations under ``~/dev``
+        providers: Providers pinned by each configuration
+        size_mb: Size of each provider package
+        latency: Seconds the stand-in registry waits before each response
+
+    Returns:
+        Dict[str, Any]: Configuration and the measurements of each scenario
+    """
+    with tempfile.TemporaryDirectory(prefix="local-env-tfbench-") as root, \
+            Sandbox(root, mirror_latency=latency) as sandbox:
+        pins = [(f"registry.terraform.io/bench/provider{i}", f"1.{i}.0")
+                for i in range(providers)]
+        for source, version in pins:
+            sandbox.add_provider(source, version, size=int(size_mb * 1e6))
+        directories = [sandbox.add_terraform_config(f"config{i}", pins) for i in range(configs)]
+
+        cold = _init_all(sandbox, directories)
+        requests_before = len(sandbox.mirror_requests)
+        setup = sandbox.run_init(components=["terraform"])
+        step = setup["steps"].get("terraform", {})
+        warmup = {"seconds": step.get("duration", setup["wall_time"]),
+                  "requests": len(sandbox.mirror_requests) - requests_before,
+                  "success": setup["success"]}
+        warm = _init_all(sandbox, directories)
+    return {
+        "version": RESULT_VERSION,
+        "config": {"configs": configs, "providers": providers, "size_mb": size_mb,
+                   "latency": latency},
+        "scenarios": {"cold": cold, "warmup": warmup, "warm": warm},
+        "speedup": cold["seconds"] / warm["seconds"] if warm["seconds"] else float("inf"),
+    }
+
+
+def print_result(result: Dict[str, Any]) -> None:
+    """Print the measurements of a benchmark result."""
+    print(f"{'scenario':<10} {'time':>8} {'requests':>9}")
+    for name, scenario in result["scenarios"].items():
+        print(f"{name:<10} {scenario['seconds']:>7.2f}s {scenario['requests']:>9}")
+    print(f"terraform init is {result['speedup']:.1f}x faster with the warmed cache")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark terraform init against a "
+                                                 "stand-in registry, cold and warm")
+    parser.add_argument("--configs", type=int, default=8,
+                        help="Terraform configurations under ~/dev (default: 8)")
+    parser.add_argument("--providers", type=int, default=3,
+                        help="Providers pinned by each configuration (default: 3)")
+    parser.add_argument("--size-mb", type=float, default=5.0,
+                        help="Size of each provider package (default: 5)")
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="Seconds the stand-in registry takes per request (default: 0.05)")
+    parser.add_argument("-o", "--output", help="Write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    print(f"🏁 Benchmarking terraform init: {args.configs} configurations, "
+          f"{args.providers} providers of {args.size_mb:g} MB")
+    result = run_tf_benchmark(args.configs, args.providers, args.size_mb, args.latency)
+    print_result(result)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"📊 Results written to {args.output}")
+    if not result["scenarios"]["warmup"]["success"]:
+        print("❌ init failed inside the sandbox")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
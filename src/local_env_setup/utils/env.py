@@ -3,43 +3,56 @@ Environment variable utilities for the local environment setup tool.
 This module provides functionality to load and access environment variables from .env files.
 """
 
+import functools
 import os
 from pathlib import Path
 from typing import Optional, Dict, Any
-from dotenv import load_dotenv
 
-def load_env_file(env_file: Optional[str] = None) -> Dict[str, Any]:
+from local_env_setup.config.sources import dotenv_files
+
+@functools.lru_cache(maxsize=None)
+def _find_env_file(start: str) -> Optional[Path]:
+    """Find the nearest .env in a directory or its parents (memoized per directory)."""
+    current_dir = Path(start)
+    while True:
+        env_path = current_dir / '.env'
+        if env_path.exists():
+            return env_path
+        if current_dir.parent == current_dir:
+            return None
+        current_dir = current_dir.parent
+
+def load_env_file(env_file: Optional[str] = None) -> Dict[str, str]:
     """
     Load environment variables from a .env file.
     
+    Variables already set in the environment are left alone. The file is
+    parsed once and re-parsed only when it changes.
+    
     Args:
         env_file (Optional[str]): Path to the .env file. If None, looks for .env in the current directory
                                  and parent directories.
     
     Returns:
-        Dict[str, Any]: Dictionary containing the loaded environment variables
+        Dict[str, str]: The variables defined in the file
     
     Raises:
         FileNotFoundError: If the .env file is not found
     """
     if env_file:
-        env_path = Path(env_file)
+        env_path: Optional[Path] = Path(env_file)
     else:
-        # Start with current directory and look up
-        current_dir = Path.cwd()
-        env_path = current_dir / '.env'
-        
-        while not env_path.exists() and current_dir.parent != current_dir:
-            current_dir = current_dir.parent
-            env_path = current_dir / '.env'
-    
-    if not env_path.exists():
-        raise FileNotFoundError(f"No .env file found in {env_path} or its parent directories")
-    
-    load_dotenv(env_path)
+        env_path = _find_env_file(str(Path.cwd()))
+        if env_path is not None and not env_path.exists():
+            _find_env_file.cache_clear()
+            env_path = _find_env_file(str(Path.cwd()))
+    values = dotenv_files.get(env_path) if env_path else None
+    if values is None:
+        raise FileNotFoundError(f"No .env file found in {env_path or Path.cwd()} or its parent directories")
     
-    # Return a dictionary of all environment variables
-    return {key: value for key, value in os.environ.items()}
+    for key, value in values.items():
+        os.environ.setdefault(key, value)
+    return dict(values)
 
 def get_env_var(key: str, default: Any = None) -> Any:
     """
@@ -0,0 +1,74 @@
+import pytest
+
+from local_env_setup.config.env import CliOptions, resolve
+from local_env_setup.config.sources import FileCache, parse_yaml
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """An empty working directory and config home, with no config in the environment."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(tmp_path / "config"))
+    for key in ("GIT_EMAIL", "GIT_USERNAME", "SHELL_FAST_STARTUP",
+                "LOCAL_ENV_SETUP_CONFIG", "LOCAL_ENV_SETUP_PROFILE"):
+        monkeypatch.delenv(key, raising=False)
+    return tmp_path
+
+
+def test_layers_override_in_order(workdir, monkeypatch):
+    """Test defaults < YAML < profile < .env < environment < --set."""
+    config_file = workdir / "config" / "local_env_setup" / "config.yaml"
+    config_file.parent.mkdir(parents=True)
+    config_file.write_text(
+        "python_version: 3.12.1\n"
+        "git_username: yaml\n"
+        "zsh_plugins: [git]\n"
+        "profiles:\n"
+        "  work:\n"
+        "    GIT_EMAIL: work@corp\n"
+        "    GIT_USERNAME: profile\n")
+    (workdir / ".env").write_text("GIT_USERNAME=dotenv\nUNRELATED=1\n"
+                                  "LOCAL_ENV_SETUP_KUBECTL_VERSION=1.27\n")
+    monkeypatch.setenv("LOCAL_ENV_SETUP_SHELL_FAST_STARTUP", "off")
+    monkeypatch.setenv("LOCAL_ENV_SETUP_POETRY_MAX_WORKERS", "6")
+    monkeypatch.setenv("PYTHON_VERSION", "3.9.0")
+
+    config = resolve(CliOptions(profile="work", overrides={"HELM_VERSION": "3.12.0"}))
+
+    assert config.PYTHON_VERSION == "3.12.1"
+    assert config.ZSH_PLUGINS == ["git"]
+    assert config.GIT_EMAIL == "work@corp"
+    assert config.GIT_USERNAME == "dotenv"
+    assert config.KUBECTL_VERSION == "1.27"
+    assert config.SHELL_FAST_STARTUP is False
+    assert config.POETRY_MAX_WORKERS == 6
+    assert config.HELM_VERSION == "3.12.0"
+    monkeypatch.setenv("GIT_USERNAME", "env")
+    assert resolve(CliOptions()).GIT_USERNAME == "env"
+
+
+def test_unknown_keys_and_profiles_are_errors(workdir):
+    """Test that typos are reported instead of silently ignored."""
+    config_file = workdir / "config.yaml"
+    config_file.write_text("pyhton_version: 3.12\n")
+
+    with pytest.raises(ValueError, match="PYHTON_VERSION"):
+        resolve(CliOptions(config_file=str(config_file)))
+    with pytest.raises(ValueError, match="Unknown profile"):
+        resolve(CliOptions(profile="missing"))
+    with pytest.raises(ValueError, match="NOPE"):
+        resolve(CliOptions(overrides={"NOPE": "1"}))
+
+
+def test_files_are_parsed_again_only_when_changed(tmp_path):
+    """Test the per-file cache's mtime invalidation."""
+    parsed = []
+    cache = FileCache(lambda path: parsed.append(path) or parse_yaml(path))
+    path = tmp_path / "config.yaml"
+    path.write_text("a: 1\n")
+
+    assert cache.get(path) == cache.get(path) == {"a": 1}
+    path.write_text("a: 22\n")
+    assert cache.get(path) == {"a": 22}
+    assert len(parsed) == 2
+    assert cache.get(tmp_path / "missing.yaml") is None
@@ -0,0 +1,30 @@
+import pytest
+
+from local_env_setup.core.artifacts import set_artifact_cache
+from local_env_setup.core.backup import set_backup_store
+from local_env_setup.core.executor import CommandExecutor, FakeBackend, set_executor
+from local_env_setup.core.journal import set_journal
+
+
+@pytest.fixture(autouse=True)
+def state_home(tmp_path, monkeypatch):
+    """Keep journals, backups, artifacts and tools written during a test out of the real home."""
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+    set_backup_store(None)
+    set_journal(None)
+    set_artifact_cache(None)
+    yield tmp_path / "state"
+    set_backup_store(None)
+    set_journal(None)
+    set_artifact_cache(None)
+
+
+@pytest.fixture
+def fake_backend(tmp_path):
+    """Route every command through a FakeBackend for the duration of a test."""
+    backend = FakeBackend()
+    set_executor(CommandExecutor(backend=backend, log_dir=tmp_path / "logs"))
+    yield backend
+    set_executor(None)
@@ -0,0 +1,69 @@
+import os
+import time
+
+import pytest
+
+from local_env_setup.core.artifacts import ArtifactCache
+
+ATTRS = {"arch": "arm64", "os": "macos-14", "prefix": "/home/me/.pyenv/versions/3.12.1"}
+
+
+@pytest.fixture
+def tree(tmp_path):
+    """A small interpreter-like tree with an executable and a symlink."""
+    root = tmp_path / "build" / "3.12.1"
+    (root / "bin").mkdir(parents=True)
+    (root / "bin" / "python3.12").write_text("#!/bin/sh\necho python\n")
+    (root / "bin" / "python3.12").chmod(0o755)
+    (root / "bin" / "python3").symlink_to("python3.12")
+    (root / "lib").mkdir()
+    (root / "lib" / "os.py").write_text("x = 1\n" * 1000)
+    return root
+
+
+def test_pack_and_unpack_round_trip(tmp_path, tree):
+    """Test that a packed tree unpacks identically, keyed by its attributes."""
+    cache = ArtifactCache(tmp_path / "cache")
+    cache.pack(tree, "python", "3.12.1", ATTRS)
+
+    assert cache.lookup("python", "3.12.1", {**ATTRS, "arch": "x86_64"}) is None
+    artifact = cache.lookup("python", "3.12.1", ATTRS)
+    dest = tmp_path / "home" / ".pyenv" / "versions" / "3.12.1"
+    assert cache.unpack(artifact, dest)
+
+    assert (dest / "lib" / "os.py").read_text() == (tree / "lib" / "os.py").read_text()
+    assert os.readlink(dest / "bin" / "python3") == "python3.12"
+    assert os.access(dest / "bin" / "python3.12", os.X_OK)
+    assert sorted(p.name for p in dest.parent.iterdir()) == ["3.12.1"]
+    assert [a.version for a in cache.list()] == ["3.12.1"]
+
+
+def test_corrupt_artifact_is_removed(tmp_path, tree):
+    """Test that a tarball failing its checksum is dropped instead of unpacked."""
+    cache = ArtifactCache(tmp_path / "cache")
+    artifact = cache.pack(tree, "python", "3.12.1", ATTRS)
+    with cache.path(artifact).open("r+b") as f:
+        f.seek(20)
+        f.write(b"\0" * 16)
+
+    dest = tmp_path / "versions" / "3.12.1"
+    assert not cache.unpack(artifact, dest)
+    assert not dest.exists()
+    assert cache.lookup("python", "3.12.1", ATTRS) is None
+
+
+def test_prune_by_age_then_size(tmp_path, tree):
+    """Test that prune drops stale artifacts, then the least recently used."""
+    cache = ArtifactCache(tmp_path / "cache")
+    old = cache.pack(tree, "python", "3.9.18", ATTRS)
+    used = cache.pack(tree, "python", "3.10.13", ATTRS)
+    new = cache.pack(tree, "python", "3.12.1", ATTRS)
+    now = time.time()
+    os.utime(cache.path(old), (now - 200 * 86400,) * 2)
+    os.utime(cache.path(used), (now - 3600,) * 2)
+
+    assert cache.prune(max_age_days=90, max_bytes=new.size, dry_run=True) == [old, used]
+    assert [a.version for a in cache.list()] == ["3.10.13", "3.12.1", "3.9.18"]
+    cache.prune(max_age_days=90, max_bytes=new.size)
+    assert [a.version for a in cache.list()] == ["3.12.1"]
+    assert sorted(p.name for p in cache.root.glob("*.tar.gz")) == [new.file]
@@ -0,0 +1,40 @@
+from local_env_setup.core.backup import BackupStore
+
+
+def test_snapshots_are_deduplicated_and_retained(tmp_path):
+    """Test that unchanged files add no content and the original survives."""
+    store = BackupStore(tmp_path / "backups", keep=2)
+    rc = tmp_path / ".zshrc"
+    rc.write_text("original\n")
+
+    first = store.snapshot(rc, run="r1")
+    assert store.snapshot(rc, run="r1") == first
+    store.snapshot(rc, run="r2")
+    assert [v.digest for v in store.versions(rc)] == [first.digest] * 2
+    assert len(list(store.objects.rglob("*"))) == 2  # one shard dir, one object
+
+    for content in ("second\n", "third\n"):
+        rc.write_text(content)
+        store.snapshot(rc, run="r3")
+    digests = {v.digest for v in BackupStore(store.root, keep=2).versions(rc)}
+    assert first.digest not in digests and len(digests) == 2
+    assert not store.object_path(first.digest).exists()
+
+
+def test_restore_at_run(tmp_path):
+    """Test that restoring a run puts back the content it first replaced."""
+    store = BackupStore(tmp_path / "backups")
+    rc = tmp_path / ".zshrc"
+    rc.write_text("before r1\n")
+    store.snapshot(rc, run="r1", replacing=True)
+    rc.unlink()  # replaced by rename, as atomic_write does
+    rc.write_text("after r1\n")
+    store.snapshot(rc, run="r2")
+    rc.write_text("after r2\n")
+
+    [version] = store.at_run("r1")
+    assert store.restore(version)
+    assert rc.read_text() == "before r1\n"
+    assert not store.restore(version)
+    # The restore itself is undoable
+    assert store.read(store.versions(rc)[-1]) == b"after r2\n"
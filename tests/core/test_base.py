@@ -78,4 +78,15 @@ def test_rollback(base_setup, tmp_path):
     base_setup.rollback()
     
     # Verify rollback restored original content
-    assert test_file.read_text() == original_content 
\ No newline at end of file
+    assert test_file.read_text() == original_content 
+
+
+def test_append_rollback_restores_previous_content(base_setup, tmp_path):
+    """Test that rolling back an append restores the file as it was."""
+    test_file = tmp_path / "test.txt"
+    test_file.write_text("initial content\n")
+    base_setup.append_to_file(test_file, "new content\n")
+
+    base_setup.rollback()
+
+    assert test_file.read_text() == "initial content\n"
@@ -0,0 +1,60 @@
+from local_env_setup.core.brew import BrewPlan
+
+
+def test_packages_are_installed_in_one_deduplicated_batch(fake_backend):
+    """Test that formulae and casks each take a single brew install."""
+    plan = BrewPlan()
+    plan.add("kubernetes", formulae=["kubectl", "helm"])
+    plan.add("terraform", formulae=["terraform", "helm"])
+    plan.add("docker", casks=["docker"])
+
+    assert plan.execute() is True
+
+    assert fake_backend.calls == [
+        ["brew", "install", "helm", "kubectl", "terraform"],
+        ["brew", "install", "--cask", "docker"],
+    ]
+    assert plan.failures() == {}
+    assert plan.succeeded("kubectl")
+
+
+def test_batch_failure_is_mapped_to_requesting_components(fake_backend):
+    """Test that only owners of packages missing after a failed batch fail."""
+    fake_backend.add(["brew", "install"], returncode=1, stderr="Error: helm failed\n")
+    fake_backend.add(["brew", "list", "--versions"], stdout="kubectl 1.0\nterraform 1.0\n")
+    plan = BrewPlan()
+    plan.add("kubernetes", formulae=["kubectl", "helm"])
+    plan.add("terraform", formulae=["terraform"])
+
+    plan.execute()
+
+    assert plan.failures() == {"kubernetes": {"helm"}}
+    assert plan.succeeded("terraform")
+    assert not plan.succeeded("helm")
+
+
+def test_packages_after_a_failing_one_are_retried_alone(fake_backend):
+    """Test that packages brew never attempted are installed one at a time."""
+    fake_backend.add(["brew", "install", "helm"], returncode=1, stderr="Error: helm failed\n")
+    fake_backend.add(["brew", "list", "--versions"], stdout="")
+    plan = BrewPlan()
+    plan.add("kubernetes", formulae=["kubectl", "helm"])
+    plan.add("terraform", formulae=["terraform"])
+
+    plan.execute()
+
+    assert fake_backend.calls[-3:] == [
+        ["brew", "install", "helm"], ["brew", "install", "kubectl"], ["brew", "install", "terraform"]]
+    assert plan.failures() == {"kubernetes": {"helm"}}
+    assert plan.succeeded("terraform")
+
+
+def test_missing_brew_fails_every_package(fake_backend):
+    """Test that an unrunnable brew fails the whole plan."""
+    fake_backend.add(["brew"], returncode=127)
+    plan = BrewPlan()
+    plan.add("terraform", formulae=["terraform"])
+    plan.add("docker", casks=["docker"])
+
+    assert plan.execute() is False
+    assert plan.failures() == {"terraform": {"terraform"}, "docker": {"docker"}}
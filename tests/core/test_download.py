@@ -0,0 +1,194 @@
+import hashlib
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from local_env_setup.core.download import ChecksumError, DownloadCache
+from local_env_setup.core.resources import ResourcePool
+
+FILES = {
+    "/compose": b"docker-compose binary " * 1000,
+    "/install.sh": b"#!/bin/bash\necho installing\n",
+    "/other": b"x" * 5000,
+}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serve FILES with Range, If-Range and ETag support, recording each request."""
+
+    requests = []
+
+    def do_GET(self):
+        body = FILES.get(self.path)
+        self.requests.append((self.path, self.headers.get("Range")))
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"%s"' % hashlib.sha256(body).hexdigest()[:16]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        start = 0
+        if self.headers.get("Range") and self.headers.get("If-Range") in (None, etag):
+            start = int(self.headers["Range"].split("=")[1].rstrip("-"))
+            self.send_response(206)
+        else:
+            self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    Handler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def make_cache(tmp_path, **kwargs):
+    return DownloadCache(tmp_path / "cache", mirror="", pool=ResourcePool({}), **kwargs)
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def test_verified_download_is_served_from_cache(server, tmp_path):
+    """Test that a pinned download is verified once and then reused."""
+    cache = make_cache(tmp_path)
+    expected = sha256(FILES["/compose"])
+
+    first = cache.fetch(f"{server}/compose", sha256=expected)
+    second = cache.fetch(f"{server}/compose", sha256=expected)
+
+    assert first == second == cache.object_path(expected)
+    assert first.read_bytes() == FILES["/compose"]
+    assert len(Handler.requests) == 1
+
+
+def test_checksum_mismatch_is_rejected(server, tmp_path):
+    """Test that content not matching the expected digest is never cached."""
+    cache = make_cache(tmp_path)
+
+    with pytest.raises(ChecksumError):
+        cache.fetch(f"{server}/install.sh", sha256="0" * 64)
+
+    assert not list((tmp_path / "cache" / "objects").glob("*/*"))
+
+
+def test_partial_download_resumes(server, tmp_path):
+    """Test that an interrupted download continues with a Range request."""
+    cache = make_cache(tmp_path)
+    url = f"{server}/compose"
+    partial_dir = tmp_path / "cache" / "partial"
+    partial_dir.mkdir(parents=True)
+    (partial_dir / (sha256(url.encode())[:32] + ".part")).write_bytes(FILES["/compose"][:1000])
+
+    path = cache.fetch(url, sha256=sha256(FILES["/compose"]))
+
+    assert path.read_bytes() == FILES["/compose"]
+    assert Handler.requests == [("/compose", "bytes=1000-")]
+
+
+def test_unpinned_partial_resumes_only_the_same_version(server, tmp_path):
+    """Test that a partial file of a since-changed resource is not extended."""
+    cache = make_cache(tmp_path)
+    partial_dir = tmp_path / "cache" / "partial"
+    partial_dir.mkdir(parents=True)
+    url = f"{server}/install.sh"
+    partial = partial_dir / (sha256(url.encode())[:32] + ".part")
+    partial.write_bytes(b"#!/bin/sh\necho older\n")
+    partial.with_suffix(".validator").write_text('"old"')
+
+    assert cache.fetch(url).read_bytes() == FILES["/install.sh"]
+    assert Handler.requests == [("/install.sh", "bytes=21-")]
+    assert not partial.with_suffix(".validator").exists()
+
+    # Without a validator an unpinned partial file is discarded
+    Handler.requests = []
+    url = f"{server}/other"
+    (partial_dir / (sha256(url.encode())[:32] + ".part")).write_bytes(b"y" * 100)
+    assert cache.fetch(url).read_bytes() == FILES["/other"]
+    assert Handler.requests == [("/other", None)]
+
+
+def test_unpinned_entries_are_revalidated(server, tmp_path):
+    """Test that stale unpinned entries are revalidated with their ETag."""
+    cache = make_cache(tmp_path)
+    url = f"{server}/install.sh"
+
+    first = cache.fetch(url, max_age=0)
+    second = cache.fetch(url, max_age=0)
+
+    assert first == second
+    assert len(Handler.requests) == 2
+
+
+def test_mirror_is_tried_first(server, tmp_path):
+    """Test that downloads come from the mirror when one is configured."""
+    cache = DownloadCache(tmp_path / "cache", mirror=f"{server}/", pool=ResourcePool({}))
+    FILES["/example.com/tool"] = b"mirrored"
+    try:
+        path = cache.fetch("http://example.com/tool", sha256=sha256(b"mirrored"))
+    finally:
+        del FILES["/example.com/tool"]
+
+    assert path.read_bytes() == b"mirrored"
+    assert Handler.requests == [("/example.com/tool", None)]
+
+
+def test_checksum_mismatch_on_the_mirror_falls_back_to_the_origin(server, tmp_path):
+    """Test that a corrupt mirror copy is replaced by the origin's."""
+    cache = DownloadCache(tmp_path / "cache", mirror=f"{server}/mirror/", pool=ResourcePool({}))
+    mirrored = f"/mirror/{server.split('//')[1]}/install.sh"
+    FILES[mirrored] = b"corrupt"
+    try:
+        path = cache.fetch(f"{server}/install.sh", sha256=sha256(FILES["/install.sh"]))
+    finally:
+        del FILES[mirrored]
+
+    assert path.read_bytes() == FILES["/install.sh"]
+    assert [request for request, _ in Handler.requests] == [mirrored, "/install.sh"]
+
+
+def test_waiter_does_not_write_into_a_stored_object(tmp_path):
+    """Test that the partial file is reopened once its locked inode was renamed away."""
+    partial = tmp_path / "download.part"
+    first = DownloadCache._lock_partial(partial)
+    first.write(b"content")
+    first.flush()
+    stored = tmp_path / "object"
+    waiter = []
+    thread = threading.Thread(target=lambda: waiter.append(DownloadCache._lock_partial(partial)))
+    thread.start()
+    os.replace(partial, stored)
+    first.close()
+    thread.join(5)
+
+    [f] = waiter
+    assert os.fstat(f.fileno()).st_ino != stored.stat().st_ino
+    f.close()
+
+
+def test_least_recently_used_objects_are_evicted(server, tmp_path):
+    """Test that the size cap evicts the oldest objects first."""
+    cache = make_cache(tmp_path, max_bytes=len(FILES["/compose"]) + len(FILES["/other"]))
+    paths = cache.fetch_many([(f"{server}/compose", None), (f"{server}/install.sh", None)])
+    # Make install.sh the least recently used object
+    cache.fetch(f"{server}/compose")
+
+    cache.fetch(f"{server}/other")
+
+    assert paths[0].exists()
+    assert not paths[1].exists()
@@ -0,0 +1,119 @@
+import asyncio
+import sys
+import time
+
+import pytest
+
+from local_env_setup.core.executor import (
+    CommandError, CommandExecutor, FakeBackend, RecordingBackend, TailBuffer
+)
+from local_env_setup.core.monitoring import SetupMonitor
+
+
+def test_tail_buffer_keeps_only_the_end():
+    """Test that captured output is bounded to the last bytes written."""
+    tail = TailBuffer(limit=10)
+    for i in range(100):
+        tail.write(f"line{i}\n".encode())
+
+    assert tail.getvalue() == "98\nline99\n"
+
+
+def test_full_output_goes_to_the_log(tmp_path):
+    """Test that output beyond the in-memory tail is kept on disk."""
+    executor = CommandExecutor(log_dir=tmp_path, tail_bytes=16)
+    result = executor.run([sys.executable, "-c", "print('x' * 1000)"])
+
+    assert result.ok
+    assert len(result.stdout) == 16
+    assert result.log_path.read_text() == "x" * 1000 + "\n"
+
+
+def test_env_overlay_and_timings(tmp_path):
+    """Test that env overlays reach the process and timings are reported."""
+    monitor = SetupMonitor()
+    executor = CommandExecutor(log_dir=tmp_path, env={"BASE_VAR": "a"})
+    result = executor.run(
+        [sys.executable, "-c", "import os; print(os.environ['BASE_VAR'] + os.environ['CALL_VAR'])"],
+        env={"CALL_VAR": "b"}, monitor=monitor, name="echo-env")
+
+    assert result.stdout.strip() == "ab"
+    assert result.wall_time > 0
+    [record] = monitor.commands
+    assert record.name == "echo-env"
+    assert record.returncode == 0
+
+
+def test_call_env_overrides_the_overlay(tmp_path):
+    """Test that a per-call env wins over the executor's overlay for the same key."""
+    executor = CommandExecutor(log_dir=tmp_path, env={"SHARED_VAR": "overlay"})
+    result = executor.run([sys.executable, "-c", "import os; print(os.environ['SHARED_VAR'])"],
+                          env={"SHARED_VAR": "call"})
+
+    assert result.stdout.strip() == "call"
+
+
+def test_timeout_kills_the_command(tmp_path):
+    """Test that a command is killed and reported once its timeout expires."""
+    executor = CommandExecutor(log_dir=tmp_path)
+    with pytest.raises(CommandError) as excinfo:
+        executor.run([sys.executable, "-c", "import time; time.sleep(30)"],
+                     timeout=0.2, check=True)
+
+    assert excinfo.value.result.timed_out
+    assert excinfo.value.result.wall_time < 10
+
+
+def test_timeout_kills_the_commands_children(tmp_path):
+    """Test that a timeout does not wait for processes the command started."""
+    executor = CommandExecutor(log_dir=tmp_path)
+
+    start = time.perf_counter()
+    result = executor.run(["sh", "-c", "sleep 8 & sleep 8"], timeout=0.5)
+    assert result.timed_out and time.perf_counter() - start < 4
+
+    start = time.perf_counter()
+    result = asyncio.run(executor.arun(["sh", "-c", "sleep 8 & sleep 8"], timeout=0.5))
+    assert result.timed_out and time.perf_counter() - start < 4
+
+
+def test_recorded_session_replays(tmp_path):
+    """Test that a recorded session can be replayed by the fake backend."""
+    recording = tmp_path / "session.json"
+    fake = FakeBackend()
+    fake.add(["brew", "--version"], stdout="Homebrew 4.1.0\n")
+    CommandExecutor(backend=RecordingBackend(fake, recording), log_dir=tmp_path).run(
+        ["brew", "--version"])
+
+    replay = CommandExecutor(backend=FakeBackend.from_recording(recording), log_dir=tmp_path)
+    assert replay.run(["brew", "--version"]).stdout == "Homebrew 4.1.0\n"
+    assert replay.run(["brew", "doctor"]).returncode == 127
+
+
+def test_async_run_streams_lines(tmp_path):
+    """Test that the async path delivers output line by line."""
+    lines = []
+    executor = CommandExecutor(log_dir=tmp_path)
+    result = asyncio.run(executor.arun(
+        [sys.executable, "-c", "print('one'); print('two', flush=True)"],
+        on_line=lambda stream, line: lines.append((stream, line))))
+
+    assert result.ok
+    assert lines == [("stdout", "one"), ("stdout", "two")]
+
+
+def test_async_cancel_kills_the_command(tmp_path):
+    """Test that cancelling the awaiting task stops the process."""
+    executor = CommandExecutor(log_dir=tmp_path)
+
+    async def main():
+        task = asyncio.ensure_future(
+            executor.arun([sys.executable, "-c", "import time; time.sleep(30)"]))
+        await asyncio.sleep(0.2)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    start = time.perf_counter()
+    asyncio.run(main())
+    assert time.perf_counter() - start < 10
@@ -0,0 +1,74 @@
+import fcntl
+import json
+
+import pytest
+
+from local_env_setup.core.fleet import fleet_summary, load_targets, provision_fleet
+from local_env_setup.core.resources import ResourcePool
+from local_env_setup.core.state import shared_cache_dir
+from local_env_setup.testing import Sandbox
+
+
+@pytest.fixture
+def sandbox(tmp_path, monkeypatch):
+    """Stub tools on PATH for the fleet's worker processes."""
+    with Sandbox(tmp_path / "sandbox") as sandbox:
+        for key, value in sandbox.env().items():
+            monkeypatch.setenv(key, value)
+        yield sandbox
+
+
+def test_load_targets_applies_defaults(tmp_path):
+    """Test that defaults merge into each target and names must be unique."""
+    path = tmp_path / "targets.json"
+    path.write_text(json.dumps({
+        "defaults": {"env": {"GIT_EMAIL": "ci@example.com"}},
+        "targets": [{"home": str(tmp_path / "a")},
+                    {"name": "b", "home": str(tmp_path / "b"), "env": {"GIT_EMAIL": "b@x"}}],
+    }))
+
+    a, b = load_targets(path)
+
+    assert (a.name, a.env) == ("a", {"GIT_EMAIL": "ci@example.com"})
+    assert b.env == {"GIT_EMAIL": "b@x"}
+    path.write_text(json.dumps([{"name": "x", "home": "/a"}, {"name": "x", "home": "/b"}]))
+    with pytest.raises(ValueError, match="duplicate"):
+        load_targets(path)
+
+
+def test_fleet_provisions_each_target_in_its_own_home(sandbox, tmp_path):
+    """Test per-target overrides, the per-target lock and the combined summary."""
+    targets = tmp_path / "targets.json"
+    targets.write_text(json.dumps([
+        {"name": f"t{i}", "home": str(tmp_path / f"t{i}"), "env": {"GIT_EMAIL": f"t{i}@x"}}
+        for i in range(3)
+    ]))
+    busy = tmp_path / "t2" / ".local" / "state" / "local_env_setup" / "provision.lock"
+    busy.parent.mkdir(parents=True)
+
+    with open(busy, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        results = provision_fleet(load_targets(targets), processes=2, components=["git"],
+                                  log_dir=tmp_path / "logs")
+    summary = fleet_summary(results)
+
+    assert [(r.name, r.success) for r in results] == [("t0", True), ("t1", True), ("t2", False)]
+    assert "another run" in results[2].error
+    assert "user.email = t1@x" in (tmp_path / "t1" / ".gitconfig").read_text()
+    assert [run["run"] for run in summary["runs"]] == ["t0", "t1"]
+    assert {span["run"] for span in summary["spans"]} == {"t0", "t1"}
+    assert summary["success"] is False
+    environ = load_targets(targets)[0].environ(str(tmp_path / "shared"))
+    assert environ["XDG_DATA_HOME"] == str(tmp_path / "t0" / ".local" / "share")
+    assert environ["XDG_CONFIG_HOME"] == str(tmp_path / "t0" / ".config")
+
+
+def test_brew_is_held_across_processes(tmp_path):
+    """Test that holding brew also takes the host-wide lock other workers wait on."""
+    lock_path = shared_cache_dir() / "locks" / "brew.lock"
+    with ResourcePool().hold(("brew",)):
+        with open(lock_path) as other:
+            with pytest.raises(BlockingIOError):
+                fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    with open(lock_path) as other:
+        fcntl.flock(other, fcntl.LOCK_EX | fcntl.LOCK_NB)
@@ -0,0 +1,79 @@
+import asyncio
+import subprocess
+
+import pytest
+
+from local_env_setup.core.executor import CommandExecutor, FakeBackend
+from local_env_setup.core.git_mirror import GitMirrorCache
+from local_env_setup.core.resources import ResourcePool
+
+
+def git(*args, cwd=None):
+    return subprocess.run(
+        ["git", "-c", "user.name=test", "-c", "user.email=test@example.com", *args],
+        cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+@pytest.fixture
+def origin(tmp_path):
+    repo = tmp_path / "origin"
+    repo.mkdir()
+    git("init", "--quiet", cwd=repo)
+    for i in range(3):
+        (repo / "plugin.zsh").write_text(f"# version {i}\n")
+        git("add", ".", cwd=repo)
+        git("commit", "--quiet", "-m", f"commit {i}", cwd=repo)
+    return repo
+
+
+def make_cache(tmp_path, backend=None, max_age=3600):
+    executor = CommandExecutor(backend=backend, log_dir=tmp_path / "logs")
+    return GitMirrorCache(tmp_path / "mirrors", max_age=max_age,
+                          executor=executor, pool=ResourcePool({}))
+
+
+def test_clones_are_shallow_copies_of_one_mirror(origin, tmp_path):
+    """Test that concurrent clones share a mirror and point at the real remote."""
+    cache = make_cache(tmp_path)
+    url = origin.as_uri()
+
+    async def clone_twice():
+        return await asyncio.gather(cache.aclone(url, tmp_path / "a"),
+                                    cache.aclone(url, tmp_path / "b"))
+
+    results = asyncio.run(clone_twice())
+
+    assert all(result.ok for result in results)
+    assert len(list((tmp_path / "mirrors").glob("*.git"))) == 1
+    assert git("rev-list", "--count", "HEAD", cwd=tmp_path / "a") == "1"
+    assert git("remote", "get-url", "origin", cwd=tmp_path / "b") == url
+
+
+def test_stale_mirror_is_fetched_not_recloned(origin, tmp_path):
+    """Test that a stale mirror picks up new commits with an incremental fetch."""
+    cache = make_cache(tmp_path, max_age=0)
+    url = origin.as_uri()
+    inode = asyncio.run(cache.aupdate(url)).stat().st_ino
+    (origin / "plugin.zsh").write_text("# version 3\n")
+    git("commit", "--quiet", "-am", "commit 3", cwd=origin)
+
+    result = asyncio.run(cache.aclone(url, tmp_path / "work"))
+
+    assert result.ok
+    assert (tmp_path / "work" / "plugin.zsh").read_text() == "# version 3\n"
+    assert cache.mirror_path(url).stat().st_ino == inode
+
+
+def test_fresh_mirror_skips_the_network(tmp_path):
+    """Test that a recently fetched mirror is used without contacting the remote."""
+    backend = FakeBackend()
+    cache = make_cache(tmp_path, backend=backend)
+    url = "https://github.com/zsh-users/zsh-autosuggestions.git"
+    mirror = cache.mirror_path(url)
+    mirror.mkdir(parents=True)
+    mirror.with_suffix(".fetched").touch()
+
+    asyncio.run(cache.aclone(url, tmp_path / "plugin"))
+
+    assert [call[1] for call in backend.calls] == ["clone", "-C"]
+    assert backend.calls[0][-2] == mirror.as_uri()
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+from local_env_setup.core.history import RunHistory, percentile
+from local_env_setup.core.monitoring import SetupMonitor
+
+
+def summary(run_id, started_at, durations, host="mac-1"):
+    """A summary with one python/pyenv install command per duration."""
+    return {
+        "run_id": run_id, "host": host, "started_at": started_at, "total_duration": 1.0,
+        "spans": [{"category": "command", "component": "python", "action": "pyenv install",
+                   "target": f"3.{i}", "duration": d, "success": True}
+                  for i, d in enumerate(durations)],
+    }
+
+
+def test_percentile_interpolates():
+    """Test percentiles between samples."""
+    assert percentile([1, 2, 3, 4], 50) == 2.5
+    assert percentile([5], 95) == 5
+
+
+def test_monitor_runs_are_grouped_by_step_kind(tmp_path):
+    """Test that recorded steps group by component and action, not target."""
+    history = RunHistory(tmp_path / "history.sqlite3")
+    for path in ("/a", "/b"):
+        monitor = SetupMonitor()
+        with monitor.span("docker", category="component"):
+            with monitor.span("create_directory", target=path):
+                pass
+        history.record(monitor, success=True)
+
+    [stat] = history.step_stats(category="step")
+
+    assert (stat.component, stat.action) == ("docker", "create_directory")
+    assert (stat.count, stat.runs) == (2, 2)
+
+
+def test_fleet_summaries_are_ingested_once(tmp_path):
+    """Test ingesting a directory of summaries, including the legacy format."""
+    fleet = tmp_path / "fleet"
+    fleet.mkdir()
+    (fleet / "a.json").write_text(json.dumps(summary("a", 1, [10.0, 20.0])))
+    (fleet / "old.json").write_text(json.dumps({
+        "total_duration": 3.0, "failed_steps": 0,
+        "steps": [{"name": "run_command_brew_install_kubectl", "duration": 3.0,
+                   "success": True}],
+        "commands": [],
+    }))
+    history = RunHistory(tmp_path / "history.sqlite3")
+
+    assert history.ingest_files([fleet]) == (2, 0)
+    assert history.ingest_files([fleet]) == (0, 2)
+    stats = {stat.action: stat for stat in history.step_stats()}
+    assert stats["pyenv install"].p50 == pytest.approx(15.0)
+    assert stats["run_command"].max == 3.0
+
+
+def test_regressions_compare_the_latest_run_with_its_baseline(tmp_path):
+    """Test that only a slowdown in the latest run beyond the threshold is reported."""
+    history = RunHistory(tmp_path / "history.sqlite3")
+    for i, duration in enumerate([10.0, 11.0, 9.0, 10.0, 15.0]):
+        history.ingest(summary(f"run{i}", i, [duration]))
+    history.ingest(summary("other-host", 10, [1.0], host="linux-1"))
+
+    [regression] = history.regressions(threshold=0.2, window=4, host="mac-1")
+
+    assert regression.action == "pyenv install"
+    assert regression.baseline == pytest.approx(10.0)
+    assert regression.change == pytest.approx(0.5)
+    assert history.regressions(threshold=0.6, host="mac-1") == []
+    assert history.regressions(host="linux-1") == []
+
+
+def test_expected_durations_prefer_the_local_host(tmp_path):
+    """Test component estimates from successful runs on this host."""
+    history = RunHistory(tmp_path / "history.sqlite3")
+    for i, (host, duration, ok) in enumerate([("mac-1", 100.0, True), ("mac-1", 120.0, True),
+                                               ("mac-1", 5.0, False), ("linux-1", 10.0, True)]):
+        history.ingest({"run_id": f"r{i}", "host": host, "started_at": i, "spans": [
+            {"category": "component", "component": "python", "action": "python",
+             "duration": duration, "success": ok}]})
+
+    assert history.expected_durations(host="mac-1") == {"python": 110.0}
+    assert history.expected_durations(host="new-mac") == {"python": 100.0}
@@ -0,0 +1,60 @@
+import json
+
+import pytest
+
+from local_env_setup.core.inventory import BrewInventory, version_matches
+
+BREW_INFO = {
+    "formulae": [
+        {"name": "kubernetes-cli", "full_name": "kubernetes-cli", "aliases": ["kubectl"],
+         "installed": [{"version": "1.26.3"}]},
+        {"name": "terraform", "full_name": "terraform", "aliases": [],
+         "installed": [{"version": "1.5.7"}]},
+    ],
+    "casks": [{"token": "docker", "installed": "4.20.0"}],
+}
+
+
+@pytest.fixture
+def brew_prefix(tmp_path):
+    prefix = tmp_path / "homebrew"
+    (prefix / "Cellar" / "terraform").mkdir(parents=True)
+    (prefix / "Caskroom").mkdir()
+    return prefix
+
+
+@pytest.fixture
+def brew_calls(fake_backend):
+    fake_backend.add(["brew", "info"], stdout=json.dumps(BREW_INFO))
+    return fake_backend.calls
+
+
+def test_lookups_use_one_brew_call(brew_prefix, brew_calls, tmp_path):
+    """Test that the index answers lookups, including aliases and casks."""
+    inventory = BrewInventory(tmp_path / "cache.json", prefix=brew_prefix)
+
+    assert inventory.is_installed("kubectl")
+    assert inventory.versions("terraform") == ["1.5.7"]
+    assert inventory.is_installed("docker", cask=True)
+    assert not inventory.is_installed("helm")
+    assert inventory.satisfies("kubectl", "1.26")
+    assert len(brew_calls) == 1
+
+
+def test_disk_cache_is_keyed_on_cellar(brew_prefix, brew_calls, tmp_path):
+    """Test that the disk cache is reused until the Cellar changes."""
+    cache = tmp_path / "cache.json"
+    BrewInventory(cache, prefix=brew_prefix).load()
+    BrewInventory(cache, prefix=brew_prefix).load()
+    assert len(brew_calls) == 1
+
+    (brew_prefix / "Cellar" / "helm").mkdir()
+    BrewInventory(cache, prefix=brew_prefix).load()
+    assert len(brew_calls) == 2
+
+
+def test_version_matches():
+    """Test pinned version matching on dotted components."""
+    assert version_matches("1.26.3", "1.26")
+    assert version_matches("1.4.0_1", "1.4.0")
+    assert not version_matches("1.260.0", "1.26")
@@ -0,0 +1,57 @@
+import pytest
+
+from local_env_setup.core.journal import Journal
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return Journal(tmp_path / "state" / "journal.jsonl")
+
+
+def test_rollback_restores_preimages(journal, tmp_path):
+    """Test that rolling back a run undoes its writes and directories."""
+    rc = tmp_path / ".zshrc"
+    rc.write_text("original\n")
+    journal.begin(["shell"])
+    with journal.mutation("write", rc):
+        rc.write_text("changed\n")
+    with journal.mutation("write", tmp_path / "new.txt"):
+        (tmp_path / "new.txt").write_text("new\n")
+    with journal.mutation("mkdir", tmp_path / "a" / "b"):
+        (tmp_path / "a" / "b").mkdir(parents=True)
+    journal.end(True)
+
+    runs = Journal(journal.path).rollback()
+
+    assert [len(run.mutations) for run in runs] == [3]
+    assert rc.read_text() == "original\n"
+    assert not (tmp_path / "new.txt").exists()
+    assert not (tmp_path / "a").exists()
+    with pytest.raises(ValueError, match="already rolled back"):
+        journal.rollback()
+
+
+def test_interrupted_run_is_resumable(journal, tmp_path):
+    """Test that a crashed run keeps its commits and its torn write is undone."""
+    rc = tmp_path / ".zshrc"
+    rc.write_text("original\n")
+    block = {"path": str(rc), "name": "git", "content": "x", "priority": 50}
+    journal.begin(["git", "shell"])
+    journal.commit("git", [block])
+    with pytest.raises(KeyboardInterrupt):
+        with journal.mutation("write", rc):
+            rc.write_text("half")
+            raise KeyboardInterrupt
+    # The process dies here: no end record
+
+    interrupted = Journal(journal.path).resumable()
+    assert interrupted is not None and interrupted.interrupted
+    assert interrupted.committed == {"git": [block]}
+    assert journal.recover(interrupted) == [f"restored {rc}"]
+    assert rc.read_text() == "original\n"
+
+    # A resumed run that fails keeps the commits of the one it resumed
+    resumed = Journal(journal.path)
+    resumed.begin(["git", "shell"], resumes=interrupted.run_id)
+    resumed.end(False)
+    assert set(resumed.resumable().committed) == {"git"}
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from local_env_setup.core.inventory import BrewInventory
+from local_env_setup.core.manifest import Manifest, apply, plan
+from local_env_setup.core.rcfile import RcEditor
+
+BREW_INFO = {
+    "formulae": [
+        {"name": "kubernetes-cli", "full_name": "kubernetes-cli", "aliases": ["kubectl"],
+         "installed": [{"version": "1.26.3"}]},
+        {"name": "helm", "full_name": "helm", "aliases": [],
+         "installed": [{"version": "3.11.2"}]},
+    ],
+    "casks": [{"token": "docker", "installed": "4.20.0"}],
+}
+
+MANIFEST = {
+    "brew": {"kubectl": "1.26", "helm": "3.11", "kubectx": None},
+    "casks": ["docker"],
+    "git": {"user.name": "Jane Doe"},
+    "rc": {"~/.zshrc": {"aliases": {"content": "alias k=kubectl", "priority": 60}}},
+}
+
+
+@pytest.fixture
+def machine(fake_backend, tmp_path, monkeypatch):
+    """A machine where everything in MANIFEST but kubectx is in place."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    prefix = tmp_path / "homebrew"
+    (prefix / "Cellar").mkdir(parents=True)
+    (prefix / "Caskroom").mkdir()
+    fake_backend.add(["brew", "info"], stdout=json.dumps(BREW_INFO))
+    fake_backend.add(["git", "config", "--global", "--list"], stdout="user.name=Jane Doe\n")
+    editor = RcEditor()
+    editor.set_block(tmp_path / ".zshrc", "aliases", "alias k=kubectl", priority=60)
+    inventory = BrewInventory(tmp_path / "cache.json", prefix=prefix)
+    return {"inventory": inventory, "editor": editor}
+
+
+def test_plan_lists_only_the_delta(machine):
+    """Test that a pin change shows up as exactly one change."""
+    manifest = Manifest.from_dict(MANIFEST)
+    changes = plan(manifest, **machine)
+    assert [(c.resource.address, c.action) for c in changes] == [("brew.kubectx", "install")]
+
+    pinned = Manifest.from_dict({**MANIFEST, "brew": {**MANIFEST["brew"], "kubectl": "1.27"}})
+    changes = plan(pinned, **machine)
+    assert [(c.resource.address, c.action, c.current) for c in changes] == [
+        ("brew.kubectl", "upgrade", "1.26.3"), ("brew.kubectx", "install", None)]
+
+
+def test_apply_runs_only_changed_resources(machine, fake_backend):
+    """Test that apply touches the changed git key and formula and nothing else."""
+    manifest = Manifest.from_dict({**MANIFEST, "git": {"user.name": "John Doe"}})
+    changes = plan(manifest, **machine)
+    fake_backend.calls.clear()
+
+    results = apply(changes, **machine)
+
+    assert results == {"brew.kubectx": True, "git.user.name": True}
+    commands = [call for call in fake_backend.calls if call[:2] != ["brew", "info"]]
+    assert sorted(commands) == [["brew", "install", "kubectx"],
+                                ["git", "config", "--global", "user.name", "John Doe"]]
+
+
+def test_unknown_section_is_rejected():
+    """Test that typos in section names are reported."""
+    with pytest.raises(ValueError, match="unknown section"):
+        Manifest.from_dict({"formulae": ["jq"]})
@@ -0,0 +1,85 @@
+import json
+import time
+
+import pytest
+
+from local_env_setup.core.executor import CommandExecutor, FakeBackend
+from local_env_setup.core.monitoring import SetupMonitor
+from local_env_setup.core.resources import ResourcePool
+from local_env_setup.core.scheduler import Scheduler
+
+
+def test_spans_and_steps_nest():
+    """Test that spans and legacy steps nest instead of failing each other."""
+    monitor = SetupMonitor()
+
+    with monitor.span("install", category="component") as outer:
+        monitor.start_step("platform_check")
+        monitor.start_step("inner_check")
+        monitor.end_step(True)
+        monitor.end_step(False, "Unsupported platform")
+        with pytest.raises(RuntimeError):
+            with monitor.span("configure"):
+                raise RuntimeError("boom")
+
+    spans = {span.name: span for span in monitor.spans}
+    assert spans["inner_check"].parent is spans["platform_check"]
+    assert spans["platform_check"].parent is outer
+    assert spans["configure"].parent is outer
+    assert (spans["configure"].success, spans["configure"].error) == (False, "boom")
+    assert [(step.name, step.success) for step in monitor.steps] == [
+        ("inner_check", True), ("platform_check", False), ("configure", False)]
+    assert monitor.current_span is None
+
+
+def test_span_works_as_decorator():
+    """Test that span() decorates a function, recording each call."""
+    monitor = SetupMonitor()
+
+    @monitor.span("probe")
+    def probe():
+        return monitor.current_span.name
+
+    assert probe() == "probe"
+    assert probe() == "probe"
+    assert [span.name for span in monitor.spans] == ["probe", "probe"]
+
+
+def test_scheduled_run_exports_a_trace(tmp_path):
+    """Test that commands nest under their components on separate lanes."""
+    monitor = SetupMonitor()
+    backend = FakeBackend()
+    backend.add(["brew"], delay=0.05)
+    backend.add(["git"], returncode=1, delay=0.05)
+    executor = CommandExecutor(backend=backend, log_dir=tmp_path / "logs")
+    scheduler = Scheduler(max_workers=2, pool=ResourcePool({}), monitor=monitor)
+    scheduler.add("brew-bundle", lambda: executor.run(["brew", "install"], monitor=monitor).ok)
+    scheduler.add("git", lambda: executor.run(["git", "clone"], monitor=monitor).ok)
+
+    with monitor.span("init", category="run"):
+        scheduler.run()
+    monitor.save_chrome_trace(tmp_path / "trace.json")
+    monitor.save_jsonl(tmp_path / "trace.jsonl")
+
+    events = [e for e in json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+              if e["ph"] == "X"]
+    lanes = {e["name"]: e["tid"] for e in events}
+    assert lanes["brew install"] == lanes["brew-bundle"]
+    assert lanes["git clone"] == lanes["git"] != lanes["brew-bundle"]
+    records = {r["name"]: r for r in map(json.loads, (tmp_path / "trace.jsonl").open())}
+    assert records["git clone"]["parent"] == records["git"]["id"]
+    assert records["git clone"]["attrs"]["returncode"] == 1
+    assert records["git"]["success"] is False
+    assert records["brew-bundle"]["parent"] == records["init"]["id"]
+
+
+def test_open_spans_are_exported_as_unfinished():
+    """Test that a trace taken mid-run includes the spans still open."""
+    monitor = SetupMonitor()
+
+    with monitor.span("init", category="run"):
+        time.sleep(0.001)
+        [event] = [e for e in monitor.chrome_trace()["traceEvents"] if e["ph"] == "X"]
+
+    assert event["args"]["unfinished"] is True
+    assert event["dur"] > 0
@@ -0,0 +1,120 @@
+import hashlib
+import io
+import json
+import os
+import time
+import zipfile
+
+import pytest
+
+from local_env_setup.core.providers import (
+    Provider, ProviderMirror, find_lock_files, merge_providers, parse_lock_file, parse_provider)
+
+LOCK = '''# This file is maintained automatically by "terraform init".
+
+provider "registry.terraform.io/hashicorp/aws" {{
+  version     = "5.31.0"
+  constraints = "~> 5.0"
+  hashes = [
+    "h1:abc=",
+    "zh:{digest}",
+  ]
+}}
+
+provider "registry.terraform.io/hashicorp/random" {{
+  version = "3.6.0"
+}}
+'''
+
+
+def _package():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as package:
+        info = zipfile.ZipInfo("terraform-provider-aws_v5.31.0_x5")
+        info.external_attr = 0o755 << 16
+        package.writestr(info, b"binary")
+    return buffer.getvalue()
+
+
+class FakeDownloads:
+    """Serves the registry metadata and package of one provider."""
+
+    def __init__(self, tmp_path, archive):
+        self.tmp_path = tmp_path
+        self.archive = archive
+        self.urls = []
+
+    def fetch(self, url, sha256=None, max_age=None):
+        self.urls.append(url)
+        path = self.tmp_path / f"download{len(self.urls)}"
+        if url.endswith(".zip"):
+            path.write_bytes(self.archive)
+        else:
+            path.write_text(json.dumps({"download_url": "https://releases.example/aws.zip",
+                                        "shasum": hashlib.sha256(self.archive).hexdigest()}))
+        return path
+
+
+def test_lock_files_are_discovered_and_merged(tmp_path):
+    """Test that pins from lock files and the configuration are deduplicated."""
+    (tmp_path / "app" / ".terraform").mkdir(parents=True)
+    (tmp_path / "app" / ".terraform.lock.hcl").write_text(LOCK.format(digest="a" * 64))
+    (tmp_path / "app" / ".terraform" / ".terraform.lock.hcl").write_text(LOCK.format(digest="b" * 64))
+    (tmp_path / "infra").mkdir()
+    (tmp_path / "infra" / ".terraform.lock.hcl").write_text(LOCK.format(digest="c" * 64))
+
+    lock_files = find_lock_files(tmp_path)
+    assert [path.parent.name for path in lock_files] == ["app", "infra"]
+    providers = [parse_provider("hashicorp/aws@5.31.0")]
+    for path in lock_files:
+        providers += parse_lock_file(path.read_text())
+
+    assert merge_providers(providers) == [
+        Provider("registry.terraform.io/hashicorp/aws", "5.31.0", ("a" * 64, "c" * 64)),
+        Provider("registry.terraform.io/hashicorp/random", "3.6.0"),
+    ]
+    with pytest.raises(ValueError):
+        parse_provider("hashicorp/aws")
+
+
+def test_lock_file_walk_is_reused_until_a_directory_changes(tmp_path, monkeypatch):
+    """Test that the indexed walk is skipped while no directory was modified."""
+    root = tmp_path / "dev"
+    (root / "app" / "modules").mkdir(parents=True)
+    (root / "app" / ".terraform.lock.hcl").write_text(LOCK.format(digest="a" * 64))
+    index = tmp_path / "index.json"
+    assert find_lock_files(root, index=index) and not index.exists()
+    for path in (root, root / "app", root / "app" / "modules"):
+        os.utime(path, (time.time() - 10, time.time() - 10))
+    assert [p.parent.name for p in find_lock_files(root, index=index)] == ["app"]
+
+    walks = []
+    walk = os.walk
+    monkeypatch.setattr(os, "walk", lambda top: walks.append(top) or walk(top))
+    assert [p.parent.name for p in find_lock_files(root, index=index)] == ["app"]
+    assert walks == []
+
+    (root / "app" / "modules" / ".terraform.lock.hcl").write_text(LOCK.format(digest="b" * 64))
+    assert [p.parent.name for p in find_lock_files(root, index=index)] == ["app", "modules"]
+    assert walks == [str(root)]
+
+
+def test_mirror_verifies_and_unpacks(tmp_path):
+    """Test that providers are unpacked once and checked against the lock file."""
+    archive = _package()
+    downloads = FakeDownloads(tmp_path, archive)
+    mirror = ProviderMirror(tmp_path / "cache", downloads=downloads, target="darwin_arm64")
+    good = Provider("registry.terraform.io/hashicorp/aws", "5.31.0",
+                    (hashlib.sha256(archive).hexdigest(),))
+    tampered = Provider("registry.terraform.io/hashicorp/aws", "5.30.0", ("0" * 64,))
+
+    outcome = mirror.warm([good, tampered])
+
+    assert outcome[good] is None
+    assert "does not match the lock file" in outcome[tampered]
+    binary = mirror.path(good) / "terraform-provider-aws_v5.31.0_x5"
+    assert binary.read_bytes() == b"binary" and os.access(binary, os.X_OK)
+    assert not mirror.path(tampered).exists()
+    fetched = len(downloads.urls)
+    assert mirror.warm([good]) == {good: None}
+    assert len(downloads.urls) == fetched
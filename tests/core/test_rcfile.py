@@ -0,0 +1,77 @@
+from local_env_setup.core.backup import get_backup_store
+from local_env_setup.core.rcfile import RcEditor
+
+OMZ = "export ZSH=\"$HOME/.oh-my-zsh\"\nsource $ZSH/oh-my-zsh.sh\n"
+KUBE = "source <(kubectl completion zsh)\n"
+
+
+def test_rerun_does_not_grow_or_rewrite_the_file(tmp_path):
+    """Test that applying the same blocks again leaves the file untouched."""
+    rc = tmp_path / ".zshrc"
+    rc.write_text("export EDITOR=vim\n")
+
+    for run in range(3):
+        editor = RcEditor()
+        with editor.batch():
+            editor.set_block(rc, "kubernetes", KUBE, priority=60)
+            editor.set_block(rc, "oh-my-zsh", OMZ, priority=10)
+        if run == 0:
+            inode = rc.stat().st_ino
+
+    text = rc.read_text()
+    assert text.startswith("export EDITOR=vim\n\n# >>> local_env_setup: oh-my-zsh >>>\n")
+    assert text.count("kubectl completion") == 1
+    assert rc.stat().st_ino == inode
+
+
+def test_block_is_updated_in_place_and_ordered_by_priority(tmp_path):
+    """Test that changed blocks replace their old version and respect priority."""
+    rc = tmp_path / ".zshrc"
+    editor = RcEditor()
+    editor.set_block(rc, "kubernetes", KUBE, priority=60)
+    editor.set_block(rc, "oh-my-zsh", OMZ, priority=10)
+    editor.set_block(rc, "kubernetes", "alias k=kubectl\n", priority=60)
+
+    text = rc.read_text()
+    assert text.index("oh-my-zsh.sh") < text.index("alias k=kubectl")
+    assert "kubectl completion" not in text
+
+
+def test_legacy_duplicates_are_removed(tmp_path):
+    """Test that unmarked copies appended by older versions are cleaned up."""
+    rc = tmp_path / ".zshrc"
+    legacy = "\n# Kubernetes configuration\n" + KUBE
+    rc.write_text("export EDITOR=vim\n" + legacy + legacy)
+
+    editor = RcEditor()
+    editor.set_block(rc, "kubernetes", legacy, legacy=[legacy])
+
+    text = rc.read_text()
+    assert text.count("kubectl completion") == 1
+    assert text.startswith("export EDITOR=vim\n")
+    backup = get_backup_store().versions(rc)[-1]
+    assert get_backup_store().read(backup).decode().count("kubectl completion") == 2
+
+
+def test_symlinked_rc_file_is_written_through(tmp_path):
+    """Test that a dotfiles symlink is kept and its target updated."""
+    target = tmp_path / "dotfiles" / "zshrc"
+    target.parent.mkdir()
+    target.write_text("")
+    rc = tmp_path / ".zshrc"
+    rc.symlink_to(target)
+
+    RcEditor().set_block(rc, "oh-my-zsh", OMZ)
+
+    assert rc.is_symlink()
+    assert "oh-my-zsh.sh" in target.read_text()
+
+
+def test_failed_batch_write_is_reported(tmp_path):
+    """Test that a batch exposes the failure of its deferred write."""
+    (tmp_path / "not-a-dir").write_text("")
+    editor = RcEditor()
+    with editor.batch() as written:
+        assert editor.set_block(tmp_path / "not-a-dir" / ".zshrc", "kubernetes", KUBE)
+
+    assert not written.ok
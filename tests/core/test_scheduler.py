@@ -0,0 +1,181 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from local_env_setup.core.resources import ResourcePool
+from local_env_setup.core.scheduler import Scheduler
+
+
+def test_dependencies_run_first():
+    """Test that a task only starts after its dependencies finished."""
+    order = []
+    scheduler = Scheduler(max_workers=4)
+    scheduler.add("brew", lambda: order.append("brew"))
+    scheduler.add("python", lambda: order.append("python"), depends_on=["brew"])
+    scheduler.add("git", lambda: order.append("git"))
+
+    results = scheduler.run()
+
+    assert all(r.success for r in results.values())
+    assert order.index("brew") < order.index("python")
+
+
+def test_independent_tasks_overlap():
+    """Test that independent tasks run concurrently."""
+    barrier = threading.Barrier(2, timeout=5)
+    scheduler = Scheduler(max_workers=2)
+    scheduler.add("a", lambda: barrier.wait() is not None)
+    scheduler.add("b", lambda: barrier.wait() is not None)
+
+    results = scheduler.run()
+
+    assert results["a"].success and results["b"].success
+
+
+def test_resource_limit_serializes_tasks():
+    """Test that a resource with limit 1 is never held twice."""
+    active = []
+    peak = []
+
+    def install():
+        active.append(1)
+        peak.append(len(active))
+        time.sleep(0.02)
+        active.pop()
+        return True
+
+    scheduler = Scheduler(max_workers=4, pool=ResourcePool({"brew": 1}))
+    for name in ("kubectl", "helm", "terraform"):
+        scheduler.add(name, install, resources=["brew"])
+
+    scheduler.run()
+
+    assert max(peak) == 1
+
+
+def test_failed_dependency_skips_dependents():
+    """Test that dependents of a failed task are skipped."""
+    scheduler = Scheduler()
+    scheduler.add("homebrew", lambda: False)
+    scheduler.add("python", lambda: True, depends_on=["homebrew"])
+    scheduler.add("git", lambda: True)
+
+    results = scheduler.run()
+
+    assert results["homebrew"].success is False
+    assert results["python"].skipped is True
+    assert results["python"].blocked_by == ["homebrew"]
+    assert results["git"].success is True
+
+
+def test_missing_dependency_is_ignored():
+    """Test that running a subset ignores dependencies outside it."""
+    scheduler = Scheduler()
+    scheduler.add("python", lambda: True, depends_on=["homebrew"])
+
+    assert scheduler.run()["python"].success is True
+
+
+def test_cycle_is_rejected():
+    """Test that dependency cycles are reported."""
+    scheduler = Scheduler()
+    scheduler.add("a", lambda: True, depends_on=["b"])
+    scheduler.add("b", lambda: True, depends_on=["a"])
+
+    with pytest.raises(ValueError):
+        scheduler.run()
+
+
+def test_coroutine_tasks_share_one_loop():
+    """Test that coroutine tasks overlap on the loop and honour resource limits."""
+    active = []
+    peak = []
+
+    async def clone():
+        active.append(1)
+        peak.append(len(active))
+        await asyncio.sleep(0.02)
+        active.pop()
+        return True
+
+    scheduler = Scheduler(pool=ResourcePool({"network": 2}))
+    for i in range(6):
+        scheduler.add(f"clone{i}", clone, resources=["network"])
+
+    results = asyncio.run(scheduler.arun())
+
+    assert all(r.success for r in results.values())
+    assert max(peak) == 2
+
+
+def test_fail_fast_cancels_siblings():
+    """Test that a failure cancels running and pending tasks."""
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+
+    async def broken():
+        await asyncio.sleep(0.01)
+        return False
+
+    scheduler = Scheduler(fail_fast=True)
+    scheduler.add("slow", slow)
+    scheduler.add("broken", broken)
+    scheduler.add("after", lambda: True, depends_on=["slow"])
+
+    results = scheduler.run()
+
+    assert cancelled == ["slow"]
+    assert results["slow"].error == "Cancelled"
+    assert results["after"].blocked_by == ["broken"]
+
+
+def test_longest_expected_work_starts_first():
+    """Test that ready tasks start in order of their expected remaining time."""
+    order = []
+    scheduler = Scheduler(max_workers=1, estimates={"git": 10, "brew": 5, "python": 60})
+    scheduler.add("git", lambda: order.append("git"))
+    scheduler.add("brew", lambda: order.append("brew"))
+    scheduler.add("python", lambda: order.append("python"), depends_on=["brew"])
+
+    scheduler.run()
+
+    # brew is shorter than git but unblocks python
+    assert order[0] == "brew"
+
+
+def test_critical_path_and_eta_follow_the_estimates():
+    """Test the expected critical path and the ETA before anything ran."""
+    scheduler = Scheduler(estimates={"homebrew": 30, "brew-bundle": 300, "python": 200,
+                                     "git": 5})
+    scheduler.add("homebrew", lambda: True)
+    scheduler.add("brew-bundle", lambda: True, depends_on=["homebrew"])
+    scheduler.add("python", lambda: True, depends_on=["brew-bundle"])
+    scheduler.add("git", lambda: True)
+
+    assert scheduler.critical_path() == (["homebrew", "brew-bundle", "python"], 530)
+    assert scheduler.eta({}) == 530
+
+
+def test_report_splits_critical_path_and_lock_waits():
+    """Test that the report charges resource waits to the waiting task."""
+    progress = []
+    scheduler = Scheduler(max_workers=2, pool=ResourcePool({"brew": 1}),
+                          estimates={"a": 0.05, "b": 0.05}, on_progress=progress.append)
+    scheduler.add("a", lambda: time.sleep(0.05), resources=["brew"])
+    scheduler.add("b", lambda: time.sleep(0.05), resources=["brew"])
+    scheduler.add("c", lambda: True, depends_on=["a", "b"])
+
+    report = scheduler.report(scheduler.run())
+
+    assert report.critical_path[-1] == "c"
+    assert max(report.lock_wait.values()) >= 0.04
+    assert report.wall_time >= 0.1
+    assert progress[-1].done == 3 and progress[-1].eta == 0
@@ -0,0 +1,63 @@
+import os
+import subprocess
+
+import pytest
+
+from local_env_setup.core.executor import get_executor
+from local_env_setup.core.shell_init import (
+    CompletionCache, benchmark_shell, lazy_function, load_previous_benchmark, save_benchmark)
+
+
+@pytest.fixture
+def kubectl(tmp_path, monkeypatch):
+    """A kubectl executable on PATH."""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    binary = bin_dir / "kubectl"
+    binary.write_text("#!/bin/sh\n")
+    binary.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return binary
+
+
+def test_completion_is_generated_once_per_binary(fake_backend, kubectl, tmp_path):
+    """Test that completions are regenerated only when the binary changes."""
+    fake_backend.add(["kubectl", "completion"], stdout="compdef _kubectl kubectl\n")
+    cache = CompletionCache(tmp_path / "completions", executor=get_executor())
+
+    first = cache.generate("kubectl", ["kubectl", "completion", "zsh"])
+    cache.generate("kubectl", ["kubectl", "completion", "zsh"])
+    generated = [call for call in fake_backend.calls if call[0] == "kubectl"]
+    kubectl.write_text("#!/bin/sh\n# upgraded\n")
+    cache.generate("kubectl", ["kubectl", "completion", "zsh"])
+
+    assert first.read_text().startswith("#compdef kubectl\n")
+    assert len(generated) == 1
+    assert len([call for call in fake_backend.calls if call[0] == "kubectl"]) == 2
+
+
+def test_lazy_function_initializes_on_first_call(tmp_path):
+    """Test that a lazy stub runs the real init once and then the command."""
+    marker = tmp_path / "inits"
+    script = lazy_function("tool", f'echo init >> "{marker}"; tool() {{ echo "ran $1"; }}')
+    script += "tool a\ntool b\n"
+
+    output = subprocess.run(["bash", "-c", script], capture_output=True, text=True,
+                            check=True).stdout
+
+    assert output == "ran a\nran b\n"
+    assert marker.read_text() == "init\n"
+
+
+def test_benchmark_is_compared_with_the_previous_run(fake_backend, monkeypatch, tmp_path):
+    """Test that benchmarks skip warm-up runs and persist for comparison."""
+    monkeypatch.setenv("XDG_STATE_HOME", str(tmp_path / "state"))
+    fake_backend.add(["zsh", "-i"], delay=0.01)
+
+    bench = benchmark_shell("zsh", runs=3, warmup=1, executor=get_executor())
+    save_benchmark(bench)
+
+    assert len(fake_backend.calls) == 4
+    assert bench.best >= 10
+    assert load_previous_benchmark("zsh") == bench
+    assert load_previous_benchmark("bash") is None
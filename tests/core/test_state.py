@@ -0,0 +1,36 @@
+from local_env_setup.core.state import StepStateStore
+
+
+def test_unchanged_inputs_skip(tmp_path):
+    """Test that a step with recorded identical inputs is skipped."""
+    store = StepStateStore(tmp_path / "steps.jsonl")
+    inputs = {"GIT_EMAIL": "dev@example.com", "gitconfig": "abc"}
+
+    assert store.check("git", inputs).reason == "never completed"
+    store.record("git", inputs)
+
+    # A fresh store reads the decision back from disk
+    decision = StepStateStore(tmp_path / "steps.jsonl").check("git", inputs)
+    assert decision.run is False
+
+
+def test_changed_inputs_are_explained(tmp_path):
+    """Test that the decision lists exactly the inputs that changed."""
+    store = StepStateStore(tmp_path / "steps.jsonl")
+    store.record("python", {"PYTHON_VERSION": "3.11.0", "shell_rc": "abc"})
+
+    decision = store.check("python", {"PYTHON_VERSION": "3.12.1", "shell_rc": "abc"})
+
+    assert decision.run is True
+    assert decision.changed == ["PYTHON_VERSION"]
+
+
+def test_store_is_compacted(tmp_path):
+    """Test that superseded records do not grow the file without bound."""
+    path = tmp_path / "steps.jsonl"
+    store = StepStateStore(path)
+    for i in range(100):
+        store.record("git", {"run": i})
+
+    assert len(path.read_text().splitlines()) < 40
+    assert StepStateStore(path).get("git")["inputs"] == {"run": 99}
@@ -0,0 +1,71 @@
+"""Import-time budget for the CLI entry point.
+
+The CLI is called from shell hooks and CI steps, so ``local_env_setup --help``
+must not pay for importing the setup components, their dependencies or the
+configuration.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+SRC = Path(__file__).resolve().parents[2] / "src"
+
+# Cumulative import time budget for the CLI module, in microseconds. Generous
+# enough for slow CI runners; importing the setup modules blows well past it.
+IMPORT_BUDGET_US = 100_000
+
+# Modules that must only be imported once a command is dispatched
+DEFERRED_MODULES = [
+    "dotenv",
+    "local_env_setup.config.env",
+    "local_env_setup.core.base",
+    "local_env_setup.scripts.commands",
+    "local_env_setup.setup.dev_tools.python",
+    "subprocess",
+]
+
+
+def import_times(code: str) -> Dict[str, int]:
+    """Run code under ``-X importtime`` and return cumulative times by module."""
+    env = dict(os.environ, PYTHONPATH=str(SRC))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, env=env, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_cli_import_is_within_budget():
+    """Test that importing the CLI module stays within the time budget."""
+    times = import_times("import local_env_setup.scripts.local_env_setup")
+
+    assert times["local_env_setup.scripts.local_env_setup"] < IMPORT_BUDGET_US
+
+
+@pytest.mark.parametrize("argv", [["--help"], ["init", "--help"], ["nonexistent"]])
+def test_help_does_not_import_commands(argv):
+    """Test that help and usage errors do not import any command module."""
+    code = (
+        "import sys\n"
+        f"sys.argv = ['local_env_setup'] + {argv!r}\n"
+        "from local_env_setup.scripts.local_env_setup import main\n"
+        "try:\n"
+        "    main()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    )
+    times = import_times(code)
+
+    imported = [name for name in DEFERRED_MODULES if name in times]
+    assert imported == []
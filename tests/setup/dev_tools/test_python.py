@@ -0,0 +1,104 @@
+import asyncio
+import shutil
+import time
+
+import pytest
+
+from local_env_setup.config.env import configure
+from local_env_setup.setup.dev_tools.python import (
+    PythonSetup, build_jobs, poetry_cache_dir, wheelhouse_pyproject)
+
+VERSIONS = ["3.9.18", "3.10.13", "3.12.1"]
+
+
+@pytest.fixture
+def python_setup(fake_backend, tmp_path, monkeypatch):
+    """A PythonSetup for a fresh HOME, configured with several versions."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("SHELL", "/bin/zsh")
+    configure(overrides={"PYTHON_VERSION": "3.11.7", "PYTHON_VERSIONS": VERSIONS})
+    yield PythonSetup()
+    configure()
+
+
+def test_build_jobs_split_cores():
+    """Test that cores are shared between builds and make jobs."""
+    assert build_jobs(1, cpus=10) == (1, 10)
+    assert build_jobs(4, cpus=10) == (2, 5)
+    assert build_jobs(3, cpus=2) == (1, 2)
+
+
+def test_versions_build_concurrently_and_verify_once(python_setup, fake_backend, monkeypatch):
+    """Test that builds overlap and verification parses pyenv versions --bare."""
+    monkeypatch.setattr("os.cpu_count", lambda: 16)
+    fake_backend.add(["pyenv", "install"], delay=0.3)
+    fake_backend.add(["pyenv", "versions", "--bare"],
+                     stdout="3.9.18\n3.10.13\n3.11.7\n3.11.7/envs/tools\n")
+    versions = ["3.11.7"] + VERSIONS
+
+    start = time.monotonic()
+    assert asyncio.run(python_setup.abuild(versions))
+    assert time.monotonic() - start < 0.9
+
+    installs = [call for call in fake_backend.calls if call[:2] == ["pyenv", "install"]]
+    assert sorted(call[-1] for call in installs) == sorted(versions)
+    assert not python_setup.verify()  # 3.12.1 is not in the listing
+    assert fake_backend.calls.count(["pyenv", "versions", "--bare"]) == 1
+
+
+def test_prebuilt_interpreter_is_unpacked_instead_of_built(python_setup, fake_backend):
+    """Test that a cached build is reused and a built version is packed."""
+    built = python_setup.pyenv_root / "versions" / "3.12.1"
+    (built / "bin").mkdir(parents=True)
+    python_setup.cache_build("3.12.1")
+    shutil.rmtree(built)
+
+    assert asyncio.run(python_setup.abuild(["3.12.1", "3.9.18"]))
+
+    assert python_setup.verify_python_version("3.12.1")
+    installs = [call[-1] for call in fake_backend.calls if call[:2] == ["pyenv", "install"]]
+    assert installs == ["3.9.18"]
+    assert ["pyenv", "rehash"] in fake_backend.calls
+
+
+def test_poetry_config_only_writes_changed_settings(python_setup, fake_backend, monkeypatch):
+    """Test that settings already in place are not rewritten."""
+    monkeypatch.setattr("os.cpu_count", lambda: 8)
+    poetry = str(python_setup.poetry_bin)
+    cache = str(poetry_cache_dir())
+    fake_backend.add([poetry, "config", "--list"],
+                     stdout=f'cache-dir = "{cache}"\ninstaller.max-workers = null\n')
+
+    assert python_setup.configure_poetry()
+
+    writes = [call[2:] for call in fake_backend.calls if call[:2] == [poetry, "config"]]
+    assert writes == [["--list"], ["installer.max-workers", "8"]]
+
+
+def test_wheelhouse_builds_per_interpreter_concurrently(python_setup, fake_backend):
+    """Test that every interpreter gets a project locked for its version."""
+    packages = ["numpy==1.26.4", "zope.interface", "psycopg2[binary] >=2.9"]
+    configure(overrides={"PYTHON_VERSION": "3.11.7", "POETRY_WHEELHOUSE": packages})
+    fake_backend.add([str(python_setup.poetry_bin), "install"], delay=0.3)
+
+    start = time.monotonic()
+    assert asyncio.run(python_setup.awarm_wheelhouse(VERSIONS)) == VERSIONS
+    assert time.monotonic() - start < 0.8
+
+    pyproject = wheelhouse_pyproject(packages, "3.10.13")
+    assert 'python = "~3.10"' in pyproject
+    assert '"numpy" = "==1.26.4"' in pyproject
+    assert '"zope.interface" = "*"' in pyproject
+    assert '"psycopg2" = ">=2.9"' in pyproject
+    uses = [call[-1] for call in fake_backend.calls if call[1:3] == ["env", "use"]]
+    assert sorted(uses) == sorted(str(python_setup.pyenv_root / "versions" / v / "bin" / "python3")
+                                  for v in VERSIONS)
+
+
+def test_unsupported_shell_fails_only_the_run(python_setup, monkeypatch):
+    """Test that an unsupported SHELL does not break building or fingerprinting."""
+    monkeypatch.setenv("SHELL", "/usr/bin/fish")
+    setup = PythonSetup()
+
+    assert setup.fingerprint_inputs()["shell_rc"] is None
+    assert not setup.run()
@@ -0,0 +1,81 @@
+import io
+import threading
+import time
+import zipfile
+
+import pytest
+
+from local_env_setup.config.env import configure
+from local_env_setup.core.providers import terraform_platform
+from local_env_setup.setup.infra.terraform import TerraformSetup
+
+VERSIONS = ["1.3.9", "1.5.7"]
+
+
+class FakeReleases:
+    """Serves Terraform releases and their SHA256SUMS, slowly."""
+
+    def __init__(self, tmp_path, delay=0.0):
+        self.tmp_path = tmp_path
+        self.delay = delay
+        self.urls = []
+        self.lock = threading.Lock()
+
+    def fetch(self, url, sha256=None, max_age=None):
+        with self.lock:
+            self.urls.append(url)
+            path = self.tmp_path / f"download{len(self.urls)}"
+        version = url.split("/")[-2]
+        asset = f"terraform_{version}_{terraform_platform()}.zip"
+        if url.endswith("_SHA256SUMS"):
+            path.write_text(f"{'0' * 64}  terraform_{version}_windows_amd64.zip\n"
+                            f"{'1' * 64}  {asset}\n")
+        else:
+            assert sha256 == "1" * 64
+            time.sleep(self.delay)
+            buffer = io.BytesIO()
+            with zipfile.ZipFile(buffer, "w") as package:
+                package.writestr("terraform", f"#!/bin/sh\necho Terraform v{version}\n")
+            path.write_bytes(buffer.getvalue())
+        return path
+
+
+@pytest.fixture
+def terraform_setup(fake_backend, tmp_path, monkeypatch):
+    """A TerraformSetup for a fresh HOME, configured with several versions."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("SHELL", "/bin/zsh")
+    configure(overrides={"TERRAFORM_VERSION": "1.4.0", "TERRAFORM_VERSIONS": VERSIONS})
+    setup = TerraformSetup()
+    setup.downloads = FakeReleases(tmp_path, delay=0.3)
+    for version in ["1.4.0"] + VERSIONS:
+        fake_backend.add([str(setup.binary(version)), "version"], stdout=f"Terraform v{version}")
+    yield setup
+    configure()
+
+
+def test_versions_install_side_by_side_concurrently(terraform_setup):
+    """Test that missing releases are fetched at once and installed only once."""
+    start = time.monotonic()
+    assert terraform_setup.install_versions()
+    elapsed = time.monotonic() - start
+
+    assert elapsed < 0.6
+    for version in ["1.4.0"] + VERSIONS:
+        assert terraform_setup.binary(version).stat().st_mode & 0o111
+    downloads = len(terraform_setup.downloads.urls)
+    assert terraform_setup.install_versions()
+    assert len(terraform_setup.downloads.urls) == downloads
+
+
+def test_shim_is_installed_first_on_path(terraform_setup, tmp_path):
+    """Test that the shim is written once and its directory put on PATH."""
+    assert terraform_setup.install_shim()
+    shim = terraform_setup.shim_path
+    assert shim.stat().st_mode & 0o111
+    assert f"versions='{terraform_setup.versions_dir}'" in shim.read_text()
+    assert f'export PATH="{shim.parent}:$PATH"' in (tmp_path / ".zshrc").read_text()
+
+    written = shim.stat().st_mtime_ns
+    assert terraform_setup.install_shim()
+    assert shim.stat().st_mtime_ns == written
@@ -0,0 +1,12 @@
+from local_env_setup.setup.os.shell import KNOWN_PLUGIN_URLS, plugin_sources
+
+
+def test_plugin_sources_follow_zsh_plugins():
+    """Test that ZSH_PLUGINS entries map to clone URLs or bundled plugins."""
+    sources = plugin_sources(["git", "zsh-autosuggestions", "zdharma-continuum/zinit"])
+
+    assert sources == {
+        "git": None,
+        "zsh-autosuggestions": KNOWN_PLUGIN_URLS["zsh-autosuggestions"],
+        "zinit": "https://github.com/zdharma-continuum/zinit.git",
+    }
@@ -0,0 +1,113 @@
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+import local_env_setup
+from local_env_setup.shims.terraform import CACHE_ENTRY, render_shim, resolve, satisfies
+
+# What the shim may add to running Terraform directly, per invocation
+OVERHEAD_BUDGET_S = 0.010
+
+
+@pytest.fixture
+def shim(tmp_path):
+    """A shim over fake Terraform 1.3.9, 1.4.0 (the default) and 1.5.7."""
+    versions = tmp_path / "versions"
+    for version in ("1.3.9", "1.4.0", "1.5.7"):
+        binary = versions / version / "terraform"
+        binary.parent.mkdir(parents=True)
+        binary.write_text(f"#!/bin/sh\necho {version}\n")
+        binary.chmod(0o755)
+    path = tmp_path / "bin" / "terraform"
+    path.parent.mkdir()
+    path.write_text(render_shim(str(path), str(versions), str(tmp_path / "cache"), "1.4.0",
+                                sys.executable, str(Path(local_env_setup.__file__).parent.parent)))
+    path.chmod(0o755)
+    return path
+
+
+def write_config(path, text):
+    """Write a *.tf file dated far enough back for its lookup to be cached."""
+    path.write_text(text)
+    os.utime(path, (time.time() - 10, time.time() - 10))
+
+
+def run(shim, cwd, *args):
+    """Run the shim in a directory and return what it printed."""
+    result = subprocess.run([str(shim), *args], cwd=cwd, capture_output=True, text=True)
+    return result.stdout.strip() or result.stderr.strip()
+
+
+def test_constraints_pick_the_default_else_the_newest_match(tmp_path):
+    """Test Terraform's constraint operators and the choice among installed versions."""
+    assert satisfies("1.5.7", ">= 1.3, < 2.0")
+    assert satisfies("1.5.7", "~> 1.5.0") and not satisfies("1.6.0", "~> 1.5.0")
+    assert satisfies("1.9.0", "~> 1.5") and not satisfies("2.0.0", "~> 1.5")
+    assert satisfies("1.4.0", "1.4.0") and not satisfies("1.4.0", "!= 1.4.0")
+    assert not satisfies("1.4.0", "latest")
+
+    versions = tmp_path / "versions"
+    for version in ("1.3.9", "1.4.0", "1.5.7"):
+        (versions / version).mkdir(parents=True)
+        (versions / version / "terraform").touch()
+    (tmp_path / "main.tf").write_text('terraform {\n  required_version = ">= 1.3"\n}\n')
+    assert resolve(str(tmp_path), "1.4.0", str(versions)) == "1.4.0"
+    (tmp_path / "versions.tf").write_text('terraform {\n  required_version = "!= 1.4.0"\n}\n')
+    assert resolve(str(tmp_path), "1.4.0", str(versions)) == "1.5.7"
+    (tmp_path / "versions.tf").write_text('terraform {\n  required_version = "> 2.0"\n}\n')
+    with pytest.raises(LookupError):
+        resolve(str(tmp_path), "1.4.0", str(versions))
+    (tmp_path / "versions.tf").write_text('terraform {\n  required_version = "> 1.x"\n}\n')
+    (versions / "nightly").mkdir()
+    (versions / "nightly" / "terraform").touch()
+    assert resolve(str(tmp_path), "1.4.0", str(versions)) == "1.4.0"
+
+
+def test_shim_runs_the_version_the_directory_asks_for(shim, tmp_path):
+    """Test .terraform-version, cached required_version lookups and their invalidation."""
+    repo = tmp_path / "repo"
+    module = repo / "modules" / "network"
+    module.mkdir(parents=True)
+    assert run(shim, repo) == "1.4.0"
+    (repo / ".terraform-version").write_text("1.3.9\n")
+    assert run(shim, module) == "1.3.9"
+    (repo / ".terraform-version").write_text("1.6.0\n")
+    assert "1.6.0" in run(shim, module) and "not installed" in run(shim, module)
+
+    app = tmp_path / "app"
+    app.mkdir()
+    write_config(app / "main.tf", 'terraform {\n  required_version = "~> 1.5.0"\n}\n')
+    assert run(shim, app) == "1.5.7"
+    entry = tmp_path / "cache" / str(app).lstrip("/") / CACHE_ENTRY
+    assert entry.read_text() == "1.5.7 1\n"
+    # A stale entry is used while no *.tf file changed...
+    entry.write_text("1.3.9 1\n")
+    assert run(shim, app) == "1.3.9"
+    assert run(shim, tmp_path, f"-chdir={app.name}") == "1.3.9"
+    # ...and re-resolved once one is added
+    (app / "versions.tf").write_text("")
+    assert run(shim, app) == "1.5.7"
+
+
+def test_cached_lookup_stays_within_budget(shim, tmp_path):
+    """Test that a cached lookup adds less than 10 ms to each invocation."""
+    app = tmp_path / "app"
+    app.mkdir()
+    write_config(app / "main.tf", 'terraform {\n  required_version = ">= 1.5"\n}\n')
+    assert run(shim, app) == "1.5.7"
+    binary = tmp_path / "versions" / "1.5.7" / "terraform"
+
+    def median(cmd):
+        timings = []
+        for _ in range(21):
+            start = time.perf_counter()
+            subprocess.run(cmd, cwd=app, stdout=subprocess.DEVNULL, check=True)
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
+
+    assert median([str(shim)]) - median([str(binary)]) < OVERHEAD_BUDGET_S
@@ -0,0 +1,19 @@
+from local_env_setup.testing.bench import compare
+
+
+def result(wall_time, commands):
+    return {"scenarios": {"cold": {"median": {
+        "wall_time": wall_time, "overhead": 0.1, "commands": commands,
+        "stub_calls": commands, "peak_rss_mb": 30.0}}}}
+
+
+def test_compare_reports_only_meaningful_regressions():
+    """Test that regressions need both the relative and absolute change."""
+    baseline = result(wall_time=2.0, commands=30)
+
+    [regression] = compare(result(wall_time=3.0, commands=30), baseline)
+
+    assert (regression.scenario, regression.metric) == ("cold", "wall_time")
+    assert regression.change == 0.5
+    assert compare(result(wall_time=2.2, commands=30), baseline) == []
+    assert [r.metric for r in compare(result(2.0, 40), baseline)] == ["commands", "stub_calls"]
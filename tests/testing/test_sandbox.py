@@ -0,0 +1,50 @@
+import pytest
+
+from local_env_setup.testing import Sandbox
+
+
+@pytest.fixture
+def sandbox(tmp_path):
+    """A running sandbox with instant stubs."""
+    with Sandbox(tmp_path / "sandbox") as sandbox:
+        yield sandbox
+
+
+def test_init_runs_against_stub_tools(sandbox):
+    """Test a full init in the sandbox, then a warm run that does no work."""
+    cold = sandbox.run_init()
+    warm = sandbox.run_init()
+
+    assert cold["success"], cold["output"]
+    tools = {call["tool"] for call in sandbox.calls()}
+    assert {"brew", "git", "pyenv", "kubectl", "helm"} <= tools
+    assert (sandbox.home / ".oh-my-zsh").is_dir()
+    assert "pyenv" in (sandbox.home / ".zshrc").read_text()
+    assert cold["commands"] > 0 and set(cold["steps"]) >= {"python", "brew-bundle"}
+    assert warm["success"]
+    assert (warm["commands"], warm["stub_calls"]) == (0, 0)
+
+
+def test_injected_failures_fail_only_their_component(sandbox):
+    """Test that a failing stub fails the component using it."""
+    sandbox.configure("pyenv", failure_rate=1.0)
+
+    result = sandbox.run_init(components=["git", "homebrew", "python", "terraform"])
+
+    assert not result["success"]
+    assert "❌ python" in result["output"]
+    assert "❌ terraform" not in result["output"]
+
+
+def test_resume_skips_completed_components(sandbox):
+    """Test that --resume re-runs only what the failed run did not finish."""
+    sandbox.configure("pyenv", failure_rate=1.0)
+    failed = sandbox.run_init(components=["git", "homebrew", "python"])
+    assert not failed["success"]
+
+    sandbox.configure("pyenv", failure_rate=0.0)
+    resumed = sandbox.run_init(resume=True)
+
+    assert resumed["success"], resumed["output"]
+    assert "⏭️  git completed before the interruption" in resumed["output"]
+    assert set(resumed["steps"]) == {"python"}
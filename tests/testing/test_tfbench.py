@@ -0,0 +1,12 @@
+from local_env_setup.testing.tfbench import run_tf_benchmark
+
+
+def test_warmed_cache_serves_every_init():
+    """Test that after the warm-up no terraform init downloads anything."""
+    result = run_tf_benchmark(configs=3, providers=2, size_mb=0.1, latency=0.0)
+
+    cold, warmup, warm = (result["scenarios"][name] for name in ("cold", "warmup", "warm"))
+    assert cold["requests"] == 3 * 2 * 2
+    # Each provider's metadata and package, plus the Terraform release and its SHA256SUMS
+    assert warmup["success"] and warmup["requests"] == 2 * 2 + 2
+    assert warm["requests"] == 0